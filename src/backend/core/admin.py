@@ -160,6 +160,7 @@ class ItemAdmin(admin.ModelAdmin):
                     "title",
                     "filename",
                     "size",
+                    "blob",
                     "deleted_at",
                     "ancestors_deleted_at",
                     "malware_detection_info",
@@ -187,6 +188,7 @@ class ItemAdmin(admin.ModelAdmin):
                     "path",
                     "depth",
                     "numchild",
+                    "numchild_folder",
                 )
             },
         ),
@@ -207,9 +209,11 @@ class ItemAdmin(admin.ModelAdmin):
         "depth",
         "id",
         "numchild",
+        "numchild_folder",
         "path",
         "filename",
         "size",
+        "blob",
         "deleted_at",
         "ancestors_deleted_at",
         "malware_detection_info",
@@ -219,12 +223,6 @@ class ItemAdmin(admin.ModelAdmin):
     show_facets = admin.ShowFacets.ALWAYS
     actions = ("trigger_file_analysis",)
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate_with_numchild()
-
-        return queryset
-
     def trigger_file_analysis(self, request, queryset):
         """Reanalyse the file of the items."""
 
@@ -11,6 +11,11 @@ from core.models import RoleChoices, get_trashbin_cutoff
 ACTION_FOR_METHOD_TO_PERMISSION = {
     "versions_detail": {"DELETE": "versions_destroy", "GET": "versions_retrieve"},
     "children": {"GET": "children_list", "POST": "children_create"},
+    "changes": {"GET": "children_list"},
+    "background_tasks": {"GET": "retrieve"},
+    "upload_parts": {"POST": "upload_ended"},
+    "upload_batch": {"POST": "children_create"},
+    "upload_ended_batch": {"POST": "children_create"},
 }
 
 
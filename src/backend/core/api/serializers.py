@@ -283,6 +283,8 @@ class ListItemSerializer(serializers.ModelSerializer):
             "link_role",
             "link_reach",
             "nb_accesses",
+            "numchild",
+            "numchild_folder",
             "path",
             "updated_at",
             "user_role",
@@ -332,12 +334,13 @@ class ListItemSerializer(serializers.ModelSerializer):
         """Return the URL of the item."""
         if (
             item.type != models.ItemTypeChoices.FILE
-            or item.upload_state == models.ItemUploadStateChoices.PENDING
+            or item.upload_state
+            in [models.ItemUploadStateChoices.PENDING, models.ItemUploadStateChoices.FINALIZING]
             or item.filename is None
         ):
             return None
 
-        return f"{settings.MEDIA_BASE_URL}{settings.MEDIA_URL}{quote(item.file_key)}"
+        return f"{settings.MEDIA_BASE_URL}{settings.MEDIA_URL}{quote(item.media_key)}"
 
     def get_url_permalink(self, item):
         """Return a stable permalink URL for downloading the item.
@@ -347,7 +350,8 @@ class ListItemSerializer(serializers.ModelSerializer):
         """
         if (
             item.type != models.ItemTypeChoices.FILE
-            or item.upload_state == models.ItemUploadStateChoices.PENDING
+            or item.upload_state
+            in [models.ItemUploadStateChoices.PENDING, models.ItemUploadStateChoices.FINALIZING]
             or item.filename is None
         ):
             return None
@@ -364,12 +368,13 @@ class ListItemSerializer(serializers.ModelSerializer):
         """Return the URL of the item."""
         if (
             item.type != models.ItemTypeChoices.FILE
-            or item.upload_state == models.ItemUploadStateChoices.PENDING
+            or item.upload_state
+            in [models.ItemUploadStateChoices.PENDING, models.ItemUploadStateChoices.FINALIZING]
             or item.filename is None
             or not utils.is_previewable_item(item)
         ):
             return None
-        return f"{settings.MEDIA_BASE_URL}{settings.MEDIA_URL_PREVIEW}{quote(item.file_key)}"
+        return f"{settings.MEDIA_BASE_URL}{settings.MEDIA_URL_PREVIEW}{quote(item.media_key)}"
 
     def get_hard_delete_at(self, item):
         """Return the hard delete date of the item."""
@@ -431,6 +436,8 @@ class ListItemLightSerializer(ListItemSerializer):
             "is_favorite",
             "link_role",
             "link_reach",
+            "numchild",
+            "numchild_folder",
             "path",
             "updated_at",
             "user_role",
@@ -511,6 +518,8 @@ class ItemSerializer(ListItemSerializer):
             "depth",
             "is_favorite",
             "nb_accesses",
+            "numchild",
+            "numchild_folder",
             "link_role",
             "link_reach",
             "path",
@@ -567,6 +576,7 @@ class CreateItemSerializer(ItemSerializer):
         default=None,
         write_only=True,
     )
+    size = serializers.IntegerField(min_value=0, required=False, allow_null=True)
 
     class Meta:
         model = models.Item
@@ -623,7 +633,6 @@ class CreateItemSerializer(ItemSerializer):
             "url_permalink",
             "policy",
             "main_workspace",
-            "size",
             "hard_delete_at",
         ]
 
@@ -680,11 +689,27 @@ class CreateItemSerializer(ItemSerializer):
                             code="item_create_file_extension_not_allowed",
                         )
 
+                # The size declared by the client is signed in its upload policy so that
+                # files too large are refused before being uploaded. Files created without
+                # a size are checked once uploaded, when their upload is finalized.
+                if (
+                    attrs.get("size") is not None
+                    and attrs["size"] > settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+                ):
+                    raise serializers.ValidationError(
+                        {"size": _("The file size is higher than the allowed max size.")},
+                        code="item_create_file_size_exceeded",
+                    )
+
                 # When it's a file we force the title with the filename
                 attrs["title"] = attrs["filename"]
                 # Use the sanitize_filename utils
                 attrs["filename"] = utils.sanitize_filename(attrs["filename"])
 
+        if attrs["type"] != models.ItemTypeChoices.FILE or extension:
+            # Only files uploaded by the client have a size declared
+            attrs.pop("size", None)
+
         if attrs["type"] == models.ItemTypeChoices.FOLDER and attrs.get("title") is None:
             raise serializers.ValidationError(
                 {"title": _("This field is required for folders.")},
@@ -724,6 +749,32 @@ class BreadcrumbItemSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "title", "path", "depth", "main_workspace"]
 
 
+class ItemBackgroundTaskSerializer(serializers.ModelSerializer):
+    """Serialize the background tasks run on the subtree of an item."""
+
+    class Meta:
+        model = models.ItemBackgroundTask
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "processed",
+            "total",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class ItemChangeSerializer(serializers.ModelSerializer):
+    """Serialize the entries of the change log of the items."""
+
+    class Meta:
+        model = models.ItemChange
+        fields = ["id", "item_id", "kind", "path", "previous_path", "created_at"]
+        read_only_fields = fields
+
+
 class UserMeSerializer(UserSerializer):
     """Serialize users for me endpoint."""
 
@@ -871,6 +922,156 @@ class MoveItemSerializer(serializers.Serializer):
     target_item_id = serializers.UUIDField(required=False)
 
 
+class UploadPartsSerializer(serializers.Serializer):
+    """
+    Serializer for validating the parts of a multipart upload for which upload urls are asked.
+
+    Example:
+        Input payload asking for the urls of the first three parts of a file sent in 8 parts:
+        {
+            "parts_count": 8,
+            "part_numbers": [1, 2, 3],
+        }
+
+    Notes:
+        - Part numbers range from 1 to the number of parts of the file, which is at most 10000,
+          the maximum number of parts of a multipart upload.
+        - At most `ITEM_UPLOAD_PARTS_BATCH_SIZE` part numbers can be asked at once.
+    """
+
+    parts_count = serializers.IntegerField(min_value=1, max_value=10000)
+    part_numbers = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=10000), allow_empty=False
+    )
+
+    def validate_part_numbers(self, value):
+        """Limit the number of urls signed by one request and drop duplicates."""
+        if len(value) > settings.ITEM_UPLOAD_PARTS_BATCH_SIZE:
+            raise serializers.ValidationError(
+                f"At most {settings.ITEM_UPLOAD_PARTS_BATCH_SIZE:d} parts can be asked at once."
+            )
+        return sorted(set(value))
+
+    def validate(self, attrs):
+        """Ensure that the parts asked are among the parts of the file."""
+        if attrs["part_numbers"][-1] > attrs["parts_count"]:
+            raise serializers.ValidationError(
+                {"part_numbers": "Part numbers cannot exceed the number of parts."}
+            )
+        return attrs
+
+
+class UploadBatchFileSerializer(serializers.Serializer):
+    """
+    Serializer for validating one file of a folder upload, given by its path relative to the
+    folder in which it is uploaded.
+    """
+
+    path = serializers.CharField(max_length=4096)
+    size = serializers.IntegerField(min_value=0)
+
+    def validate_path(self, value):
+        """Split the path in the titles of its folders and the title of the file."""
+        segments = value.split("/")
+        if any(segment in ("", ".", "..") or len(segment) > 255 for segment in segments):
+            raise serializers.ValidationError(
+                _("This path is not a valid relative path."),
+                code="item_upload_batch_invalid_path",
+            )
+        return value
+
+    def validate(self, attrs):
+        """Check the file like when a file item is created on its own."""
+        attrs["segments"] = attrs["path"].split("/")
+        title = attrs["segments"][-1]
+
+        if settings.RESTRICT_UPLOAD_FILE_TYPE:
+            _root, extension = splitext(title)
+            if extension.lower() not in settings.FILE_EXTENSIONS_ALLOWED:
+                logger.info(
+                    "upload_batch: file extension not allowed %s for filename %s",
+                    extension,
+                    title,
+                )
+                raise serializers.ValidationError(
+                    {"path": _("This file extension is not allowed.")},
+                    code="item_create_file_extension_not_allowed",
+                )
+
+        if attrs["size"] > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+            raise serializers.ValidationError(
+                {"size": _("The file size is higher than the allowed max size.")},
+                code="item_create_file_size_exceeded",
+            )
+
+        attrs["filename"] = utils.sanitize_filename(title)
+        return attrs
+
+
+class UploadBatchSerializer(serializers.Serializer):
+    """
+    Serializer for validating the manifest of a folder upload, creating its folders and files
+    in one request.
+
+    Example:
+        Input payload uploading two files, one of them in a sub folder:
+        {
+            "files": [
+                {"path": "report.pdf", "size": 1024},
+                {"path": "photos/holidays.jpg", "size": 2048},
+            ],
+        }
+
+    Notes:
+        - At most `ITEM_UPLOAD_BATCH_SIZE` files can be created at once, larger uploads are
+          sent in several batches reusing the folders created by the former ones.
+    """
+
+    files = UploadBatchFileSerializer(many=True, allow_empty=False)
+
+    def validate_files(self, value):
+        """Limit the number of files created by one request and refuse duplicated paths."""
+        if len(value) > settings.ITEM_UPLOAD_BATCH_SIZE:
+            raise serializers.ValidationError(
+                f"At most {settings.ITEM_UPLOAD_BATCH_SIZE:d} files can be uploaded at once."
+            )
+
+        paths = {tuple(file["segments"]) for file in value}
+        if len(paths) != len(value):
+            raise serializers.ValidationError(
+                _("The same path can not be uploaded twice."),
+                code="item_upload_batch_duplicated_path",
+            )
+        # A path can not be both a file and a folder of another file
+        if any(path[:depth] in paths for path in paths for depth in range(1, len(path))):
+            raise serializers.ValidationError(
+                _("A file can not be the folder of another file."),
+                code="item_upload_batch_file_as_folder",
+            )
+        return value
+
+
+class UploadEndedBatchSerializer(serializers.Serializer):
+    """
+    Serializer for validating the files of which the upload ended, finalized in one request.
+
+    Example:
+        {
+            "ids": ["123e4567-e89b-12d3-a456-426614174000"],
+        }
+    """
+
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+
+    def validate_ids(self, value):
+        """Limit the number of files finalized by one request and drop duplicates."""
+        if len(value) > settings.ITEM_UPLOAD_BATCH_SIZE:
+            raise serializers.ValidationError(
+                f"At most {settings.ITEM_UPLOAD_BATCH_SIZE:d} files can be finalized at once."
+            )
+        return list(dict.fromkeys(value))
+
+
 class SDKRelayEventSerializer(serializers.Serializer):
     """Serializer for SDK relay events."""
 
@@ -9,12 +9,13 @@ from os.path import splitext
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.files.storage import default_storage
 
-import boto3
 import botocore
 import magic
 
+from core.services.s3_signer import get_s3_request_signer
+from core.storage import get_storage_gateway
+
 logger = logging.getLogger(__name__)
 
 
@@ -82,62 +83,124 @@ def generate_s3_authorization_headers(key):
       with cookies)
     - access control is truly realtime
     - the object storage service does not need to be exposed on internet
+
+    The headers are built by a signer reusing the credentials and the signing key between
+    requests, without building a presigned url and a botocore request for each of them.
+    """
+    return get_s3_request_signer().sign(key)
+
+
+def generate_upload_policy(item):
+    """
+    Generate a S3 upload policy for a given item. When the size of the file was declared on
+    creation, it is signed in the policy so that the object storage refuses any other size.
     """
-    url = default_storage.unsigned_connection.meta.client.generate_presigned_url(
-        "get_object",
-        ExpiresIn=0,
-        Params={"Bucket": default_storage.bucket_name, "Key": key},
+    params = {"ACL": "private"}
+    if item.size is not None:
+        params["ContentLength"] = item.size
+
+    # The url is signed for the domain through which the frontend application reaches the
+    # object storage, which can't be changed once signed (see AWS_S3_DOMAIN_REPLACE).
+    return get_storage_gateway().presign(
+        "put_object", item.file_key, settings.AWS_S3_UPLOAD_POLICY_EXPIRATION, **params
     )
-    request = botocore.awsrequest.AWSRequest(method="get", url=url)
 
-    s3_client = default_storage.connection.meta.client
-    # pylint: disable=protected-access
-    credentials = s3_client._request_signer._credentials  # noqa: SLF001
-    frozen_credentials = credentials.get_frozen_credentials()
-    region = s3_client.meta.region_name
-    auth = botocore.auth.S3SigV4Auth(frozen_credentials, "s3", region)
-    auth.add_auth(request)
 
-    return request
+def create_multipart_upload(item):
+    """
+    Create a S3 multipart upload for the file of a given item and return its id.
+    """
+    return get_storage_gateway().create_multipart_upload(item.file_key, acl="private")
 
 
-def generate_upload_policy(item):
+def get_upload_part_size(size, parts_count, part_number):
     """
-    Generate a S3 upload policy for a given item.
-    """
-
-    # Generate a unique key for the item
-    key = f"{item.key_base}/{item.filename}"
-
-    # This settings should be used if the backend application and the frontend application
-    # can't connect to the object storage with the same domain. This is the case in the
-    # docker compose stack used in development. The frontend application will use localhost
-    # to connect to the object storage while the backend application will use the object storage
-    # service name declared in the docker compose stack.
-    # This is needed because the domain name is used to compute the signature. So it can't be
-    # changed dynamically by the frontend application.
-    if settings.AWS_S3_DOMAIN_REPLACE:
-        s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY,
-            endpoint_url=settings.AWS_S3_DOMAIN_REPLACE,
-            config=botocore.client.Config(
-                region_name=settings.AWS_S3_REGION_NAME,
-                signature_version=settings.AWS_S3_SIGNATURE_VERSION,
+    Size of a part of a multipart upload: the file is split in parts of the same size, rounded
+    up, the last part holding the rest.
+    """
+    part_size = -(-size // parts_count)
+    if part_number < parts_count:
+        return part_size
+    return size - part_size * (parts_count - 1)
+
+
+def generate_upload_part_urls(item, part_numbers):
+    """
+    Generate presigned urls to upload the given parts of the multipart upload of an item.
+    Parts can be sent in parallel and each one can be retried on its own. The size of each
+    part is signed so that the object storage refuses any other size.
+    """
+    storage_gateway = get_storage_gateway()
+
+    return [
+        {
+            "part_number": part_number,
+            "url": storage_gateway.presign(
+                "upload_part",
+                item.file_key,
+                settings.AWS_S3_UPLOAD_PART_EXPIRATION,
+                UploadId=item.multipart_upload_id,
+                PartNumber=part_number,
+                ContentLength=get_upload_part_size(
+                    item.size, item.multipart_parts_count, part_number
+                ),
             ),
+        }
+        for part_number in part_numbers
+    ]
+
+
+def complete_multipart_upload(item):
+    """
+    Complete the multipart upload of an item with the parts received by the object storage,
+    so that the client does not have to collect and send back their ETags. The upload is only
+    completed if all the parts declared when it was created were received with their
+    expected size.
+    """
+    storage_gateway = get_storage_gateway()
+    parts = sorted(
+        storage_gateway.list_parts(item.file_key, item.multipart_upload_id),
+        key=lambda part: part["PartNumber"],
+    )
+    if not parts:
+        raise ValueError(f"No part was uploaded for the file of item {item.id!s}.")
+
+    parts_count = item.multipart_parts_count or len(parts)
+    if [part["PartNumber"] for part in parts] != list(range(1, parts_count + 1)):
+        raise ValueError(
+            f"The parts uploaded for the file of item {item.id!s} are not the "
+            f"{parts_count:d} parts expected."
         )
-    else:
-        s3_client = default_storage.connection.meta.client
-
-    # Generate the policy
-    policy = s3_client.generate_presigned_url(
-        ClientMethod="put_object",
-        Params={"Bucket": default_storage.bucket_name, "Key": key, "ACL": "private"},
-        ExpiresIn=settings.AWS_S3_UPLOAD_POLICY_EXPIRATION,
+
+    # Uploads created before the size of files was required are not checked
+    if item.size is not None and item.multipart_parts_count:
+        for part in parts:
+            part_size = get_upload_part_size(
+                item.size, item.multipart_parts_count, part["PartNumber"]
+            )
+            if part["Size"] != part_size:
+                raise ValueError(
+                    f"The part {part['PartNumber']:d} uploaded for the file of item "
+                    f"{item.id!s} has {part['Size']:d} bytes instead of {part_size:d}."
+                )
+
+    storage_gateway.complete_multipart_upload(
+        item.file_key,
+        item.multipart_upload_id,
+        [{"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in parts],
     )
 
-    return policy
+
+def abort_multipart_upload(key, upload_id):
+    """
+    Abort a multipart upload so that the object storage frees its parts.
+    Uploads that are already completed or aborted are ignored.
+    """
+    try:
+        get_storage_gateway().abort_multipart_upload(key, upload_id)
+    except botocore.exceptions.ClientError as error:
+        if error.response["Error"]["Code"] != "NoSuchUpload":
+            raise
 
 
 def is_previewable_item(item):
@@ -160,9 +223,7 @@ def get_item_file_head_object(item):
     """
     Get the head object of an item file.
     """
-    return default_storage.connection.meta.client.head_object(
-        Bucket=default_storage.bucket_name, Key=item.file_key
-    )
+    return get_storage_gateway().head(item.file_key)
 
 
 def detect_mimetype(file_buffer: bytes, filename: str | None = None) -> str:
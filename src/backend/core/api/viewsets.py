@@ -1,11 +1,14 @@
 """API endpoints"""
 # pylint: disable=too-many-lines
 
+import base64
+import hashlib
 import json
 import logging
 import os
 import re
 import uuid
+from datetime import timedelta
 from io import BytesIO
 from urllib.parse import quote, unquote, urlparse
 
@@ -13,15 +16,17 @@ from django.conf import settings
 from django.contrib.postgres.search import TrigramSimilarity
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.core.files.storage import default_storage
 from django.db import IntegrityError, transaction
 from django.db import models as db
 from django.db.models.expressions import RawSQL
 from django.db.models.functions import Coalesce
 from django.http import StreamingHttpResponse
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
 from django.utils.functional import cached_property
+from django.utils.http import content_disposition_header, quote_etag
 from django.utils.text import capfirst, slugify
 from django.utils.translation import gettext_lazy as _
 
@@ -37,12 +42,12 @@ from lasuite.drf.models.choices import (
     LinkReachChoices,
     get_equivalent_link_definition,
 )
-from lasuite.malware_detection import malware_detection
 from lasuite.oidc_login.decorators import refresh_oidc_access_token
 from rest_framework import response as drf_response
 from rest_framework import status, viewsets
 from rest_framework.permissions import AllowAny
 from rest_framework.throttling import UserRateThrottle
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework_api_key.permissions import HasAPIKey
 
 from core import enums, models
@@ -53,8 +58,16 @@ from core.services.search_indexers import (
     get_file_indexer,
     get_visited_items_ids_of,
 )
-from core.storage import get_storage_compute_backend
-from core.tasks.item import duplicate_file, process_item_purge, rename_file
+from core.storage import get_storage_compute_backend, get_storage_gateway
+from core.tasks.item import (
+    duplicate_file,
+    finalize_item_upload,
+    finalize_item_uploads,
+    process_item_background_task,
+    process_item_purge,
+    rename_file,
+)
+from core.tasks.search import trigger_batch_file_indexer
 from core.utils.analytics import posthog_capture
 from wopi.conversion import exceptions as conversion_exceptions
 from wopi.conversion.services import prepare_conversion
@@ -168,6 +181,162 @@ class Pagination(drf.pagination.PageNumberPagination):
     page_size_query_param = "page_size"
 
 
+class ItemPagination(Pagination):
+    """
+    Page number pagination with an opt-in keyset mode for item listings.
+
+    Passing the `cursor` query parameter (empty for the first page) switches to keyset
+    pagination: pages are fetched by comparing the ordering fields of the queryset, with
+    a tiebreak on the id, to the values of the last row seen. The cost of a page is then
+    the same whatever its position and no count query is run.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = _("Invalid cursor")
+    tiebreak_field = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate by keyset if a cursor is requested, by page number otherwise."""
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self._get_keyset_ordering(queryset)
+        position, reverse = self._decode_cursor(request)
+
+        queryset = queryset.order_by(*self._get_order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(position, reverse))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Coming from a cursor, there is always a page on the side we came from
+        has_next, has_previous = has_more, position is not None
+        if reverse:
+            has_next, has_previous = has_previous, has_next
+
+        self.next_position = self.previous_position = None
+        if results and has_next:
+            self.next_position = self._get_position(results[-1])
+        if results and has_previous:
+            self.previous_position = self._get_position(results[0])
+
+        return results
+
+    def get_paginated_response(self, data):
+        """Keyset pages expose opaque next/previous links and no count."""
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        return drf.response.Response(
+            {
+                "next": self._encode_cursor(self.next_position, reverse=False),
+                "previous": self._encode_cursor(self.previous_position, reverse=True),
+                "results": data,
+            }
+        )
+
+    def _get_keyset_ordering(self, queryset):
+        """Return the ordering of the queryset as (field, descending) tuples."""
+        order_by = queryset.query.order_by or queryset.query.get_meta().ordering
+        ordering = []
+        for field in order_by:
+            if not isinstance(field, str) or field == "?":
+                raise drf.exceptions.ValidationError(
+                    {"cursor": "This ordering does not support cursor pagination."},
+                    code="cursor_unsupported_ordering",
+                )
+            name = field.lstrip("-")
+            if name in ("pk", self.tiebreak_field):
+                break
+            ordering.append((name, field.startswith("-")))
+
+        ordering.append((self.tiebreak_field, False))
+        return ordering
+
+    def _get_order_by(self, reverse):
+        """Order with NULL values last so that they can be compared in the keyset filter."""
+        nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+        order_by = []
+        for field, descending in self.ordering:
+            expression = db.F(field)
+            if descending != reverse:
+                order_by.append(expression.desc(**nulls))
+            else:
+                order_by.append(expression.asc(**nulls))
+        return order_by
+
+    def _get_keyset_filter(self, position, reverse):
+        """
+        Build the filter selecting rows located after the position, or before it when
+        paginating in reverse, in the ordering of the queryset.
+        """
+        clause = db.Q(pk__in=[])
+        equal = db.Q()
+        for (field, descending), value in zip(self.ordering, position, strict=True):
+            if value is None:
+                # NULL values are sorted last: only non NULL values are located before
+                beyond = db.Q(**{f"{field}__isnull": False}) if reverse else None
+                same = db.Q(**{f"{field}__isnull": True})
+            else:
+                lookup = "lt" if descending != reverse else "gt"
+                beyond = db.Q(**{f"{field}__{lookup}": value})
+                if not reverse:
+                    beyond |= db.Q(**{f"{field}__isnull": True})
+                same = db.Q(**{field: value})
+
+            if beyond is not None:
+                clause |= equal & beyond
+            equal &= same
+
+        return clause
+
+    def _get_position(self, item):
+        """Return the values of the ordering fields for an item."""
+        position = []
+        for field, _descending in self.ordering:
+            value = item
+            for attribute in field.split("__"):
+                value = getattr(value, attribute, None) if value is not None else None
+            position.append(value)
+        return position
+
+    def _encode_cursor(self, position, reverse):
+        """Return the url of the page located after or before the position, if any."""
+        if position is None:
+            return None
+
+        # Datetimes are dumped with their full precision for exact comparisons
+        payload = json.dumps({"p": position, "r": reverse}, default=str)
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _decode_cursor(self, request):
+        """Return the position and direction encoded in the cursor of the request."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            position, reverse = payload["p"], bool(payload["r"])
+        except (TypeError, ValueError, KeyError) as excpt:
+            raise drf.exceptions.NotFound(self.invalid_cursor_message) from excpt
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise drf.exceptions.NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+
 class UserListThrottleBurst(UserRateThrottle):
     """Throttle for the user list endpoint."""
 
@@ -355,7 +524,7 @@ class ItemViewSet(
         "updated_at",
         "creator__full_name",
     ]
-    pagination_class = Pagination
+    pagination_class = ItemPagination
     permission_classes = [
         permissions.ItemPermission,
     ]
@@ -401,6 +570,7 @@ class ItemViewSet(
         queryset = super().get_queryset().select_related("creator")
         # Remove items with upload_state SUSPICIOUS for non-creators
         queryset = self._filter_suspicious_items(queryset, user)
+        queryset = queryset.exclude_background_tasks_subtrees()
 
         # Only list views need filtering and annotation
         if self.detail:
@@ -412,29 +582,18 @@ class ItemViewSet(
         queryset = queryset.filter(ancestors_deleted_at__isnull=True)
         queryset = self._exclude_pending_items(queryset)
 
-        # Filter items to which the current user has access...
-        access_items_ids = models.ItemAccess.objects.filter(
-            db.Q(user=user) | db.Q(team__in=user.teams)
-        ).values_list("item_id", flat=True)
-
-        # ...or that were previously accessed and are not restricted
-        # For this we look for all items that have a link trace for the current user
-        # and that are not in the access_items_ids list.
-        # and we compute the ancestors link definition for each item.
-        # Then we filter out the items that are restricted.
-        traced_items = models.Item.objects.filter(
-            db.Q(link_traces__user=user) & ~db.Q(id__in=access_items_ids)
-        ).order_by("path")
-        ancestors_link_definition = self._compute_ancestors_link_definition(traced_items)
-        traced_items_ids = []
-        for item in traced_items:
-            links = ancestors_link_definition.get(str(item.path[:-1]), [])
-            item.ancestors_link_definition = get_equivalent_link_definition(links)
-            if item.computed_link_reach != LinkReachChoices.RESTRICTED:
-                traced_items_ids.append(item.id)
+        root_paths = self.accessible_root_paths
+        if not root_paths:
+            return queryset.none()
 
-        # Among all these items remove them that are restricted
-        return queryset.filter(db.Q(id__in=access_items_ids) | (db.Q(id__in=traced_items_ids)))
+        # Filter items to which the current user has access or that were previously
+        # accessed by link and are not restricted: those are under the root paths of the
+        # accessible items, restricted ones only if the user has access to an ancestor.
+        access_items_ids, traced_items_ids = self._get_access_and_traced_items_ids(user)
+        return queryset.filter(
+            db.Q(id__in=access_items_ids)
+            | db.Q(id__in=traced_items_ids, path__descendants_any=root_paths)
+        )
 
     def get_queryset_for_descendants(self):
         """
@@ -445,105 +604,216 @@ class ItemViewSet(
         """
 
         user = self.request.user
-        queryset = self.get_queryset()
-
-        all_accessible_paths = queryset.order_by("path").values_list("path", flat=True)
-
-        if not all_accessible_paths:
-            return queryset.none()
-
-        # Among the results, we may have items that are ancestors/descendants
-        # of each other. In this case we want to keep only the highest ancestors.
-        root_paths = utils.filter_root_paths(
-            all_accessible_paths,
-            skip_sorting=True,
-        )
+        if not user.is_authenticated:
+            return self.queryset.none()
 
-        path_list = db.Q()
-        for path in root_paths:
-            path_list |= db.Q(path__descendants=path)
+        root_paths = self.accessible_root_paths
+        if not root_paths:
+            return self.queryset.none()
 
         queryset = self.queryset.select_related("creator")
         # Remove items with upload_state SUSPICIOUS for non-creators
         queryset = self._filter_suspicious_items(queryset, user)
         queryset = self._exclude_pending_items(queryset)
-        queryset = queryset.filter(path_list)
+        queryset = queryset.filter(path__descendants_any=root_paths)
         queryset = queryset.filter(ancestors_deleted_at__isnull=True)
+        queryset = queryset.exclude_background_tasks_subtrees()
 
         return queryset
 
+    @staticmethod
+    def _get_access_and_traced_items_ids(user):
+        """
+        Return the subqueries of the ids of the items to which the user or their teams have
+        access and of the items the user accessed by link.
+        """
+        access_items_ids = models.ItemAccess.objects.filter(
+            db.Q(user=user) | db.Q(team__in=user.teams)
+        ).values("item_id")
+        traced_items_ids = models.LinkTrace.objects.filter(user=user).values("item_id")
+        return access_items_ids, traced_items_ids
+
+    @cached_property
+    def accessible_root_paths(self):
+        """
+        Root paths of the items the current user can list, cached per user.
+
+        The cache is invalidated on access, link trace, link configuration, restoration and
+        move changes so that users who visited many public links don't pay the cost of
+        computing it on every request.
+        """
+        user = self.request.user
+        cache_key = models.get_accessible_items_cache_key(user)
+        root_paths = cache.get(cache_key)
+
+        if root_paths is None:
+            root_paths = self._compute_accessible_root_paths(user)
+            cache.set(cache_key, root_paths, settings.ACCESSIBLE_ITEMS_CACHE_TIMEOUT)
+
+        return root_paths
+
+    def _compute_accessible_root_paths(self, user):
+        """
+        Compute the root paths of the items to which the user or their teams have access
+        and of the items that were previously accessed by link and are not restricted.
+        Deleted or pending items are kept here and filtered out when querying, as their
+        state is not tracked.
+        """
+        access_items_ids, traced_items_ids = self._get_access_and_traced_items_ids(user)
+
+        items = list(
+            models.Item.objects.filter(
+                db.Q(id__in=access_items_ids) | db.Q(id__in=traced_items_ids)
+            )
+            .annotate(has_access=db.Exists(access_items_ids.filter(item_id=db.OuterRef("pk"))))
+            .only("id", "path", "link_reach", "link_role", "ancestors_deleted_at")
+            .order_by("path")
+        )
+
+        # Among traced items, remove the ones that are restricted
+        traced_items = [item for item in items if not item.has_access]
+        ancestors_link_definition = self._compute_ancestors_link_definition(traced_items)
+        accessible_items = []
+        for item in items:
+            if not item.has_access:
+                links = ancestors_link_definition.get(str(item.path[:-1]), [])
+                item.ancestors_link_definition = get_equivalent_link_definition(links)
+                if item.computed_link_reach == LinkReachChoices.RESTRICTED:
+                    continue
+            accessible_items.append(item)
+
+        # Among the results, we may have items that are ancestors/descendants
+        # of each other. In this case we want to keep only the highest ancestors.
+        root_paths = utils.filter_root_paths(
+            [item.path for item in accessible_items],
+            skip_sorting=True,
+        )
+
+        return [str(path) for path in root_paths]
+
     def filter_queryset(self, queryset):
         """Override to apply annotations to generic views."""
         queryset = super().filter_queryset(queryset)
         user = self.request.user
         queryset = queryset.annotate_is_favorite(user)
         queryset = queryset.annotate_user_roles(user)
-        queryset = queryset.annotate_with_numchild()
         return queryset
 
-    def get_response_for_queryset(
-        self, queryset, context=None, with_ancestors_link_definition=False
-    ):
+    def get_response_for_queryset(self, queryset, context=None):
         """Return paginated response for the queryset if requested."""
         context = context or self.get_serializer_context()
         page = self.paginate_queryset(queryset)
         if page is not None:
             items = list(page)
-            if with_ancestors_link_definition:
-                paths_links_mapping = self._compute_ancestors_link_definition(items)
-                context["paths_links_mapping"] = paths_links_mapping
+            self._resolve_items_permissions(items, context)
             serializer = self.get_serializer(items, many=True, context=context)
             result = self.get_paginated_response(serializer.data)
             return result
 
         items = list(queryset)
-        if with_ancestors_link_definition:
-            paths_links_mapping = self._compute_ancestors_link_definition(items)
-            context["paths_links_mapping"] = paths_links_mapping
+        self._resolve_items_permissions(items, context)
         serializer = self.get_serializer(items, many=True, context=context)
         return drf.response.Response(serializer.data)
 
+    def _get_item_etag(self, item, with_ancestors=False):
+        """
+        Compute the ETag of a response about an item from the version tokens kept in cache
+        for the item (and its ancestors if requested), the user and the requested url.
+        Computing it does not hit the database so that unchanged responses can be answered
+        without querying and serializing the items again.
+        """
+        user = self.request.user
+        teams = sorted(user.teams) if user.is_authenticated else []
+        signature = ":".join(
+            [
+                str(user.pk),
+                *teams,
+                item.get_version(with_ancestors=with_ancestors),
+                self.request.get_full_path(),
+            ]
+        )
+        return quote_etag(hashlib.sha256(signature.encode()).hexdigest())
+
+    def _get_not_modified_response(self, etag):
+        """Return a "304 Not Modified" response if the client already has this ETag."""
+        response = get_conditional_response(self.request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+        return response
+
     def _compute_ancestors_link_definition(self, items):
         """
         Compute ancestors link definition for the items collection.
-        On the collection, we look for the deepest items, compute ancestors link definition
-        for each item and aggregate them in order to inject it in the serializer context.
+        The ancestors of each item are known from its path: the ones that are not part of
+        the collection are all fetched in one query and the mapping of each parent path to
+        the link definitions of its non deleted ancestors is aggregated in memory in order
+        to inject it in the serializer context.
         """
+        items = list(items)
         if not items:
             return {}
 
-        # Find deepest items and group them by parent path
-        # Items at the same depth in multiple trees (same parent path) share the same ancestors,
-        items_sorted = sorted(items, key=lambda x: len(x.path), reverse=True)
-        items_by_tree = {}  # Group deepest items by parent_path
-        seen_paths = set()  # Track all paths we've processed
-
-        for item in items_sorted:
-            # Check if this item is a parent of any longer path we've already seen
-            # A descendant path would start with the item's path followed by a dot
-            item_path_prefix = f"{item.path}."
-            has_descendants = any(
-                seen_path.startswith(item_path_prefix) for seen_path in seen_paths
-            )
+        ancestors_by_id = {str(item.id): item for item in items}
+        missing_ancestor_ids = {
+            item_id
+            for item in items
+            for item_id in item.path[:-1]
+            if item_id not in ancestors_by_id
+        }
+        if missing_ancestor_ids:
+            ancestors_by_id |= {
+                str(ancestor.id): ancestor
+                for ancestor in models.Item.objects.filter(id__in=missing_ancestor_ids).only(
+                    "id", "path", "link_reach", "link_role", "ancestors_deleted_at"
+                )
+            }
 
-            if not has_descendants:
-                # Get parent path (empty string for root items)
-                parent_path = str(item.path[:-1]) if item.depth > 1 else ""
-                if parent_path not in items_by_tree:
-                    items_by_tree[parent_path] = item
+        paths_links_mapping = {}
+        for item in items:
+            parent_path = str(item.path[:-1]) if item.depth > 1 else ""
+            if not parent_path or parent_path in paths_links_mapping:
+                continue
 
-            # Add this item's path to the set for future checks (shorter paths)
-            seen_paths.add(str(item.path))
+            ancestors = [ancestors_by_id.get(item_id) for item_id in item.path[:-1]]
+            # A deleted parent does not transmit any link definition to its children
+            if any(a is None for a in ancestors) or ancestors[-1].ancestors_deleted_at is not None:
+                continue
 
-        # Compute ancestors links paths mapping for one item per tree group and aggregate
-        paths_links_mapping = {}
-        for item in items_by_tree.values():
-            item_mapping = item.compute_ancestors_links_paths_mapping()
-            paths_links_mapping |= item_mapping
+            paths_links_mapping[parent_path] = [
+                ancestor.link_definition
+                for ancestor in ancestors
+                if ancestor.ancestors_deleted_at is None
+            ]
 
-        # Update the serializer context with the aggregated mapping
         return paths_links_mapping
 
+    def _resolve_items_permissions(self, items, context):
+        """
+        Resolve the roles and the ancestors link definitions of a page of items in a
+        constant number of queries, so that abilities can be computed in memory.
+
+        Items that were not annotated with the roles of the user get them from one query
+        on the effective accesses instead of one query per item.
+        """
+        if not items:
+            return
+
+        if "paths_links_mapping" not in context:
+            context["paths_links_mapping"] = self._compute_ancestors_link_definition(items)
+
+        user = self.request.user
+        items_without_roles = [item for item in items if not hasattr(item, "user_roles")]
+        if items_without_roles and user.is_authenticated:
+            roles_by_item_id = {}
+            for item_id, role in models.ItemEffectiveAccess.objects.filter(
+                db.Q(user=user) | db.Q(team__in=user.teams),
+                item_id__in=[item.id for item in items_without_roles],
+            ).values_list("item_id", "role"):
+                roles_by_item_id.setdefault(item_id, []).append(role)
+
+            for item in items_without_roles:
+                item.user_roles = roles_by_item_id.get(item.id, [])
+
     def retrieve(self, request, *args, **kwargs):
         """
         Add a trace that the item was accessed by a user. This is used to list items
@@ -552,6 +822,12 @@ class ItemViewSet(
         """
         user = self.request.user
         instance = self.get_object()
+
+        # The client got this response, and the trace was created, on a previous visit
+        etag = self._get_item_etag(instance)
+        if not_modified := self._get_not_modified_response(etag):
+            return not_modified
+
         serializer = self.get_serializer(instance)
 
         # The `create` query generates 5 db queries which are much less efficient than an
@@ -563,7 +839,9 @@ class ItemViewSet(
             except IntegrityError:
                 pass  # Race condition: trace already created by concurrent request
 
-        return drf.response.Response(serializer.data)
+        response = drf.response.Response(serializer.data)
+        response["ETag"] = etag
+        return response
 
     def _create_file_from_template(self, item, extension):
         """Read template file and upload it to storage for the given item."""
@@ -585,8 +863,11 @@ class ItemViewSet(
                 code="template_file_read_error",
             ) from e
 
+        mimetype = utils.detect_mimetype(template_content, item.filename)
         try:
-            default_storage.save(item.file_key, BytesIO(template_content))
+            get_storage_gateway().put_stream(
+                item.file_key, BytesIO(template_content), content_type=mimetype
+            )
         except Exception as e:  # pylint: disable=broad-exception-caught
             logger.error(
                 "Error uploading template file to storage for item %s: %s",
@@ -601,7 +882,7 @@ class ItemViewSet(
             ) from e
 
         item.upload_state = models.ItemUploadStateChoices.READY
-        item.mimetype = utils.detect_mimetype(template_content, item.filename)
+        item.mimetype = mimetype
         item.size = len(template_content)
         item.save(update_fields=["upload_state", "mimetype", "size", "updated_at"])
 
@@ -624,8 +905,12 @@ class ItemViewSet(
         )
 
     def perform_destroy(self, instance):
-        """Override to implement a soft delete instead of dumping the record in database."""
-        instance.soft_delete()
+        """
+        Override to implement a soft delete instead of dumping the record in database.
+        The deletion is marked on the descendants of large folders in a background task.
+        """
+        if background_task := instance.soft_delete(in_background=instance.has_large_subtree()):
+            process_item_background_task.delay(background_task.id)
 
     def perform_update(self, serializer):
         """Override to check if a file is renamed in order to rename file on storage."""
@@ -712,17 +997,72 @@ class ItemViewSet(
         # Annotate favorite status and filter if applicable as late as possible
         queryset = queryset.annotate_is_favorite(user)
         queryset = filterset.filters["is_favorite"].filter(queryset, filter_data["is_favorite"])
-        queryset = queryset.annotate_with_numchild()
 
         # Apply ordering only now that everyting is filtered and annotated
         queryset = ItemOrdering().filter_queryset(self.request, queryset, self)
 
         return self.get_response_for_queryset(queryset)
 
+    @drf.decorators.action(detail=True, methods=["post"], url_path="upload-parts")
+    def upload_parts(self, request, *args, **kwargs):
+        """
+        Return presigned urls to upload parts of a file in parallel with a multipart upload.
+        The multipart upload is created on the first call and completed by upload-ended.
+        """
+        item = self.get_object()
+
+        if item.type != models.ItemTypeChoices.FILE:
+            raise drf.exceptions.ValidationError(
+                {"item": "This action is only available for items of type FILE."},
+                code="item_upload_type_unavailable",
+            )
+
+        if item.upload_state != models.ItemUploadStateChoices.PENDING:
+            raise drf.exceptions.ValidationError(
+                {"item": "This action is only available for items in PENDING state."},
+                code="item_upload_state_not_pending",
+            )
+
+        serializer = serializers.UploadPartsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        parts_count = serializer.validated_data["parts_count"]
+
+        # The size of each part is derived from the size of the file to be signed
+        if (
+            item.size is None
+            or utils.get_upload_part_size(item.size, parts_count, parts_count) <= 0
+        ):
+            raise drf.exceptions.ValidationError(
+                {"parts_count": "The file can not be split in this number of parts."},
+                code="multipart_upload_parts_count_invalid",
+            )
+
+        if not item.multipart_upload_id:
+            upload_id = utils.create_multipart_upload(item)
+            # Concurrent calls can each create a multipart upload: only one is kept
+            if models.Item.objects.filter(pk=item.pk, multipart_upload_id__isnull=True).update(
+                multipart_upload_id=upload_id, multipart_parts_count=parts_count
+            ):
+                item.multipart_upload_id = upload_id
+                item.multipart_parts_count = parts_count
+            else:
+                utils.abort_multipart_upload(item.file_key, upload_id)
+                item.refresh_from_db(fields=["multipart_upload_id", "multipart_parts_count"])
+
+        # The upload is only completed with the parts declared when it was created
+        if parts_count != item.multipart_parts_count:
+            raise drf.exceptions.ValidationError(
+                {"parts_count": "This number of parts differs from the one of the upload."},
+                code="multipart_upload_parts_count_mismatch",
+            )
+
+        parts = utils.generate_upload_part_urls(item, serializer.validated_data["part_numbers"])
+        return drf_response.Response({"parts": parts}, status=status.HTTP_200_OK)
+
     @drf.decorators.action(detail=True, methods=["post"], url_path="upload-ended")
     def upload_ended(self, request, *args, **kwargs):
         """
-        Start the analysis of an item after a successful upload.
+        Start the finalization of an item after a successful upload.
         """
 
         item = self.get_object()
@@ -747,93 +1087,177 @@ class ItemViewSet(
                 detail=can_upload.get("message", "You do not have permission to upload files.")
             )
 
-        s3_client = default_storage.connection.meta.client
-
-        head_response = s3_client.head_object(Bucket=default_storage.bucket_name, Key=item.file_key)
-        file_size = head_response["ContentLength"]
+        self._complete_multipart_upload(item)
 
-        if file_size > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
-            self._complete_item_deletion(item)
-            logger.info(
-                "upload_ended: file size (%s) for file %s higher than the allowed max size",
-                file_size,
-                item.file_key,
-            )
+        if not self._start_uploads_finalization([item]):
             raise drf.exceptions.ValidationError(
-                detail="The file size is higher than the allowed max size.",
-                code="file_size_exceeded",
+                {"item": "This action is only available for items in PENDING state."},
+                code="item_upload_state_not_pending",
             )
+        finalize_item_upload.delay(item.id)
 
-        if file_size > 2048:
-            range_response = s3_client.get_object(
-                Bucket=default_storage.bucket_name,
-                Key=item.file_key,
-                Range="bytes=0-2047",
-            )
-            file_head = range_response["Body"].read()
-        else:
-            file_head = s3_client.get_object(Bucket=default_storage.bucket_name, Key=item.file_key)[
-                "Body"
-            ].read()
+        serializer = self.get_serializer(item)
+        self._capture_item_uploaded(item)
 
-        # Use improved MIME type detection combining magic bytes and file extension
-        logger.info("upload_ended: detecting mimetype for file: %s", item.file_key)
-        mimetype = utils.detect_mimetype(file_head, filename=item.filename)
+        return drf_response.Response(serializer.data, status=status.HTTP_200_OK)
 
-        if settings.RESTRICT_UPLOAD_FILE_TYPE and mimetype not in settings.FILE_MIMETYPE_ALLOWED:
-            self._complete_item_deletion(item)
-            logger.info(
-                "upload_ended: mimetype not allowed %s for filename %s",
-                mimetype,
-                item.filename,
+    @drf.decorators.action(detail=True, methods=["post"], url_path="upload-batch")
+    def upload_batch(self, request, *args, **kwargs):
+        """
+        Create the folders and files of a folder upload under an item from the paths of its
+        files relative to the item, in one transaction, and return the urls to upload them.
+        """
+        item = self.get_object()
+
+        serializer = serializers.UploadBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        entitlements_backend = get_entitlements_backend()
+        can_upload = entitlements_backend.can_upload(self.request.user)
+        if not can_upload["result"]:
+            raise drf.exceptions.PermissionDenied(
+                detail=can_upload.get("message", "You do not have permission to upload files.")
             )
-            raise drf.exceptions.ValidationError(
-                detail="The file type is not allowed.",
-                code="file_type_not_allowed",
+
+        files = serializer.validated_data["files"]
+        created_folders, created_files = models.Item.objects.create_upload_batch(
+            item, request.user, files
+        )
+        # One indexation covers all the items created since the first one
+        trigger_batch_file_indexer([*created_folders, *created_files][0])
+
+        return drf_response.Response(
+            {
+                "folders": [
+                    {"id": folder.id, "parent_id": folder.parent_id, "title": folder.title}
+                    for folder in created_folders
+                ],
+                "files": [
+                    {
+                        "id": created_file.id,
+                        "parent_id": created_file.parent_id,
+                        "path": file["path"],
+                        "title": created_file.title,
+                        "policy": utils.generate_upload_policy(created_file),
+                    }
+                    for file, created_file in zip(files, created_files, strict=True)
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @drf.decorators.action(detail=True, methods=["post"], url_path="upload-ended-batch")
+    def upload_ended_batch(self, request, *args, **kwargs):
+        """
+        Start the finalization of many files uploaded under an item, e.g. by a folder upload.
+        Files that are not pending or not under the item are not finalized and are returned
+        as failed with the files of which the multipart upload could not be completed.
+        """
+        item = self.get_object()
+
+        serializer = serializers.UploadEndedBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        entitlements_backend = get_entitlements_backend()
+        can_upload = entitlements_backend.can_upload(self.request.user)
+        if not can_upload["result"]:
+            # Pending files are removed by the clean_pending_items command
+            raise drf.exceptions.PermissionDenied(
+                detail=can_upload.get("message", "You do not have permission to upload files.")
             )
 
-        item.upload_state = models.ItemUploadStateChoices.ANALYZING
-        item.mimetype = mimetype
-        item.size = file_size
+        ids = serializer.validated_data["ids"]
+        uploaded_items = []
+        for uploaded_item in models.Item.objects.filter(
+            id__in=ids,
+            path__descendants=item.path,
+            type=models.ItemTypeChoices.FILE,
+            upload_state=models.ItemUploadStateChoices.PENDING,
+        ):
+            try:
+                self._complete_multipart_upload(uploaded_item)
+            except drf.exceptions.ValidationError:
+                continue
+            uploaded_items.append(uploaded_item)
+
+        finalizing_ids = self._start_uploads_finalization(uploaded_items)
+        if finalizing_ids:
+            finalize_item_uploads.delay(finalizing_ids)
 
-        item.save(update_fields=["upload_state", "mimetype", "size"])
+        finalized = set(finalizing_ids)
+        for uploaded_item in uploaded_items:
+            if uploaded_item.id in finalized:
+                self._capture_item_uploaded(uploaded_item)
 
-        if head_response["ContentType"] != mimetype:
+        return drf_response.Response(
+            {
+                "finalizing": finalizing_ids,
+                "failed": [item_id for item_id in ids if item_id not in finalized],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def _complete_multipart_upload(self, item):
+        """Assemble the parts of the file of an item uploaded by parts, if any."""
+        if not item.multipart_upload_id:
+            return
+
+        try:
+            utils.complete_multipart_upload(item)
+        except (ClientError, ValueError) as error:
             logger.info(
-                "upload_ended: content type mismatch between object storage and item,"
-                " updating from %s to %s",
-                head_response["ContentType"],
-                mimetype,
+                "upload_ended: failed to complete multipart upload of item %s: %s",
+                item.id,
+                error,
             )
-            try:
-                s3_client.copy_object(
-                    Bucket=default_storage.bucket_name,
-                    Key=item.file_key,
-                    CopySource={
-                        "Bucket": default_storage.bucket_name,
-                        "Key": item.file_key,
-                    },
-                    ContentType=mimetype,
-                    Metadata=head_response["Metadata"],
-                    MetadataDirective="REPLACE",
-                )
-            except ClientError as error:
-                # Log an exception but don't stop the action.
-                logger.exception(
-                    "Changing content type of item %s on object storage failed with error code %s"
-                    " and error message %s",
-                    item.id,
-                    error.response["Error"]["Code"],
-                    error.response["Error"]["Message"],
-                )
+            raise drf.exceptions.ValidationError(
+                detail="The multipart upload could not be completed.",
+                code="multipart_upload_incomplete",
+            ) from error
 
-        malware_detection.analyse_file(item.file_key, item_id=item.id)
+    def _start_uploads_finalization(self, items):
+        """
+        Move pending items to the FINALIZING state and return the ids of those that were
+        still pending. Their files are checked, hashed and analysed by a task so that ending
+        an upload does not wait for the object storage. Rows are locked so that each file is
+        finalized only once when uploads are ended concurrently.
+        """
+        with transaction.atomic():
+            finalizing_ids = list(
+                models.Item.objects.select_for_update()
+                .filter(
+                    id__in=[item.id for item in items],
+                    upload_state=models.ItemUploadStateChoices.PENDING,
+                )
+                .values_list("id", flat=True)
+            )
+            models.Item.objects.filter(id__in=finalizing_ids).update(
+                upload_state=models.ItemUploadStateChoices.FINALIZING,
+                multipart_upload_id=None,
+                multipart_parts_count=None,
+                updated_at=timezone.now(),
+            )
+            finalized = set(finalizing_ids)
+            finalized_items = [item for item in items if item.id in finalized]
+            # The update skips Item.save which logs the changes
+            models.ItemChange.objects.log(finalized_items, models.ItemChangeKindChoices.UPDATED)
+
+        for item in finalized_items:
+            item.upload_state = models.ItemUploadStateChoices.FINALIZING
+            item.multipart_upload_id = None
+            item.multipart_parts_count = None
+        # The items are listed among the children of their parent
+        models.bump_items_version(
+            {item_id for item in finalized_items for item_id in item.path[-2:]}
+        )
 
-        serializer = self.get_serializer(item)
+        return finalizing_ids
 
+    def _capture_item_uploaded(self, item):
+        """Send the analytics event of a file uploaded."""
         posthog_capture(
             "item_uploaded",
-            request.user,
+            self.request.user,
             {
                 "id": item.id,
                 "title": item.title,
@@ -842,8 +1266,6 @@ class ItemViewSet(
             },
         )
 
-        return drf_response.Response(serializer.data, status=status.HTTP_200_OK)
-
     def _complete_item_deletion(self, item):
         """Completely delete an item."""
         item.soft_delete()
@@ -873,12 +1295,11 @@ class ItemViewSet(
         )
 
         queryset = queryset.filter(id__in=favorite_items_ids)
-        queryset = queryset.annotate_with_numchild()
 
         # Apply ordering only now that everyting is filtered and annotated
         queryset = ItemOrdering().filter_queryset(self.request, queryset, self)
 
-        return self.get_response_for_queryset(queryset, with_ancestors_link_definition=True)
+        return self.get_response_for_queryset(queryset)
 
     @drf.decorators.action(
         detail=False,
@@ -891,17 +1312,17 @@ class ItemViewSet(
         The selected items are those deleted within the cutoff period defined in the
         settings (see TRASHBIN_CUTOFF_DAYS), before they are considered permanently deleted.
 
-        Optimized version that uses EXISTS instead of expensive subqueries to check
-        owner access on items or their ancestors.
+        Optimized version that uses EXISTS on the materialized effective accesses
+        instead of expensive subqueries to check owner access on items or their ancestors.
         """
         user = request.user
 
         # Build the EXISTS subquery to check if user has owner access
         # to the item or any of its ancestors
-        owner_access_exists = models.ItemAccess.objects.filter(
+        owner_access_exists = models.ItemEffectiveAccess.objects.filter(
             db.Q(user=user) | db.Q(team__in=user.teams),
             role=models.RoleChoices.OWNER,
-            item__path__ancestors=db.OuterRef("path"),
+            item_id=db.OuterRef("pk"),
         )
 
         # Filter trashbin items to only those where user has owner access
@@ -924,7 +1345,6 @@ class ItemViewSet(
 
         # Only annotate with user roles for the filtered set if needed by serializer
         queryset = queryset.annotate_user_roles(user)
-        queryset = queryset.annotate_with_numchild()
 
         return self.get_response_for_queryset(queryset)
 
@@ -969,7 +1389,8 @@ class ItemViewSet(
                 {"target_item_id": message}, code="item_move_missing_permission"
             )
 
-        item.move(target_item)
+        # The descendants of large folders are moved by batches in a background task
+        background_task = item.move(target_item, in_background=item.has_large_subtree())
 
         # If the item is moved to the root and the user does not have an access on the item,
         # create an owner access for the user. Otherwise, the item will be invisible for the user.
@@ -1000,6 +1421,16 @@ class ItemViewSet(
 
         posthog_capture("item_moved", user, {}, item=item)
 
+        if background_task:
+            process_item_background_task.delay(background_task.id)
+            return drf.response.Response(
+                {
+                    "message": "item move in progress.",
+                    "background_task_id": str(background_task.id),
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+
         return drf.response.Response(
             {"message": "item moved successfully."}, status=status.HTTP_200_OK
         )
@@ -1013,7 +1444,16 @@ class ItemViewSet(
         Restore a soft-deleted item if it was deleted less than x days ago.
         """
         item = self.get_object()
-        item.restore()
+        # The descendants of large folders are restored in a background task
+        if background_task := item.restore(in_background=item.has_large_subtree()):
+            process_item_background_task.delay(background_task.id)
+            return drf_response.Response(
+                {
+                    "detail": "item restoration in progress.",
+                    "background_task_id": str(background_task.id),
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
 
         return drf_response.Response(
             {"detail": "item has been successfully restored."},
@@ -1067,6 +1507,10 @@ class ItemViewSet(
             )
 
         # GET: List children
+        etag = self._get_item_etag(item)
+        if not_modified := self._get_not_modified_response(etag):
+            return not_modified
+
         queryset = item.children().select_related("creator").filter(deleted_at__isnull=True)
         queryset = self._filter_suspicious_items(queryset, request.user)
         queryset = self._exclude_pending_items(queryset)
@@ -1090,13 +1534,15 @@ class ItemViewSet(
         # in order to allow saving time while computing abilities on the instance
         paths_links_mapping = item.compute_ancestors_links_paths_mapping()
 
-        return self.get_response_for_queryset(
+        response = self.get_response_for_queryset(
             queryset,
             context={
                 "request": request,
                 "paths_links_mapping": paths_links_mapping,
             },
         )
+        response["ETag"] = etag
+        return response
 
     @drf.decorators.action(detail=True, methods=["get"])
     def tree(self, request, pk=None):
@@ -1124,6 +1570,10 @@ class ItemViewSet(
                 else drf.exceptions.NotAuthenticated()
             )
 
+        etag = self._get_item_etag(item, with_ancestors=True)
+        if not_modified := self._get_not_modified_response(etag):
+            return not_modified
+
         ancestors = (
             self.queryset.filter(
                 path__ancestors=item.path,
@@ -1151,10 +1601,7 @@ class ItemViewSet(
                 clause |= db.Q(path=ancestor.path)
             else:
                 # Select all siblings of the current ancestor
-                clause |= db.Q(
-                    path__descendants=".".join(ancestor.path[:-1]),
-                    path__depth=len(ancestor.path),
-                )
+                clause |= db.Q(parent_id=ancestor.path[-2])
 
             # Compute cache for ancestors links to avoid many queries while computing
             # abilties for his items in the tree!
@@ -1172,7 +1619,6 @@ class ItemViewSet(
         user = request.user
         tree = tree.annotate_user_roles(user)
         tree = tree.annotate_is_favorite(user)
-        tree = tree.annotate_with_numchild()
         tree = self._filter_suspicious_items(tree, user)
 
         serializer = self.get_serializer(
@@ -1184,9 +1630,11 @@ class ItemViewSet(
             },
         )
 
-        return drf.response.Response(
+        response = drf.response.Response(
             utils.flat_to_nested(serializer.data), status=drf.status.HTTP_200_OK
         )
+        response["ETag"] = etag
+        return response
 
     @drf.decorators.action(
         url_path="recents",
@@ -1207,12 +1655,11 @@ class ItemViewSet(
 
         queryset = queryset.annotate_is_favorite(user)
         queryset = queryset.annotate_user_roles(user)
-        queryset = queryset.annotate_with_numchild()
 
         # Apply ordering only now that everyting is filtered and annotated
         queryset = ItemOrdering().filter_queryset(self.request, queryset, self)
 
-        return self.get_response_for_queryset(queryset, with_ancestors_link_definition=True)
+        return self.get_response_for_queryset(queryset)
 
     @drf.decorators.action(detail=True, methods=["get"])
     def breadcrumb(self, request, *args, **kwargs):
@@ -1236,6 +1683,10 @@ class ItemViewSet(
                 else drf.exceptions.NotAuthenticated()
             )
 
+        etag = self._get_item_etag(item, with_ancestors=True)
+        if not_modified := self._get_not_modified_response(etag):
+            return not_modified
+
         breadcrumb = self.queryset.filter(
             path__ancestors=item.path,
             path__descendants=highest_ancestor.path,
@@ -1243,7 +1694,123 @@ class ItemViewSet(
         ).order_by("path")
 
         serializer = self.get_serializer(breadcrumb, many=True)
-        return drf.response.Response(serializer.data, status=drf.status.HTTP_200_OK)
+        response = drf.response.Response(serializer.data, status=drf.status.HTTP_200_OK)
+        response["ETag"] = etag
+        return response
+
+    @drf.decorators.action(detail=True, methods=["get"], url_path="background-tasks")
+    def background_tasks(self, request, *args, **kwargs):
+        """List the background tasks run on the subtree of an item, with their progress."""
+        item = self.get_object()
+        queryset = item.background_tasks.all()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = serializers.ItemBackgroundTaskSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = serializers.ItemBackgroundTaskSerializer(queryset, many=True)
+        return drf.response.Response(serializer.data)
+
+    @drf.decorators.action(detail=True, methods=["get"], url_path="changes")
+    def changes(self, request, *args, **kwargs):
+        """
+        List the changes made in the subtree of an item after the position given by the
+        `cursor` query parameter, in the order they were made, for clients to synchronize
+        the subtree without listing it again.
+
+        Without cursor, no change is returned: the response only gives the current position
+        to synchronize from. Each change comes with the current state of its item, or null
+        if the item is not listed in the subtree anymore (deleted, moved away, pending...).
+        Paths outside of the subtree, e.g. where an item was moved to, are not disclosed.
+        """
+        item = self.get_object()
+
+        # Paths contain the ids of all the ancestors: this still matches changes recorded
+        # before the item or one of its ancestors was moved.
+        lquery = f"*.{item.pk!s}.*"
+        changes = models.ItemChange.objects.filter(
+            db.Q(path__match=lquery) | db.Q(previous_path__match=lquery)
+        )
+
+        cursor = request.query_params.get("cursor")
+        if cursor is None:
+            last_change_id = (
+                models.ItemChange.objects.order_by("-id").values_list("id", flat=True).first()
+            )
+            return drf.response.Response(
+                {
+                    "cursor": self._encode_changes_cursor(last_change_id or 0),
+                    "has_more": False,
+                    "results": [],
+                }
+            )
+
+        position = self._decode_changes_cursor(cursor)
+        page_size = settings.ITEM_CHANGES_PAGE_SIZE
+        changes = list(changes.filter(id__gt=position).order_by("id")[: page_size + 1])
+        has_more = len(changes) > page_size
+        changes = changes[:page_size]
+
+        queryset = self.queryset.select_related("creator").filter(
+            id__in={change.item_id for change in changes},
+            path__descendants=item.path,
+            ancestors_deleted_at__isnull=True,
+        )
+        queryset = self._filter_suspicious_items(queryset, request.user)
+        queryset = self._exclude_pending_items(queryset)
+        queryset = queryset.annotate_is_favorite(request.user)
+        queryset = queryset.annotate_user_roles(request.user)
+
+        items = list(queryset)
+        context = self.get_serializer_context()
+        self._resolve_items_permissions(items, context)
+        items_data = {
+            data["id"]: data
+            for data in serializers.ListItemSerializer(items, many=True, context=context).data
+        }
+
+        results = []
+        for change_data in serializers.ItemChangeSerializer(changes, many=True).data:
+            for field in ["path", "previous_path"]:
+                if change_data[field] and str(item.pk) not in change_data[field].split("."):
+                    change_data[field] = None
+            results.append({**change_data, "item": items_data.get(change_data["item_id"])})
+
+        return drf.response.Response(
+            {
+                "cursor": self._encode_changes_cursor(changes[-1].id if changes else position),
+                "has_more": has_more,
+                "results": results,
+            }
+        )
+
+    @staticmethod
+    def _encode_changes_cursor(position):
+        """Encode a position in the change log with the date the cursor was given at."""
+        payload = {"p": position, "t": int(timezone.now().timestamp())}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    @staticmethod
+    def _decode_changes_cursor(cursor):
+        """
+        Return the position in the change log encoded in a cursor. Changes are purged after
+        ITEM_CHANGES_RETENTION_DAYS: a cursor given before may have missed some of them and
+        the client must list the items again.
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            position, given_at = int(payload["p"]), float(payload["t"])
+        except (TypeError, ValueError, KeyError) as excpt:
+            raise drf.exceptions.NotFound(ItemPagination.invalid_cursor_message) from excpt
+
+        retention = timedelta(days=settings.ITEM_CHANGES_RETENTION_DAYS)
+        if given_at < (timezone.now() - retention).timestamp():
+            raise drf.exceptions.ValidationError(
+                {"cursor": "This cursor expired, items must be listed again."},
+                code="item_changes_cursor_expired",
+            )
+
+        return position
 
     # pylint: disable-next=too-many-arguments,too-many-positional-arguments
     @method_decorator(refresh_oidc_access_token)
@@ -1267,21 +1834,21 @@ class ItemViewSet(
         queryset = queryset.filter(pk__in=result_ids)
         queryset = queryset.annotate_user_roles(user)
         queryset = queryset.annotate_is_favorite(user)
-        queryset = queryset.annotate_with_numchild()
 
         files_by_uuid = {str(d.pk): d for d in queryset}
         ordered_files = [files_by_uuid[id] for id in result_ids if id in files_by_uuid]
 
         page = self.paginate_queryset(ordered_files)
 
+        context = self.get_serializer_context()
         if page is not None:
-            items = self._compute_parents(page)
-            serializer = self.get_serializer(items, many=True)
+            items = self._compute_parents(page, context)
+            serializer = self.get_serializer(items, many=True, context=context)
             result = self.get_paginated_response(serializer.data)
             return result
 
-        items = self._compute_parents(ordered_files)
-        serializer = self.get_serializer(items, many=True)
+        items = self._compute_parents(ordered_files, context)
+        serializer = self.get_serializer(items, many=True, context=context)
         return drf.response.Response(serializer.data)
 
     @drf.decorators.action(
@@ -1360,23 +1927,25 @@ class ItemViewSet(
         # Without the indexer, the "title" filtering is kept
         queryset = filterset.filter_queryset(queryset)
         queryset = queryset.annotate_user_roles(user)
-        queryset = queryset.annotate_with_numchild()
 
         page = self.paginate_queryset(queryset)
 
+        context = self.get_serializer_context()
         if page is not None:
-            items = self._compute_parents(page)
-            serializer = self.get_serializer(items, many=True)
+            items = self._compute_parents(page, context)
+            serializer = self.get_serializer(items, many=True, context=context)
             result = self.get_paginated_response(serializer.data)
             return result
 
-        items = self._compute_parents(queryset)
-        serializer = self.get_serializer(items, many=True)
+        items = self._compute_parents(list(queryset), context)
+        serializer = self.get_serializer(items, many=True, context=context)
         return drf.response.Response(serializer.data)
 
-    def _compute_parents(self, items):
+    def _compute_parents(self, items, context):
         """
         Compute parents for the items by analyzing their paths and fetching missing parents.
+        The permissions of the items and of their parents are resolved for the whole
+        collection at once.
         """
         # Build parents dictionary and collect missing parent IDs
         parents = {str(item.id): item for item in items}
@@ -1389,17 +1958,15 @@ class ItemViewSet(
 
         # Fetch missing ancestors from database
         if missing_parent_ids:
-            for parent in (
-                models.Item.objects.annotate_with_numchild()
-                .filter(id__in=missing_parent_ids)
-                .iterator()
-            ):
+            for parent in models.Item.objects.filter(id__in=missing_parent_ids).iterator():
                 parents[str(parent.id)] = parent
 
         # Set parents for each item
         for item in items:
             item.parents = [parents[item_id] for item_id in item.path if item_id != str(item.id)]
 
+        self._resolve_items_permissions(list(parents.values()), context)
+
         return items
 
     @drf.decorators.action(detail=True, methods=["put"], url_path="link-configuration")
@@ -1419,6 +1986,7 @@ class ItemViewSet(
             item.link_reach
         ) >= models.LinkReachChoices.get_priority(previous_link_reach):
             item.descendants().update(link_reach=None)
+            item.invalidate_accessible_items_cache(accesses=False)
 
         return drf.response.Response(serializer.data, status=drf.status.HTTP_200_OK)
 
@@ -1441,6 +2009,8 @@ class ItemViewSet(
                     status=drf.status.HTTP_200_OK,
                 )
 
+            # The favorite status is shown on the item and among its parent's children
+            models.bump_items_version(item.path[-2:])
             posthog_capture("item_favorited", user, {}, item=item)
 
             # At this point the annotation is_favorite is already made by the
@@ -1455,6 +2025,7 @@ class ItemViewSet(
         # Handle DELETE method to unmark as favorite
         deleted, _ = models.ItemFavorite.objects.filter(item=item, user=user).delete()
         if deleted:
+            models.bump_items_version(item.path[-2:])
             # At this point the annotation is_favorite is already made by the
             # queryset.annotate_is_favorite(user) and its value is True.
             # If we want a fresh data we have to make a new queryset, apply the annotation
@@ -1492,6 +2063,14 @@ class ItemViewSet(
         Raises:
         - PermissionDenied if authorization fails.
         """
+        url_params = self._get_subrequest_url_params(request, pattern)
+        return self._authorize_subrequest_item(request, url_params)
+
+    def _get_subrequest_url_params(self, request, pattern):
+        """
+        Extract the parameters of the original URL of an Nginx subrequest with the given
+        pattern. Raises PermissionDenied if the URL does not match or has no item ID.
+        """
         # Extract the original URL from the request header
         original_url = request.META.get("HTTP_X_ORIGINAL_URL")
         if not original_url:
@@ -1519,13 +2098,18 @@ class ItemViewSet(
             logger.debug("Failed to extract parameters from subrequest URL: %s", exc)
             raise drf.exceptions.PermissionDenied() from exc
 
-        pk = url_params.get("pk")
-        if not pk:
+        if not url_params.get("pk"):
             logger.debug("item ID (pk) not found in URL parameters: %s", url_params)
             raise drf.exceptions.PermissionDenied()
 
+        return url_params
+
+    def _authorize_subrequest_item(self, request, url_params):
+        """Fetch the item of the URL parameters of a subrequest and check the user's access."""
+        pk = url_params["pk"]
+
         # Fetch the item and check if the user has access
-        queryset = models.Item.objects.all()
+        queryset = models.Item.objects.exclude_background_tasks_subtrees()
         queryset = self._filter_suspicious_items(queryset, request.user)
         try:
             item = queryset.get(pk=pk)
@@ -1556,10 +2140,13 @@ class ItemViewSet(
         if item.type != models.ItemTypeChoices.FILE:
             raise drf.exceptions.PermissionDenied()
 
-        if item.upload_state == models.ItemUploadStateChoices.PENDING:
+        if item.upload_state in [
+            models.ItemUploadStateChoices.PENDING,
+            models.ItemUploadStateChoices.FINALIZING,
+        ]:
             raise drf.exceptions.PermissionDenied()
 
-        redirect_url = f"{settings.MEDIA_BASE_URL}{settings.MEDIA_URL}{quote(item.file_key)}"
+        redirect_url = f"{settings.MEDIA_BASE_URL}{settings.MEDIA_URL}{quote(item.media_key)}"
         return drf.response.Response(
             status=status.HTTP_302_FOUND,
             headers={"Location": redirect_url},
@@ -1593,23 +2180,97 @@ class ItemViewSet(
         annotation. The request will then be proxied to the object storage backend who will
         respond with the file after checking the signature included in headers.
         """
-        url_params, _, _, item = self._authorize_subrequest(request, MEDIA_STORAGE_URL_PATTERN)
-        if item.type != models.ItemTypeChoices.FILE:
-            logger.debug("Item '%s' is not a file", item.id)
-            raise drf.exceptions.PermissionDenied()
+        url_params = self._get_subrequest_url_params(request, MEDIA_STORAGE_URL_PATTERN)
+
+        # Media are fetched again and again, e.g. the thumbnails of a gallery: the decision is
+        # reused as long as the item, its ancestors and their accesses did not change
+        media = self._get_cached_media_authorization(request.user, url_params["pk"])
+        if media is None:
+            _, _, _, item = self._authorize_subrequest_item(request, url_params)
+            if item.type != models.ItemTypeChoices.FILE:
+                logger.debug("Item '%s' is not a file", item.id)
+                raise drf.exceptions.PermissionDenied()
+
+            if item.upload_state in [
+                models.ItemUploadStateChoices.PENDING,
+                models.ItemUploadStateChoices.FINALIZING,
+            ]:
+                logger.debug("Item '%s' is not ready", item.id)
+                raise drf.exceptions.PermissionDenied()
+
+            media = {
+                "path": str(item.path),
+                "version": item.get_version(),
+                "file_key": item.file_key,
+                "media_key": item.media_key,
+                "filename": item.filename,
+                "is_previewable": utils.is_previewable_item(item),
+            }
+            if settings.MEDIA_AUTH_CACHE_TIMEOUT:
+                cache.set(
+                    self._get_media_authorization_cache_key(request.user, url_params["pk"]),
+                    media,
+                    timeout=settings.MEDIA_AUTH_CACHE_TIMEOUT,
+                )
 
-        if item.upload_state == models.ItemUploadStateChoices.PENDING:
-            logger.debug("Item '%s' is not ready", item.id)
+        if url_params.get("preview") and not media["is_previewable"]:
+            logger.debug("Item '%s' is not previewable", url_params["pk"])
             raise drf.exceptions.PermissionDenied()
 
-        if url_params.get("preview") and not utils.is_previewable_item(item):
-            logger.debug("Item '%s' is not previewable", item.id)
-            raise drf.exceptions.PermissionDenied()
+        # Only files stored under their name before versioned keys are stored under the key of
+        # their url: the proxy gets the key to fetch from the X-Storage-Key header and the name
+        # of the file from the Content-Disposition header
+        key = (
+            url_params.get("key") if media["file_key"] == media["media_key"] else media["file_key"]
+        )
 
         # Generate S3 authorization headers using the extracted URL parameters
-        request = utils.generate_s3_authorization_headers(f"{url_params.get('key'):s}")
+        authorization_headers = utils.generate_s3_authorization_headers(f"{key:s}")
+
+        return drf.response.Response(
+            "authorized",
+            headers={
+                **authorization_headers,
+                "X-Storage-Key": quote(key),
+                "Content-Disposition": content_disposition_header(
+                    as_attachment=not url_params.get("preview"), filename=media["filename"]
+                ),
+            },
+            status=200,
+        )
 
-        return drf.response.Response("authorized", headers=request.headers, status=200)
+    def _get_media_authorization_cache_key(self, user, pk):
+        """Cache key of the decision to let a user fetch the file of an item."""
+        if not user.is_authenticated:
+            return f"media_auth:anonymous:{pk!s}"
+
+        # Roles given to teams depend on the teams of the user
+        teams = hashlib.sha256(":".join(sorted(user.teams)).encode()).hexdigest()
+        return f"media_auth:{user.id!s}:{teams:s}:{pk!s}"
+
+    def _get_cached_media_authorization(self, user, pk):
+        """
+        Return the media authorization cached for a user and an item if it is still valid,
+        None otherwise. It is valid as long as the version of the item did not change: any
+        change of the item, of its accesses, link definition or deletion state, or of those
+        of its ancestors, gives it a new version. Only authorizations are cached.
+        """
+        if not settings.MEDIA_AUTH_CACHE_TIMEOUT:
+            return None
+
+        media = cache.get(self._get_media_authorization_cache_key(user, pk))
+        if media is None:
+            return None
+
+        # Same token as Item.get_version, read from cache without loading the item
+        version = models.get_cache_tokens_digest(
+            [models.get_item_generation_cache_key(item_id) for item_id in media["path"].split(".")]
+            + [models.get_item_version_cache_key(pk)]
+        )
+        if version != media["version"]:
+            return None
+
+        return media
 
     @drf.decorators.action(detail=True, methods=["get"], url_path="wopi")
     def wopi(self, request, *args, **kwargs):
@@ -1651,13 +2312,17 @@ class ItemViewSet(
     )
     def duplicate(self, request, *args, **kwargs):
         """
-        Duplicate an item of type File. The item is duplicated in the folder where the original
+        Duplicate an item. The item is duplicated in the folder where the original
         item is.
-        The user who duplicates becomes the creator of the duplicate
+        The user who duplicates becomes the creator of the duplicate.
+
+        The content of a folder is duplicated by a background task: the copy of the folder
+        is returned at once and the progress of the task can be followed on it.
         """
 
         item_to_duplicate = self.get_object()
         user = request.user
+        is_folder = item_to_duplicate.type == models.ItemTypeChoices.FOLDER
 
         parent = item_to_duplicate.parent() if item_to_duplicate.depth > 1 else None
 
@@ -1665,6 +2330,25 @@ class ItemViewSet(
             # If the user as reader role on the parent folder, then the duplicated
             # item must be created at the user's root
             parent = None
+
+        if is_folder:
+            # The content of the folder is read where it is while it is duplicated
+            item_to_duplicate.check_no_background_task()
+            content_fields = {"type": models.ItemTypeChoices.FOLDER}
+        else:
+            content_fields = {
+                "type": models.ItemTypeChoices.FILE,
+                "size": item_to_duplicate.size,
+                # Duplicating a file stored in a blob only references the blob
+                "blob_id": item_to_duplicate.blob_id,
+                "upload_state": models.ItemUploadStateChoices.READY
+                if item_to_duplicate.blob_id
+                else models.ItemUploadStateChoices.DUPLICATING,
+                "mimetype": item_to_duplicate.mimetype,
+                "filename": item_to_duplicate.filename,
+            }
+
+        background_task = None
         with transaction.atomic():
             duplicated_item = models.Item.objects.create_child(
                 creator=user,
@@ -1673,12 +2357,8 @@ class ItemViewSet(
                 title=capfirst(
                     _("copy of {title}").format(title=item_to_duplicate.title)
                 ),  # Title uniqueness is managed in the create_child method
-                type=models.ItemTypeChoices.FILE,
-                size=item_to_duplicate.size,
-                upload_state=models.ItemUploadStateChoices.DUPLICATING,
-                mimetype=item_to_duplicate.mimetype,
-                filename=item_to_duplicate.filename,
                 description=item_to_duplicate.description,
+                **content_fields,
             )
 
             if duplicated_item.is_root:
@@ -1688,11 +2368,21 @@ class ItemViewSet(
                     role=models.RoleChoices.OWNER,
                 )
 
+            if is_folder:
+                background_task = models.ItemBackgroundTask.objects.create(
+                    item=duplicated_item,
+                    kind=models.ItemBackgroundTaskKindChoices.DUPLICATE,
+                    previous_path=item_to_duplicate.path,
+                )
+
+        if background_task:
+            process_item_background_task.delay(background_task.id)
         # Then duplicate the file in async way
-        duplicate_file.delay(
-            item_to_duplicate_id=item_to_duplicate.id,
-            duplicated_item_id=duplicated_item.id,
-        )
+        elif not duplicated_item.blob_id:
+            duplicate_file.delay(
+                item_to_duplicate_id=item_to_duplicate.id,
+                duplicated_item_id=duplicated_item.id,
+            )
 
         posthog_capture("item_duplicate", user, {}, item=duplicated_item)
 
@@ -2214,6 +2904,7 @@ class ConfigView(drf.views.APIView):
             "FRONTEND_ENTITLEMENTS_DISCLAIMERS",
             "FRONTEND_CSS_URL",
             "FRONTEND_JS_URL",
+            "ITEM_UPLOAD_BATCH_SIZE",
             "MEDIA_BASE_URL",
             "POSTHOG_KEY",
             "POSTHOG_HOST",
@@ -0,0 +1,60 @@
+"""Measure the cost of signing the requests that the reverse proxy sends to the object storage."""
+
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+import botocore
+
+from core.services.s3_signer import S3RequestSigner
+from core.storage import get_storage_gateway
+
+
+def _sign_with_botocore(key):
+    """Sign a request as botocore does, building a presigned url and a request each time."""
+    url = default_storage.unsigned_connection.meta.client.generate_presigned_url(
+        "get_object",
+        ExpiresIn=0,
+        Params={"Bucket": default_storage.bucket_name, "Key": key},
+    )
+    request = botocore.awsrequest.AWSRequest(method="get", url=url)
+    s3_client = default_storage.connection.meta.client
+    # pylint: disable=protected-access
+    credentials = s3_client._request_signer._credentials  # noqa: SLF001
+    auth = botocore.auth.S3SigV4Auth(
+        credentials.get_frozen_credentials(), "s3", s3_client.meta.region_name
+    )
+    auth.add_auth(request)
+    return request.headers
+
+
+class Command(BaseCommand):
+    """
+    Compare the time taken to sign a request on an object with botocore and with the signer
+    used by the media-auth endpoint. No request is sent to the object storage.
+    """
+
+    help = "Measure the cost of signing the requests sent to the object storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=10000,
+            help="Number of requests signed by each implementation (default: 10000)",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        signer = S3RequestSigner(get_storage_gateway())
+        key = "item/8f1c0e4e-4a48-4a55-9a4d-2f3b8f0b4c1e/document.pdf"
+
+        for name, sign in (("botocore", _sign_with_botocore), ("signer", signer.sign)):
+            # Warm up clients, credentials and cached signing keys
+            sign(key)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                sign(key)
+            per_call = (time.perf_counter() - start) / iterations * 1_000_000
+            self.stdout.write(f"{name:s}: {per_call:.1f} µs per request ({iterations:d} requests)")
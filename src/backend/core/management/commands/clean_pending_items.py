@@ -5,6 +5,7 @@ from datetime import timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
+from core.api.utils import abort_multipart_upload
 from core.models import Item, ItemUploadStateChoices
 
 
@@ -32,6 +33,9 @@ class Command(BaseCommand):
 
         count = 0
         for item in items.iterator():
+            # Parts of an unfinished multipart upload are kept, and billed, until it is aborted
+            if item.multipart_upload_id:
+                abort_multipart_upload(item.file_key, item.multipart_upload_id)
             item.soft_delete()
             item.delete()
             count += 1
@@ -0,0 +1,78 @@
+"""Move files stored under their name to versioned keys."""
+
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from botocore.exceptions import ClientError
+
+from core.models import Item, ItemTypeChoices, ItemUploadStateChoices
+from core.services.storage_copy import copy_file
+from core.storage import get_storage_gateway
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Move the files still stored under a key containing their name to a key built from the item
+    id and a version, so that renaming them does not copy them in object storage anymore.
+    The command can be interrupted and run again: files already moved are skipped.
+    """
+
+    help = "Move files stored under their name to versioned keys"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Maximum number of files to move (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.ITEM_FILE_VERSIONED_KEYS:
+            raise CommandError("Versioned file keys are not enabled (ITEM_FILE_VERSIONED_KEYS).")
+
+        items = (
+            Item.objects.filter(
+                type=ItemTypeChoices.FILE,
+                file_version__isnull=True,
+                blob__isnull=True,
+                filename__isnull=False,
+            )
+            # Pending uploads are still sent to the key given in their upload policy
+            .exclude(
+                upload_state__in=[
+                    ItemUploadStateChoices.PENDING,
+                    ItemUploadStateChoices.FINALIZING,
+                ]
+            )
+            .only("id", "filename", "file_version", "blob_id")
+            .order_by("pk")
+        )
+        if options["limit"] is not None:
+            items = items[: options["limit"]]
+
+        count = 0
+        for item in items.iterator():
+            legacy_key = item.file_key
+            item.file_version = 1
+
+            try:
+                copy_file(legacy_key, item.file_key)
+            except ClientError as error:
+                logger.error("Failed to copy file of item %s: %s", item.id, error)
+                continue
+
+            # The file may have been renamed while it was copied: it is moved by a next run
+            if Item.objects.filter(
+                pk=item.pk, filename=item.filename, file_version__isnull=True
+            ).update(file_version=item.file_version):
+                get_storage_gateway().delete(legacy_key)
+                count += 1
+            else:
+                get_storage_gateway().delete(item.file_key)
+
+        self.stdout.write(f"Moved {count} file(s) to versioned keys.")
@@ -0,0 +1,24 @@
+"""Resume item background tasks"""
+
+from django.core.management.base import BaseCommand
+
+from core.models import ItemBackgroundTask
+from core.tasks.item import process_item_background_task
+
+
+class Command(BaseCommand):
+    """Resume item background tasks command"""
+
+    help = "Dispatch again the item background tasks that were interrupted or failed"
+
+    def handle(self, *args, **options):
+        """Resume item background tasks"""
+        self.stdout.write("Starting resume item background tasks command")
+        tasks = ItemBackgroundTask.objects.filter(
+            status__in=ItemBackgroundTask.LOCKING_STATUSES
+        ).iterator()
+
+        for task in tasks:
+            self.stdout.write(f"Resuming {task.kind} background task {task.id}")
+            process_item_background_task.delay(task.id)
+        self.stdout.write("Resume item background tasks command completed")
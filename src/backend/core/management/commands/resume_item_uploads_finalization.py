@@ -0,0 +1,40 @@
+"""Resume the finalization of uploaded files that is stuck."""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Item, ItemUploadStateChoices
+from core.tasks.item import finalize_item_upload
+
+
+class Command(BaseCommand):
+    """Dispatch again the finalization of items stuck in the FINALIZING state."""
+
+    help = "Dispatch again the finalization of uploads that were interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes",
+            type=int,
+            default=30,
+            help="Age threshold in minutes (default: 30)",
+        )
+
+    def handle(self, *args, **options):
+        """Resume the finalization of the items stuck since the threshold."""
+        threshold = timezone.now() - timedelta(minutes=options["minutes"])
+
+        item_ids = Item.objects.filter(
+            upload_state=ItemUploadStateChoices.FINALIZING,
+            updated_at__lt=threshold,
+            hard_deleted_at__isnull=True,
+        ).values_list("id", flat=True)
+
+        count = 0
+        for item_id in item_ids.iterator():
+            finalize_item_upload.delay(item_id)
+            count += 1
+
+        self.stdout.write(f"Resumed the finalization of {count} item(s).")
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.14 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_alter_item_upload_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemEffectiveAccess',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('team', models.CharField(blank=True, max_length=100)),
+                ('role', models.CharField(choices=[('reader', 'Reader'), ('editor', 'Editor'), ('administrator', 'Administrator'), ('owner', 'Owner')], max_length=20)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_accesses', to='core.item')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Item effective access',
+                'verbose_name_plural': 'Item effective accesses',
+                'db_table': 'drive_item_effective_access',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'item'), name='unique_effective_access_item_user'), models.UniqueConstraint(condition=models.Q(('team__gt', '')), fields=('team', 'item'), name='unique_effective_access_item_team')],
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO drive_item_effective_access (item_id, user_id, team, role)
+            SELECT i.id, a.user_id, a.team,
+                (ARRAY['reader', 'editor', 'administrator', 'owner']::varchar[])[
+                    MAX(array_position(
+                        ARRAY['reader', 'editor', 'administrator', 'owner']::varchar[],
+                        a.role::varchar
+                    ))
+                ]
+            FROM drive_item_access a
+            JOIN drive_item ai ON ai.id = a.item_id
+            JOIN drive_item i ON i.path <@ ai.path
+            GROUP BY i.id, a.user_id, a.team;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
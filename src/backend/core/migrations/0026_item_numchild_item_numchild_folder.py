@@ -0,0 +1,42 @@
+# Generated by Django 5.2.14 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_itemeffectiveaccess'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='numchild',
+            field=models.PositiveIntegerField(default=0, help_text='Number of direct non-deleted children.'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='numchild_folder',
+            field=models.PositiveIntegerField(default=0, help_text='Number of direct non-deleted folder children.'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE drive_item AS parent
+            SET numchild = children.numchild, numchild_folder = children.numchild_folder
+            FROM (
+                SELECT
+                    subpath(path, 0, nlevel(path) - 1) AS parent_path,
+                    COUNT(*) AS numchild,
+                    COUNT(*) FILTER (WHERE type = 'folder') AS numchild_folder
+                FROM drive_item
+                WHERE nlevel(path) > 1
+                    AND deleted_at IS NULL
+                    AND ancestors_deleted_at IS NULL
+                GROUP BY 1
+            ) AS children
+            WHERE parent.path = children.parent_path;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
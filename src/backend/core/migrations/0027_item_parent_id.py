@@ -0,0 +1,42 @@
+# Generated by Django 5.2.14 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_item_numchild_item_numchild_folder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='parent_id',
+            field=models.UUIDField(blank=True, editable=False, help_text='Denormalized id of the parent item, kept in sync with the path.', null=True),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE drive_item
+            SET parent_id = subpath(path, -2, 1)::text::uuid
+            WHERE nlevel(path) > 1;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['parent_id', 'created_at'], name='drive_item_parent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['parent_id', 'title'], name='drive_item_parent_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['parent_id', 'updated_at'], name='drive_item_parent_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['parent_id', 'size'], name='drive_item_parent_size_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.14 on 2026-10-18 14:02
+
+import django.contrib.postgres.indexes
+import django.utils.timezone
+import django_ltree.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_item_parent_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('item_id', models.UUIDField()),
+                ('path', django_ltree.fields.PathField()),
+                ('previous_path', django_ltree.fields.PathField(blank=True, help_text='Path of the item before it was moved.', null=True)),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('moved', 'Moved'), ('deleted', 'Deleted'), ('restored', 'Restored'), ('accesses', 'Accesses changed')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+            options={
+                'verbose_name': 'Item change',
+                'verbose_name_plural': 'Item changes',
+                'db_table': 'drive_item_change',
+                'ordering': ('id',),
+                'indexes': [django.contrib.postgres.indexes.GistIndex(fields=['path'], name='drive_item_change_path_idx'), django.contrib.postgres.indexes.GistIndex(fields=['previous_path'], name='drive_item_change_prev_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.14 on 2026-10-18 15:37
+
+import uuid
+
+import django.db.models.deletion
+import django_ltree.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_itemchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemBackgroundTask',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='primary key for the record as UUID', primary_key=True, serialize=False, verbose_name='id')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='date and time at which a record was created', verbose_name='created on')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='date and time at which a record was last updated', verbose_name='updated on')),
+                ('kind', models.CharField(choices=[('move', 'Move')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=25)),
+                ('previous_path', django_ltree.fields.PathField(blank=True, help_text='Path of the item before it was moved.', null=True)),
+                ('processed', models.PositiveIntegerField(default=0, help_text='Number of descendants processed so far.')),
+                ('total', models.PositiveIntegerField(default=0, help_text='Number of descendants to process, estimated when the task started.')),
+                ('error_details', models.TextField(blank=True, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='background_tasks', to='core.item')),
+            ],
+            options={
+                'verbose_name': 'Item background task',
+                'verbose_name_plural': 'Item background tasks',
+                'db_table': 'drive_item_background_task',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.14 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_itembackgroundtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itembackgroundtask',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='Deletion date marked on the descendants or removed from them.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='itembackgroundtask',
+            name='kind',
+            field=models.CharField(choices=[('move', 'Move'), ('soft_delete', 'Soft delete'), ('restore', 'Restore')], max_length=20),
+        ),
+    ]
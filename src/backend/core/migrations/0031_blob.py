@@ -0,0 +1,33 @@
+# Generated by Django 5.2.14 on 2026-10-18 18:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_itembackgroundtask_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('size', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+                'db_table': 'drive_blob',
+            },
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Content addressed blob storing the file, if deduplicated.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='items', to='core.blob'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.14 on 2026-10-18 19:10
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_blob'),
+    ]
+
+    operations = [
+        # Existing files stay stored under their name until they are moved with the
+        # migrate_item_file_keys command
+        migrations.AddField(
+            model_name='item',
+            name='file_version',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Version of the key storing the file, which does not depend on its name. Empty for files still stored under their name.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='file_version',
+            field=models.PositiveSmallIntegerField(blank=True, default=core.models.get_default_file_version, help_text='Version of the key storing the file, which does not depend on its name. Empty for files still stored under their name.', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.14 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_item_file_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='multipart_upload_id',
+            field=models.CharField(blank=True, help_text='Id of the multipart upload in progress for the file, if any.', max_length=1024, null=True),
+        ),
+    ]
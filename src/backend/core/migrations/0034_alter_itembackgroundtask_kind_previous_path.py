@@ -0,0 +1,24 @@
+# Generated by Django 5.2.14 on 2026-10-18 21:14
+
+import django_ltree.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_item_multipart_upload_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itembackgroundtask',
+            name='kind',
+            field=models.CharField(choices=[('move', 'Move'), ('soft_delete', 'Soft delete'), ('restore', 'Restore'), ('duplicate', 'Duplicate')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='itembackgroundtask',
+            name='previous_path',
+            field=django_ltree.fields.PathField(blank=True, help_text='Path of the item before it was moved, or of the folder duplicated.', null=True),
+        ),
+    ]
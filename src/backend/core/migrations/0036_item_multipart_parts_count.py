@@ -0,0 +1,18 @@
+# Generated by Django 5.2.14 on 2026-10-18 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_alter_item_upload_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='multipart_parts_count',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Number of parts of the multipart upload in progress for the file, if any.', null=True),
+        ),
+    ]
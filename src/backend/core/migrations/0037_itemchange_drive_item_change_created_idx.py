@@ -0,0 +1,17 @@
+# Generated by Django 5.2.14 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_item_multipart_parts_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemchange',
+            index=models.Index(fields=['created_at'], name='drive_item_change_created_idx'),
+        ),
+    ]
@@ -3,10 +3,12 @@ Declare and configure the models for the drive core application
 """
 # pylint: disable=too-many-lines
 
+import hashlib
 import smtplib
 import uuid
 from datetime import timedelta
 from enum import StrEnum
+from functools import partial
 from logging import getLogger
 from os.path import splitext
 
@@ -15,19 +17,22 @@ from django.contrib.auth import models as auth_models
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GistIndex
+from django.contrib.postgres.lookups import PostgresOperatorLookup
 from django.contrib.sites.models import Site
 from django.core import mail, validators
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import get_language, override
 from django.utils.translation import gettext_lazy as _
 
+from django_ltree.fields import PathField
 from django_ltree.functions import NLevel
 from django_ltree.managers import TreeManager, TreeQuerySet
 from django_ltree.models import TreeModel
@@ -42,6 +47,7 @@ from lasuite.drf.models.choices import (
 from pydantic import BaseModel as PydanticBaseModel
 from timezone_field import TimeZoneField
 
+from core.utils.item_title import get_unique_title
 from core.utils.item_title import manage_unique_title as manage_unique_title_utils
 from wopi.conversion.policy import target_extension_for
 
@@ -62,6 +68,106 @@ def get_trashbin_cutoff():
     return timezone.now() - timedelta(days=settings.TRASHBIN_CUTOFF_DAYS)
 
 
+def get_cache_tokens_digest(keys):
+    """
+    Return a digest of the tokens stored in cache under the given keys.
+
+    Missing tokens are created with a random value so that deleting a token, to signal a
+    change, always produces a digest that was never seen before.
+    """
+    tokens = cache.get_many(keys)
+    missing_tokens = {key: uuid.uuid4().hex for key in keys if key not in tokens}
+    if missing_tokens:
+        cache.set_many(missing_tokens, timeout=None)
+        tokens.update(missing_tokens)
+
+    return hashlib.sha256(":".join(tokens[key] for key in keys).encode()).hexdigest()
+
+
+def get_accessible_items_cache_key(user):
+    """
+    Return the cache key of the items a user can list.
+
+    The key is derived from generation tokens stored for the user and for each of their
+    teams. Invalidating a principal drops its token so that the next read computes a new
+    key, while the stale entry simply expires.
+    """
+    generation_keys = [f"accessible_items_generation:user:{user.id!s}"] + [
+        f"accessible_items_generation:team:{team:s}" for team in sorted(user.teams)
+    ]
+    return f"accessible_items:{user.id!s}:{get_cache_tokens_digest(generation_keys):s}"
+
+
+def delete_cache_tokens(keys):
+    """
+    Delete cache tokens to signal a change, now and again once the current transaction is
+    committed: until then, a concurrent request still reads the former rows and could
+    cache them under the new token. Deleting them now lets the transaction read its own
+    changes.
+    """
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if connection.in_atomic_block:
+        transaction.on_commit(partial(cache.delete_many, keys))
+
+
+def invalidate_accessible_items_cache(user_ids=(), teams=()):
+    """Invalidate the cached items listable by the given users and teams."""
+    keys = [f"accessible_items_generation:user:{user_id!s}" for user_id in user_ids if user_id]
+    keys += [f"accessible_items_generation:team:{team:s}" for team in teams if team]
+    delete_cache_tokens(keys)
+
+
+def get_item_generation_cache_key(item_id):
+    """Return the cache key under which the generation of an item is stored."""
+    return f"item_{item_id!s}_generation"
+
+
+def bump_items_generation(item_ids):
+    """
+    Bump the generation of the given items, invalidating in one cache operation all the
+    caches scoped to these items or to any of their descendants.
+    """
+    delete_cache_tokens([get_item_generation_cache_key(item_id) for item_id in item_ids])
+
+
+def get_item_version_cache_key(item_id):
+    """Return the cache key under which the version of an item is stored."""
+    return f"item_{item_id!s}_version"
+
+
+def bump_items_version(item_ids):
+    """
+    Bump the version of the given items, to signal that their own fields or the list
+    of their children changed.
+    """
+    delete_cache_tokens([get_item_version_cache_key(item_id) for item_id in item_ids])
+
+
+@PathField.register_lookup
+class DescendantsOfAnyLookup(PostgresOperatorLookup):
+    """
+    Match paths that are descendants of any of the paths in a list.
+
+    The list is converted to an array of lqueries matched in a single predicate, which can
+    use the GiST index on the path column unlike a chain of OR'ed descendants lookups.
+    """
+
+    lookup_name = "descendants_any"
+    postgres_operator = "?"
+    prepare_rhs = False
+
+    def get_prep_lookup(self):
+        """Convert each path to an lquery matching the path and its descendants."""
+        return [f"{path!s}.*" for path in self.rhs]
+
+    def process_rhs(self, compiler, connection):
+        """Cast the list of lqueries passed as parameter."""
+        rhs, rhs_params = super().process_rhs(compiler, connection)
+        return f"{rhs:s}::lquery[]", rhs_params
+
+
 class ItemTypeChoices(models.TextChoices):
     """Defines the types of items that can be created."""
 
@@ -73,6 +179,7 @@ class ItemUploadStateChoices(models.TextChoices):
     """Defines the possible states of an item."""
 
     PENDING = "pending", _("Pending")
+    FINALIZING = "finalizing", _("Finalizing")
     DUPLICATING = "duplicating", ("Duplicating")
     CONVERTING = "converting", _("Converting")
     ANALYZING = "analyzing", _("Analyzing")
@@ -93,6 +200,35 @@ class MirrorItemTaskStatusChoices(models.TextChoices):
     FAILED = "failed", _("Failed")
 
 
+class ItemBackgroundTaskKindChoices(models.TextChoices):
+    """Defines the operations on a subtree that can be run as background tasks."""
+
+    MOVE = "move", _("Move")
+    SOFT_DELETE = "soft_delete", _("Soft delete")
+    RESTORE = "restore", _("Restore")
+    DUPLICATE = "duplicate", _("Duplicate")
+
+
+class ItemBackgroundTaskStatusChoices(models.TextChoices):
+    """Defines the possible statuses for a background task on a subtree."""
+
+    PENDING = "pending", _("Pending")
+    PROCESSING = "processing", _("Processing")
+    COMPLETED = "completed", _("Completed")
+    FAILED = "failed", _("Failed")
+
+
+class ItemChangeKindChoices(models.TextChoices):
+    """Defines the kinds of changes recorded in the change log of the items."""
+
+    CREATED = "created", _("Created")
+    UPDATED = "updated", _("Updated")
+    MOVED = "moved", _("Moved")
+    DELETED = "deleted", _("Deleted")
+    RESTORED = "restored", _("Restored")
+    ACCESSES = "accesses", _("Accesses changed")
+
+
 class DuplicateEmailError(Exception):
     """Raised when an email is already associated with a pre-existing user."""
 
@@ -314,9 +450,18 @@ class User(AbstractBaseUser, BaseModel, auth_models.PermissionsMixin):
             ]
         )
 
+        # Bulk create bypasses ItemAccess.save(), refresh the effective roles explicitly
+        ItemEffectiveAccess.objects.rebuild(user_id=self.id)
+        invalidate_accessible_items_cache(user_ids=[self.id])
+
         # Set creator of items if not yet set (e.g. items created via server-to-server API)
         item_ids = [invitation.item_id for invitation in valid_invitations]
         Item.objects.filter(id__in=item_ids, creator__isnull=True).update(creator=self)
+        bump_items_generation(item_ids)
+        bump_items_version(item_ids)
+        ItemChange.objects.log(
+            [invitation.item for invitation in valid_invitations], ItemChangeKindChoices.ACCESSES
+        )
 
         valid_invitations.delete()
 
@@ -480,11 +625,19 @@ class UserReconciliation(BaseModel):
         if removed_accesses:
             ids_to_delete = [entry.id for entry in removed_accesses]
             ItemAccess.objects.filter(id__in=ids_to_delete).delete()
-            # Bulk delete bypasses ItemAccess.delete(), so the nb_accesses cache
-            # of the affected items must be invalidated explicitly.
-            items_to_invalidate = {entry.item_id: entry.item for entry in removed_accesses}
-            for item in items_to_invalidate.values():
-                item.invalidate_nb_accesses_cache()
+
+        # Bulk operations bypass ItemAccess.save() and ItemAccess.delete(), so the
+        # generation of the affected items and the effective roles of both users
+        # must be refreshed explicitly.
+        accesses_items_ids = {entry.item_id for entry in [*updated_accesses, *removed_accesses]}
+        bump_items_generation(accesses_items_ids)
+        ItemChange.objects.log(
+            Item.objects.filter(id__in=accesses_items_ids).only("id", "path"),
+            ItemChangeKindChoices.ACCESSES,
+        )
+        ItemEffectiveAccess.objects.rebuild(user_id=self.active_user.id)
+        ItemEffectiveAccess.objects.rebuild(user_id=self.inactive_user.id)
+        invalidate_accessible_items_cache(user_ids=[self.active_user.id, self.inactive_user.id])
 
         ItemFavorite.objects.bulk_update(updated_favorites, ["user"])
         if removed_favorites:
@@ -754,13 +907,16 @@ class AnnotateUserRoleQuerySetMixin:
         """
         Annotate queryset with the roles of the current user
         on the item or its ancestors.
+
+        Roles are read from the materialized effective accesses of the item so that
+        no ancestor scan is needed.
         """
         output_field = ArrayField(base_field=models.CharField())
 
         if user.is_authenticated:
-            user_roles_subquery = ItemAccess.objects.filter(
+            user_roles_subquery = ItemEffectiveAccess.objects.filter(
                 models.Q(user=user) | models.Q(team__in=user.teams),
-                item__path__ancestors=models.OuterRef(self.path_property),
+                item_id=models.OuterRef(self.item_id_property),
             ).values_list("role", flat=True)
 
             return self.annotate(
@@ -777,7 +933,7 @@ class AnnotateUserRoleQuerySetMixin:
 class ItemQuerySet(AnnotateUserRoleQuerySetMixin, TreeQuerySet):
     """Custom queryset for Item model with additional methods."""
 
-    path_property = "path"
+    item_id_property = "pk"
 
     def readable_per_se(self, user):
         """
@@ -795,6 +951,70 @@ class ItemQuerySet(AnnotateUserRoleQuerySetMixin, TreeQuerySet):
 
         return self.filter(models.Q(link_reach=LinkReachChoices.PUBLIC))
 
+    def exclude_background_tasks_subtrees(self):
+        """
+        Exclude the items that background tasks did not process yet: the descendants of the
+        items whose deletion is still being marked on their descendants, and the descendants
+        still found under the former path of a folder being moved, whose roles and link
+        reach still come from their former ancestors. The subqueries run on the few
+        unfinished tasks.
+        """
+        return self.exclude(
+            models.Exists(
+                ItemBackgroundTask.objects.filter(
+                    kind=ItemBackgroundTaskKindChoices.SOFT_DELETE,
+                    status__in=ItemBackgroundTask.LOCKING_STATUSES,
+                    item__path__ancestors=models.OuterRef("path"),
+                ).exclude(item_id=models.OuterRef("pk"))
+            )
+        ).exclude(
+            models.Exists(
+                ItemBackgroundTask.objects.filter(
+                    kind=ItemBackgroundTaskKindChoices.MOVE,
+                    status__in=ItemBackgroundTask.LOCKING_STATUSES,
+                    previous_path__ancestors=models.OuterRef("path"),
+                )
+            )
+        )
+
+    def filter_purgeable(self):
+        """
+        Filter the items that can be purged: hard deleted items and items soft deleted for
+        longer than the trashbin retention period and the purge grace period.
+        """
+        cutoff = timezone.now() - timedelta(
+            days=settings.TRASHBIN_CUTOFF_DAYS + settings.PURGE_GRACE_DAYS
+        )
+        return self.filter(
+            models.Q(hard_deleted_at__isnull=False) | models.Q(deleted_at__lte=cutoff)
+        )
+
+    def purgeable_roots(self):
+        """
+        Return the highest purgeable items, purging them purges their purgeable descendants,
+        annotated with the number of items in their subtree.
+        """
+        purgeable = self.model.objects.filter_purgeable()
+        subtree_count_sq = models.Subquery(
+            self.model.objects.filter(path__descendants=models.OuterRef("path"))
+            .order_by()
+            .values(group_key=models.Value(1))
+            .annotate(count=models.Count("pk"))
+            .values("count"),
+            output_field=models.IntegerField(),
+        )
+        return (
+            self.filter_purgeable()
+            .exclude(
+                models.Exists(
+                    purgeable.filter(path__ancestors=models.OuterRef("path")).exclude(
+                        pk=models.OuterRef("pk")
+                    )
+                )
+            )
+            .annotate(subtree_count=Coalesce(subtree_count_sq, 1))
+        )
+
     def filter_non_deleted(self, **kwargs):
         """Filter the non deleted items"""
         return self.filter(
@@ -816,34 +1036,19 @@ class ItemQuerySet(AnnotateUserRoleQuerySetMixin, TreeQuerySet):
 
         return self.annotate(is_favorite=models.Value(False))
 
-    def annotate_user_roles(self, user):
-        """
-        Annotate item queryset with the roles of the current user
-        on the item or its ancestors.
-        """
-        output_field = ArrayField(base_field=models.CharField())
-
-        if user.is_authenticated:
-            user_roles_subquery = ItemAccess.objects.filter(
-                models.Q(user=user) | models.Q(team__in=user.teams),
-                item__path__ancestors=models.OuterRef("path"),
-            ).values_list("role", flat=True)
-
-            return self.annotate(
-                user_roles=models.Func(
-                    user_roles_subquery, function="ARRAY", output_field=output_field
-                )
-            )
-
-        return self.annotate(
-            user_roles=models.Value([], output_field=output_field),
+    def move_under(self, old_path, new_path):
+        """Replace the `old_path` prefix of the paths of the items by `new_path`."""
+        # https://patshaughnessy.net/2017/12/14/manipulating-trees-using-sql-and-the-postgres-ltree-extension
+        return self.update(
+            path=RawSQL("%s || subpath(path, nlevel(%s))", (str(new_path), str(old_path)))
         )
 
-    def annotate_with_numchild(self):
+    def refresh_numchild(self):
         """
-        Annotate queryset with the count of direct non-deleted children (_numchild)
-        and folder children (_numchild_folder).
-        Uses two correlated subqueries; the Item.numchild property reads these annotations.
+        Recompute the persistent children counters of the items in the queryset from the
+        direct non-deleted children (numchild) and folder children (numchild_folder).
+        Counters are maintained incrementally, this is only needed when many items change
+        state at once (e.g. when a subtree is restored).
         """
         direct_children_qs = (
             Item.objects.filter(
@@ -876,9 +1081,9 @@ class ItemQuerySet(AnnotateUserRoleQuerySetMixin, TreeQuerySet):
             output_field=models.IntegerField(),
         )
 
-        return self.annotate(
-            _numchild=numchild_sq,
-            _numchild_folder=numchild_folder_sq,
+        return self.update(
+            numchild=Coalesce(numchild_sq, 0),
+            numchild_folder=Coalesce(numchild_folder_sq, 0),
         )
 
 
@@ -913,7 +1118,7 @@ class ItemManager(TreeManager.from_queryset(ItemQuerySet)):
                     }
                 )
             kwargs["title"] = manage_unique_title_utils(
-                self.children(parent.path), kwargs.get("title")
+                self.filter(parent_id=parent.pk), kwargs.get("title")
             )
 
         if not kwargs.get("id"):
@@ -926,8 +1131,191 @@ class ItemManager(TreeManager.from_queryset(ItemQuerySet)):
 
         item = self.create(**kwargs)
 
+        if parent and item.is_alive:
+            self.increment_numchild(parent.path, item, 1)
+            # Keep the parent instance in sync with the database
+            parent.numchild += 1
+            if item.type == ItemTypeChoices.FOLDER:
+                parent.numchild_folder += 1
+
         return item
 
+    def create_upload_batch(self, parent, creator, files):
+        """
+        Create the file items of a folder upload under a parent folder, with the folders of
+        their relative paths, in bulk. `files` is a list of dicts with the `segments` of the
+        relative path of each file (titles of its folders then its own title), its sanitized
+        `filename` and its declared `size`.
+
+        Folders of the paths that already exist under the parent, e.g. created by a former
+        batch of the same upload, are reused. Titles are made unique among the children of
+        each folder like create_child does, with one query per existing folder instead of
+        one per item. Existing folders are locked before their children are listed so that
+        concurrent batches do not create the same folder twice.
+
+        Return the list of folders and the list of files created, in the order of `files`
+        for the latter.
+        """
+        if parent.type != ItemTypeChoices.FOLDER:
+            raise ValidationError(
+                {
+                    "type": ValidationError(
+                        _("Only folders can have children."),
+                        code="item_create_child_type_folder_only",
+                    )
+                }
+            )
+
+        parent.check_no_background_task()
+
+        with transaction.atomic():
+            # Folders by the titles of their relative path, the parent being the empty path
+            folders = {(): parent}
+            # Titles taken among the children of each folder, loaded on first use for the
+            # folders that already exist
+            titles = {}
+            existing_children = {}
+            created_folders = []
+            created_ids = set()
+
+            def load_children(folder):
+                if folder.pk not in titles:
+                    # Concurrent batches wait for each other before listing the same children
+                    list(self.select_for_update().filter(pk=folder.pk).values_list("pk"))
+                    children = list(
+                        self.filter(parent_id=folder.pk)
+                        .filter_non_deleted()
+                        .only("id", "path", "title", "type")
+                    )
+                    titles[folder.pk] = {child.title for child in children}
+                    existing_children[folder.pk] = {
+                        child.title: child
+                        for child in children
+                        if child.type == ItemTypeChoices.FOLDER
+                    }
+                return titles[folder.pk]
+
+            def build_child(folder, title, **kwargs):
+                child_id = uuid.uuid4()
+                child = self.model(
+                    id=child_id,
+                    path=f"{folder.path!s}.{child_id!s}",
+                    parent_id=folder.pk,
+                    title=get_unique_title(load_children(folder), title),
+                    creator=creator,
+                    **kwargs,
+                )
+                titles[folder.pk].add(child.title)
+                titles[child.pk] = set()
+                created_ids.add(child.pk)
+                return child
+
+            folder_paths = sorted(
+                {
+                    tuple(file["segments"][:depth])
+                    for file in files
+                    for depth in range(1, len(file["segments"]))
+                },
+                key=len,
+            )
+            for folder_path in folder_paths:
+                folder = folders[folder_path[:-1]]
+                title = folder_path[-1]
+                if folder.pk not in created_ids:
+                    load_children(folder)
+                    if title in existing_children[folder.pk]:
+                        folders[folder_path] = existing_children[folder.pk][title]
+                        continue
+                folders[folder_path] = build_child(folder, title, type=ItemTypeChoices.FOLDER)
+                created_folders.append(folders[folder_path])
+
+            created_files = [
+                build_child(
+                    folders[tuple(file["segments"][:-1])],
+                    file["segments"][-1],
+                    type=ItemTypeChoices.FILE,
+                    filename=file["filename"],
+                    size=file.get("size"),
+                    upload_state=ItemUploadStateChoices.PENDING,
+                )
+                for file in files
+            ]
+
+            created_items = [*created_folders, *created_files]
+            numchild = {}
+            numchild_folder = {}
+            for item in created_items:
+                numchild[item.parent_id] = numchild.get(item.parent_id, 0) + 1
+                if item.type == ItemTypeChoices.FOLDER:
+                    numchild_folder[item.parent_id] = numchild_folder.get(item.parent_id, 0) + 1
+            for folder in created_folders:
+                folder.numchild = numchild.get(folder.pk, 0)
+                folder.numchild_folder = numchild_folder.get(folder.pk, 0)
+
+            self.bulk_create(created_items)
+            ItemChange.objects.log(created_items, ItemChangeKindChoices.CREATED)
+            ItemEffectiveAccess.objects.inherit_from_parents(created_items)
+
+            updated_folders = [
+                folder
+                for folder in folders.values()
+                if folder.pk not in created_ids and folder.pk in numchild
+            ]
+            for folder in updated_folders:
+                self.filter(pk=folder.pk).update(
+                    numchild=models.F("numchild") + numchild[folder.pk],
+                    numchild_folder=models.F("numchild_folder") + numchild_folder.get(folder.pk, 0),
+                )
+
+        # The counters are shown on the folders and in the list of their own parent's children
+        bump_items_version({item_id for folder in updated_folders for item_id in folder.path[-2:]})
+
+        return created_folders, created_files
+
+    def increment_numchild(self, parent_path, child, value):
+        """Atomically add value to the children counters of a parent for the given child."""
+        is_folder = child.type == ItemTypeChoices.FOLDER
+        self.filter(pk=parent_path[-1]).update(
+            numchild=models.F("numchild") + value,
+            numchild_folder=models.F("numchild_folder") + (value if is_folder else 0),
+        )
+        # The counters are shown on the parent and in the list of its own parent's children
+        bump_items_version(parent_path[-2:])
+
+
+def get_default_file_version():
+    """New files are stored under a versioned key if enabled, otherwise under their name."""
+    return 1 if settings.ITEM_FILE_VERSIONED_KEYS else None
+
+
+class Blob(models.Model):
+    """
+    Content of a file stored once in object storage under its SHA-256 digest, whatever the
+    number of items referencing it. A blob is deleted when no item references it anymore.
+    """
+
+    sha256 = models.CharField(_("SHA-256"), max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        db_table = "drive_blob"
+        verbose_name = _("Blob")
+        verbose_name_plural = _("Blobs")
+
+    def __str__(self):
+        return self.sha256
+
+    @staticmethod
+    def get_key(sha256):
+        """Key used to store the content of a blob in object storage."""
+        return f"blob/{sha256[:2]:s}/{sha256:s}"
+
+    @property
+    def key(self):
+        """Key used to store the content of the blob in object storage."""
+        return self.get_key(self.sha256)
+
 
 # pylint: disable=too-many-public-methods
 class Item(TreeModel, BaseModel):
@@ -969,6 +1357,34 @@ class Item(TreeModel, BaseModel):
     mimetype = models.CharField(max_length=255, null=True, blank=True)
     main_workspace = models.BooleanField(default=False)
     size = models.BigIntegerField(null=True, blank=True)
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        related_name="items",
+        blank=True,
+        null=True,
+        help_text=_("Content addressed blob storing the file, if deduplicated."),
+    )
+    file_version = models.PositiveSmallIntegerField(
+        default=get_default_file_version,
+        blank=True,
+        null=True,
+        help_text=_(
+            "Version of the key storing the file, which does not depend on its name. "
+            "Empty for files still stored under their name."
+        ),
+    )
+    multipart_upload_id = models.CharField(
+        max_length=1024,
+        blank=True,
+        null=True,
+        help_text=_("Id of the multipart upload in progress for the file, if any."),
+    )
+    multipart_parts_count = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+        help_text=_("Number of parts of the multipart upload in progress for the file, if any."),
+    )
     description = models.TextField(null=True, blank=True)
     malware_detection_info = models.JSONField(
         null=True,
@@ -976,8 +1392,23 @@ class Item(TreeModel, BaseModel):
         default=dict,
         help_text=_("Malware detection info when the analysis status is unsafe."),
     )
+    parent_id = models.UUIDField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_("Denormalized id of the parent item, kept in sync with the path."),
+    )
+    numchild = models.PositiveIntegerField(
+        default=0,
+        help_text=_("Number of direct non-deleted children."),
+    )
+    numchild_folder = models.PositiveIntegerField(
+        default=0,
+        help_text=_("Number of direct non-deleted folder children."),
+    )
 
     label_size = 7
+    counter_fields = ("numchild", "numchild_folder")
 
     objects = ItemManager()
 
@@ -998,6 +1429,11 @@ class Item(TreeModel, BaseModel):
         indexes = [
             GistIndex(fields=["path"]),
             models.Index(NLevel(models.F("path")), name="drive_item_path_nlevel_idx"),
+            # Cover listing the children of an item with the supported orderings
+            models.Index(fields=["parent_id", "created_at"], name="drive_item_parent_created_idx"),
+            models.Index(fields=["parent_id", "title"], name="drive_item_parent_title_idx"),
+            models.Index(fields=["parent_id", "updated_at"], name="drive_item_parent_updated_idx"),
+            models.Index(fields=["parent_id", "size"], name="drive_item_parent_size_idx"),
         ]
 
     def __str__(self):
@@ -1010,7 +1446,12 @@ class Item(TreeModel, BaseModel):
         self._computed_link_definition = None
 
     def save(self, *args, **kwargs):
-        """Set the upload state to pending if it's the first save and it's a file"""
+        """
+        Set the upload state to pending if it's the first save and it's a file.
+
+        The change is recorded in the change log of the items, with the kind passed in the
+        `change_kind` keyword argument if any (None to skip it).
+        """
         # Validate filename requirements based on item type
         if self.type == ItemTypeChoices.FILE:
             if self.filename is None:
@@ -1046,7 +1487,53 @@ class Item(TreeModel, BaseModel):
         if not self.path:
             self.path = str(self.id)
 
-        return super().save(*args, **kwargs)
+        self.parent_id = self.path[-2] if len(self.path) > 1 else None
+
+        is_adding = self._state.adding
+        change_kind = kwargs.pop(
+            "change_kind",
+            ItemChangeKindChoices.CREATED if is_adding else ItemChangeKindChoices.UPDATED,
+        )
+        previous_path = kwargs.pop("previous_path", None)
+
+        # Children counters are only updated atomically in database, saving a stale
+        # instance must not overwrite them. Like Django does, deferred fields are not saved.
+        if not is_adding and kwargs.get("update_fields") is None:
+            excluded_fields = {*self.counter_fields, *self.get_deferred_fields()}
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in excluded_fields
+            ]
+
+        super().save(*args, **kwargs)
+
+        # The item is listed among the children of its parent
+        bump_items_version(self.path[-2:])
+
+        if change_kind is not None:
+            ItemChange.objects.log([self], change_kind, previous_path=previous_path)
+
+        if is_adding and self.depth > 1:
+            ItemEffectiveAccess.objects.inherit_from_parent(self)
+
+        # Traced items listed by users depend on the link definition of their ancestors
+        link_definition = (self.__dict__.get("link_reach"), self.__dict__.get("link_role"))
+        loaded_link_definition = getattr(self, "_loaded_link_definition", None)
+        if loaded_link_definition is not None and loaded_link_definition != link_definition:
+            self.bump_generation()
+            self.invalidate_accessible_items_cache(accesses=False)
+        self._loaded_link_definition = link_definition
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Keep track of the link definition loaded from the database."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_link_definition = (  # noqa: SLF001
+            instance.__dict__.get("link_reach"),
+            instance.__dict__.get("link_role"),
+        )
+        return instance
 
     def delete(self, using=None, keep_parents=False):
         if self.deleted_at is None and self.ancestors_deleted_at is None:
@@ -1062,6 +1549,17 @@ class Item(TreeModel, BaseModel):
         """Return the descendants of the item excluding the item itself."""
         return super().descendants().exclude(id=self.id)
 
+    def children(self):
+        """Return the direct children of the item using the indexed parent pointer."""
+        return self._meta.model.objects.filter(parent_id=self.pk)
+
+    def siblings(self):
+        """Return the items sharing the same parent, excluding the item itself."""
+        if self.is_root:
+            return super().siblings()
+
+        return self._meta.model.objects.filter(parent_id=self.path[-2]).exclude(pk=self.pk)
+
     @property
     def extension(self):
         """Return the extension related to the filename."""
@@ -1087,21 +1585,65 @@ class Item(TreeModel, BaseModel):
         return f"item/{self.pk!s}"
 
     @property
-    def file_key(self):
-        """Key used to store the file in object storage."""
+    def media_key(self):
+        """Key of the file in media urls, identifying the item whatever its storage."""
         if self.filename is None:
             raise RuntimeError("The item must have a filename to generate a file key.")
 
         return f"{self.key_base}/{self.filename}"
 
+    @property
+    def file_key(self):
+        """Key used to store the file in object storage."""
+        if self.blob_id:
+            return Blob.get_key(self.blob_id)
+
+        if self.file_version is None:
+            return self.media_key
+
+        return f"{self.key_base}/v{self.file_version:d}"
+
     @property
     def depth(self):
         """Return the depth of the item in the tree."""
         return len(self.path)
 
+    @property
+    def tree_generation(self):
+        """
+        Token combining the generations of the item and of all its ancestors.
+
+        Caches depending on the ancestors of an item are keyed with it: bumping the
+        generation of an item invalidates them on its whole subtree with one cache
+        operation, and reading it costs one cache round-trip whatever the depth.
+        """
+        return get_cache_tokens_digest(
+            [get_item_generation_cache_key(item_id) for item_id in self.path]
+        )
+
+    def bump_generation(self):
+        """Invalidate the caches scoped to the item and its descendants."""
+        bump_items_generation([self.id])
+
+    def get_cache_key(self, name):
+        """Return the key of the cache `name` scoped to the item and its ancestors."""
+        return f"item_{self.id!s}_{name:s}_{self.tree_generation:s}"
+
+    def get_version(self, with_ancestors=False):
+        """
+        Token changing whenever the item or its children change, or whenever the accesses,
+        link definitions or deletion state of the item or its ancestors change. Passing
+        `with_ancestors` also follows the changes of the ancestors and of their children.
+        """
+        versioned_ids = self.path if with_ancestors else [self.id]
+        return get_cache_tokens_digest(
+            [get_item_generation_cache_key(item_id) for item_id in self.path]
+            + [get_item_version_cache_key(item_id) for item_id in versioned_ids]
+        )
+
     def get_nb_accesses_cache_key(self):
-        """Generate a unique cache key for each item."""
-        return f"item_{self.id!s}_nb_accesses"
+        """Generate a cache key for the number of accesses, following the item's tree."""
+        return self.get_cache_key("nb_accesses")
 
     def manage_unique_title(self, title):
         """Manage the unique title in the same path."""
@@ -1128,14 +1670,9 @@ class Item(TreeModel, BaseModel):
             return nb_accesses
 
     @property
-    def numchild(self):
-        """Return the number of non-deleted children from annotation."""
-        return self._numchild  # pylint: disable=no-member
-
-    @property
-    def numchild_folder(self):
-        """Calculate the number of non-deleted folder children from annotation."""
-        return self._numchild_folder  # pylint: disable=no-member
+    def is_alive(self):
+        """Return True if neither the item nor any of its ancestors is deleted."""
+        return self.deleted_at is None and self.ancestors_deleted_at is None
 
     @property
     def is_root(self):
@@ -1146,13 +1683,28 @@ class Item(TreeModel, BaseModel):
         """Return the root of the tree."""
         return self.ancestors().filter(path__depth=1).first()
 
-    def invalidate_nb_accesses_cache(self):
+    def invalidate_accessible_items_cache(self, accesses=True):
         """
-        Invalidate the cache for number of accesses, including on affected descendants.
+        Invalidate the items listable by the users having a link trace on the item or its
+        descendants, as their link reach may have changed. The users and teams having an
+        access on them are only concerned if their paths changed (`accesses`): the items
+        listed are filtered on their deletion when querying.
         """
-        for item in self._meta.model.objects.filter(path__descendants=self.path).only("id"):
-            cache_key = item.get_nb_accesses_cache_key()
-            cache.delete(cache_key)
+        user_ids = set(
+            LinkTrace.objects.filter(item__path__descendants=self.path)
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+        teams = set()
+        if accesses:
+            for user_id, team in (
+                ItemAccess.objects.filter(item__path__descendants=self.path)
+                .values_list("user_id", "team")
+                .distinct()
+            ):
+                user_ids.add(user_id)
+                teams.add(team)
+        invalidate_accessible_items_cache(user_ids=user_ids, teams=teams)
 
     def get_role(self, user):
         """Return the role a user has on an item."""
@@ -1162,9 +1714,9 @@ class Item(TreeModel, BaseModel):
         try:
             roles = self.user_roles or []
         except AttributeError:
-            roles = ItemAccess.objects.filter(
+            roles = ItemEffectiveAccess.objects.filter(
                 models.Q(user=user) | models.Q(team__in=user.teams),
-                item__path__ancestors=self.path,
+                item_id=self.pk,
             ).values_list("role", flat=True)
 
         return RoleChoices.max(*roles)
@@ -1290,8 +1842,10 @@ class Item(TreeModel, BaseModel):
         can_duplicate = (
             can_get
             and user.is_authenticated
-            and self.type == ItemTypeChoices.FILE
-            and self.upload_state == ItemUploadStateChoices.READY
+            and (
+                self.type == ItemTypeChoices.FOLDER
+                or self.upload_state == ItemUploadStateChoices.READY
+            )
         )
         can_export = can_get and self.type == ItemTypeChoices.FOLDER
         can_convert = (
@@ -1393,10 +1947,14 @@ class Item(TreeModel, BaseModel):
         self.send_email(subject, [email], context, language)
 
     @transaction.atomic
-    def soft_delete(self):
+    def soft_delete(self, in_background=False):
         """
         Soft delete the item, marking the deletion on descendants.
         We still keep the .delete() method untouched for programmatic purposes.
+
+        In background mode, only the item itself is marked here and the deletion is marked
+        on its descendants by batches in a background task, which is returned for the
+        caller to dispatch it. Meanwhile, the descendants are hidden from the API.
         """
         if self.deleted_at or self.ancestors_deleted_at:
             raise RuntimeError("This item is already deleted or has deleted ancestors.")
@@ -1407,15 +1965,39 @@ class Item(TreeModel, BaseModel):
                 "Cannot delete this item because one or more ancestors are already deleted."
             )
 
+        self.check_no_background_task()
+
         self.ancestors_deleted_at = self.deleted_at = timezone.now()
+        # Children of a deleted item are not counted anymore
+        self.numchild = self.numchild_folder = 0
+
+        self.save(
+            update_fields=["deleted_at", "ancestors_deleted_at", "numchild", "numchild_folder"],
+            change_kind=ItemChangeKindChoices.DELETED,
+        )
 
-        self.save(update_fields=["deleted_at", "ancestors_deleted_at"])
+        if self.depth > 1:
+            self._meta.model.objects.increment_numchild(self.path[:-1], self, -1)
 
         # Mark all descendants as soft deleted
+        background_task = None
         if self.type == ItemTypeChoices.FOLDER:
-            self.descendants().filter(ancestors_deleted_at__isnull=True).update(
-                ancestors_deleted_at=self.ancestors_deleted_at,
-            )
+            if in_background:
+                background_task = ItemBackgroundTask.objects.create(
+                    item=self,
+                    kind=ItemBackgroundTaskKindChoices.SOFT_DELETE,
+                    deleted_at=self.deleted_at,
+                )
+            else:
+                self.descendants().filter(ancestors_deleted_at__isnull=True).update(
+                    ancestors_deleted_at=self.ancestors_deleted_at,
+                    numchild=0,
+                    numchild_folder=0,
+                )
+
+        self.bump_generation()
+
+        return background_task
 
     def hard_delete(self):
         """
@@ -1443,14 +2025,21 @@ class Item(TreeModel, BaseModel):
             )
 
         self.hard_deleted_at = timezone.now()
-        self.save(update_fields=["hard_deleted_at"])
+        # Clients were already notified of the deletion when the item was soft deleted
+        self.save(update_fields=["hard_deleted_at"], change_kind=None)
 
         # Mark all descendants as hard deleted
         self.descendants().update(hard_deleted_at=self.hard_deleted_at)
 
     @transaction.atomic
-    def restore(self):
-        """Cancelling a soft delete with checks."""
+    def restore(self, in_background=False):
+        """
+        Cancelling a soft delete with checks.
+
+        In background mode, only the item itself is restored here and its descendants are
+        restored by batches in a background task, which is returned for the caller to
+        dispatch it. Meanwhile, the descendants remain deleted.
+        """
         # This should not happen
         if self.deleted_at is None:
             raise ValidationError(
@@ -1478,6 +2067,8 @@ class Item(TreeModel, BaseModel):
                 }
             )
 
+        self.check_no_background_task()
+
         # save the current deleted_at value to exclude it from the descendants update
         current_deleted_at = self.deleted_at
         has_ancestors_deleted = False
@@ -1494,17 +2085,85 @@ class Item(TreeModel, BaseModel):
         self.deleted_at = None
         self.ancestors_deleted_at = None
 
-        self.save(update_fields=["deleted_at", "ancestors_deleted_at"])
+        self.save(
+            update_fields=["deleted_at", "ancestors_deleted_at"],
+            change_kind=ItemChangeKindChoices.RESTORED,
+        )
+
+        # Count again the children of the folders that are alive again
+        if self.depth > 1:
+            self._meta.model.objects.increment_numchild(self.path[:-1], self, 1)
+
+        background_task = None
+        if in_background and self.type == ItemTypeChoices.FOLDER:
+            background_task = ItemBackgroundTask.objects.create(
+                item=self,
+                kind=ItemBackgroundTaskKindChoices.RESTORE,
+                deleted_at=current_deleted_at,
+            )
+        else:
+            self.descendants().exclude(
+                models.Q(deleted_at__isnull=False)
+                | models.Q(ancestors_deleted_at__lt=current_deleted_at)
+            ).update(ancestors_deleted_at=None)
+
+            if self.type == ItemTypeChoices.FOLDER:
+                self._meta.model.objects.filter(
+                    path__descendants=self.path,
+                    type=ItemTypeChoices.FOLDER,
+                    ancestors_deleted_at__isnull=True,
+                ).refresh_numchild()
+                self.refresh_from_db(fields=["numchild", "numchild_folder"])
+
+        self.bump_generation()
+        self.invalidate_accessible_items_cache(accesses=False)
+
+        return background_task
 
-        self.descendants().exclude(
-            models.Q(deleted_at__isnull=False)
-            | models.Q(ancestors_deleted_at__lt=current_deleted_at)
-        ).update(ancestors_deleted_at=None)
+    def has_large_subtree(self):
+        """
+        Return True if the item has enough descendants for the operations on its subtree
+        to be run as background tasks.
+        """
+        threshold = settings.ITEM_BACKGROUND_TASK_THRESHOLD
+        return (
+            self.type == ItemTypeChoices.FOLDER
+            and self.descendants()[:threshold].count() >= threshold
+        )
+
+    def check_no_background_task(self):
+        """
+        Raise a validation error if a background task is rewriting a subtree containing the
+        item or contained in its subtree. Until the task completes, the descendants of the
+        item it runs on may still be found at their former path which contains its id.
+        """
+        if ItemBackgroundTask.objects.filter(
+            models.Q(item_id__in=list(self.path))
+            | models.Q(item__path__descendants=self.path)
+            | models.Q(previous_path__descendants=self.path)
+            # The files of a duplicated folder are copied from where they were found
+            | models.Q(
+                kind=ItemBackgroundTaskKindChoices.DUPLICATE, previous_path__ancestors=self.path
+            ),
+            status__in=ItemBackgroundTask.LOCKING_STATUSES,
+        ).exists():
+            raise ValidationError(
+                {
+                    "path": ValidationError(
+                        _("An operation is already in progress on this item's tree."),
+                        code="item_background_task_in_progress",
+                    )
+                }
+            )
 
     @transaction.atomic
-    def move(self, target):
+    def move(self, target, in_background=False):
         """
         Move an item to a new position in the tree.
+
+        In background mode, only the item itself is moved here and the paths of its
+        descendants are rewritten by batches in a background task, which is returned for
+        the caller to dispatch it.
         """
         if target and target.type != ItemTypeChoices.FOLDER:
             raise ValidationError(
@@ -1516,19 +2175,46 @@ class Item(TreeModel, BaseModel):
                 }
             )
 
+        self.check_no_background_task()
+
         old_path = self.path
         if target:
             self.path = f"{target.path!s}.{self.id!s}"
         else:
             self.path = str(self.id)
 
-        self.save(update_fields=["path"])
+        self.save(
+            update_fields=["path", "parent_id"],
+            change_kind=ItemChangeKindChoices.MOVED,
+            previous_path=old_path,
+        )
+
+        # Deleted items are not counted by their parent
+        if self.is_alive:
+            if len(old_path) > 1:
+                self._meta.model.objects.increment_numchild(old_path[:-1], self, -1)
+            if target:
+                self._meta.model.objects.increment_numchild(target.path, self, 1)
 
+        background_task = None
         if self.type == ItemTypeChoices.FOLDER:
-            # https://patshaughnessy.net/2017/12/14/manipulating-trees-using-sql-and-the-postgres-ltree-extension
-            self._meta.model.objects.filter(path__descendants=old_path).update(
-                path=RawSQL("%s || subpath(path, nlevel(%s))", (str(self.path), str(old_path)))
-            )
+            if in_background:
+                background_task = ItemBackgroundTask.objects.create(
+                    item=self, kind=ItemBackgroundTaskKindChoices.MOVE, previous_path=old_path
+                )
+            else:
+                self._meta.model.objects.filter(path__descendants=old_path).move_under(
+                    old_path, self.path
+                )
+
+        # Inherited roles depend on the new ancestors. In background mode, the descendants
+        # left under the former path are hidden until the task rebuilds their roles.
+        ItemEffectiveAccess.objects.rebuild(self.path)
+        self.invalidate_accessible_items_cache()
+        # The item left the children of its former parent
+        bump_items_version(old_path[-2:-1])
+
+        return background_task
 
 
 class MirrorItemTask(BaseModel):
@@ -1556,6 +2242,295 @@ class MirrorItemTask(BaseModel):
         return f"Mirror task for item {self.item!s} with status {self.status!s}"
 
 
+class ItemBackgroundTask(BaseModel):
+    """
+    Operation on a large subtree run by batches in a background task, recording its
+    progress so that it can be followed by clients and resumed if it was interrupted.
+    """
+
+    LOCKING_STATUSES = (
+        ItemBackgroundTaskStatusChoices.PENDING,
+        ItemBackgroundTaskStatusChoices.PROCESSING,
+        ItemBackgroundTaskStatusChoices.FAILED,
+    )
+
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="background_tasks",
+    )
+    kind = models.CharField(max_length=20, choices=ItemBackgroundTaskKindChoices.choices)
+    status = models.CharField(
+        max_length=25,
+        choices=ItemBackgroundTaskStatusChoices.choices,
+        default=ItemBackgroundTaskStatusChoices.PENDING,
+    )
+    previous_path = PathField(
+        null=True,
+        blank=True,
+        help_text=_("Path of the item before it was moved, or of the folder duplicated."),
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_("Deletion date marked on the descendants or removed from them."),
+    )
+    processed = models.PositiveIntegerField(
+        default=0,
+        help_text=_("Number of descendants processed so far."),
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        help_text=_("Number of descendants to process, estimated when the task started."),
+    )
+    error_details = models.TextField(null=True, blank=True)
+
+    class Meta:
+        db_table = "drive_item_background_task"
+        verbose_name = _("Item background task")
+        verbose_name_plural = _("Item background tasks")
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"{self.kind:s} task on item {self.item_id!s} with status {self.status:s}"
+
+    def process(self):
+        """
+        Run the operation by batches, each in its own transaction. Batches only select the
+        items that remain to be processed so that running the task again resumes it.
+        """
+        self.status = ItemBackgroundTaskStatusChoices.PROCESSING
+        self.save(update_fields=["status", "updated_at"])
+
+        try:
+            getattr(self, f"_process_{self.kind:s}")()
+        except Exception as exc:
+            self.status = ItemBackgroundTaskStatusChoices.FAILED
+            self.error_details = str(exc)
+            self.save(update_fields=["status", "error_details", "updated_at"])
+            raise
+
+        # The files of a duplicated folder are copied by other tasks, the last of which
+        # completes the task
+        if self.get_duplicating_items().exists():
+            return
+
+        self.status = ItemBackgroundTaskStatusChoices.COMPLETED
+        self.error_details = None
+        self.save(update_fields=["status", "error_details", "updated_at"])
+
+    def complete_duplicate(self):
+        """Complete the duplication of a folder once none of its files is being copied."""
+        if self.get_duplicating_items().exists():
+            return False
+
+        return bool(
+            ItemBackgroundTask.objects.filter(
+                pk=self.pk, status=ItemBackgroundTaskStatusChoices.PROCESSING
+            ).update(
+                status=ItemBackgroundTaskStatusChoices.COMPLETED,
+                error_details=None,
+                updated_at=timezone.now(),
+            )
+        )
+
+    def get_duplicating_items(self):
+        """Return the files of the copy of a duplicated folder still waiting to be copied."""
+        if self.kind != ItemBackgroundTaskKindChoices.DUPLICATE:
+            return Item.objects.none()
+
+        return Item.objects.filter(
+            path__descendants=self.item.path,
+            upload_state=ItemUploadStateChoices.DUPLICATING,
+        )
+
+    def get_duplicate_id(self, item_id):
+        """
+        Id of the copy of an item of a duplicated folder, derived from the id of the task
+        and of the item so that cloning again after an interruption skips existing copies.
+        """
+        return uuid.uuid5(self.id, str(item_id))
+
+    def _process_batches(self, queryset, process_batch):
+        """Call `process_batch` on the ids of the queryset by batches until none is left."""
+        batch_size = settings.ITEM_BACKGROUND_TASK_BATCH_SIZE
+        if not self.total:
+            self.total = queryset.count()
+            self.save(update_fields=["total", "updated_at"])
+
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.values_list("id", flat=True)[:batch_size])
+                if not ids:
+                    return
+                # Filtering again skips the rows processed concurrently by another run
+                process_batch(queryset.filter(id__in=ids))
+                ItemBackgroundTask.objects.filter(pk=self.pk).update(
+                    processed=models.F("processed") + len(ids), updated_at=timezone.now()
+                )
+
+    def _process_move(self):
+        """
+        Rewrite the paths of the descendants still found under the former path of the item
+        and their roles, batch by batch. Until then, they are hidden from the users as they
+        keep their former ancestors' roles and links.
+        """
+        item = Item.objects.get(pk=self.item_id)
+
+        def move_batch(batch):
+            item_ids = list(batch.values_list("id", flat=True))
+            batch.move_under(self.previous_path, item.path)
+            ItemEffectiveAccess.objects.rebuild_items(item_ids)
+
+        self._process_batches(Item.objects.filter(path__descendants=self.previous_path), move_batch)
+
+        item.bump_generation()
+        item.invalidate_accessible_items_cache()
+
+    def _process_soft_delete(self):
+        """Mark the deletion on the descendants that are not marked yet."""
+        item = Item.objects.get(pk=self.item_id)
+        self._process_batches(
+            item.descendants().filter(ancestors_deleted_at__isnull=True),
+            lambda batch: batch.update(
+                ancestors_deleted_at=self.deleted_at, numchild=0, numchild_folder=0
+            ),
+        )
+
+        item.bump_generation()
+
+    def _process_restore(self):
+        """
+        Remove the deletion from the descendants that were deleted with the item, then count
+        again the children of the folders that are alive again.
+        """
+        item = Item.objects.get(pk=self.item_id)
+        self._process_batches(
+            item.descendants().filter(
+                deleted_at__isnull=True, ancestors_deleted_at__gte=self.deleted_at
+            ),
+            lambda batch: batch.update(ancestors_deleted_at=None),
+        )
+
+        self._refresh_numchild(item)
+
+        item.bump_generation()
+        item.invalidate_accessible_items_cache(accesses=False)
+
+    def _process_duplicate(self):
+        """
+        Clone the alive descendants of the duplicated folder under the copy of the folder,
+        level by level so that folders are cloned before their children. Files stored in
+        blobs are ready at once, the other ones wait for their file to be copied.
+        """
+        item = Item.objects.get(pk=self.item_id)
+        source_depth = len(self.previous_path)
+        descendants = (
+            Item.objects.filter(
+                path__descendants=self.previous_path,
+                deleted_at__isnull=True,
+                ancestors_deleted_at__isnull=True,
+            )
+            .exclude(id=self.previous_path[-1])
+            # Files that are not ready (pending, suspicious...) are not duplicated
+            .filter(
+                models.Q(type=ItemTypeChoices.FOLDER)
+                | models.Q(upload_state=ItemUploadStateChoices.READY)
+            )
+            .annotate(level=NLevel("path"))
+        )
+        batch_size = settings.ITEM_BACKGROUND_TASK_BATCH_SIZE
+
+        self.total = descendants.count()
+        self.processed = 0
+        self.save(update_fields=["total", "processed", "updated_at"])
+
+        max_level = descendants.aggregate(max_level=models.Max("level"))["max_level"] or 0
+        for level in range(source_depth + 1, max_level + 1):
+            level_items = descendants.filter(level=level).order_by("pk")
+            last_pk = None
+            while True:
+                batch_qs = level_items.filter(pk__gt=last_pk) if last_pk else level_items
+                batch = list(batch_qs[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                with transaction.atomic():
+                    clones = [self._clone(item, source_depth, source) for source in batch]
+                    # Copies created by a former run are left untouched and not logged again
+                    existing_ids = set(
+                        Item.objects.filter(id__in=[clone.id for clone in clones]).values_list(
+                            "id", flat=True
+                        )
+                    )
+                    created = [clone for clone in clones if clone.id not in existing_ids]
+                    Item.objects.bulk_create(created, ignore_conflicts=True)
+                    ItemChange.objects.log(created, ItemChangeKindChoices.CREATED)
+                    done = (
+                        Item.objects.filter(id__in=[clone.id for clone in clones])
+                        .exclude(upload_state=ItemUploadStateChoices.DUPLICATING)
+                        .count()
+                    )
+                    ItemBackgroundTask.objects.filter(pk=self.pk).update(
+                        processed=models.F("processed") + done, updated_at=timezone.now()
+                    )
+                bump_items_version({clone.parent_id for clone in clones})
+
+        # Children that were not duplicated are not counted
+        self._refresh_numchild(item)
+        ItemEffectiveAccess.objects.rebuild(item.path)
+        item.bump_generation()
+
+    def _clone(self, item, source_depth, source):
+        """Build the copy of a descendant of the duplicated folder under its copy."""
+        relative_ids = [self.get_duplicate_id(item_id) for item_id in source.path[source_depth:]]
+        path = ".".join([str(item.path), *(str(item_id) for item_id in relative_ids)])
+        is_file = source.type == ItemTypeChoices.FILE
+        return Item(
+            id=relative_ids[-1],
+            path=path,
+            parent_id=relative_ids[-2] if len(relative_ids) > 1 else item.id,
+            title=source.title,
+            type=source.type,
+            creator_id=item.creator_id,
+            filename=source.filename,
+            mimetype=source.mimetype,
+            size=source.size,
+            description=source.description,
+            # Duplicating a file stored in a blob only references the blob
+            blob_id=source.blob_id,
+            upload_state=(
+                (
+                    ItemUploadStateChoices.READY
+                    if source.blob_id
+                    else ItemUploadStateChoices.DUPLICATING
+                )
+                if is_file
+                else None
+            ),
+            numchild=source.numchild,
+            numchild_folder=source.numchild_folder,
+        )
+
+    def _refresh_numchild(self, item):
+        """Count again the children of the alive folders of the subtree of an item."""
+        folders = Item.objects.filter(
+            path__descendants=item.path,
+            type=ItemTypeChoices.FOLDER,
+            ancestors_deleted_at__isnull=True,
+        ).order_by("pk")
+        batch_size = settings.ITEM_BACKGROUND_TASK_BATCH_SIZE
+        last_pk = None
+        while True:
+            batch = folders.filter(pk__gt=last_pk) if last_pk else folders
+            ids = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            Item.objects.filter(pk__in=ids).refresh_numchild()
+            last_pk = ids[-1]
+
+
 class LinkTrace(BaseModel):
     """
     Relation model to trace accesses to an item via a link by a logged-in user.
@@ -1585,6 +2560,11 @@ class LinkTrace(BaseModel):
     def __str__(self):
         return f"{self.user!s} trace on item {self.item!s}"
 
+    def save(self, *args, **kwargs):
+        """Override save to invalidate the items listable by the user."""
+        super().save(*args, **kwargs)
+        invalidate_accessible_items_cache(user_ids=[self.user_id])
+
 
 class ItemFavorite(BaseModel):
     """Relation model to store a user's favorite items."""
@@ -1618,7 +2598,7 @@ class ItemFavorite(BaseModel):
 class ItemAccessQuerySet(AnnotateUserRoleQuerySetMixin, models.QuerySet):
     """Custom queryset for ItemAccess model with additional methods."""
 
-    path_property = "item__path"
+    item_id_property = "item_id"
 
 
 class ItemAccessManager(models.Manager.from_queryset(ItemAccessQuerySet)):
@@ -1674,14 +2654,28 @@ class ItemAccess(BaseModel):
         return f"{self.user!s} is {self.role:s} in item {self.item!s}"
 
     def save(self, *args, **kwargs):
-        """Override save to clear the item's cache for number of accesses."""
+        """
+        Override save to bump the item's generation and refresh the effective roles
+        of the principal on the item's subtree.
+        """
         super().save(*args, **kwargs)
-        self.item.invalidate_nb_accesses_cache()
+        self.item.bump_generation()
+        bump_items_version(self.item.path[-2:-1])
+        ItemChange.objects.log([self.item], ItemChangeKindChoices.ACCESSES)
+        ItemEffectiveAccess.objects.rebuild(self.item.path, user_id=self.user_id, team=self.team)
+        invalidate_accessible_items_cache(user_ids=[self.user_id], teams=[self.team])
 
     def delete(self, *args, **kwargs):
-        """Override delete to clear the item's cache for number of accesses."""
+        """
+        Override delete to bump the item's generation and refresh the effective roles
+        of the principal on the item's subtree.
+        """
         super().delete(*args, **kwargs)
-        self.item.invalidate_nb_accesses_cache()
+        self.item.bump_generation()
+        bump_items_version(self.item.path[-2:-1])
+        ItemChange.objects.log([self.item], ItemChangeKindChoices.ACCESSES)
+        ItemEffectiveAccess.objects.rebuild(self.item.path, user_id=self.user_id, team=self.team)
+        invalidate_accessible_items_cache(user_ids=[self.user_id], teams=[self.team])
 
     @property
     def target_key(self):
@@ -1752,9 +2746,9 @@ class ItemAccess(BaseModel):
         try:
             roles = self.user_roles or []
         except AttributeError:
-            roles = ItemAccess.objects.filter(
+            roles = ItemEffectiveAccess.objects.filter(
                 models.Q(user=user) | models.Q(team__in=user.teams),
-                item__path__ancestors=self.item.path,
+                item_id=self.item_id,
             ).values_list("role", flat=True)
 
         return RoleChoices.max(*roles)
@@ -1806,10 +2800,268 @@ class ItemAccess(BaseModel):
         }
 
 
+class ItemEffectiveAccessManager(models.Manager):
+    """
+    Maintain the materialized effective roles.
+
+    Rows are recomputed with set based SQL statements: each item of the impacted
+    subtree gets, for each principal, the highest role among the accesses defined
+    on the item itself or on any of its ancestors.
+    """
+
+    @staticmethod
+    def _get_roles_by_priority():
+        """Return the roles sorted from the lowest to the highest priority."""
+        return sorted(RoleChoices.values, key=RoleChoices.get_priority)
+
+    def rebuild(self, path=None, user_id=None, team=None):
+        """
+        Recompute the effective roles of the subtree rooted at `path` (all items if
+        no path is given), optionally restricted to one user or one team.
+
+        Rebuilds of the same subtree are serialized by a transaction level advisory lock so
+        that each one sees the accesses committed by the previous one. Rebuilds of
+        overlapping subtrees may still run concurrently: rows inserted by one of them are
+        updated by the other instead of violating the unique constraints.
+        """
+        table = self.model._meta.db_table  # noqa: SLF001
+        delete_conditions = []
+        delete_params = []
+        insert_conditions = []
+        insert_params = []
+
+        if path is not None:
+            delete_conditions.append(
+                "e.item_id IN (SELECT id FROM drive_item WHERE path <@ %s::ltree)"
+            )
+            delete_params.append(str(path))
+            # Only accesses defined on the ancestors of the subtree root or inside
+            # the subtree can contribute to the roles of its items.
+            insert_conditions.append(
+                "i.path <@ %s::ltree AND (ai.path @> %s::ltree OR ai.path <@ %s::ltree)"
+            )
+            insert_params.extend([str(path)] * 3)
+
+        if user_id is not None:
+            delete_conditions.append("e.user_id = %s")
+            delete_params.append(user_id)
+            insert_conditions.append("a.user_id = %s")
+            insert_params.append(user_id)
+        elif team:
+            delete_conditions.append("e.team = %s")
+            delete_params.append(team)
+            insert_conditions.append("a.team = %s")
+            insert_params.append(team)
+
+        delete_where = " AND ".join(delete_conditions) or "TRUE"
+        insert_where = " AND ".join(insert_conditions) or "TRUE"
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                [f"{table:s}:{path or ''!s}"],
+            )
+            cursor.execute(
+                f"DELETE FROM {table} e WHERE {delete_where}",  # noqa: S608
+                delete_params,
+            )
+            self._insert_roles(
+                cursor,
+                f"""
+                FROM drive_item_access a
+                JOIN drive_item ai ON ai.id = a.item_id
+                JOIN drive_item i ON i.path <@ ai.path
+                WHERE {insert_where}
+                """,
+                insert_params,
+            )
+
+    def rebuild_items(self, item_ids):
+        """
+        Recompute the effective roles of the given items. Their ancestors are the items whose
+        ids are in their path, so that the roles are right even if some of the ancestors are
+        still found at a former path, e.g. while a folder is moved by batches.
+        """
+        table = self.model._meta.db_table  # noqa: SLF001
+        item_ids = list(item_ids)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE item_id = ANY(%s::uuid[])",  # noqa: S608
+                [item_ids],
+            )
+            self._insert_roles(
+                cursor,
+                """
+                FROM drive_item i
+                JOIN drive_item_access a
+                    ON a.item_id = ANY(string_to_array(ltree2text(i.path), '.')::uuid[])
+                WHERE i.id = ANY(%s::uuid[])
+                """,
+                [item_ids],
+            )
+
+    def _insert_roles(self, cursor, from_where, params):
+        """
+        Insert the highest role of each principal on each item selected by the FROM and
+        WHERE clauses, which join the items `i` with the accesses `a` given on their
+        ancestors. Rows inserted concurrently are updated.
+        """
+        table = self.model._meta.db_table  # noqa: SLF001
+        roles = self._get_roles_by_priority()
+        # One statement per kind of principal, each matching one of the partial unique
+        # constraints
+        for principal_where, conflict_target in (
+            ("a.user_id IS NOT NULL", "(user_id, item_id) WHERE user_id IS NOT NULL"),
+            ("a.team > ''", "(team, item_id) WHERE team > ''"),
+        ):
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (item_id, user_id, team, role)
+                SELECT i.id, a.user_id, a.team,
+                    (%s::varchar[])[MAX(array_position(%s::varchar[], a.role::varchar))]
+                {from_where} AND {principal_where}
+                GROUP BY i.id, a.user_id, a.team
+                ON CONFLICT {conflict_target} DO UPDATE SET role = EXCLUDED.role
+                """,
+                [roles, roles, *params],
+            )
+
+    def inherit_from_parent(self, item):
+        """Copy the effective roles of the parent on a newly created item."""
+        table = self.model._meta.db_table  # noqa: SLF001
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (item_id, user_id, team, role)
+                SELECT %s, user_id, team, role FROM {table} WHERE item_id = %s
+                """,  # noqa: S608
+                [item.pk, str(item.path[-2])],
+            )
+
+    def inherit_from_parents(self, items):
+        """
+        Copy the effective roles of their parent on many newly created items, with one
+        statement per level so that new folders get their roles before their children.
+        """
+        table = self.model._meta.db_table  # noqa: SLF001
+        items_by_depth = {}
+        for item in items:
+            items_by_depth.setdefault(str(item.path).count("."), []).append(item.pk)
+
+        with connection.cursor() as cursor:
+            for depth in sorted(items_by_depth):
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (item_id, user_id, team, role)
+                    SELECT i.id, e.user_id, e.team, e.role
+                    FROM drive_item i JOIN {table} e ON e.item_id = i.parent_id
+                    WHERE i.id = ANY(%s)
+                    """,  # noqa: S608
+                    [items_by_depth[depth]],
+                )
+
+
+class ItemEffectiveAccess(models.Model):
+    """
+    Materialized role of a user or a team on an item, combining the accesses given
+    on the item and on all its ancestors. This table is derived from ItemAccess and
+    must never be written directly.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="effective_accesses",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    team = models.CharField(max_length=100, blank=True)
+    role = models.CharField(max_length=20, choices=RoleChoices.choices)
+
+    objects = ItemEffectiveAccessManager()
+
+    class Meta:
+        db_table = "drive_item_effective_access"
+        verbose_name = _("Item effective access")
+        verbose_name_plural = _("Item effective accesses")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "item"],
+                condition=models.Q(user__isnull=False),
+                name="unique_effective_access_item_user",
+            ),
+            models.UniqueConstraint(
+                fields=["team", "item"],
+                condition=models.Q(team__gt=""),
+                name="unique_effective_access_item_team",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user or self.team!s} is {self.role:s} in item {self.item_id!s}"
+
+
+class ItemChangeManager(models.Manager):
+    """Append entries to the change log of the items."""
+
+    def log(self, items, kind, previous_path=None):
+        """Record a change of the given kind on each of the items, at their current path."""
+        return self.bulk_create(
+            [
+                self.model(item_id=item.pk, path=item.path, previous_path=previous_path, kind=kind)
+                for item in items
+            ]
+        )
+
+
+class ItemChange(models.Model):
+    """
+    Append-only log of the changes made on items, read by clients to synchronize a subtree
+    from a position in the log instead of listing it again.
+
+    The path of the item at the time of the change is stored so that changes can be scoped
+    to a subtree: it contains the ids of all the ancestors of the item, which remains true
+    even if an ancestor is moved later on. The item is not a foreign key so that the log
+    outlives the items. Changes are purged after ITEM_CHANGES_RETENTION_DAYS.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    item_id = models.UUIDField()
+    path = PathField()
+    previous_path = PathField(
+        null=True,
+        blank=True,
+        help_text=_("Path of the item before it was moved."),
+    )
+    kind = models.CharField(max_length=20, choices=ItemChangeKindChoices.choices)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = ItemChangeManager()
+
+    class Meta:
+        db_table = "drive_item_change"
+        verbose_name = _("Item change")
+        verbose_name_plural = _("Item changes")
+        ordering = ("id",)
+        indexes = [
+            GistIndex(fields=["path"], name="drive_item_change_path_idx"),
+            GistIndex(fields=["previous_path"], name="drive_item_change_prev_idx"),
+            models.Index(fields=["created_at"], name="drive_item_change_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Item {self.item_id!s} {self.kind:s}"
+
+
 class ItemInvitationQuerySet(AnnotateUserRoleQuerySetMixin, models.QuerySet):
     """Custom queryset for ItemInvitation model with additional methods."""
 
-    path_property = "item__path"
+    item_id_property = "item_id"
 
 
 class ItemInvitationManager(models.Manager.from_queryset(ItemInvitationQuerySet)):
@@ -1885,9 +3137,9 @@ class Invitation(BaseModel):
         try:
             roles = self.user_roles or []
         except AttributeError:
-            roles = ItemAccess.objects.filter(
+            roles = ItemEffectiveAccess.objects.filter(
                 models.Q(user=user) | models.Q(team__in=user.teams),
-                item__path__ancestors=self.item.path,
+                item_id=self.item_id,
             ).values_list("role", flat=True)
 
         return RoleChoices.max(*roles)
@@ -0,0 +1,85 @@
+"""Services storing the content of files once in object storage and deleting them."""
+
+import logging
+
+from django.db import models as db
+from django.db import transaction
+
+from core import models
+from core.services.storage_copy import copy_file
+from core.storage import get_storage_gateway
+
+logger = logging.getLogger(__name__)
+
+
+def store_file_as_blob(item):
+    """
+    Move the file uploaded for an item to the blob named after the SHA-256 digest of its
+    content. If a blob with the same content already exists, the uploaded file is dropped
+    and the item references the existing blob.
+    """
+    if item.blob_id:
+        return item.blob
+
+    upload_key = item.file_key
+    storage_gateway = get_storage_gateway()
+    sha256 = storage_gateway.get_sha256(upload_key)
+
+    with transaction.atomic():
+        # The lock prevents the blob from being deleted as unreferenced until the item
+        # references it
+        blob, created = models.Blob.objects.select_for_update().get_or_create(
+            sha256=sha256, defaults={"size": item.size}
+        )
+        if created:
+            copy_file(upload_key, blob.key)
+        item.blob = blob
+        item.save(update_fields=["blob", "updated_at"])
+
+    storage_gateway.delete(upload_key)
+
+    logger.info(
+        "File of item %s stored in %s blob %s", item.id, "new" if created else "existing", sha256
+    )
+    return blob
+
+
+def delete_unreferenced_blobs(blob_ids):
+    """
+    Delete the blobs that are not referenced by any item anymore, from object storage then
+    from database, and return the number of bytes reclaimed. Blobs are locked first so that
+    no item can start referencing them while they are deleted.
+    """
+    if not blob_ids:
+        return 0
+
+    with transaction.atomic():
+        locked_ids = list(
+            models.Blob.objects.select_for_update()
+            .filter(sha256__in=blob_ids)
+            .values_list("sha256", flat=True)
+        )
+        unreferenced = dict(
+            models.Blob.objects.filter(sha256__in=locked_ids)
+            .exclude(db.Exists(models.Item.objects.filter(blob_id=db.OuterRef("sha256"))))
+            .values_list("sha256", "size")
+        )
+        delete_files_from_storage([models.Blob.get_key(sha256) for sha256 in unreferenced])
+        models.Blob.objects.filter(sha256__in=unreferenced).delete()
+
+    return sum(unreferenced.values())
+
+
+def delete_files_from_storage(keys):
+    """
+    Delete files from the object storage with one DeleteObjects request by batch of 1000
+    keys. Keys of files that are already absent from the storage are not reported as errors.
+    """
+    if not keys:
+        return
+
+    if errors := get_storage_gateway().delete_many(keys):
+        raise RuntimeError(
+            f"Failed to delete {len(errors):d} files from storage, "
+            f"first error on {errors[0]['Key']:s}: {errors[0]['Message']:s}"
+        )
@@ -1,19 +1,19 @@
 """Service for exporting item folders as streaming ZIP archives."""
 
-from django.core.files.storage import default_storage
+from contextlib import closing
 
 from zipstream import ZipStream
 
 from core import models
+from core.storage import get_storage_gateway
 
 DEFAULT_STORAGE_READ_CHUNK_SIZE = 1024
 
 
 def iter_storage_chunks(file_key, chunk_size=DEFAULT_STORAGE_READ_CHUNK_SIZE):
     """Yield bytes from object storage without buffering the whole file."""
-    with default_storage.open(file_key, "rb") as fh:
-        while chunk := fh.read(chunk_size):
-            yield chunk
+    with closing(get_storage_gateway().open(file_key)) as body:
+        yield from body.iter_chunks(chunk_size)
 
 
 def export_descendants(folder):
@@ -0,0 +1,136 @@
+"""Service signing the requests that the reverse proxy sends to the object storage."""
+
+import functools
+import hashlib
+import hmac
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+from core.storage import get_storage_gateway
+
+ALGORITHM = "AWS4-HMAC-SHA256"
+SERVICE = "s3"
+# Hash of the empty body of the GET requests signed
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b"").hexdigest()
+# Refreshable credentials are renewed by botocore long before they expire, a copy can
+# safely be reused for this number of seconds
+CREDENTIALS_REFRESH_INTERVAL = 60
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+class S3RequestSigner:
+    """
+    Sign GET requests on the objects of a bucket with AWS Signature Version 4 headers.
+
+    Everything that does not depend on the object is computed once: the url of the bucket
+    as built by botocore, the credentials, frozen and refreshed every
+    CREDENTIALS_REFRESH_INTERVAL seconds, and the signing key of the day, so that signing
+    a request only costs two hashes and one HMAC.
+    """
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self._lock = threading.Lock()
+        self._bucket_url = None
+        self._credentials = None
+        self._credentials_expire_at = 0
+        self._region = None
+        self._signing_key = (None, None, None)
+
+    @property
+    def bucket_url(self):
+        """
+        Host and path of the bucket, from the url botocore builds for an object so
+        that the addressing style configured is followed.
+        """
+        if self._bucket_url is None:
+            url = self.gateway.presign("get_object", "key", 0, for_client=False)
+            parts = urlsplit(url)
+            default_port = {"http": 80, "https": 443}.get(parts.scheme)
+            host = parts.hostname if parts.port == default_port else parts.netloc
+            self._bucket_url = (host, parts.path.removesuffix("key"))
+        return self._bucket_url
+
+    def get_credentials(self):
+        """Return the frozen credentials of the storage, refreshed when they are too old."""
+        now = time.monotonic()
+        if self._credentials is None or now >= self._credentials_expire_at:
+            with self._lock:
+                if self._credentials is None or now >= self._credentials_expire_at:
+                    self._credentials, self._region = self.gateway.get_credentials()
+                    self._credentials_expire_at = now + CREDENTIALS_REFRESH_INTERVAL
+        return self._credentials
+
+    def get_signing_key(self, credentials, date):
+        """Return the key signing the requests of a day, derived once per day."""
+        secret_key, key_date, signing_key = self._signing_key
+        if secret_key != credentials.secret_key or key_date != date:
+            signing_key = _hmac(f"AWS4{credentials.secret_key:s}".encode("utf-8"), date)
+            for message in (self._region, SERVICE, "aws4_request"):
+                signing_key = _hmac(signing_key, message)
+            self._signing_key = (credentials.secret_key, date, signing_key)
+        return signing_key
+
+    def sign(self, key):
+        """Return the headers authorizing a GET request on an object of the bucket."""
+        credentials = self.get_credentials()
+        host, bucket_path = self.bucket_url
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        date = timestamp[:8]
+        scope = f"{date:s}/{self._region:s}/{SERVICE:s}/aws4_request"
+
+        headers = {
+            "host": host,
+            "x-amz-content-sha256": EMPTY_PAYLOAD_HASH,
+            "x-amz-date": timestamp,
+        }
+        if credentials.token:
+            headers["x-amz-security-token"] = credentials.token
+        signed_headers = ";".join(headers)
+        canonical_request = "\n".join(
+            [
+                "GET",
+                bucket_path + quote(key, safe="/~"),
+                "",
+                *(f"{name:s}:{value:s}" for name, value in headers.items()),
+                "",
+                signed_headers,
+                EMPTY_PAYLOAD_HASH,
+            ]
+        )
+        string_to_sign = "\n".join(
+            [
+                ALGORITHM,
+                timestamp,
+                scope,
+                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+            ]
+        )
+        signature = hmac.new(
+            self.get_signing_key(credentials, date),
+            string_to_sign.encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+
+        authorization_headers = {
+            "X-Amz-Date": timestamp,
+            "X-Amz-Content-SHA256": EMPTY_PAYLOAD_HASH,
+            "Authorization": (
+                f"{ALGORITHM:s} Credential={credentials.access_key:s}/{scope:s}, "
+                f"SignedHeaders={signed_headers:s}, Signature={signature:s}"
+            ),
+        }
+        if credentials.token:
+            authorization_headers["X-Amz-Security-Token"] = credentials.token
+        return authorization_headers
+
+
+@functools.cache
+def get_s3_request_signer():
+    """Get the signer of the requests on the objects of the storage gateway."""
+    return S3RequestSigner(get_storage_gateway())
@@ -3,18 +3,19 @@
 import logging
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from contextlib import closing
 from functools import cache
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
-from django.core.files.storage import default_storage
 from django.db.models import Subquery
 from django.utils.module_loading import import_string
 
 import requests
 
 from core import models
+from core.storage import get_storage_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -270,8 +271,8 @@ class SearchIndexer(BaseItemIndexer):
         mimetype = item.mimetype or ""
 
         if mimetype.startswith("text/"):
-            with default_storage.open(item.file_key, "rb") as fd:
-                return fd.read().decode()
+            with closing(get_storage_gateway().open(item.file_key)) as body:
+                return body.read().decode()
 
         raise SuspiciousFileOperation(f"Unrecognized mimetype {mimetype}")
 
@@ -0,0 +1,142 @@
+"""Service copying files inside the object storage, in parallel parts for large files."""
+
+import hashlib
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.cache import cache
+
+from botocore.exceptions import ClientError
+
+from core.api.utils import abort_multipart_upload
+from core.storage import get_storage_gateway
+
+logger = logging.getLogger(__name__)
+
+# Limits of multipart uploads on S3
+MAX_PARTS_COUNT = 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def _get_copy_state_key(target_key):
+    """Cache key of the multipart copy in progress to a target key."""
+    return f"storage_copy_{hashlib.sha256(target_key.encode()).hexdigest():s}"
+
+
+def _get_part_size(size):
+    """Size of the parts of a copy, large enough to copy the file in at most 10000 parts."""
+    return max(settings.STORAGE_COPY_PART_SIZE, MIN_PART_SIZE, math.ceil(size / MAX_PARTS_COUNT))
+
+
+def copy_file(source_key, target_key, on_progress=None):
+    """
+    Copy a file inside the object storage with its content type and metadata.
+
+    Files up to STORAGE_COPY_MULTIPART_THRESHOLD are copied with one CopyObject request.
+    Larger files, including those above the 5 GB that CopyObject allows, are copied by
+    parts with UploadPartCopy requests sent in parallel. The multipart upload is kept
+    if the copy fails so that copying again, e.g. when a task is retried, only copies the
+    parts that are missing, as long as the source file did not change meanwhile.
+
+    `on_progress` is called with the number of bytes copied so far and the size of the file
+    each time a part is copied.
+    """
+    storage_gateway = get_storage_gateway()
+
+    head = storage_gateway.head(source_key)
+    size = head["ContentLength"]
+
+    if size <= settings.STORAGE_COPY_MULTIPART_THRESHOLD:
+        storage_gateway.copy(source_key, target_key)
+        if on_progress:
+            on_progress(size, size)
+        return
+
+    state_key = _get_copy_state_key(target_key)
+    state = cache.get(state_key)
+    copied_parts = {}
+    if state and state["source_etag"] == head["ETag"]:
+        try:
+            copied_parts = {
+                part["PartNumber"]: part["ETag"]
+                for part in storage_gateway.list_parts(target_key, state["upload_id"])
+            }
+        except ClientError as error:
+            if error.response["Error"]["Code"] != "NoSuchUpload":
+                raise
+            state = None
+    elif state:
+        # Parts copied from a former version of the source can not be reused
+        abort_copy(target_key)
+        state = None
+
+    if not state:
+        state = {
+            "upload_id": storage_gateway.create_multipart_upload(
+                target_key, content_type=head["ContentType"], metadata=head["Metadata"]
+            ),
+            "source_etag": head["ETag"],
+            "part_size": _get_part_size(size),
+        }
+        cache.set(state_key, state, timeout=settings.STORAGE_COPY_RESUME_TIMEOUT)
+
+    part_size = state["part_size"]
+    ranges = {
+        part_number: (start, min(start + part_size, size) - 1)
+        for part_number, start in enumerate(range(0, size, part_size), start=1)
+    }
+    copied_size = sum(ranges[number][1] - ranges[number][0] + 1 for number in copied_parts)
+    if copied_parts:
+        logger.info(
+            "Resuming copy of %s to %s from part %d on %d",
+            source_key,
+            target_key,
+            len(copied_parts),
+            len(ranges),
+        )
+
+    def copy_part(part_number):
+        start, end = ranges[part_number]
+        # Fail rather than mix parts of two versions of the source
+        etag = storage_gateway.upload_part_copy(
+            source_key, target_key, state["upload_id"], part_number, start, end, head["ETag"]
+        )
+        return part_number, etag
+
+    with ThreadPoolExecutor(max_workers=settings.STORAGE_COPY_MAX_CONCURRENCY) as executor:
+        futures = [
+            executor.submit(copy_part, part_number)
+            for part_number in ranges
+            if part_number not in copied_parts
+        ]
+        for future in as_completed(futures):
+            part_number, etag = future.result()
+            copied_parts[part_number] = etag
+            copied_size += ranges[part_number][1] - ranges[part_number][0] + 1
+            if on_progress:
+                on_progress(copied_size, size)
+
+    storage_gateway.complete_multipart_upload(
+        target_key,
+        state["upload_id"],
+        [
+            {"PartNumber": part_number, "ETag": copied_parts[part_number]}
+            for part_number in sorted(copied_parts)
+        ],
+    )
+    cache.delete(state_key)
+
+
+def abort_copy(target_key):
+    """
+    Abort the multipart copy in progress to a target key, if any, so that the object storage
+    frees the parts copied so far.
+    """
+    state_key = _get_copy_state_key(target_key)
+    if not (state := cache.get(state_key)):
+        return
+
+    abort_multipart_upload(target_key, state["upload_id"])
+    cache.delete(state_key)
@@ -15,3 +15,11 @@ def get_storage_compute_backend():
     """
     backend = import_string(settings.STORAGE_COMPUTE_BACKEND)()
     return backend
+
+
+@functools.cache
+def get_storage_gateway():
+    """
+    Get the gateway to the object storage, shared by all the threads of the process.
+    """
+    return import_string(settings.STORAGE_GATEWAY_BACKEND)()
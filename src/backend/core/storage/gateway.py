@@ -0,0 +1,662 @@
+"""
+Gateway to the object storage: the operations the application runs on files, on one client
+shared by all threads, with metrics on the latency of each operation.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from io import BytesIO
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+import boto3
+import botocore
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of keys deleted by one DeleteObjects request
+DELETE_OBJECTS_MAX_KEYS = 1000
+# Minimum size of the parts of a multipart upload, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Size of the chunks in which files are read to be hashed
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _read(stream, size):
+    """Read `size` bytes from a stream, less only if it ends before."""
+    chunks = []
+    while size > 0 and (chunk := stream.read(size)):
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _get_put_result(response, size):
+    """Keep the ETag and the version id of the response to an upload."""
+    result = {"ETag": response["ETag"], "ContentLength": size}
+    if version_id := response.get("VersionId"):
+        result["VersionId"] = version_id
+    return result
+
+
+class StorageGatewayMetrics:
+    """
+    Count, errors and latency of the operations run on the object storage, per operation.
+    The metrics are logged and reset by the first operation recorded once `log_interval`
+    seconds elapsed, never if it is 0.
+    """
+
+    def __init__(self, log_interval=0):
+        self.log_interval = log_interval
+        self._lock = threading.Lock()
+        self._operations = {}
+        self._period_start = time.monotonic()
+
+    def record(self, operation, duration, failed=False):
+        """Record an operation that took `duration` seconds."""
+        operations = None
+        with self._lock:
+            metrics = self._operations.setdefault(
+                operation, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            metrics["count"] += 1
+            metrics["errors"] += int(failed)
+            metrics["total_seconds"] += duration
+            metrics["max_seconds"] = max(metrics["max_seconds"], duration)
+
+            now = time.monotonic()
+            if self.log_interval and now - self._period_start >= self.log_interval:
+                operations, self._operations = self._operations, {}
+                period, self._period_start = now - self._period_start, now
+
+        if operations:
+            self._log(operations, period)
+
+    @staticmethod
+    def _log(operations, period):
+        for operation, metrics in sorted(operations.items()):
+            logger.info(
+                "storage_gateway metrics over %ds: %s count=%d errors=%d avg=%.1fms max=%.1fms",
+                period,
+                operation,
+                metrics["count"],
+                metrics["errors"],
+                metrics["total_seconds"] * 1000 / metrics["count"],
+                metrics["max_seconds"] * 1000,
+            )
+
+    def snapshot(self):
+        """Return a copy of the metrics of each operation."""
+        with self._lock:
+            return {operation: dict(metrics) for operation, metrics in self._operations.items()}
+
+    def reset(self):
+        """Forget the operations recorded so far."""
+        with self._lock:
+            self._operations.clear()
+
+
+class StorageGateway(ABC):
+    """
+    Base class of the gateways to the object storage. Operations are measured with
+    `_measure` so that all the gateways report the same metrics.
+    """
+
+    def __init__(self):
+        self.metrics = StorageGatewayMetrics(
+            log_interval=settings.STORAGE_GATEWAY_METRICS_LOG_INTERVAL
+        )
+
+    @contextmanager
+    def _measure(self, operation, key):
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.metrics.record(operation, duration, failed=failed)
+            logger.debug(
+                "storage_gateway: %s %s in %.1fms%s",
+                operation,
+                key,
+                duration * 1000,
+                " (failed)" if failed else "",
+            )
+
+    @abstractmethod
+    def head(self, key):
+        """Return the size, content type, ETag and metadata of a file."""
+
+    @abstractmethod
+    def get_range(self, key, start=0, end=None):
+        """
+        Return the response to a GET request on a file, with its content as a stream in
+        "Body". Only the bytes from `start` to `end`, included, are fetched if a range is
+        given, the whole file otherwise. A negative `start` fetches the last `-start` bytes.
+        """
+
+    def open(self, key):
+        """Return the content of a file as a stream, read as it is consumed."""
+        return self.get_range(key)["Body"]
+
+    def get_sha256(self, key):
+        """Return the SHA-256 digest of the content of a file, read by chunks."""
+        digest = hashlib.sha256()
+        with closing(self.open(key)) as body:
+            for chunk in body.iter_chunks(READ_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @abstractmethod
+    def put_stream(self, key, stream, content_type=None, metadata=None):
+        """
+        Store the content read from a stream, by parts uploaded in parallel if it is larger
+        than the multipart threshold of the transfer configuration of the default storage.
+        The stream is read part by part and only the parts being uploaded are kept in
+        memory. Return the ETag, the version id if any and the size of the file stored.
+        """
+
+    @abstractmethod
+    def copy(self, source_key, target_key, content_type=None, metadata=None):
+        """
+        Copy a file with one request, keeping its content type and metadata unless new ones
+        are given. A file can be copied on itself to change them. Large files are copied
+        with `core.services.storage_copy.copy_file`.
+        """
+
+    @abstractmethod
+    def delete(self, key, version_id=None):
+        """Delete a file, or only one of its versions."""
+
+    @abstractmethod
+    def delete_many(self, keys):
+        """
+        Delete files by batches of 1000 and return the errors, files already absent from
+        the storage not being errors.
+        """
+
+    @abstractmethod
+    def list(self, prefix=""):
+        """Iterate over the files whose key starts with a prefix."""
+
+    @abstractmethod
+    def create_multipart_upload(self, key, content_type=None, metadata=None, acl=None):
+        """Create a multipart upload to a key and return its id."""
+
+    @abstractmethod
+    def list_parts(self, key, upload_id):
+        """Iterate over the parts received by a multipart upload, with their ETag and size."""
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    @abstractmethod
+    def upload_part_copy(  # noqa: PLR0913
+        self, source_key, key, upload_id, part_number, start, end, if_match
+    ):
+        """
+        Copy the bytes from `start` to `end`, included, of a file as a part of a multipart
+        upload and return the ETag of the part. The copy fails if the ETag of the source is
+        not `if_match`, so that parts of two versions of a file are never mixed.
+        """
+
+    @abstractmethod
+    def complete_multipart_upload(self, key, upload_id, parts):
+        """Assemble the parts, given by their number and ETag, of a multipart upload."""
+
+    @abstractmethod
+    def abort_multipart_upload(self, key, upload_id):
+        """Abort a multipart upload so that the object storage frees its parts."""
+
+    @abstractmethod
+    def presign(self, operation, key, expires_in, for_client=True, **params):
+        """
+        Return an url authorizing an operation on a file for `expires_in` seconds. Urls
+        for the frontend application are signed for the endpoint it reaches, which can
+        differ from the one of the backend (see AWS_S3_DOMAIN_REPLACE).
+        """
+
+    @abstractmethod
+    def get_credentials(self):
+        """Return the frozen credentials and the region signing the requests."""
+
+
+class S3StorageGateway(StorageGateway):
+    """
+    Gateway to a S3 compatible object storage. Boto3 clients are thread safe: one client,
+    with a connection pool large enough for the copies and uploads run in parallel, is
+    shared by all threads instead of one per thread. Throttled requests are retried with
+    the adaptive retry mode of botocore, which also slows down the following requests.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.bucket_name = default_storage.bucket_name
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def _get_client(self, endpoint_url):
+        if endpoint_url not in self._clients:
+            with self._lock:
+                if endpoint_url not in self._clients:
+                    self._clients[endpoint_url] = boto3.session.Session().client(
+                        "s3",
+                        aws_access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY,
+                        endpoint_url=endpoint_url,
+                        config=botocore.client.Config(
+                            region_name=settings.AWS_S3_REGION_NAME,
+                            signature_version=settings.AWS_S3_SIGNATURE_VERSION,
+                            max_pool_connections=settings.STORAGE_GATEWAY_MAX_POOL_CONNECTIONS,
+                            connect_timeout=settings.STORAGE_GATEWAY_CONNECT_TIMEOUT,
+                            read_timeout=settings.STORAGE_GATEWAY_READ_TIMEOUT,
+                            tcp_keepalive=True,
+                            retries={
+                                "mode": settings.STORAGE_GATEWAY_RETRY_MODE,
+                                "max_attempts": settings.STORAGE_GATEWAY_MAX_ATTEMPTS,
+                            },
+                        ),
+                    )
+        return self._clients[endpoint_url]
+
+    @property
+    def _client(self):
+        return self._get_client(settings.AWS_S3_ENDPOINT_URL)
+
+    @property
+    def _upload_client(self):
+        """
+        The boto3 client signing the urls that the frontend application uses to upload
+        files. It differs from `_client` if the frontend application can't reach the object
+        storage with the same domain as the backend (see AWS_S3_DOMAIN_REPLACE).
+        """
+        return self._get_client(settings.AWS_S3_DOMAIN_REPLACE or settings.AWS_S3_ENDPOINT_URL)
+
+    def head(self, key):
+        with self._measure("head", key):
+            return self._client.head_object(Bucket=self.bucket_name, Key=key)
+
+    def get_range(self, key, start=0, end=None):
+        params = {"Bucket": self.bucket_name, "Key": key}
+        # A range on an empty file is refused, the whole file is fetched without a range
+        if start < 0:
+            params["Range"] = f"bytes={start:d}"
+        elif start or end is not None:
+            params["Range"] = f"bytes={start:d}-" + ("" if end is None else f"{end:d}")
+        with self._measure("get_range", key):
+            return self._client.get_object(**params)
+
+    def put_stream(self, key, stream, content_type=None, metadata=None):
+        params = {"Bucket": self.bucket_name, "Key": key, "Metadata": metadata or {}}
+        if content_type:
+            params["ContentType"] = content_type
+        transfer_config = default_storage.transfer_config
+
+        with self._measure("put_stream", key):
+            content = _read(stream, transfer_config.multipart_threshold)
+            if len(content) < transfer_config.multipart_threshold:
+                response = self._client.put_object(Body=content, **params)
+                return _get_put_result(response, len(content))
+
+            upload_id = self._client.create_multipart_upload(**params)["UploadId"]
+            try:
+                response, size = self._upload_parts(key, upload_id, stream, content)
+            except BaseException:
+                self._client.abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=key, UploadId=upload_id
+                )
+                raise
+            return _get_put_result(response, size)
+
+    def _upload_parts(self, key, upload_id, stream, content):
+        """
+        Upload the parts of a multipart upload read from a stream, the first bytes being
+        already read, with at most `max_concurrency` parts in memory, then complete it.
+        """
+        transfer_config = default_storage.transfer_config
+        part_size = max(transfer_config.multipart_chunksize, MIN_PART_SIZE)
+
+        def upload_part(part_number, part):
+            response = self._client.upload_part(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=part,
+            )
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+        parts = []
+        part_number = size = 0
+        part = content + _read(stream, part_size - len(content))
+        with ThreadPoolExecutor(max_workers=transfer_config.max_concurrency) as executor:
+            pending = set()
+            while part:
+                if len(pending) >= transfer_config.max_concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    parts.extend(future.result() for future in done)
+                part_number += 1
+                size += len(part)
+                pending.add(executor.submit(upload_part, part_number, part))
+                part = _read(stream, part_size)
+            parts.extend(future.result() for future in wait(pending).done)
+
+        response = self._client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])},
+        )
+        return response, size
+
+    def copy(self, source_key, target_key, content_type=None, metadata=None):
+        params = {
+            "Bucket": self.bucket_name,
+            "CopySource": {"Bucket": self.bucket_name, "Key": source_key},
+            "Key": target_key,
+            "MetadataDirective": "COPY",
+        }
+        if content_type is not None or metadata is not None:
+            if content_type is None or metadata is None:
+                head = self.head(source_key)
+                content_type = content_type or head["ContentType"]
+                metadata = head["Metadata"] if metadata is None else metadata
+            params.update(ContentType=content_type, Metadata=metadata, MetadataDirective="REPLACE")
+        with self._measure("copy", target_key):
+            self._client.copy_object(**params)
+
+    def delete(self, key, version_id=None):
+        params = {"Bucket": self.bucket_name, "Key": key}
+        if version_id:
+            params["VersionId"] = version_id
+        with self._measure("delete", key):
+            self._client.delete_object(**params)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        errors = []
+        for start in range(0, len(keys), DELETE_OBJECTS_MAX_KEYS):
+            batch = keys[start : start + DELETE_OBJECTS_MAX_KEYS]
+            with self._measure("delete_many", f"{len(batch):d} keys"):
+                response = self._client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            errors.extend(response.get("Errors", []))
+        return errors
+
+    def list(self, prefix=""):
+        paginator = self._client.get_paginator("list_objects_v2")
+        pages = iter(paginator.paginate(Bucket=self.bucket_name, Prefix=prefix))
+        while True:
+            with self._measure("list", prefix):
+                page = next(pages, None)
+            if page is None:
+                return
+            yield from page.get("Contents", [])
+
+    def create_multipart_upload(self, key, content_type=None, metadata=None, acl=None):
+        params = {"Bucket": self.bucket_name, "Key": key}
+        if content_type:
+            params["ContentType"] = content_type
+        if metadata is not None:
+            params["Metadata"] = metadata
+        if acl:
+            params["ACL"] = acl
+        with self._measure("create_multipart_upload", key):
+            return self._client.create_multipart_upload(**params)["UploadId"]
+
+    def list_parts(self, key, upload_id):
+        paginator = self._client.get_paginator("list_parts")
+        pages = iter(paginator.paginate(Bucket=self.bucket_name, Key=key, UploadId=upload_id))
+        while True:
+            with self._measure("list_parts", key):
+                page = next(pages, None)
+            if page is None:
+                return
+            yield from page.get("Parts", [])
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def upload_part_copy(  # noqa: PLR0913
+        self, source_key, key, upload_id, part_number, start, end, if_match
+    ):
+        with self._measure("upload_part_copy", key):
+            response = self._client.upload_part_copy(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                CopySource={"Bucket": self.bucket_name, "Key": source_key},
+                CopySourceRange=f"bytes={start:d}-{end:d}",
+                CopySourceIfMatch=if_match,
+            )
+        return response["CopyPartResult"]["ETag"]
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        with self._measure("complete_multipart_upload", key):
+            self._client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+
+    def abort_multipart_upload(self, key, upload_id):
+        with self._measure("abort_multipart_upload", key):
+            self._client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id
+            )
+
+    def presign(self, operation, key, expires_in, for_client=True, **params):
+        client = self._upload_client if for_client else self._client
+        with self._measure("presign", key):
+            return client.generate_presigned_url(
+                ClientMethod=operation,
+                Params={"Bucket": self.bucket_name, "Key": key, **params},
+                ExpiresIn=expires_in,
+            )
+
+    def get_credentials(self):
+        client = self._client
+        # pylint: disable=protected-access
+        credentials = client._request_signer._credentials  # noqa: SLF001
+        return credentials.get_frozen_credentials(), client.meta.region_name
+
+
+class InMemoryStreamingBody(BytesIO):
+    """Content of a file of the in-memory gateway, read like a botocore streaming body."""
+
+    def iter_chunks(self, chunk_size=1024):
+        """Iterate over the content by chunks of `chunk_size` bytes."""
+        while chunk := self.read(chunk_size):
+            yield chunk
+
+
+class InMemoryStorageGateway(StorageGateway):
+    """
+    Gateway storing files in memory, for tests and benchmarks that should not depend on an
+    object storage. Errors are raised as botocore errors with the codes S3 returns. A
+    latency in seconds can be added to each operation to simulate network round trips.
+    """
+
+    def __init__(self, latency=0):
+        super().__init__()
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._files = {}
+        self._uploads = {}
+
+    @staticmethod
+    def _error(code, operation):
+        return botocore.exceptions.ClientError(
+            {"Error": {"Code": code, "Message": f"{code:s} error"}}, operation
+        )
+
+    @contextmanager
+    def _measure(self, operation, key):
+        with super()._measure(operation, key):
+            if self.latency:
+                time.sleep(self.latency)
+            yield
+
+    def _get_file(self, key, operation, code="NoSuchKey"):
+        try:
+            return self._files[key]
+        except KeyError:
+            raise self._error(code, operation) from None
+
+    def head(self, key):
+        with self._measure("head", key):
+            file = self._get_file(key, "HeadObject", code="404")
+            return {
+                "ContentLength": len(file["content"]),
+                "ContentType": file["content_type"],
+                "ETag": file["etag"],
+                "LastModified": file["last_modified"],
+                "Metadata": dict(file["metadata"]),
+            }
+
+    def get_range(self, key, start=0, end=None):
+        with self._measure("get_range", key):
+            file = self._get_file(key, "GetObject")
+            content = file["content"]
+            response = {
+                "ContentType": file["content_type"],
+                "ETag": file["etag"],
+                "LastModified": file["last_modified"],
+                "Metadata": dict(file["metadata"]),
+            }
+            if start or end is not None:
+                if start >= len(content) or not content:
+                    raise self._error("InvalidRange", "GetObject")
+                if start < 0:
+                    start, end = max(len(content) + start, 0), None
+                end = len(content) - 1 if end is None else min(end, len(content) - 1)
+                response["ContentRange"] = f"bytes {start:d}-{end:d}/{len(content):d}"
+                content = content[start : end + 1]
+            response["ContentLength"] = len(content)
+            response["Body"] = InMemoryStreamingBody(content)
+            return response
+
+    def _store(self, key, content, content_type, metadata):
+        with self._lock:
+            self._files[key] = {
+                "content": content,
+                "content_type": content_type or "binary/octet-stream",
+                "etag": f'"{hashlib.md5(content).hexdigest():s}"',  # noqa: S324
+                "last_modified": datetime.now(timezone.utc),
+                "metadata": dict(metadata or {}),
+            }
+
+    def put_stream(self, key, stream, content_type=None, metadata=None):
+        with self._measure("put_stream", key):
+            content = stream.read()
+            self._store(key, content, content_type, metadata)
+            return {"ETag": self._files[key]["etag"], "ContentLength": len(content)}
+
+    def copy(self, source_key, target_key, content_type=None, metadata=None):
+        with self._measure("copy", target_key):
+            file = self._get_file(source_key, "CopyObject")
+            self._store(
+                target_key,
+                file["content"],
+                file["content_type"] if content_type is None else content_type,
+                file["metadata"] if metadata is None else metadata,
+            )
+
+    def delete(self, key, version_id=None):
+        with self._measure("delete", key), self._lock:
+            self._files.pop(key, None)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), DELETE_OBJECTS_MAX_KEYS):
+            batch = keys[start : start + DELETE_OBJECTS_MAX_KEYS]
+            with self._measure("delete_many", f"{len(batch):d} keys"), self._lock:
+                for key in batch:
+                    self._files.pop(key, None)
+        return []
+
+    def list(self, prefix=""):
+        with self._measure("list", prefix), self._lock:
+            files = sorted(
+                (key, file) for key, file in self._files.items() if key.startswith(prefix)
+            )
+        for key, file in files:
+            yield {
+                "Key": key,
+                "Size": len(file["content"]),
+                "ETag": file["etag"],
+                "LastModified": file["last_modified"],
+            }
+
+    def create_multipart_upload(self, key, content_type=None, metadata=None, acl=None):
+        with self._measure("create_multipart_upload", key), self._lock:
+            upload_id = uuid.uuid4().hex
+            self._uploads[upload_id] = {
+                "key": key,
+                "content_type": content_type,
+                "metadata": metadata,
+                "parts": {},
+            }
+            return upload_id
+
+    def _get_upload(self, key, upload_id, operation):
+        upload = self._uploads.get(upload_id)
+        if upload is None or upload["key"] != key:
+            raise self._error("NoSuchUpload", operation)
+        return upload
+
+    def list_parts(self, key, upload_id):
+        with self._measure("list_parts", key), self._lock:
+            parts = sorted(self._get_upload(key, upload_id, "ListParts")["parts"].items())
+        for part_number, part in parts:
+            yield {"PartNumber": part_number, "ETag": part["etag"], "Size": len(part["content"])}
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def upload_part_copy(  # noqa: PLR0913
+        self, source_key, key, upload_id, part_number, start, end, if_match
+    ):
+        with self._measure("upload_part_copy", key):
+            file = self._get_file(source_key, "UploadPartCopy")
+            if file["etag"] != if_match:
+                raise self._error("PreconditionFailed", "UploadPartCopy")
+            content = file["content"][start : end + 1]
+            etag = f'"{hashlib.md5(content).hexdigest():s}"'  # noqa: S324
+            with self._lock:
+                upload = self._get_upload(key, upload_id, "UploadPartCopy")
+                upload["parts"][part_number] = {"etag": etag, "content": content}
+            return etag
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        with self._measure("complete_multipart_upload", key):
+            with self._lock:
+                upload = self._uploads.pop(upload_id, None)
+            if upload is None or upload["key"] != key:
+                raise self._error("NoSuchUpload", "CompleteMultipartUpload")
+            content = b"".join(upload["parts"][part["PartNumber"]]["content"] for part in parts)
+            self._store(key, content, upload["content_type"], upload["metadata"])
+
+    def abort_multipart_upload(self, key, upload_id):
+        with self._measure("abort_multipart_upload", key), self._lock:
+            self._get_upload(key, upload_id, "AbortMultipartUpload")
+            del self._uploads[upload_id]
+
+    def presign(self, operation, key, expires_in, for_client=True, **params):
+        with self._measure("presign", key):
+            query = urlencode({"operation": operation, "expires_in": expires_in, **params})
+            return f"memory://storage/{quote(key):s}?{query:s}"
+
+    def get_credentials(self):
+        return botocore.credentials.ReadOnlyCredentials("memory", "memory", None), "memory"
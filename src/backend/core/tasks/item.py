@@ -2,25 +2,52 @@
 Tasks related to items.
 """
 
-import hashlib
+import heapq
 import logging
 from datetime import timedelta
 from os.path import splitext
 
 from django.conf import settings
-from django.core.files.storage import default_storage
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
 
 import boto3
 import botocore
-
-from core.api.utils import sanitize_filename
-from core.models import Item, ItemTypeChoices, ItemUploadStateChoices
+from celery import Celery
+from celery.schedules import crontab
+from django_ltree.functions import NLevel
+from lasuite.malware_detection import malware_detection
+
+from core.api.utils import abort_multipart_upload, detect_mimetype, sanitize_filename
+from core.models import (
+    Item,
+    ItemBackgroundTask,
+    ItemBackgroundTaskKindChoices,
+    ItemBackgroundTaskStatusChoices,
+    ItemChange,
+    ItemChangeKindChoices,
+    ItemTypeChoices,
+    ItemUploadStateChoices,
+    bump_items_version,
+)
+from core.services.blobs import (
+    delete_files_from_storage,
+    delete_unreferenced_blobs,
+    store_file_as_blob,
+)
+from core.services.storage_copy import abort_copy, copy_file
+from core.storage import get_storage_gateway
 
 from drive.celery_app import app
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of keys accepted by one DeleteObjects request on S3
+PURGE_BATCH_SIZE = 1000
+
 
 @app.task
 def process_item_purge(item_id):
@@ -58,16 +85,287 @@ def process_item_purge(item_id):
         logger.info("Item %s is not eligible for purge: %s", item_id, reason)
         return
 
-    # Get descendants, leaf first. Don't burst memory
-    for item in Item.objects.filter(path__descendants=root.path).order_by("-path").iterator():
-        if item.type == ItemTypeChoices.FILE and item.file_key:
-            try:
-                default_storage.delete(item.file_key)
-            except FileNotFoundError:
-                # File already absent from storage: ignore and continue
-                pass
+    # Delete leaf first, level by level from the deepest one, by batches committed one after
+    # the other: if the purge is interrupted, the remaining items are still under the root
+    # and retrying it resumes where it stopped.
+    descendants = Item.objects.filter(path__descendants=root.path).annotate(level=NLevel("path"))
+    max_level = descendants.aggregate(max_level=Max("level"))["max_level"] or root.depth
+    nb_purged = nb_bytes = 0
+    for level in range(max_level, root.depth - 1, -1):
+        level_items = descendants.filter(level=level).only(
+            "id", "type", "filename", "size", "blob_id", "file_version", "multipart_upload_id"
+        )
+        while batch := list(level_items[:PURGE_BATCH_SIZE]):
+            for item in batch:
+                if item.multipart_upload_id:
+                    abort_multipart_upload(item.file_key, item.multipart_upload_id)
+            files = [
+                item
+                for item in batch
+                if item.type == ItemTypeChoices.FILE and item.filename and not item.blob_id
+            ]
+            delete_files_from_storage([item.file_key for item in files])
+            # Accesses, favorites, link traces, invitations... are deleted in cascade with one
+            # statement per table
+            Item.objects.filter(id__in=[item.id for item in batch]).delete()
+            # Blobs are only deleted once the last item referencing them is purged
+            nb_bytes += delete_unreferenced_blobs({item.blob_id for item in batch if item.blob_id})
+            nb_purged += len(batch)
+            nb_bytes += sum(item.size or 0 for item in files)
+
+    logger.info("Purged %d items (%d bytes) under item %s", nb_purged, nb_bytes, item_id)
+    return {"items": nb_purged, "bytes": nb_bytes}
+
+
+@app.on_after_finalize.connect
+def setup_periodic_tasks(sender: Celery, **kwargs):
+    """Setup periodic tasks."""
+    sender.add_periodic_task(
+        crontab(
+            minute=settings.PURGE_CRONTAB_MINUTE,
+            hour=settings.PURGE_CRONTAB_HOUR,
+            day_of_month=settings.PURGE_CRONTAB_DAY_OF_MONTH,
+            month_of_year=settings.PURGE_CRONTAB_MONTH_OF_YEAR,
+        ),
+        plan_item_purge.s(),
+        name="plan_item_purge",
+        serializer="json",
+    )
+    sender.add_periodic_task(
+        crontab(
+            minute=settings.ITEM_CHANGES_PURGE_CRONTAB_MINUTE,
+            hour=settings.ITEM_CHANGES_PURGE_CRONTAB_HOUR,
+            day_of_month=settings.ITEM_CHANGES_PURGE_CRONTAB_DAY_OF_MONTH,
+            month_of_year=settings.ITEM_CHANGES_PURGE_CRONTAB_MONTH_OF_YEAR,
+        ),
+        purge_item_changes.s(),
+        name="purge_item_changes",
+        serializer="json",
+    )
+
+
+@app.task
+def purge_item_changes():
+    """
+    Delete the changes of the items older than ITEM_CHANGES_RETENTION_DAYS, by batches so
+    that the change log is not locked for long. The changes endpoint refuses the cursors
+    given before, as they may have missed some of the deleted changes.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.ITEM_CHANGES_RETENTION_DAYS)
+    batch_size = settings.ITEM_BACKGROUND_TASK_BATCH_SIZE
+    nb_deleted = 0
+    while True:
+        ids = list(
+            ItemChange.objects.filter(created_at__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        nb_deleted += ItemChange.objects.filter(id__in=ids).delete()[0]
 
-        item.delete()
+    logger.info("Purged %d item changes older than %s", nb_deleted, cutoff.isoformat())
+    return nb_deleted
+
+
+def _get_purge_claim_key(item_id):
+    """Return the cache key claiming the purge of an item for a shard."""
+    return f"item_purge_claim_{item_id!s}"
+
+
+@app.task
+def plan_item_purge():
+    """
+    Plan the purge of deleted items: only the highest purgeable items are purged, their
+    purgeable descendants being purged with them. They are split into at most
+    PURGE_SHARDS_COUNT shards balanced on the size of their subtree, each shard being purged
+    by one worker. Items already claimed by a shard of a previous run are skipped until the
+    shard is done with them.
+    """
+    roots = sorted(
+        Item.objects.purgeable_roots().values_list("id", "subtree_count"),
+        key=lambda root: root[1],
+        reverse=True,
+    )
+    roots = [
+        (root_id, subtree_count)
+        for root_id, subtree_count in roots
+        if cache.add(_get_purge_claim_key(root_id), True, timeout=settings.PURGE_CLAIM_TIMEOUT)
+    ]
+    if not roots:
+        logger.info("No deleted item to purge")
+        return []
+
+    # Assign each tree, the largest first, to the least loaded shard
+    shards = [(0, index, []) for index in range(min(settings.PURGE_SHARDS_COUNT, len(roots)))]
+    for root_id, subtree_count in roots:
+        load, index, item_ids = heapq.heappop(shards)
+        item_ids.append(str(root_id))
+        heapq.heappush(shards, (load + subtree_count, index, item_ids))
+
+    shards = [item_ids for _load, _index, item_ids in sorted(shards)]
+
+    logger.info(
+        "Planned the purge of %d items under %d deleted items in %d shards",
+        sum(subtree_count for _root_id, subtree_count in roots),
+        len(roots),
+        len(shards),
+    )
+    for item_ids in shards:
+        process_item_purge_shard.delay(item_ids)
+
+    return shards
+
+
+@app.task
+def process_item_purge_shard(item_ids):
+    """
+    Purge deleted items one after the other and report the number of items and bytes
+    reclaimed. The failure of one purge does not stop the shard, the item is planned again
+    by the next run.
+    """
+    metrics = {"items": 0, "bytes": 0, "failures": 0}
+    for item_id in item_ids:
+        try:
+            result = process_item_purge(item_id)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Failed to purge item %s", item_id)
+            metrics["failures"] += 1
+        else:
+            for key, value in (result or {}).items():
+                metrics[key] += value
+        finally:
+            cache.delete(_get_purge_claim_key(item_id))
+
+    logger.info(
+        "Purge shard reclaimed %d items and %d bytes under %d deleted items (%d failures)",
+        metrics["items"],
+        metrics["bytes"],
+        len(item_ids),
+        metrics["failures"],
+    )
+    return metrics
+
+
+@app.task
+def process_item_background_task(task_id):
+    """
+    Run a background task on a large subtree. Running it again after a failure or an
+    interruption resumes it where it stopped.
+    """
+    try:
+        task = ItemBackgroundTask.objects.get(id=task_id)
+    except ItemBackgroundTask.DoesNotExist:
+        logger.error("Item background task %s does not exist", task_id)
+        return
+
+    if task.status == ItemBackgroundTaskStatusChoices.COMPLETED:
+        logger.info("Item background task %s is already completed", task_id)
+        return
+
+    logger.info("Processing %s background task on item %s", task.kind, task.item_id)
+    task.process()
+
+    if task.kind == ItemBackgroundTaskKindChoices.DUPLICATE:
+        # The copies are spread over a bounded number of tasks running in parallel
+        for shard in range(settings.ITEM_DUPLICATE_COPY_CONCURRENCY):
+            copy_duplicated_files.delay(task.id, shard)
+
+
+@app.task(bind=True, max_retries=10)
+def copy_duplicated_files(self, task_id, shard):
+    """
+    Copy on storage the files of a duplicated folder that belong to a shard, then complete
+    the duplication if no file is left to copy. Files are spread over the shards after the
+    last 28 bits of their id, running the task again only copies the files of the shard that
+    are not copied yet.
+    """
+    try:
+        task = ItemBackgroundTask.objects.select_related("item").get(id=task_id)
+    except ItemBackgroundTask.DoesNotExist:
+        logger.error("duplicating folder: background task %s does not exist", task_id)
+        return
+
+    shards_count = settings.ITEM_DUPLICATE_COPY_CONCURRENCY
+    sources = (
+        Item.objects.filter(
+            path__descendants=task.previous_path,
+            type=ItemTypeChoices.FILE,
+            upload_state=ItemUploadStateChoices.READY,
+            blob__isnull=True,
+            deleted_at__isnull=True,
+            ancestors_deleted_at__isnull=True,
+        )
+        # The files of the other shards are filtered out by the database
+        .alias(
+            shard=RawSQL(
+                "('x' || right(drive_item.id::text, 7))::bit(28)::int %% %s", (shards_count,)
+            )
+        )
+        .filter(shard=shard)
+        .only("id", "filename", "file_version", "blob_id")
+        .order_by("pk")
+    )
+    batch_size = settings.ITEM_BACKGROUND_TASK_BATCH_SIZE
+    last_pk = None
+    while True:
+        batch_qs = sources.filter(pk__gt=last_pk) if last_pk else sources
+        batch = list(batch_qs[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        copies = Item.objects.filter(
+            id__in=[task.get_duplicate_id(source.id) for source in batch],
+            upload_state=ItemUploadStateChoices.DUPLICATING,
+        ).only("id", "path", "type", "filename", "file_version", "blob_id")
+        copies = {copy.id: copy for copy in copies}
+
+        for source in batch:
+            if not (copy := copies.get(task.get_duplicate_id(source.id))):
+                continue
+
+            try:
+                copy_file(source.file_key, copy.file_key)
+            except (
+                boto3.exceptions.Boto3Error,
+                botocore.exceptions.BotoCoreError,
+                botocore.exceptions.ClientError,
+            ) as exc:
+                if self.request.retries < self.max_retries:
+                    logger.error(
+                        "duplicating folder: error while copying file %s (retries %d on %d): %s",
+                        source.id,
+                        self.request.retries,
+                        self.max_retries,
+                        exc,
+                    )
+                    self.retry(exc=exc)
+
+                logger.error(
+                    "duplicating folder: %d max retries exceeded, the copy %s is deleted",
+                    self.max_retries,
+                    copy.id,
+                )
+                abort_copy(copy.file_key)
+                # Not soft deleted first: the subtree is locked by the duplication
+                with transaction.atomic():
+                    Item.objects.filter(pk=copy.pk).delete()
+                    Item.objects.increment_numchild(copy.path[:-1], copy, -1)
+                    ItemChange.objects.log([copy], ItemChangeKindChoices.DELETED)
+                continue
+
+            if Item.objects.filter(
+                pk=copy.pk, upload_state=ItemUploadStateChoices.DUPLICATING
+            ).update(upload_state=ItemUploadStateChoices.READY, updated_at=timezone.now()):
+                ItemBackgroundTask.objects.filter(pk=task.pk).update(
+                    processed=F("processed") + 1, updated_at=timezone.now()
+                )
+                # The copy is listed among the children of its parent
+                bump_items_version(copy.path[-2:])
+
+    if task.complete_duplicate():
+        logger.info("duplicating folder: copy %s of item completed", task.item_id)
 
 
 @app.task
@@ -108,23 +406,159 @@ def rename_file(item_id, new_title):
     item.save(update_fields=["filename", "updated_at"])
 
     to_file_key = item.file_key
+    if to_file_key == from_file_key:
+        # Only files stored under their name before versioned keys have to be moved
+        return
 
-    s3_client = default_storage.connection.meta.client
+    copy_file(from_file_key, to_file_key)
 
-    s3_client.copy_object(
-        Bucket=default_storage.bucket_name,
-        CopySource={
-            "Bucket": default_storage.bucket_name,
-            "Key": from_file_key,
-        },
-        Key=to_file_key,
-        MetadataDirective="COPY",
-    )
+    get_storage_gateway().delete(from_file_key)
 
-    s3_client.delete_object(
-        Bucket=default_storage.bucket_name,
-        Key=from_file_key,
-    )
+
+def _reject_uploaded_item(item):
+    """Completely delete an item whose uploaded file is rejected."""
+    item.soft_delete()
+    item.hard_delete()
+    process_item_purge.delay(item.id)
+
+
+@app.task(bind=True, max_retries=10)
+def finalize_item_upload(self, item_id):
+    """
+    Finalize the upload of a file ended by its client: check the size and the type of the
+    file actually stored, fix its content type on the object storage, then store it in its
+    blob or analyse it. Files that are not allowed are deleted with their item.
+    """
+    try:
+        item = Item.objects.get(id=item_id)
+    except Item.DoesNotExist:
+        logger.error("finalize_item_upload: Item %s does not exist", item_id)
+        return
+
+    if item.upload_state != ItemUploadStateChoices.FINALIZING:
+        logger.error(
+            "finalize_item_upload: Item %s upload_state is not finalizing but %s",
+            item_id,
+            item.upload_state,
+        )
+        return
+
+    storage_gateway = get_storage_gateway()
+
+    try:
+        head_response = storage_gateway.head(item.file_key)
+        file_size = head_response["ContentLength"]
+
+        # Only the first bytes are needed to detect the type of the file
+        file_head = storage_gateway.get_range(
+            item.file_key, end=2047 if file_size > 2048 else None
+        )["Body"].read()
+    except (
+        boto3.exceptions.Boto3Error,
+        botocore.exceptions.BotoCoreError,
+        botocore.exceptions.ClientError,
+    ) as exc:
+        # A file that was never uploaded can not be finalized, retrying is useless
+        is_missing = isinstance(exc, botocore.exceptions.ClientError) and exc.response.get(
+            "Error", {}
+        ).get("Code") in ("404", "NoSuchKey")
+        if not is_missing and self.request.retries < self.max_retries:
+            self.retry(exc=exc)
+        logger.error("finalize_item_upload: file of item %s can not be read: %s", item_id, exc)
+        _reject_uploaded_item(item)
+        return
+
+    if file_size > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+        logger.info(
+            "finalize_item_upload: file size (%s) for file %s higher than the allowed max size",
+            file_size,
+            item.file_key,
+        )
+        _reject_uploaded_item(item)
+        return
+
+    # Use improved MIME type detection combining magic bytes and file extension
+    logger.info("finalize_item_upload: detecting mimetype for file: %s", item.file_key)
+    mimetype = detect_mimetype(file_head, filename=item.filename)
+
+    if settings.RESTRICT_UPLOAD_FILE_TYPE and mimetype not in settings.FILE_MIMETYPE_ALLOWED:
+        logger.info(
+            "finalize_item_upload: mimetype not allowed %s for filename %s",
+            mimetype,
+            item.filename,
+        )
+        _reject_uploaded_item(item)
+        return
+
+    if head_response["ContentType"] != mimetype:
+        logger.info(
+            "finalize_item_upload: content type mismatch between object storage and item,"
+            " updating from %s to %s",
+            head_response["ContentType"],
+            mimetype,
+        )
+        try:
+            storage_gateway.copy(
+                item.file_key,
+                item.file_key,
+                content_type=mimetype,
+                metadata=head_response["Metadata"],
+            )
+        except botocore.exceptions.ClientError as error:
+            # Log an exception but don't stop the finalization.
+            logger.exception(
+                "Changing content type of item %s on object storage failed with error code %s"
+                " and error message %s",
+                item.id,
+                error.response["Error"]["Code"],
+                error.response["Error"]["Message"],
+            )
+
+    item.upload_state = ItemUploadStateChoices.ANALYZING
+    item.mimetype = mimetype
+    item.size = file_size
+    item.save(update_fields=["upload_state", "mimetype", "size", "updated_at"])
+
+    if settings.ITEM_CONTENT_ADDRESSED_STORAGE:
+        # The file is analysed once stored in its blob so that it does not move meanwhile
+        store_item_file_as_blob.delay(item.id)
+    else:
+        malware_detection.analyse_file(item.file_key, item_id=item.id)
+
+
+@app.task
+def finalize_item_uploads(item_ids):
+    """
+    Finalize the uploads of many files ended at once, each one in its own task so that
+    they are finalized in parallel.
+    """
+    for item_id in item_ids:
+        finalize_item_upload.delay(item_id)
+
+
+@app.task
+def store_item_file_as_blob(item_id):
+    """
+    Store the file uploaded for an item in the blob named after the digest of its content,
+    then analyse it. If the file can not be stored in a blob, it is analysed and kept where
+    it was uploaded.
+    """
+    try:
+        item = Item.objects.get(id=item_id)
+    except Item.DoesNotExist:
+        logger.error("storing file as blob: Item %s does not exist", item_id)
+        return
+
+    try:
+        store_file_as_blob(item)
+    except (
+        boto3.exceptions.Boto3Error,
+        botocore.exceptions.BotoCoreError,
+        botocore.exceptions.ClientError,
+    ):
+        logger.exception("storing file as blob: file of item %s kept at its upload key", item_id)
+
+    malware_detection.analyse_file(item.file_key, item_id=item.id)
 
 
 @app.task
@@ -141,8 +575,11 @@ def update_suspicious_item_file_hash(item_id):
     if item.upload_state != ItemUploadStateChoices.SUSPICIOUS:
         logger.error("updating suspicious item file hash: Item %s is not suspicious", item_id)
         return
-    with default_storage.open(item.file_key, "rb") as file:
-        file_hash = hashlib.file_digest(file, "sha256").hexdigest()
+    if item.blob_id:
+        # Blobs are named after the SHA-256 digest of their content
+        file_hash = item.blob_id
+    else:
+        file_hash = get_storage_gateway().get_sha256(item.file_key)
 
     item.malware_detection_info.update({"file_hash": file_hash})
     item.save(update_fields=["malware_detection_info"])
@@ -177,18 +614,17 @@ def duplicate_file(self, item_to_duplicate_id, duplicated_item_id):
         )
         return
 
-    s3_client = default_storage.connection.meta.client
+    def log_progress(copied_size, size):
+        logger.info(
+            "duplicating file: %d bytes copied on %d for item %s",
+            copied_size,
+            size,
+            duplicated_item.id,
+        )
 
     try:
-        s3_client.copy_object(
-            Bucket=default_storage.bucket_name,
-            CopySource={
-                "Bucket": default_storage.bucket_name,
-                "Key": item_to_duplicate.file_key,
-            },
-            Key=duplicated_item.file_key,
-            MetadataDirective="COPY",
-        )
+        # Resumes the parts copied by previous attempts of large files
+        copy_file(item_to_duplicate.file_key, duplicated_item.file_key, on_progress=log_progress)
     except (
         boto3.exceptions.Boto3Error,
         botocore.exceptions.BotoCoreError,
@@ -201,6 +637,7 @@ def duplicate_file(self, item_to_duplicate_id, duplicated_item_id):
                 self.max_retries,
                 duplicated_item.id,
             )
+            abort_copy(duplicated_item.file_key)
             duplicated_item.soft_delete()
             duplicated_item.delete()
 
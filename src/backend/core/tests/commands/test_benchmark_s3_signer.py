@@ -0,0 +1,16 @@
+"""Tests for the benchmark_s3_signer management command."""
+
+from io import StringIO
+
+from django.core.management import call_command
+
+
+def test_benchmark_s3_signer():
+    """The cost of signing a request should be reported for both implementations."""
+    out = StringIO()
+
+    call_command("benchmark_s3_signer", iterations=10, stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert [line.split(":")[0] for line in lines] == ["botocore", "signer"]
+    assert all("µs per request (10 requests)" in line for line in lines)
@@ -2,6 +2,7 @@
 
 from datetime import timedelta
 
+from django.core.files.storage import default_storage
 from django.core.management import call_command
 from django.utils import timezone
 
@@ -80,3 +81,27 @@ def test_clean_pending_items_custom_hours():
     call_command("clean_pending_items", "--hours=8")
 
     assert not models.Item.objects.filter(pk=item.pk).exists()
+
+
+def test_clean_pending_items_aborts_multipart_upload():
+    """The multipart upload of a stale pending item should be aborted to free its parts."""
+    old_date = timezone.now() - timedelta(hours=49)
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.PENDING,
+    )
+    s3_client = default_storage.connection.meta.client
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=default_storage.bucket_name, Key=item.file_key
+    )["UploadId"]
+    models.Item.objects.filter(pk=item.pk).update(
+        created_at=old_date, multipart_upload_id=upload_id
+    )
+
+    call_command("clean_pending_items")
+
+    assert not models.Item.objects.filter(pk=item.pk).exists()
+    uploads = s3_client.list_multipart_uploads(
+        Bucket=default_storage.bucket_name, Prefix=item.file_key
+    )
+    assert upload_id not in [upload["UploadId"] for upload in uploads.get("Uploads", [])]
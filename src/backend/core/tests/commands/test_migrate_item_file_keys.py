@@ -0,0 +1,78 @@
+"""Tests for the migrate_item_file_keys management command."""
+
+from io import BytesIO, StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def test_migrate_item_file_keys_not_enabled():
+    """The command should refuse to run if versioned keys are not enabled."""
+    with pytest.raises(CommandError, match="Versioned file keys are not enabled"):
+        call_command("migrate_item_file_keys")
+
+
+def test_migrate_item_file_keys(settings):
+    """Files stored under their name should be moved to versioned keys."""
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        filename="my file.txt",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    pending_item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        upload_state=models.ItemUploadStateChoices.PENDING,
+    )
+    legacy_key = item.file_key
+    default_storage.save(legacy_key, BytesIO(b"my prose"))
+
+    settings.ITEM_FILE_VERSIONED_KEYS = True
+    versioned_item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+
+    out = StringIO()
+    call_command("migrate_item_file_keys", stdout=out)
+
+    assert "Moved 1 file(s) to versioned keys." in out.getvalue()
+
+    item.refresh_from_db()
+    assert item.file_version == 1
+    assert item.file_key == f"item/{item.id!s}/v1"
+    assert not default_storage.exists(legacy_key)
+    with default_storage.open(item.file_key, "rb") as file:
+        assert file.read() == b"my prose"
+
+    pending_item.refresh_from_db()
+    assert pending_item.file_version is None
+    versioned_item.refresh_from_db()
+    assert versioned_item.file_version == 1
+
+    # Running the command again does nothing
+    out = StringIO()
+    call_command("migrate_item_file_keys", stdout=out)
+    assert "Moved 0 file(s) to versioned keys." in out.getvalue()
+
+
+def test_migrate_item_file_keys_missing_file(settings):
+    """Files missing from the storage should be left under their name."""
+    settings.ITEM_FILE_VERSIONED_KEYS = True
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        file_version=None,
+    )
+
+    out = StringIO()
+    call_command("migrate_item_file_keys", stdout=out)
+
+    assert "Moved 0 file(s) to versioned keys." in out.getvalue()
+    item.refresh_from_db()
+    assert item.file_version is None
@@ -37,6 +37,7 @@ def test_purge_deleted_items_success(settings):  # noqa: PLR0915
 
     settings.TRASHBIN_CUTOFF_DAYS = cutoff = randint(0, 50)
     settings.PURGE_GRACE_DAYS = grace = randint(0, 20)
+    settings.PURGE_SHARDS_COUNT = 2
 
     now = timezone.now()
     purge_now = now - timedelta(days=cutoff + grace)
@@ -98,7 +99,8 @@ def test_purge_deleted_items_success(settings):  # noqa: PLR0915
     # Run command
     call_command("purge_deleted_items", stdout=out)
 
-    assert "Purged 5 deleted item(s)." in out.getvalue()
+    # The hard deleted child is purged with its parent
+    assert "Purged 4 deleted item(s) in 2 shard(s)." in out.getvalue()
 
     # Database checks
     assert models.Item.objects.filter(id=not_deleted_file.id).exists()
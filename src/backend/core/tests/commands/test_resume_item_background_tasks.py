@@ -0,0 +1,39 @@
+"""Test the resume_item_background_tasks command"""
+
+from django.core.management import call_command
+
+import pytest
+
+from core import factories, models
+from core.tasks.item import process_item_background_task
+
+pytestmark = pytest.mark.django_db
+
+
+def create_tree():
+    """Create a folder with 2 levels of descendants."""
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    subfolder = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+    return folder, [subfolder, factories.ItemFactory(parent=subfolder)]
+
+
+def test_resume_item_background_tasks_command():
+    """The command should run again the tasks that are not completed."""
+    folder, descendants = create_tree()
+    other_folder, _other_descendants = create_tree()
+
+    pending_task = folder.soft_delete(in_background=True)
+    completed_task = other_folder.soft_delete(in_background=True)
+    process_item_background_task(completed_task.id)
+    completed_task.refresh_from_db()
+    completed_updated_at = completed_task.updated_at
+
+    call_command("resume_item_background_tasks")
+
+    pending_task.refresh_from_db()
+    assert pending_task.status == "completed"
+    completed_task.refresh_from_db()
+    assert completed_task.updated_at == completed_updated_at
+    for descendant in descendants:
+        descendant.refresh_from_db()
+        assert descendant.ancestors_deleted_at is not None
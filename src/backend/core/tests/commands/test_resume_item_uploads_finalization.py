@@ -0,0 +1,39 @@
+"""Tests for the resume_item_uploads_finalization management command."""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+
+import pytest
+
+from core import factories, models
+from core.tasks.item import finalize_item_upload
+
+pytestmark = pytest.mark.django_db
+
+
+def test_resume_item_uploads_finalization():
+    """Only the items stuck in the FINALIZING state for too long should be finalized again."""
+    stuck_item, recent_item, ready_item = [
+        factories.ItemFactory(
+            type=models.ItemTypeChoices.FILE,
+            update_upload_state=upload_state,
+        )
+        for upload_state in (
+            models.ItemUploadStateChoices.FINALIZING,
+            models.ItemUploadStateChoices.FINALIZING,
+            models.ItemUploadStateChoices.READY,
+        )
+    ]
+    models.Item.objects.filter(id__in=[stuck_item.id, ready_item.id]).update(
+        updated_at=timezone.now() - timedelta(minutes=31)
+    )
+
+    with mock.patch.object(finalize_item_upload, "delay") as mock_delay:
+        call_command("resume_item_uploads_finalization")
+
+    mock_delay.assert_called_once_with(stuck_item.id)
+    recent_item.refresh_from_db()
+    assert recent_item.upload_state == models.ItemUploadStateChoices.FINALIZING
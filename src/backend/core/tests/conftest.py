@@ -27,11 +27,15 @@ def clear_cache():
     from core.entitlements import (  # pylint:disable=import-outside-toplevel # noqa: PLC0415
         get_entitlements_backend,
     )
+    from core.services.s3_signer import (  # pylint:disable=import-outside-toplevel # noqa: PLC0415
+        get_s3_request_signer,
+    )
     from core.storage import (  # pylint:disable=import-outside-toplevel # noqa: PLC0415
         get_storage_compute_backend,
     )
 
     get_entitlements_backend.cache_clear()
+    get_s3_request_signer.cache_clear()
     get_storage_compute_backend.cache_clear()
 
 
@@ -139,6 +139,7 @@ def test_api_items_upload_resource_server_using_access_token(
         {
             "type": models.ItemTypeChoices.FILE,
             "filename": "file.txt",
+            "size": 8,
         },
     )
 
@@ -174,6 +175,7 @@ def test_api_items_upload_root_resource_server_using_access_token(
         {
             "type": models.ItemTypeChoices.FILE,
             "filename": "file.txt",
+            "size": 8,
         },
     )
 
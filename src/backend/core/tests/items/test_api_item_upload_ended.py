@@ -1,5 +1,6 @@
 """Test related to item upload ended API."""
 
+import hashlib
 import logging
 from io import BytesIO
 from unittest import mock
@@ -10,8 +11,8 @@ import pytest
 from rest_framework.test import APIClient
 
 from core import factories, models
-from core.api.viewsets import malware_detection
 from core.models import ItemTypeChoices, ItemUploadStateChoices, LinkRoleChoices
+from core.tasks.item import finalize_item_upload, malware_detection
 
 pytestmark = pytest.mark.django_db
 
@@ -148,7 +149,37 @@ def test_api_item_upload_ended_success():
     assert item.mimetype == "text/plain"
     assert item.size == 8
 
-    assert response.json()["mimetype"] == "text/plain"
+    assert response.json()["upload_state"] == "finalizing"
+
+
+def test_api_item_upload_ended_content_addressed_storage(settings):
+    """
+    With content addressed storage, the file should be stored in the blob named after its
+    digest before being analysed.
+    """
+    settings.ITEM_CONTENT_ADDRESSED_STORAGE = True
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(type=ItemTypeChoices.FILE, filename="my_file.txt")
+    factories.UserItemAccessFactory(item=item, user=user, role="owner")
+    upload_key = item.file_key
+
+    default_storage.save(upload_key, BytesIO(b"my prose"))
+
+    with mock.patch.object(malware_detection, "analyse_file") as mock_analyse_file:
+        response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
+
+    assert response.status_code == 200
+
+    item.refresh_from_db()
+    assert item.blob.sha256 == hashlib.sha256(b"my prose").hexdigest()
+    assert item.blob.size == 8
+    assert item.upload_state == ItemUploadStateChoices.ANALYZING
+    mock_analyse_file.assert_called_once_with(item.blob.key, item_id=item.id)
+    assert not default_storage.exists(upload_key)
+    assert default_storage.exists(item.blob.key)
 
 
 def test_api_item_upload_ended_empty_file():
@@ -175,8 +206,6 @@ def test_api_item_upload_ended_empty_file():
     assert item.mimetype == "application/x-empty"
     assert item.size == 0
 
-    assert response.json()["mimetype"] == "application/x-empty"
-
 
 @mock.patch("core.api.viewsets.get_entitlements_backend")
 def test_api_item_upload_ended_entitlements_backend_returns_falsy(
@@ -267,8 +296,8 @@ def test_api_item_upload_ended_entitlements_backend_returns_falsy_custom_message
 
 def test_api_item_upload_ended_mimetype_not_allowed(settings, caplog):
     """
-    Test that the API returns a 400 when the mimetype is not allowed.
-    Item should be deleted and the file should be deleted from the storage.
+    When the mimetype is not allowed, the item should be deleted by the finalization
+    and the file should be deleted from the storage.
     """
     settings.RESTRICT_UPLOAD_FILE_TYPE = True
     settings.FILE_MIMETYPE_ALLOWED = ["application/pdf"]
@@ -287,8 +316,11 @@ def test_api_item_upload_ended_mimetype_not_allowed(settings, caplog):
     with caplog.at_level(logging.INFO):
         response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
 
-    assert response.status_code == 400
-    assert "upload_ended: mimetype not allowed text/plain for filename my_file.txt" in caplog.text
+    assert response.status_code == 200
+    assert (
+        "finalize_item_upload: mimetype not allowed text/plain for filename my_file.txt"
+        in caplog.text
+    )
 
     assert not models.Item.objects.filter(id=item.id).exists()
     assert not default_storage.exists(item.file_key)
@@ -323,8 +355,6 @@ def test_api_item_upload_ended_mimetype_not_allowed_not_checking_mimetype(settin
     assert item.mimetype == "text/plain"
     assert item.size == 8
 
-    assert response.json()["mimetype"] == "text/plain"
-
 
 def test_api_upload_ended_mismatch_mimetype_with_object_storage(caplog):
     """
@@ -359,10 +389,10 @@ def test_api_upload_ended_mismatch_mimetype_with_object_storage(caplog):
     head_object = s3_client.head_object(Bucket=default_storage.bucket_name, Key=item.file_key)
 
     assert head_object["ContentType"] == "text/html"
-    with caplog.at_level(logging.INFO, logger="core.api.viewsets"):
+    with caplog.at_level(logging.INFO, logger="core.tasks.item"):
         response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
     assert (
-        "upload_ended: content type mismatch between object storage and item, "
+        "finalize_item_upload: content type mismatch between object storage and item, "
         "updating from text/html to application/pdf" in caplog.text
     )
     assert response.status_code == 200
@@ -378,8 +408,8 @@ def test_api_upload_ended_mismatch_mimetype_with_object_storage(caplog):
 
 def test_api_upload_ended_file_size_exceeded(settings, caplog):
     """
-    Test when the file size exceed the allowed max upload file size
-    should return a 400 and delete the file.
+    Test when the file size exceed the allowed max upload file size,
+    the finalization should delete the item and the file.
     """
 
     settings.DATA_UPLOAD_MAX_MEMORY_SIZE = 0
@@ -396,10 +426,70 @@ def test_api_upload_ended_file_size_exceeded(settings, caplog):
         BytesIO(b"my prose"),
     )
 
-    with caplog.at_level(logging.INFO, logger="core.api.viewsets"):
+    with caplog.at_level(logging.INFO, logger="core.tasks.item"):
         response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
     assert (
-        f"upload_ended: file size (8) for file {item.file_key} higher than the allowed max size"
-        in caplog.text
+        f"finalize_item_upload: file size (8) for file {item.file_key} higher than the allowed"
+        " max size" in caplog.text
     )
+    assert response.status_code == 200
+
+    assert not models.Item.objects.filter(id=item.id).exists()
+    assert not default_storage.exists(item.file_key)
+
+
+def test_api_item_upload_ended_finalized_by_task():
+    """
+    Ending an upload should not wait for the object storage: the item is finalized
+    by a task and stays in the FINALIZING state meanwhile.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(type=ItemTypeChoices.FILE, filename="my_file.txt")
+    factories.UserItemAccessFactory(item=item, user=user, role="owner")
+
+    default_storage.save(item.file_key, BytesIO(b"my prose"))
+
+    with mock.patch.object(finalize_item_upload, "delay") as mock_delay:
+        response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
+
+    assert response.status_code == 200
+    assert response.json()["upload_state"] == "finalizing"
+    assert response.json()["url"] is None
+    mock_delay.assert_called_once_with(item.id)
+
+    item.refresh_from_db()
+    assert item.upload_state == ItemUploadStateChoices.FINALIZING
+    assert models.ItemChange.objects.latest("id").item_id == item.id
+    assert models.ItemChange.objects.latest("id").kind == models.ItemChangeKindChoices.UPDATED
+
+    # Ending the upload again is refused while it is finalized
+    response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
     assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_upload_state_not_pending"
+
+    with mock.patch.object(malware_detection, "analyse_file") as mock_analyse_file:
+        finalize_item_upload(item.id)  # pylint: disable=no-value-for-parameter
+
+    mock_analyse_file.assert_called_once_with(item.file_key, item_id=item.id)
+    item.refresh_from_db()
+    assert item.upload_state == ItemUploadStateChoices.ANALYZING
+    assert item.mimetype == "text/plain"
+    assert item.size == 8
+
+
+def test_api_item_upload_ended_file_missing():
+    """The finalization should delete the item when no file was uploaded."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(type=ItemTypeChoices.FILE, filename="my_file.txt")
+    factories.UserItemAccessFactory(item=item, user=user, role="owner")
+
+    response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
+
+    assert response.status_code == 200
+    assert not models.Item.objects.filter(id=item.id).exists()
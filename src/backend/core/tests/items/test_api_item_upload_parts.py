@@ -0,0 +1,329 @@
+"""Test related to item upload parts API."""
+
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.core.files.storage import default_storage
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import factories
+from core.models import ItemTypeChoices, ItemUploadStateChoices, LinkRoleChoices
+from core.tasks.item import malware_detection
+
+pytestmark = pytest.mark.django_db
+
+
+def test_api_item_upload_parts_anonymous():
+    """Anonymous users should not be allowed to upload parts of a file."""
+    item = factories.ItemFactory(type=ItemTypeChoices.FILE, filename="my_file.txt")
+    response = APIClient().post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 1, "part_numbers": [1]},
+        format="json",
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("role", [None, "reader"])
+def test_api_item_upload_parts_no_permissions(role):
+    """Users without write permissions should not be allowed to upload parts of a file."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    if role:
+        item = factories.ItemFactory(
+            type=ItemTypeChoices.FILE,
+            filename="my_file.txt",
+            users=[(user, role)],
+            link_role=LinkRoleChoices.READER,
+        )
+    else:
+        item = factories.ItemFactory(
+            type=ItemTypeChoices.FILE, filename="my_file.txt", link_role=LinkRoleChoices.READER
+        )
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 1, "part_numbers": [1]},
+        format="json",
+    )
+
+    assert response.status_code == 403
+    item.refresh_from_db()
+    assert item.multipart_upload_id is None
+
+
+def test_api_item_upload_parts_on_wrong_upload_state():
+    """Users should not be allowed to upload parts of a file that is not pending."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE,
+        filename="my_file.txt",
+        update_upload_state=ItemUploadStateChoices.READY,
+        users=[(user, "owner")],
+    )
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 1, "part_numbers": [1]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_upload_state_not_pending"
+
+
+@pytest.mark.parametrize("part_numbers", [[], [0], [10001], [1, 2, 3]])
+def test_api_item_upload_parts_invalid_part_numbers(part_numbers, settings):
+    """Part numbers should be valid and not exceed the size of a batch."""
+    settings.ITEM_UPLOAD_PARTS_BATCH_SIZE = 2
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", users=[(user, "owner")]
+    )
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 10000, "part_numbers": part_numbers},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["attr"].startswith("part_numbers")
+    item.refresh_from_db()
+    assert item.multipart_upload_id is None
+
+
+def test_api_item_upload_parts_success():
+    """
+    The multipart upload should be created on the first call and reused by the next ones,
+    each call returning a presigned url per part.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", size=24, users=[(user, "owner")]
+    )
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 3, "part_numbers": [2, 1, 2]},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    item.refresh_from_db()
+    assert item.multipart_upload_id is not None
+    parts = response.json()["parts"]
+    assert [part["part_number"] for part in parts] == [1, 2]
+    for part in parts:
+        url = urlparse(part["url"])
+        assert url.path.endswith(item.file_key)
+        assert parse_qs(url.query)["partNumber"] == [str(part["part_number"])]
+        assert parse_qs(url.query)["uploadId"] == [item.multipart_upload_id]
+        # The size of the part is signed
+        assert parse_qs(url.query)["X-Amz-SignedHeaders"] == ["content-length;host"]
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 3, "part_numbers": [3]},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    url = urlparse(response.json()["parts"][0]["url"])
+    assert parse_qs(url.query)["uploadId"] == [item.multipart_upload_id]
+    upload_id = item.multipart_upload_id
+    item.refresh_from_db()
+    assert item.multipart_upload_id == upload_id
+
+
+def test_api_item_upload_parts_upload_ended_completes_upload():
+    """Ending the upload should assemble the parts received by the object storage."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", size=8, users=[(user, "owner")]
+    )
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 1, "part_numbers": [1]},
+        format="json",
+    )
+    assert response.status_code == 200
+    item.refresh_from_db()
+
+    default_storage.connection.meta.client.upload_part(
+        Bucket=default_storage.bucket_name,
+        Key=item.file_key,
+        UploadId=item.multipart_upload_id,
+        PartNumber=1,
+        Body=BytesIO(b"my prose"),
+    )
+
+    with mock.patch.object(malware_detection, "analyse_file") as mock_analyse_file:
+        response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
+
+    assert response.status_code == 200
+    mock_analyse_file.assert_called_once_with(item.file_key, item_id=item.id)
+    item.refresh_from_db()
+    assert item.multipart_upload_id is None
+    assert item.upload_state == ItemUploadStateChoices.ANALYZING
+    assert item.size == 8
+    with default_storage.open(item.file_key) as file:
+        assert file.read() == b"my prose"
+
+
+def test_api_item_upload_parts_upload_ended_without_parts():
+    """Ending a multipart upload for which no part was received should fail."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", size=8, users=[(user, "owner")]
+    )
+    client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 1, "part_numbers": [1]},
+        format="json",
+    )
+
+    response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "multipart_upload_incomplete"
+    item.refresh_from_db()
+    assert item.multipart_upload_id is not None
+    assert item.upload_state == ItemUploadStateChoices.PENDING
+
+
+def test_api_item_upload_parts_parts_count_mismatch():
+    """The number of parts should not change once the multipart upload is created."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", size=16, users=[(user, "owner")]
+    )
+    url = f"/api/v1.0/items/{item.id!s}/upload-parts/"
+    client.post(url, {"parts_count": 2, "part_numbers": [1]}, format="json")
+
+    response = client.post(url, {"parts_count": 3, "part_numbers": [3]}, format="json")
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "multipart_upload_parts_count_mismatch"
+    item.refresh_from_db()
+    assert item.multipart_parts_count == 2
+
+
+def test_api_item_upload_parts_part_number_above_parts_count():
+    """Part numbers should not exceed the number of parts of the file."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", users=[(user, "owner")]
+    )
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": 2, "part_numbers": [2, 3]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["attr"] == "part_numbers"
+    item.refresh_from_db()
+    assert item.multipart_upload_id is None
+
+
+@pytest.mark.parametrize(
+    "parts_count,size",
+    [
+        # A part is missing
+        (2, 16),
+        # A part does not have the size expected
+        (1, 5),
+    ],
+)
+def test_api_item_upload_parts_upload_ended_unexpected_parts(parts_count, size):
+    """Ending a multipart upload should fail unless all the parts expected were received."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", size=size, users=[(user, "owner")]
+    )
+    client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": parts_count, "part_numbers": [1]},
+        format="json",
+    )
+    item.refresh_from_db()
+
+    default_storage.connection.meta.client.upload_part(
+        Bucket=default_storage.bucket_name,
+        Key=item.file_key,
+        UploadId=item.multipart_upload_id,
+        PartNumber=1,
+        Body=BytesIO(b"my prose"),
+    )
+
+    response = client.post(f"/api/v1.0/items/{item.id!s}/upload-ended/")
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "multipart_upload_incomplete"
+    item.refresh_from_db()
+    assert item.upload_state == ItemUploadStateChoices.PENDING
+
+
+@pytest.mark.parametrize(
+    "parts_count,size",
+    [
+        # The size of the file is unknown
+        (1, None),
+        # The last part would be empty
+        (4, 9),
+        (1, 0),
+    ],
+)
+def test_api_item_upload_parts_invalid_parts_count(parts_count, size):
+    """Files should only be uploaded by parts if they can be split in that number of parts."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(
+        type=ItemTypeChoices.FILE, filename="my_file.txt", size=size, users=[(user, "owner")]
+    )
+
+    response = client.post(
+        f"/api/v1.0/items/{item.id!s}/upload-parts/",
+        {"parts_count": parts_count, "part_numbers": [1]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "multipart_upload_parts_count_invalid"
+    item.refresh_from_db()
+    assert item.multipart_upload_id is None
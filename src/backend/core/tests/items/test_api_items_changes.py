@@ -0,0 +1,218 @@
+"""
+Tests for items API endpoint in drive's core app: changes since a cursor
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from django.utils import timezone
+
+import pytest
+from freezegun import freeze_time
+from rest_framework.test import APIClient
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def decode_cursor(cursor):
+    """Return the position in the change log encoded in a cursor."""
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))["p"]
+
+
+def get_changes(client, item, cursor):
+    """Return the content of the changes of an item since the cursor."""
+    response = client.get(f"/api/v1.0/items/{item.id!s}/changes/?cursor={cursor:s}")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_api_items_changes_anonymous_restricted():
+    """Anonymous users should not be allowed to list the changes of a restricted item."""
+    item = factories.ItemFactory(link_reach="restricted", type=models.ItemTypeChoices.FOLDER)
+
+    response = APIClient().get(f"/api/v1.0/items/{item.id!s}/changes/")
+
+    assert response.status_code == 401
+
+
+def test_api_items_changes_authenticated_no_access():
+    """Users without access should not be allowed to list the changes of a restricted item."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    item = factories.ItemFactory(link_reach="restricted", type=models.ItemTypeChoices.FOLDER)
+
+    response = client.get(f"/api/v1.0/items/{item.id!s}/changes/")
+
+    assert response.status_code == 403
+
+
+def test_api_items_changes_without_cursor():
+    """Without cursor, only the current position in the change log should be returned."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+
+    response = client.get(f"/api/v1.0/items/{folder.id!s}/changes/")
+
+    assert response.status_code == 200
+    content = response.json()
+    assert decode_cursor(content["cursor"]) == models.ItemChange.objects.latest("id").id
+    assert content["has_more"] is False
+    assert content["results"] == []
+    assert get_changes(client, folder, content["cursor"])["results"] == []
+
+
+def test_api_items_changes_since_cursor():
+    """Changes made in the subtree after the cursor should be listed in order."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    other_folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    child = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+    moved_child = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+
+    cursor = client.get(f"/api/v1.0/items/{folder.id!s}/changes/").json()["cursor"]
+
+    new_child = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+    child.title = "new title"
+    child.save()
+    factories.UserItemAccessFactory(item=child)
+    moved_child.move(other_folder)
+    new_child.soft_delete()
+    # Changes outside of the subtree should not be listed
+    factories.ItemFactory(parent=other_folder, type=models.ItemTypeChoices.FOLDER)
+
+    content = get_changes(client, folder, cursor)
+
+    assert content["has_more"] is False
+    assert [(change["item_id"], change["kind"]) for change in content["results"]] == [
+        (str(new_child.id), "created"),
+        (str(child.id), "updated"),
+        (str(child.id), "accesses"),
+        (str(moved_child.id), "moved"),
+        (str(new_child.id), "deleted"),
+    ]
+    assert decode_cursor(content["cursor"]) == content["results"][-1]["id"]
+
+    # The path where the item was moved to, out of the subtree, is not disclosed
+    moved_change = content["results"][3]
+    assert moved_change["path"] is None
+    assert moved_change["previous_path"] == f"{folder.path!s}.{moved_child.id!s}"
+
+    # The current state of the items still listed in the subtree is returned
+    items = [change["item"] for change in content["results"]]
+    assert items[1]["title"] == "new title"
+    assert items[2] == items[1]
+    assert items[0] is None
+    assert items[3] is None
+    assert items[4] is None
+
+    assert get_changes(client, folder, content["cursor"])["results"] == []
+
+
+def test_api_items_changes_ancestor_moved():
+    """Changes recorded before an ancestor was moved should still be listed."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    root = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    target = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+    parent = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+    folder = factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FOLDER)
+
+    cursor = client.get(f"/api/v1.0/items/{folder.id!s}/changes/").json()["cursor"]
+
+    child = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+    parent.move(target)
+
+    content = get_changes(client, folder, cursor)
+
+    assert [(change["item_id"], change["kind"]) for change in content["results"]] == [
+        (str(child.id), "created"),
+    ]
+    assert content["results"][0]["item"]["id"] == str(child.id)
+
+
+def test_api_items_changes_has_more(settings):
+    """Changes should be returned by pages of the configured size."""
+    settings.ITEM_CHANGES_PAGE_SIZE = 2
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+
+    cursor = client.get(f"/api/v1.0/items/{folder.id!s}/changes/").json()["cursor"]
+    children = factories.ItemFactory.create_batch(
+        3, parent=folder, type=models.ItemTypeChoices.FOLDER
+    )
+
+    first_page = get_changes(client, folder, cursor)
+    second_page = get_changes(client, folder, first_page["cursor"])
+
+    assert first_page["has_more"] is True
+    assert second_page["has_more"] is False
+    assert [change["item_id"] for change in first_page["results"] + second_page["results"]] == [
+        str(child.id) for child in children
+    ]
+
+
+def test_api_items_changes_invalid_cursor():
+    """An invalid cursor should return a 404."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+
+    response = client.get(f"/api/v1.0/items/{folder.id!s}/changes/?cursor=invalid")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_api_items_changes_moved_in():
+    """The path where an item was moved from, out of the subtree, should not be disclosed."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    other_folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    child = factories.ItemFactory(parent=other_folder, type=models.ItemTypeChoices.FOLDER)
+
+    cursor = client.get(f"/api/v1.0/items/{folder.id!s}/changes/").json()["cursor"]
+
+    child.move(folder)
+
+    (change,) = get_changes(client, folder, cursor)["results"]
+    assert change["kind"] == "moved"
+    assert change["path"] == f"{folder.path!s}.{child.id!s}"
+    assert change["previous_path"] is None
+
+
+def test_api_items_changes_expired_cursor(settings):
+    """Cursors older than the retention of the changes should be refused."""
+    settings.ITEM_CHANGES_RETENTION_DAYS = 30
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+
+    cursor = client.get(f"/api/v1.0/items/{folder.id!s}/changes/").json()["cursor"]
+
+    with freeze_time(timezone.now() + timedelta(days=29)):
+        cursor = get_changes(client, folder, cursor)["cursor"]
+
+    with freeze_time(timezone.now() + timedelta(days=31)):
+        assert get_changes(client, folder, cursor)["results"] == []
+
+    with freeze_time(timezone.now() + timedelta(days=60)):
+        response = client.get(f"/api/v1.0/items/{folder.id!s}/changes/?cursor={cursor:s}")
+
+    assert response.status_code == 400
+    assert response.json() == {"cursor": ["This cursor expired, items must be listed again."]}
@@ -132,6 +132,7 @@ def test_api_items_children_create_authenticated_success(reach, role, depth):
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file.txt",
+            "size": 8,
         },
     )
 
@@ -203,6 +204,7 @@ def test_api_items_children_create_related_success(role, depth):
             {
                 "type": ItemTypeChoices.FILE,
                 "filename": "file.txt",
+                "size": 8,
             },
         )
 
@@ -262,6 +264,7 @@ def test_api_items_children_create_related_success_override_s3_endpoint(settings
             {
                 "type": ItemTypeChoices.FILE,
                 "filename": "file.txt",
+                "size": 8,
             },
         )
 
@@ -311,6 +314,7 @@ def test_api_items_children_create_file_extension_not_allowed(settings):
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file.notallowed",
+            "size": 8,
         },
     )
 
@@ -344,6 +348,7 @@ def test_api_items_children_create_file_extension_not_allowed_not_checking_exten
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file.notallowed",
+            "size": 8,
         },
     )
     assert response.status_code == 201
@@ -369,6 +374,7 @@ def test_api_items_children_create_force_id_success():
             "title": "my item",
             "type": ItemTypeChoices.FILE,
             "filename": "file.txt",
+            "size": 8,
         },
         format="json",
     )
@@ -397,6 +403,7 @@ def test_api_items_children_create_force_id_existing():
             "title": "my item",
             "type": ItemTypeChoices.FILE,
             "filename": "file.txt",
+            "size": 8,
         },
         format="json",
     )
@@ -436,6 +443,7 @@ def test_api_items_children_create_not_a_folder():
         {
             "type": "file",
             "filename": "file.txt",
+            "size": 8,
         },
         format="json",
     )
@@ -574,6 +582,7 @@ def test_api_items_children_create_entitlements_backend_returns_falsy(
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file.txt",
+            "size": 8,
         },
     )
     assert response.status_code == 403
@@ -615,6 +624,7 @@ def test_api_items_children_create_related_success_sanitize_filename(
             {
                 "type": ItemTypeChoices.FILE,
                 "filename": "><img src=x onerror=alert()>␊.txt",
+                "size": 8,
             },
         )
 
@@ -677,6 +687,7 @@ def test_api_items_children_create_related_invalid_filename(
             {
                 "type": ItemTypeChoices.FILE,
                 "filename": "!@#$%^&*().txt",
+                "size": 8,
             },
         )
 
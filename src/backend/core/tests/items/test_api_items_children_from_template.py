@@ -249,12 +249,12 @@ def test_api_items_children_from_template_empty_title():
     }
 
 
-@mock.patch("core.api.viewsets.default_storage")
-def test_api_items_children_from_template_storage_error(mock_storage):
+@mock.patch("core.api.viewsets.get_storage_gateway")
+def test_api_items_children_from_template_storage_error(mock_get_storage_gateway):
     """
     Test that storage errors are handled properly and the item is cleaned up.
     """
-    mock_storage.save.side_effect = Exception("Storage unavailable")
+    mock_get_storage_gateway.return_value.put_stream.side_effect = Exception("Storage unavailable")
 
     user = factories.UserFactory()
 
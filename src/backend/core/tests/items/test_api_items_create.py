@@ -103,6 +103,7 @@ def test_api_items_create_file_authenticated_success():
             {
                 "type": ItemTypeChoices.FILE,
                 "filename": "file.txt",
+                "size": 8,
             },
             format="json",
         )
@@ -137,6 +138,90 @@ def test_api_items_create_file_authenticated_success():
     assert len(query_params) == 0
 
 
+def test_api_items_create_file_authenticated_size_signed():
+    """The size declared when creating a file should be signed in its upload policy."""
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    response = client.post(
+        "/api/v1.0/items/",
+        {
+            "type": ItemTypeChoices.FILE,
+            "filename": "file.txt",
+            "size": 8,
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    item = Item.objects.get()
+    assert item.size == 8
+    assert item.upload_state == "pending"
+    assert response.json()["size"] == 8
+
+    query_params = parse_qs(urlparse(response.json()["policy"]).query)
+    assert query_params["X-Amz-SignedHeaders"] == ["content-length;host;x-amz-acl"]
+
+
+def test_api_items_create_file_authenticated_size_exceeded(settings):
+    """Files declared larger than the allowed max size should be refused before their upload."""
+    settings.DATA_UPLOAD_MAX_MEMORY_SIZE = 7
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    response = client.post(
+        "/api/v1.0/items/",
+        {
+            "type": ItemTypeChoices.FILE,
+            "filename": "file.txt",
+            "size": 8,
+        },
+        format="json",
+    )
+    assert response.status_code == 400
+    assert response.json() == {
+        "type": "validation_error",
+        "errors": [
+            {
+                "code": "item_create_file_size_exceeded",
+                "detail": "The file size is higher than the allowed max size.",
+                "attr": "size",
+            }
+        ],
+    }
+    assert not Item.objects.exists()
+
+
+def test_api_items_create_file_authenticated_without_size():
+    """
+    Files can be created without declaring their size, their upload policy then does not
+    sign any size and the size is checked when the upload is finalized.
+    """
+    user = factories.UserFactory()
+
+    client = APIClient()
+    client.force_login(user)
+
+    response = client.post(
+        "/api/v1.0/items/",
+        {
+            "type": ItemTypeChoices.FILE,
+            "filename": "file.txt",
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    item = Item.objects.get()
+    assert item.size is None
+    assert item.upload_state == "pending"
+
+    query_params = parse_qs(urlparse(response.json()["policy"]).query)
+    assert query_params["X-Amz-SignedHeaders"] == ["host;x-amz-acl"]
+
+
 def test_api_items_create_file_authenticated_extension_not_allowed():
     """
     Creating a file item with an extension not allowed should fail.
@@ -149,6 +234,7 @@ def test_api_items_create_file_authenticated_extension_not_allowed():
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file.notallowed",
+            "size": 8,
         },
         format="json",
     )
@@ -177,6 +263,7 @@ def test_api_items_create_file_authenticated_extension_case_insensitive():
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file.JPG",
+            "size": 8,
         },
         format="json",
     )
@@ -198,6 +285,7 @@ def test_api_items_create_file_authenticated_not_checking_extension(settings):
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file.notallowed",
+            "size": 8,
         },
         format="json",
     )
@@ -221,6 +309,7 @@ def test_api_items_create_file_authenticated_no_extension_but_checking_it_should
         {
             "type": ItemTypeChoices.FILE,
             "filename": "file",
+            "size": 8,
         },
         format="json",
     )
@@ -252,6 +341,7 @@ def test_api_items_create_file_authenticated_hidden_file_but_checking_extension_
         {
             "type": ItemTypeChoices.FILE,
             "filename": ".file",
+            "size": 8,
         },
     )
 
@@ -395,6 +485,7 @@ def test_api_items_create_file_authenticated_success_invalid_filename():
             {
                 "type": ItemTypeChoices.FILE,
                 "filename": "><img src=x onerror=alert()>␊.txt",
+                "size": 8,
             },
             format="json",
         )
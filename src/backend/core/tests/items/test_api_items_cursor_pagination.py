@@ -0,0 +1,141 @@
+"""
+Tests for items API endpoint in drive's core app: keyset (cursor) pagination
+"""
+
+from unittest import mock
+
+import pytest
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def browse(client, url):
+    """Follow the next links from the url and return the ids of the pages."""
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        content = response.json()
+        assert "count" not in content
+        pages.append([result["id"] for result in content["results"]])
+        url = content["next"]
+    return pages
+
+
+@mock.patch.object(PageNumberPagination, "get_page_size", return_value=2)
+def test_api_items_cursor_pagination_children(_mock_page_size):
+    """Children should be browsable with cursors, in order and without duplicates."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    root = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    children = factories.ItemFactory.create_batch(
+        5, parent=root, type=models.ItemTypeChoices.FOLDER
+    )
+    # Items sharing the same title are ordered by the extra ordering then by id
+    for child in children[:3]:
+        child.title = "same title"
+        child.save()
+
+    items = sorted(models.Item.objects.filter(parent_id=root.id), key=lambda i: str(i.id))
+    items.sort(key=lambda i: i.updated_at, reverse=True)
+    items.sort(key=lambda i: i.title)
+    expected = [str(item.id) for item in items]
+
+    pages = browse(client, f"/api/v1.0/items/{root.id}/children/?ordering=title&cursor=")
+
+    assert pages == [expected[0:2], expected[2:4], expected[4:5]]
+
+
+@mock.patch.object(PageNumberPagination, "get_page_size", return_value=2)
+def test_api_items_cursor_pagination_previous(_mock_page_size):
+    """The previous link should return the page located before the current one."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    root = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory.create_batch(5, parent=root, type=models.ItemTypeChoices.FOLDER)
+
+    response = client.get(f"/api/v1.0/items/{root.id}/children/?cursor=")
+    first_page = response.json()
+    assert first_page["previous"] is None
+
+    response = client.get(first_page["next"])
+    second_page = response.json()
+
+    response = client.get(second_page["previous"])
+    content = response.json()
+    assert [result["id"] for result in content["results"]] == [
+        result["id"] for result in first_page["results"]
+    ]
+    assert content["previous"] is None
+    assert content["next"] == first_page["next"]
+
+
+@mock.patch.object(PageNumberPagination, "get_page_size", return_value=2)
+def test_api_items_cursor_pagination_nullable_ordering(_mock_page_size):
+    """Items with NULL values in the ordering field should be listed last."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    root = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    folders = factories.ItemFactory.create_batch(
+        3, parent=root, type=models.ItemTypeChoices.FOLDER, size=None
+    )
+    files = factories.ItemFactory.create_batch(
+        2,
+        parent=root,
+        type=models.ItemTypeChoices.FILE,
+        upload_state=models.ItemUploadStateChoices.READY,
+        size=100,
+    )
+
+    pages = browse(client, f"/api/v1.0/items/{root.id}/children/?ordering=-size&cursor=")
+
+    ids = [item_id for page in pages for item_id in page]
+    assert len(ids) == 5
+    assert set(ids[:2]) == {str(file.id) for file in files}
+    assert set(ids[2:]) == {str(folder.id) for folder in folders}
+
+
+@mock.patch.object(PageNumberPagination, "get_page_size", return_value=2)
+def test_api_items_cursor_pagination_recents_constant_queries(
+    _mock_page_size, django_assert_num_queries
+):
+    """Fetching a page by cursor should not depend on its position or count the items."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    root = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory.create_batch(7, parent=root, type=models.ItemTypeChoices.FOLDER)
+
+    response = client.get("/api/v1.0/items/recents/?cursor=")
+    next_url = client.get(response.json()["next"]).json()["next"]
+
+    with django_assert_num_queries(3):
+        first_page = client.get("/api/v1.0/items/recents/?cursor=")
+    with django_assert_num_queries(3):
+        third_page = client.get(next_url)
+
+    assert len(first_page.json()["results"]) == 2
+    assert len(third_page.json()["results"]) == 2
+
+
+def test_api_items_cursor_pagination_invalid_cursor():
+    """An invalid cursor should return a 404."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    response = client.get("/api/v1.0/items/recents/?cursor=invalid")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Invalid cursor"}
@@ -0,0 +1,131 @@
+"""
+Tests for items API endpoint in drive's core app: soft delete and restore of large folders
+in background
+"""
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import factories, models
+from core.tasks.item import process_item_background_task
+
+pytestmark = pytest.mark.django_db
+
+
+def create_tree(user):
+    """Create a folder owned by the user with 4 descendants on 2 levels."""
+    folder = factories.ItemFactory(users=[(user, "owner")], type=models.ItemTypeChoices.FOLDER)
+    subfolders = factories.ItemFactory.create_batch(
+        2, parent=folder, type=models.ItemTypeChoices.FOLDER
+    )
+    leaves = [
+        factories.ItemFactory(parent=subfolder, type=models.ItemTypeChoices.FOLDER)
+        for subfolder in subfolders
+    ]
+    return folder, [*subfolders, *leaves]
+
+
+def test_api_items_delete_background_large_folder(settings):
+    """
+    The deletion of folders with more descendants than the threshold should be marked on
+    the descendants by batches in a background task.
+    """
+    settings.ITEM_BACKGROUND_TASK_THRESHOLD = 4
+    settings.ITEM_BACKGROUND_TASK_BATCH_SIZE = 3
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, descendants = create_tree(user)
+
+    response = client.delete(f"/api/v1.0/items/{folder.id!s}/")
+
+    assert response.status_code == 204
+
+    background_task = models.ItemBackgroundTask.objects.get(item=folder)
+    assert background_task.kind == "soft_delete"
+    assert background_task.status == "completed"
+    assert background_task.processed == background_task.total == 4
+
+    folder.refresh_from_db()
+    for descendant in descendants:
+        descendant.refresh_from_db()
+        assert descendant.deleted_at is None
+        assert descendant.ancestors_deleted_at == folder.deleted_at
+        assert descendant.numchild == 0
+
+
+def test_api_items_delete_background_descendants_hidden():
+    """Descendants should be hidden while the deletion is marked on them."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, descendants = create_tree(user)
+
+    # The task is created but not run yet
+    background_task = folder.soft_delete(in_background=True)
+
+    response = client.get(f"/api/v1.0/items/{descendants[-1].id!s}/")
+    assert response.status_code == 404
+
+    response = client.get("/api/v1.0/items/recents/")
+    assert response.status_code == 200
+    assert response.json()["results"] == []
+
+    # The deleted folder itself is still found by its owner
+    response = client.get(f"/api/v1.0/items/{folder.id!s}/")
+    assert response.status_code == 200
+
+    process_item_background_task(background_task.id)
+
+    descendants[-1].refresh_from_db()
+    assert descendants[-1].ancestors_deleted_at is not None
+
+
+def test_api_items_restore_background_large_folder(settings):
+    """
+    The descendants of folders with more descendants than the threshold should be restored
+    by batches in a background task.
+    """
+    settings.ITEM_BACKGROUND_TASK_THRESHOLD = 4
+    settings.ITEM_BACKGROUND_TASK_BATCH_SIZE = 3
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, descendants = create_tree(user)
+    # Items deleted before the folder should stay deleted
+    factories.ItemFactory(parent=descendants[0], type=models.ItemTypeChoices.FILE).soft_delete()
+    folder.soft_delete()
+
+    response = client.post(f"/api/v1.0/items/{folder.id!s}/restore/")
+
+    assert response.status_code == 202
+    content = response.json()
+    assert content["detail"] == "item restoration in progress."
+
+    background_task = models.ItemBackgroundTask.objects.get(id=content["background_task_id"])
+    assert background_task.kind == "restore"
+    assert background_task.status == "completed"
+    assert background_task.processed == 4
+
+    folder.refresh_from_db()
+    assert folder.deleted_at is None
+    assert folder.numchild == folder.numchild_folder == 2
+    for descendant in descendants:
+        descendant.refresh_from_db()
+        assert descendant.ancestors_deleted_at is None
+        assert descendant.numchild == (1 if descendant in descendants[:2] else 0)
+
+
+def test_api_items_delete_background_tree_locked():
+    """Restoring a folder should be refused while its deletion is marked on descendants."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, _descendants = create_tree(user)
+
+    folder.soft_delete(in_background=True)
+
+    response = client.post(f"/api/v1.0/items/{folder.id!s}/restore/")
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_background_task_in_progress"
@@ -2,8 +2,11 @@
 Test the item duplicate action API endpoint in drive's core app.
 """
 
+from io import BytesIO
 from unittest import mock
 
+from django.core.files.storage import default_storage
+
 import pytest
 from rest_framework.test import APIClient
 
@@ -167,20 +170,84 @@ def test_api_items_duplicate_via_user_or_team(via, mock_user_teams):
     mock_delay.assert_called_once()
 
 
-def test_api_items_duplicate_folder_not_allowed():
-    """Folders cannot be duplicated."""
+def test_api_items_duplicate_folder():
+    """
+    Duplicating a folder should return its copy at once and duplicate its alive content
+    in a background task, copying the files that are ready.
+    """
     user = factories.UserFactory()
     client = APIClient()
     client.force_login(user)
 
-    item = factories.ItemFactory(
-        type=models.ItemTypeChoices.FOLDER,
-        users=[(user, "owner")],
+    folder = factories.ItemFactory(
+        title="my folder", type=models.ItemTypeChoices.FOLDER, users=[(user, "owner")]
     )
+    subfolder = factories.ItemFactory(
+        title="subfolder", parent=folder, type=models.ItemTypeChoices.FOLDER
+    )
+    file = factories.ItemFactory(
+        title="file",
+        parent=subfolder,
+        type=models.ItemTypeChoices.FILE,
+        filename="file.txt",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    default_storage.save(file.file_key, BytesIO(b"my prose"))
+    factories.ItemFactory(
+        title="pending",
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.PENDING,
+    )
+    deleted = factories.ItemFactory(
+        title="deleted", parent=folder, type=models.ItemTypeChoices.FOLDER
+    )
+    deleted.soft_delete()
 
-    response = client.post(f"/api/v1.0/items/{item.id!s}/duplicate/")
+    response = client.post(f"/api/v1.0/items/{folder.id!s}/duplicate/")
 
-    assert response.status_code == 403
+    assert response.status_code == 201
+    assert response.json()["title"] == "Copy of my folder"
+    assert response.json()["type"] == models.ItemTypeChoices.FOLDER
+
+    copy = models.Item.objects.get(id=response.json()["id"])
+    assert copy.get_role(user) == models.RoleChoices.OWNER
+    background_task = copy.background_tasks.get()
+    assert background_task.kind == models.ItemBackgroundTaskKindChoices.DUPLICATE
+    assert background_task.status == models.ItemBackgroundTaskStatusChoices.COMPLETED
+    assert background_task.processed == background_task.total == 2
+
+    assert copy.numchild == copy.numchild_folder == 1
+    (subfolder_copy,) = copy.children()
+    assert subfolder_copy.title == "subfolder"
+    assert subfolder_copy.numchild == 1
+    (file_copy,) = subfolder_copy.children()
+    assert file_copy.title == "file"
+    assert file_copy.creator == user
+    assert file_copy.upload_state == models.ItemUploadStateChoices.READY
+    assert file_copy.file_key != file.file_key
+    with default_storage.open(file_copy.file_key) as copied_file:
+        assert copied_file.read() == b"my prose"
+
+    # The copies inherit the roles of the user
+    assert file_copy.get_role(user) == models.RoleChoices.OWNER
+
+
+def test_api_items_duplicate_folder_background_task_in_progress():
+    """A folder can not be duplicated while a background task rewrites its tree."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER, users=[(user, "owner")])
+    models.ItemBackgroundTask.objects.create(
+        item=folder, kind=models.ItemBackgroundTaskKindChoices.SOFT_DELETE
+    )
+
+    response = client.post(f"/api/v1.0/items/{folder.id!s}/duplicate/")
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_background_task_in_progress"
 
 
 @pytest.mark.parametrize(
@@ -409,6 +476,33 @@ def test_api_items_duplicate_deleted_item():
     assert response.status_code == 403
 
 
+def test_api_items_duplicate_blob():
+    """Duplicating a file stored in a blob should reference the blob without copying it."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    blob = models.Blob.objects.create(sha256="a" * 64, size=8)
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        filename="myfile.txt",
+        blob=blob,
+        users=[(user, "owner")],
+    )
+
+    with mock.patch("core.tasks.item.duplicate_file.delay") as mock_delay:
+        response = client.post(f"/api/v1.0/items/{item.id!s}/duplicate/")
+
+    assert response.status_code == 201
+    mock_delay.assert_not_called()
+
+    duplicated_item = models.Item.objects.get(id=response.json()["id"])
+    assert duplicated_item.blob == blob
+    assert duplicated_item.upload_state == models.ItemUploadStateChoices.READY
+    assert duplicated_item.file_key == item.file_key
+
+
 # Posthog events
 
 
@@ -0,0 +1,187 @@
+"""
+Tests for items API endpoint in drive's core app: conditional requests with ETags
+"""
+
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def get_client(user):
+    """Return an API client logged in as the given user."""
+    client = APIClient()
+    client.force_login(user)
+    return client
+
+
+@pytest.mark.parametrize(
+    "url_suffix",
+    ["", "children/", "tree/", "breadcrumb/"],
+)
+def test_api_items_etag_not_modified(url_suffix):
+    """A request sending the ETag of an unchanged response should get a 304."""
+    user = factories.UserFactory()
+    client = get_client(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+
+    url = f"/api/v1.0/items/{folder.id!s}/{url_suffix:s}"
+    response = client.get(url)
+
+    assert response.status_code == 200
+    etag = response["ETag"]
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    assert response.content == b""
+
+
+def test_api_items_etag_not_modified_skips_listing():
+    """Answering with a 304 should not query the children of the item."""
+    user = factories.UserFactory()
+    client = get_client(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory.create_batch(3, parent=folder, type=models.ItemTypeChoices.FOLDER)
+
+    url = f"/api/v1.0/items/{folder.id!s}/children/"
+    with CaptureQueriesContext(connection) as full_queries:
+        etag = client.get(url)["ETag"]
+
+    with CaptureQueriesContext(connection) as conditional_queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert len(conditional_queries) < len(full_queries)
+
+
+def test_api_items_etag_children_changes():
+    """The ETag of the children should change when a child or its accesses change."""
+    user = factories.UserFactory()
+    client = get_client(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    child = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+
+    url = f"/api/v1.0/items/{folder.id!s}/children/"
+    etags = [client.get(url)["ETag"]]
+
+    # A child is renamed
+    child.title = "new title"
+    child.save()
+    etags.append(client.get(url)["ETag"])
+
+    # A child gets an access
+    factories.UserItemAccessFactory(item=child)
+    etags.append(client.get(url)["ETag"])
+
+    # A child is added to the folder
+    factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+    etags.append(client.get(url)["ETag"])
+
+    # A child is deleted
+    child.soft_delete()
+    etags.append(client.get(url)["ETag"])
+
+    # The query string changes
+    etags.append(client.get(f"{url:s}?ordering=title")["ETag"])
+
+    assert len(set(etags)) == len(etags)
+
+
+def test_api_items_etag_ancestor_access_changes():
+    """The ETag of an item should change when the accesses on an ancestor change."""
+    user = factories.UserFactory()
+    client = get_client(user)
+    root = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    folder = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+
+    url = f"/api/v1.0/items/{folder.id!s}/"
+    etag = client.get(url)["ETag"]
+
+    factories.UserItemAccessFactory(item=root)
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_api_items_etag_per_user():
+    """Users sharing an item should not share its ETag."""
+    user, other_user = factories.UserFactory.create_batch(2)
+    folder = factories.ItemFactory(users=[user, other_user], type=models.ItemTypeChoices.FOLDER)
+
+    url = f"/api/v1.0/items/{folder.id!s}/"
+    etag = get_client(user).get(url)["ETag"]
+
+    response = get_client(other_user).get(url, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_api_items_etag_favorite():
+    """Marking an item as favorite should change the ETag of the item."""
+    user = factories.UserFactory()
+    client = get_client(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+
+    url = f"/api/v1.0/items/{folder.id!s}/"
+    etag = client.get(url)["ETag"]
+
+    client.post(f"{url:s}favorite/")
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["is_favorite"] is True
+
+
+@pytest.mark.parametrize("method", ["post", "delete"])
+def test_api_items_etag_favorite_bumped_after_write(method):
+    """
+    The version of the item should be bumped once the favorite changed, a concurrent request
+    could otherwise cache the former favorite status under the new version.
+    """
+    user = factories.UserFactory()
+    client = get_client(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    if method == "delete":
+        models.ItemFavorite.objects.create(item=folder, user=user)
+
+    def assert_favorite_written(_item_ids):
+        assert models.ItemFavorite.objects.filter(item=folder).exists() is (method == "post")
+
+    with mock.patch.object(
+        models, "bump_items_version", side_effect=assert_favorite_written
+    ) as mock_bump:
+        getattr(client, method)(f"/api/v1.0/items/{folder.id!s}/favorite/")
+
+    mock_bump.assert_called_once()
+
+
+def test_api_items_etag_bumped_on_commit(django_capture_on_commit_callbacks):
+    """
+    The version of an item should be bumped again once a change is committed, a concurrent
+    request may have computed its ETag from the rows read before the commit.
+    """
+    user = factories.UserFactory()
+    client = get_client(user)
+    folder = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+
+    url = f"/api/v1.0/items/{folder.id!s}/children/"
+    with django_capture_on_commit_callbacks(execute=True):
+        factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+        # A concurrent request stores a new version before the commit
+        etag = client.get(url)["ETag"]
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
@@ -6,6 +6,7 @@ import random
 from datetime import timedelta
 from unittest import mock
 
+from django.core.cache import cache
 from django.utils import timezone
 
 import pytest
@@ -285,11 +286,11 @@ def test_api_items_list_authenticated_direct(django_assert_num_queries):
         str(child4_with_access.id),
     }
 
-    with django_assert_num_queries(11):
+    with django_assert_num_queries(10):
         response = client.get("/api/v1.0/items/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(7):
+    # nb_accesses and accessible items should now be cached
+    with django_assert_num_queries(5):
         response = client.get("/api/v1.0/items/")
 
     assert response.status_code == 200
@@ -328,8 +329,8 @@ def test_api_items_list_authenticated_via_team(django_assert_num_queries, mock_u
     with django_assert_num_queries(10):
         response = client.get("/api/v1.0/items/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(5):
+    # nb_accesses and accessible items should now be cached
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/items/")
 
     assert response.status_code == 200
@@ -369,11 +370,11 @@ def test_api_items_list_authenticated_link_reach_restricted(
     folder_item = factories.ItemFactory(link_reach="public", type=models.ItemTypeChoices.FOLDER)
     models.LinkTrace.objects.create(item=folder_item, user=user)
 
-    with django_assert_num_queries(8):
+    with django_assert_num_queries(7):
         response = client.get("/api/v1.0/items/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(6):
+    # nb_accesses and accessible items should now be cached
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/items/")
 
     assert response.status_code == 200
@@ -427,11 +428,11 @@ def test_api_items_list_authenticated_link_reach_public_or_authenticated(
         str(visible_child.id),
     }
 
-    with django_assert_num_queries(12):
+    with django_assert_num_queries(10):
         response = client.get("/api/v1.0/items/")
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(9):
+    # nb_accesses and accessible items should now be cached
+    with django_assert_num_queries(5):
         response = client.get("/api/v1.0/items/")
 
     assert response.status_code == 200
@@ -535,8 +536,8 @@ def test_api_items_list_favorites_no_extra_queries(django_assert_num_queries):
     with django_assert_num_queries(12):
         response = client.get(url)
 
-    # nb_accesses should now be cached
-    with django_assert_num_queries(5):
+    # nb_accesses and accessible items should now be cached
+    with django_assert_num_queries(4):
         response = client.get(url)
 
     assert response.status_code == 200
@@ -549,7 +550,7 @@ def test_api_items_list_favorites_no_extra_queries(django_assert_num_queries):
     for item in special_items:
         models.ItemFavorite.objects.create(item=item, user=user)
 
-    with django_assert_num_queries(5):
+    with django_assert_num_queries(4):
         response = client.get(url)
 
     assert response.status_code == 200
@@ -627,3 +628,107 @@ def test_api_items_list_excludes_pending_items():
     results = response.json()["results"]
     assert len(results) == 1
     assert results[0]["id"] == str(ready_item.id)
+
+
+def test_api_items_list_accessible_items_cache_invalidation():
+    """
+    The cached accessible items should be invalidated when accesses, link traces,
+    link configurations or positions of items change.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+
+    def get_listed_ids():
+        response = client.get("/api/v1.0/items/")
+        assert response.status_code == 200
+        return {result["id"] for result in response.json()["results"]}
+
+    assert get_listed_ids() == {str(item.id)}
+
+    # A new access
+    other_item = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    access = factories.UserItemAccessFactory(user=user, item=other_item)
+    assert get_listed_ids() == {str(item.id), str(other_item.id)}
+
+    # Moving the item under an item to which the user has access
+    other_item.move(item)
+    assert get_listed_ids() == {str(item.id)}
+
+    other_item.move(None)
+    assert get_listed_ids() == {str(item.id), str(other_item.id)}
+
+    # A deleted access
+    access.delete()
+    assert get_listed_ids() == {str(item.id)}
+
+    # A link trace on a public item
+    traced_item = factories.ItemFactory(link_reach="public", type=models.ItemTypeChoices.FOLDER)
+    models.LinkTrace.objects.create(item=traced_item, user=user)
+    assert get_listed_ids() == {str(item.id), str(traced_item.id)}
+
+    # The traced item becomes restricted
+    traced_item.link_reach = "restricted"
+    traced_item.save()
+    assert get_listed_ids() == {str(item.id)}
+
+
+def test_api_items_list_accessible_items_cache_teams(mock_user_teams):
+    """The cached accessible items should follow the teams of the user."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    mock_user_teams.return_value = ["team1"]
+    item = factories.ItemFactory(teams=[("team1", "reader")], type=models.ItemTypeChoices.FOLDER)
+
+    response = client.get("/api/v1.0/items/")
+    assert [result["id"] for result in response.json()["results"]] == [str(item.id)]
+
+    mock_user_teams.return_value = []
+
+    response = client.get("/api/v1.0/items/")
+    assert response.json()["results"] == []
+
+
+def test_api_items_list_accessible_items_cache_kept_on_deletion():
+    """
+    Deleting an item should not invalidate the cached accessible items of the users having
+    an access on it, deleted items being filtered out when querying.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+    cache_key = models.get_accessible_items_cache_key(user)
+
+    item.soft_delete()
+
+    assert models.get_accessible_items_cache_key(user) == cache_key
+    response = client.get("/api/v1.0/items/")
+    assert response.json()["results"] == []
+
+
+def test_api_items_list_accessible_items_cache_invalidated_on_commit(
+    django_capture_on_commit_callbacks,
+):
+    """
+    The cached accessible items should be invalidated again once a change is committed, a
+    concurrent request may have cached them from the rows read before the commit.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+
+    item = factories.ItemFactory(users=[user], type=models.ItemTypeChoices.FOLDER)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        models.ItemAccess.objects.get(item=item, user=user).delete()
+        # A concurrent request caches the access read before the commit
+        cache.set(models.get_accessible_items_cache_key(user), [str(item.path)])
+
+    response = client.get("/api/v1.0/items/")
+    assert response.json()["results"] == []
@@ -100,7 +100,7 @@ def test_api_items_list_ordering_by_fields(django_assert_num_queries):
         field = parameter.lstrip("-")
         querystring = f"?ordering={parameter}"
 
-        with django_assert_num_queries(5):
+        with django_assert_num_queries(4):
             response = client.get(f"/api/v1.0/items/{querystring:s}")
         assert response.status_code == 200
         results = response.json()["results"]
@@ -209,7 +209,7 @@ def test_api_items_list_ordering_by_creator_fullname(django_assert_num_queries):
     assert results[1]["id"] == str(item2.id)
     assert results[2]["id"] == str(item3.id)
 
-    with django_assert_num_queries(5):
+    with django_assert_num_queries(4):
         response = client.get("/api/v1.0/items/?ordering=-creator__full_name")
 
     assert response.status_code == 200
@@ -399,3 +399,137 @@ def test_api_items_media_auth_filename_with_hash():
         timeout=1,
     )
     assert response.content.decode("utf-8") == "my prose"
+
+
+def test_api_items_media_auth_blob():
+    """
+    The media url of a file stored in a blob should stay the url of the item while the
+    authorization is given for the key of the blob, returned to the proxy.
+    """
+    item = factories.ItemFactory(
+        link_reach="public",
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        blob=models.Blob.objects.create(sha256="a" * 64, size=8),
+    )
+    default_storage.save(item.file_key, BytesIO(b"my prose"))
+
+    original_url = f"http://localhost/media/{item.media_key:s}"
+    response = APIClient().get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+
+    assert response.status_code == 200
+    assert response["X-Storage-Key"] == f"blob/aa/{'a' * 64:s}"
+
+    s3_url = urlparse(settings.AWS_S3_ENDPOINT_URL)
+    file_url = f"{settings.AWS_S3_ENDPOINT_URL:s}/drive-media-storage/{response['X-Storage-Key']:s}"
+    response = requests.get(
+        file_url,
+        headers={
+            "authorization": response["Authorization"],
+            "x-amz-date": response["x-amz-date"],
+            "x-amz-content-sha256": response["x-amz-content-sha256"],
+            "Host": f"{s3_url.hostname:s}:{s3_url.port:d}",
+        },
+        timeout=1,
+    )
+    assert response.content.decode("utf-8") == "my prose"
+
+
+@pytest.mark.parametrize(
+    "prefix, content_disposition",
+    [
+        ("", 'attachment; filename="my file.pdf"'),
+        ("preview/", 'inline; filename="my file.pdf"'),
+    ],
+)
+def test_api_items_media_auth_versioned_key(settings, prefix, content_disposition):
+    """
+    The file of an item stored under a versioned key should be authorized for this key and
+    served with its name, which is not part of the key.
+    """
+    settings.ITEM_FILE_VERSIONED_KEYS = True
+    item = factories.ItemFactory(
+        link_reach="public",
+        type=models.ItemTypeChoices.FILE,
+        filename="my file.pdf",
+        mimetype="application/pdf",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    default_storage.save(item.file_key, BytesIO(b"my prose"))
+
+    original_url = f"http://localhost/media/{prefix:s}{quote(item.media_key):s}"
+    response = APIClient().get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+
+    assert response.status_code == 200
+    assert response["X-Storage-Key"] == f"item/{item.id!s}/v1"
+    assert response["Content-Disposition"] == content_disposition
+
+
+def test_api_items_media_auth_cached(django_assert_num_queries):
+    """
+    The authorization to fetch a media should be reused without querying the database
+    until the item or its ancestors change.
+    """
+    parent = factories.ItemFactory(link_reach="public", type=models.ItemTypeChoices.FOLDER)
+    item = factories.ItemFactory(
+        parent=parent,
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    original_url = f"http://localhost/media/{item.file_key:s}"
+
+    response = APIClient().get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+    assert response.status_code == 200
+
+    with django_assert_num_queries(0):
+        response = APIClient().get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+    assert response.status_code == 200
+    assert response["X-Storage-Key"] == quote(item.file_key)
+    assert "AWS4-HMAC-SHA256 Credential=" in response["Authorization"]
+
+    # Restricting the access to an ancestor invalidates the authorization
+    parent.link_reach = "restricted"
+    parent.save()
+
+    response = APIClient().get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+    assert response.status_code == 403
+
+
+def test_api_items_media_auth_cached_access_removed():
+    """Removing the access of a user should invalidate the authorizations given to them."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    access = factories.UserItemAccessFactory(item=item, user=user, role="reader")
+    original_url = f"http://localhost/media/{item.file_key:s}"
+
+    response = client.get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+    assert response.status_code == 200
+
+    access.delete()
+
+    response = client.get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+    assert response.status_code == 403
+
+
+def test_api_items_media_auth_cache_disabled(settings, django_assert_num_queries):
+    """Authorizations should not be cached if the cache timeout is 0."""
+    settings.MEDIA_AUTH_CACHE_TIMEOUT = 0
+    item = factories.ItemFactory(
+        link_reach="public",
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    original_url = f"http://localhost/media/{item.file_key:s}"
+
+    response = APIClient().get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+    assert response.status_code == 200
+
+    models.Item.objects.filter(pk=item.pk).update(link_reach="restricted")
+
+    response = APIClient().get("/api/v1.0/items/media-auth/", HTTP_X_ORIGINAL_URL=original_url)
+    assert response.status_code == 403
@@ -0,0 +1,177 @@
+"""
+Tests for items API endpoint in drive's core app: move of large folders in background
+"""
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def create_tree(user):
+    """Create a folder with 4 descendants on 2 levels and a target folder for the user."""
+    folder = factories.ItemFactory(users=[(user, "owner")], type=models.ItemTypeChoices.FOLDER)
+    subfolders = factories.ItemFactory.create_batch(
+        2, parent=folder, type=models.ItemTypeChoices.FOLDER
+    )
+    leaves = [
+        factories.ItemFactory(parent=subfolder, type=models.ItemTypeChoices.FOLDER)
+        for subfolder in subfolders
+    ]
+    target = factories.ItemFactory(users=[(user, "owner")], type=models.ItemTypeChoices.FOLDER)
+    return folder, [*subfolders, *leaves], target
+
+
+def test_api_items_move_background_large_folder(settings):
+    """
+    Folders with more descendants than the threshold should be moved by a background task
+    rewriting the paths of the descendants by batches.
+    """
+    settings.ITEM_BACKGROUND_TASK_THRESHOLD = 4
+    settings.ITEM_BACKGROUND_TASK_BATCH_SIZE = 3
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, descendants, target = create_tree(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/move/",
+        data={"target_item_id": str(target.id)},
+    )
+
+    assert response.status_code == 202
+    content = response.json()
+    assert content["message"] == "item move in progress."
+
+    background_task = models.ItemBackgroundTask.objects.get(id=content["background_task_id"])
+    assert background_task.item == folder
+    assert background_task.kind == "move"
+    assert background_task.status == "completed"
+    assert background_task.processed == background_task.total == 4
+
+    folder.refresh_from_db()
+    assert str(folder.path) == f"{target.path!s}.{folder.id!s}"
+    for descendant in descendants:
+        descendant.refresh_from_db()
+        assert str(descendant.path).startswith(f"{folder.path!s}.")
+        assert descendant.get_role(user) == "owner"
+
+    assert list(folder.descendants().order_by("path")) == sorted(
+        descendants, key=lambda item: str(item.path)
+    )
+
+
+def test_api_items_move_background_small_folder(settings):
+    """Folders with less descendants than the threshold should be moved in the request."""
+    settings.ITEM_BACKGROUND_TASK_THRESHOLD = 5
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, _descendants, target = create_tree(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/move/",
+        data={"target_item_id": str(target.id)},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"message": "item moved successfully."}
+    assert not models.ItemBackgroundTask.objects.exists()
+
+
+def test_api_items_move_background_tree_locked():
+    """No other move should be accepted on a tree while a background task rewrites it."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, descendants, target = create_tree(user)
+
+    # The task is created but not run yet
+    folder.move(target, in_background=True)
+
+    response = client.post(
+        f"/api/v1.0/items/{descendants[-1].id!s}/move/",
+        data={"target_item_id": str(target.id)},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_background_task_in_progress"
+
+
+def test_api_items_move_background_children_readable():
+    """The children of the moved folder should be listed while its descendants are moved."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, descendants, target = create_tree(user)
+
+    folder.move(target, in_background=True)
+
+    response = client.get(f"/api/v1.0/items/{folder.id!s}/children/")
+
+    assert response.status_code == 200
+    assert {result["id"] for result in response.json()["results"]} == {
+        str(descendant.id) for descendant in descendants[:2]
+    }
+
+
+def test_api_items_move_background_descendants_hidden():
+    """
+    The descendants not moved yet should be hidden as they still inherit the roles and link
+    reach of their former ancestors.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, descendants, target = create_tree(user)
+
+    background_task = folder.move(target, in_background=True)
+
+    for descendant in descendants:
+        response = client.get(f"/api/v1.0/items/{descendant.id!s}/")
+        assert response.status_code == 404
+
+    background_task.process()
+
+    for descendant in descendants:
+        response = client.get(f"/api/v1.0/items/{descendant.id!s}/")
+        assert response.status_code == 200
+
+
+def test_api_items_background_tasks_list():
+    """The background tasks of an item should be listed with their progress."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder, _descendants, target = create_tree(user)
+
+    background_task = folder.move(target, in_background=True)
+
+    response = client.get(f"/api/v1.0/items/{folder.id!s}/background-tasks/")
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {
+            "id": str(background_task.id),
+            "kind": "move",
+            "status": "pending",
+            "processed": 0,
+            "total": 0,
+            "created_at": background_task.created_at.isoformat().replace("+00:00", "Z"),
+            "updated_at": background_task.updated_at.isoformat().replace("+00:00", "Z"),
+        }
+    ]
+
+
+def test_api_items_background_tasks_list_no_access():
+    """Users without access should not see the background tasks of an item."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = factories.ItemFactory(link_reach="restricted", type=models.ItemTypeChoices.FOLDER)
+
+    response = client.get(f"/api/v1.0/items/{folder.id!s}/background-tasks/")
+
+    assert response.status_code == 403
@@ -0,0 +1,359 @@
+"""Test the API endpoints uploading the files of a folder in batches."""
+
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.core.files.storage import default_storage
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import factories, models
+from core.models import ItemTypeChoices, ItemUploadStateChoices
+from core.tasks.item import malware_detection
+
+pytestmark = pytest.mark.django_db
+
+
+def _get_folder(user, role="owner"):
+    """Create a folder on which the user has the given role."""
+    return factories.ItemFactory(type=ItemTypeChoices.FOLDER, users=[(user, role)])
+
+
+def test_api_items_upload_batch_anonymous():
+    """Anonymous users should not be allowed to upload files in batches."""
+    folder = factories.ItemFactory(type=ItemTypeChoices.FOLDER)
+
+    response = APIClient().post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "file.txt", "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 401
+    assert not models.Item.objects.filter(type=ItemTypeChoices.FILE).exists()
+
+
+def test_api_items_upload_batch_reader():
+    """Readers of a folder should not be allowed to upload files in it."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user, role="reader")
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "file.txt", "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 403
+    assert not models.Item.objects.filter(type=ItemTypeChoices.FILE).exists()
+
+
+def test_api_items_upload_batch_success():
+    """
+    The folders of the paths of the files should be created with the files, which are
+    returned with the url to upload them.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {
+            "files": [
+                {"path": "report.pdf", "size": 1024},
+                {"path": "photos/2024/holidays.jpg", "size": 2048},
+                {"path": "photos/2024/beach.jpg", "size": 8},
+                {"path": "photos/cat.jpg", "size": 8},
+            ]
+        },
+        format="json",
+    )
+
+    assert response.status_code == 201
+    content = response.json()
+    assert [file["path"] for file in content["files"]] == [
+        "report.pdf",
+        "photos/2024/holidays.jpg",
+        "photos/2024/beach.jpg",
+        "photos/cat.jpg",
+    ]
+    assert [folder["title"] for folder in content["folders"]] == ["photos", "2024"]
+
+    photos = models.Item.objects.get(title="photos")
+    year = models.Item.objects.get(title="2024")
+    assert photos.parent_id == folder.id
+    assert year.path[:-1] == photos.path
+    assert (photos.numchild, photos.numchild_folder) == (2, 1)
+    assert (year.numchild, year.numchild_folder) == (2, 0)
+    folder.refresh_from_db()
+    assert (folder.numchild, folder.numchild_folder) == (2, 1)
+
+    holidays = models.Item.objects.get(id=content["files"][1]["id"])
+    assert holidays.type == ItemTypeChoices.FILE
+    assert holidays.title == "holidays.jpg"
+    assert holidays.filename == "holidays.jpg"
+    assert holidays.size == 2048
+    assert holidays.upload_state == ItemUploadStateChoices.PENDING
+    assert holidays.creator == user
+    assert holidays.parent_id == year.id
+    assert content["files"][1]["parent_id"] == str(year.id)
+
+    policy = urlparse(content["files"][1]["policy"])
+    assert policy.path.endswith(holidays.file_key)
+    assert parse_qs(policy.query)["X-Amz-SignedHeaders"] == ["content-length;host;x-amz-acl"]
+
+    # Roles on the folder are inherited by all the items created
+    assert (
+        models.ItemEffectiveAccess.objects.filter(
+            user=user, role="owner", item__path__descendants=folder.path
+        ).count()
+        == 7
+    )
+    assert (
+        models.ItemChange.objects.filter(kind="created", path__descendants=folder.path)
+        .exclude(item_id=folder.id)
+        .count()
+        == 6
+    )
+
+    response = client.get(f"/api/v1.0/items/{photos.id!s}/children/")
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()["results"]] == ["2024"]
+
+
+def test_api_items_upload_batch_existing_folders_and_titles():
+    """
+    Folders already created, e.g. by a former batch, should be reused while files should
+    get a unique title among the children of their folder.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+    photos = factories.ItemFactory(parent=folder, type=ItemTypeChoices.FOLDER, title="photos")
+    factories.ItemFactory(
+        parent=photos, type=ItemTypeChoices.FILE, title="cat.jpg", filename="cat.jpg"
+    )
+    factories.ItemFactory(
+        parent=photos, type=ItemTypeChoices.FILE, title="cat_03.jpg", filename="cat_03.jpg"
+    )
+    # A file with the title of a folder of the paths is not reused
+    factories.ItemFactory(parent=folder, type=ItemTypeChoices.FILE, title="docs", filename="docs")
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "photos/cat.jpg", "size": 8}, {"path": "docs/readme.md", "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 201
+    content = response.json()
+    assert [folder["title"] for folder in content["folders"]] == ["docs_01"]
+    assert content["files"][0]["title"] == "cat_04.jpg"
+    assert content["files"][0]["parent_id"] == str(photos.id)
+
+    photos.refresh_from_db()
+    assert photos.numchild == 3
+
+
+@pytest.mark.parametrize("path", ["", "/file.txt", "folder//file.txt", "../file.txt", "a/./b"])
+def test_api_items_upload_batch_invalid_path(path):
+    """Paths should be relative to the folder and should not go up the tree."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": path, "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert not models.Item.objects.filter(type=ItemTypeChoices.FILE).exists()
+
+
+def test_api_items_upload_batch_file_as_folder():
+    """A path can not be used both for a file and for the folder of another file."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "notes.txt", "size": 8}, {"path": "notes.txt/cat.jpg", "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_upload_batch_file_as_folder"
+
+
+def test_api_items_upload_batch_file_not_allowed(settings):
+    """The whole batch should be refused if one of its files is not allowed."""
+    settings.DATA_UPLOAD_MAX_MEMORY_SIZE = 1000
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "small.txt", "size": 10}, {"path": "large.txt", "size": 1001}]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_create_file_size_exceeded"
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "small.txt", "size": 8}, {"path": "script.exe", "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_create_file_extension_not_allowed"
+    assert not models.Item.objects.filter(type=ItemTypeChoices.FILE).exists()
+
+
+def test_api_items_upload_batch_too_many_files(settings):
+    """The number of files created by one request should be limited."""
+    settings.ITEM_UPLOAD_BATCH_SIZE = 2
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": f"file_{i:d}.txt", "size": 8} for i in range(3)]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert not models.Item.objects.filter(type=ItemTypeChoices.FILE).exists()
+
+
+@mock.patch("core.api.viewsets.get_entitlements_backend")
+def test_api_items_upload_batch_entitlements(mock_get_entitlements_backend):
+    """Users not entitled to upload files should not be allowed to upload in batches."""
+    mock_get_entitlements_backend.return_value.can_upload.return_value = {"result": False}
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "file.txt", "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 403
+    assert not models.Item.objects.filter(type=ItemTypeChoices.FILE).exists()
+
+
+def test_api_items_upload_ended_batch_reader():
+    """Readers of a folder should not be allowed to end uploads in it."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user, role="reader")
+    file = factories.ItemFactory(parent=folder, type=ItemTypeChoices.FILE)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-ended-batch/",
+        {"ids": [str(file.id)]},
+        format="json",
+    )
+
+    assert response.status_code == 403
+    file.refresh_from_db()
+    assert file.upload_state == ItemUploadStateChoices.PENDING
+
+
+def test_api_items_upload_ended_batch_success():
+    """
+    Pending files under the folder should be finalized at once, the other ones being
+    returned as failed.
+    """
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "a.txt", "size": 8}, {"path": "sub/b.txt", "size": 8}]},
+        format="json",
+    )
+    assert response.status_code == 201
+    ids = [file["id"] for file in response.json()["files"]]
+    for item in models.Item.objects.filter(id__in=ids):
+        default_storage.save(item.file_key, BytesIO(b"my prose"))
+
+    ready = factories.ItemFactory(
+        parent=folder, type=ItemTypeChoices.FILE, update_upload_state=ItemUploadStateChoices.READY
+    )
+    elsewhere = factories.ItemFactory(type=ItemTypeChoices.FILE, users=[(user, "owner")])
+
+    with mock.patch.object(malware_detection, "analyse_file") as mock_analyse_file:
+        response = client.post(
+            f"/api/v1.0/items/{folder.id!s}/upload-ended-batch/",
+            {"ids": [*ids, str(ready.id), str(elsewhere.id)]},
+            format="json",
+        )
+
+    assert response.status_code == 200
+    assert sorted(response.json()["finalizing"]) == sorted(ids)
+    assert response.json()["failed"] == [str(ready.id), str(elsewhere.id)]
+    assert mock_analyse_file.call_count == 2
+
+    for item in models.Item.objects.filter(id__in=ids):
+        assert item.upload_state == ItemUploadStateChoices.ANALYZING
+        assert item.mimetype == "text/plain"
+        assert item.size == 8
+    elsewhere.refresh_from_db()
+    assert elsewhere.upload_state == ItemUploadStateChoices.PENDING
+
+    # Files already finalized are not finalized again
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-ended-batch/",
+        {"ids": ids},
+        format="json",
+    )
+    assert response.status_code == 200
+    assert response.json() == {"finalizing": [], "failed": ids}
+
+
+def test_api_items_upload_batch_background_task_in_progress():
+    """No file should be uploaded in a tree while a background task rewrites it."""
+    user = factories.UserFactory()
+    client = APIClient()
+    client.force_login(user)
+    folder = _get_folder(user)
+    subfolder = factories.ItemFactory(parent=folder, type=ItemTypeChoices.FOLDER)
+    models.ItemBackgroundTask.objects.create(
+        item=subfolder,
+        kind=models.ItemBackgroundTaskKindChoices.MOVE,
+        previous_path=subfolder.path,
+    )
+
+    response = client.post(
+        f"/api/v1.0/items/{folder.id!s}/upload-batch/",
+        {"files": [{"path": "photos/cat.jpg", "size": 8}]},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["code"] == "item_background_task_in_progress"
+    assert models.Item.objects.count() == 2
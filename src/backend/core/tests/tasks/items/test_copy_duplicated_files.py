@@ -0,0 +1,173 @@
+"""Test the tasks duplicating the content of a folder."""
+
+import logging
+from io import BytesIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+
+import pytest
+
+from core import factories, models
+from core.tasks.item import copy_duplicated_files, process_item_background_task
+
+pytestmark = pytest.mark.django_db
+
+# As the task is bound, we need to ignore this error.
+# pylint: disable=no-value-for-parameter
+
+
+def _create_duplicate_task(folder):
+    """Create the copy of a folder and the background task duplicating its content."""
+    copy = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    return models.ItemBackgroundTask.objects.create(
+        item=copy,
+        kind=models.ItemBackgroundTaskKindChoices.DUPLICATE,
+        previous_path=folder.path,
+    )
+
+
+def test_copy_duplicated_files_sharded(settings):
+    """Each task should only copy the files of its shard, the last one completing the task."""
+    settings.ITEM_DUPLICATE_COPY_CONCURRENCY = 2
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    files = factories.ItemFactory.create_batch(
+        4,
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    for file in files:
+        default_storage.save(file.file_key, BytesIO(file.title.encode()))
+    background_task = _create_duplicate_task(folder)
+
+    with mock.patch.object(copy_duplicated_files, "delay") as mock_delay:
+        process_item_background_task(background_task.id)
+
+    assert mock_delay.call_args_list == [
+        mock.call(background_task.id, 0),
+        mock.call(background_task.id, 1),
+    ]
+    background_task.refresh_from_db()
+    assert background_task.status == models.ItemBackgroundTaskStatusChoices.PROCESSING
+    assert background_task.processed == 0
+    assert background_task.total == 4
+
+    copy_duplicated_files(background_task.id, 0)
+
+    copied = [file for file in files if (file.id.int & 0xFFFFFFF) % 2 == 0]
+    for file in files:
+        file_copy = models.Item.objects.get(id=background_task.get_duplicate_id(file.id))
+        assert file_copy.upload_state == (
+            models.ItemUploadStateChoices.READY
+            if file in copied
+            else models.ItemUploadStateChoices.DUPLICATING
+        )
+    background_task.refresh_from_db()
+    assert background_task.processed == len(copied)
+
+    copy_duplicated_files(background_task.id, 1)
+
+    background_task.refresh_from_db()
+    assert background_task.status == models.ItemBackgroundTaskStatusChoices.COMPLETED
+    assert background_task.processed == 4
+    for file in files:
+        file_copy = models.Item.objects.get(id=background_task.get_duplicate_id(file.id))
+        with default_storage.open(file_copy.file_key) as copied_file:
+            assert copied_file.read() == file.title.encode()
+
+
+def test_copy_duplicated_files_max_retries_exceeded(caplog, settings):
+    """A file that can not be copied should be removed from the copy of the folder."""
+    settings.ITEM_DUPLICATE_COPY_CONCURRENCY = 1
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    # don't create a file to raise a botocore exception
+    file = factories.ItemFactory(
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    background_task = _create_duplicate_task(folder)
+
+    with caplog.at_level(logging.ERROR, logger="core.tasks.item"):
+        copy_duplicated_files.max_retries = 0
+        try:
+            process_item_background_task(background_task.id)
+        finally:
+            copy_duplicated_files.max_retries = 10
+
+    assert not models.Item.objects.filter(id=background_task.get_duplicate_id(file.id)).exists()
+    assert "max retries exceeded" in caplog.text
+    background_task.refresh_from_db()
+    assert background_task.status == models.ItemBackgroundTaskStatusChoices.COMPLETED
+    background_task.item.refresh_from_db()
+    assert background_task.item.numchild == 0
+
+
+def test_copy_duplicated_files_source_locked():
+    """The content of a folder should not be moved or deleted while it is duplicated."""
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    file = factories.ItemFactory(
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    background_task = _create_duplicate_task(folder)
+
+    with mock.patch.object(copy_duplicated_files, "delay"):
+        process_item_background_task(background_task.id)
+
+    with pytest.raises(ValidationError):
+        file.soft_delete()
+
+    models.ItemBackgroundTask.objects.filter(pk=background_task.pk).update(
+        status=models.ItemBackgroundTaskStatusChoices.COMPLETED
+    )
+    file.soft_delete()
+
+
+def test_copy_duplicated_files_resumed_not_logged_again():
+    """Running the duplication again should not log the creation of the existing copies."""
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    files = factories.ItemFactory.create_batch(
+        2,
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    background_task = _create_duplicate_task(folder)
+    copy_ids = [background_task.get_duplicate_id(file.id) for file in files]
+
+    with mock.patch.object(copy_duplicated_files, "delay"):
+        process_item_background_task(background_task.id)
+        process_item_background_task(background_task.id)
+
+    assert (
+        models.ItemChange.objects.filter(
+            item_id__in=copy_ids, kind=models.ItemChangeKindChoices.CREATED
+        ).count()
+        == 2
+    )
+
+
+def test_copy_duplicated_files_bumps_version(settings):
+    """The copy of a file should be shown as ready in the cached listings of its parent."""
+    settings.ITEM_DUPLICATE_COPY_CONCURRENCY = 1
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    file = factories.ItemFactory(
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    default_storage.save(file.file_key, BytesIO(b"my prose"))
+    background_task = _create_duplicate_task(folder)
+
+    with mock.patch.object(copy_duplicated_files, "delay"):
+        process_item_background_task(background_task.id)
+
+    copy = models.Item.objects.get(id=background_task.get_duplicate_id(file.id))
+    with mock.patch("core.tasks.item.bump_items_version") as mock_bump:
+        copy_duplicated_files(background_task.id, 0)
+
+    mock_bump.assert_called_once_with(copy.path[-2:])
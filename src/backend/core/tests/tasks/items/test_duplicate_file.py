@@ -127,8 +127,7 @@ def test_duplicate_file_retry(caplog):
 
     assert (
         "duplicating file: error while copying file (retries 0 on 10). Error: An error occurred "
-        "(NoSuchKey) when calling the CopyObject operation: The specified key does not exist."
-        in caplog.text
+        "(404) when calling the HeadObject operation: Not Found" in caplog.text
     )
 
 
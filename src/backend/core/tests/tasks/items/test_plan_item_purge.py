@@ -0,0 +1,120 @@
+"""Test the planning of the purge of deleted items in shards."""
+
+import logging
+from unittest import mock
+
+import pytest
+
+from core import factories, models
+from core.tasks.item import plan_item_purge, process_item_purge_shard
+
+pytestmark = pytest.mark.django_db
+
+
+def create_deleted_tree(nb_children):
+    """Create a hard deleted folder with children."""
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory.create_batch(
+        nb_children, parent=folder, type=models.ItemTypeChoices.FOLDER
+    )
+    folder.soft_delete()
+    folder.hard_delete()
+    return folder
+
+
+def test_plan_item_purge_no_deleted_items(django_assert_num_queries):
+    """Nothing should be dispatched when there are no purgeable items."""
+    factories.ItemFactory()
+
+    with (
+        django_assert_num_queries(1),
+        mock.patch.object(process_item_purge_shard, "delay") as mock_delay,
+    ):
+        assert plan_item_purge() == []
+
+    mock_delay.assert_not_called()
+
+
+def test_plan_item_purge_highest_roots_only():
+    """Purgeable descendants of a purgeable item should not be planned on their own."""
+    folder = create_deleted_tree(2)
+    child = folder.descendants().first()
+    # A child deleted by itself before its parent
+    child.soft_delete()
+    child.hard_delete()
+
+    with mock.patch.object(process_item_purge_shard, "delay") as mock_delay:
+        shards = plan_item_purge()
+
+    assert shards == [[str(folder.id)]]
+    mock_delay.assert_called_once_with([str(folder.id)])
+
+
+def test_plan_item_purge_balanced_shards(settings):
+    """Trees should be split between the shards on the number of items they contain."""
+    settings.PURGE_SHARDS_COUNT = 2
+    large_folder = create_deleted_tree(4)
+    small_folders = [create_deleted_tree(1) for _ in range(2)]
+
+    with mock.patch.object(process_item_purge_shard, "delay") as mock_delay:
+        shards = plan_item_purge()
+
+    assert len(shards) == 2
+    assert sorted(shards[0]) == sorted(str(folder.id) for folder in small_folders)
+    assert shards[1] == [str(large_folder.id)]
+    assert mock_delay.call_count == 2
+
+
+def test_plan_item_purge_claimed_items_skipped():
+    """Items claimed by a shard should not be planned again until the shard is done."""
+    folder = create_deleted_tree(1)
+
+    with mock.patch.object(process_item_purge_shard, "delay"):
+        assert plan_item_purge() == [[str(folder.id)]]
+        assert plan_item_purge() == []
+
+    process_item_purge_shard([str(folder.id)])
+
+    assert not models.Item.objects.filter(id=folder.id).exists()
+
+
+def test_plan_item_purge_metrics(caplog):
+    """The shards should report the number of items and bytes reclaimed."""
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory.create_batch(
+        2, parent=folder, type=models.ItemTypeChoices.FILE, filename="foo.txt", size=10
+    )
+    folder.soft_delete()
+    folder.hard_delete()
+
+    with caplog.at_level(logging.INFO):
+        plan_item_purge()
+
+    assert not models.Item.objects.exists()
+    assert (
+        "Purge shard reclaimed 3 items and 20 bytes under 1 deleted items (0 failures)"
+        in caplog.text
+    )
+
+
+def test_process_item_purge_shard_failure():
+    """The failure of one purge should not stop the shard and release the claim."""
+    failing_folder, folder = create_deleted_tree(1), create_deleted_tree(1)
+
+    with mock.patch.object(process_item_purge_shard, "delay"):
+        plan_item_purge()
+
+    with mock.patch(
+        "core.tasks.item.delete_files_from_storage",
+        side_effect=[RuntimeError("storage error"), None, None],
+    ):
+        metrics = process_item_purge_shard([str(failing_folder.id), str(folder.id)])
+
+    assert metrics["failures"] == 1
+    assert metrics["items"] == 2
+    assert models.Item.objects.filter(id=failing_folder.id).exists()
+    assert not models.Item.objects.filter(id=folder.id).exists()
+
+    # The failed item is planned again by the next run
+    with mock.patch.object(process_item_purge_shard, "delay"):
+        assert plan_item_purge() == [[str(failing_folder.id)]]
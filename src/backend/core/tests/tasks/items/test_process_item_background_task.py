@@ -0,0 +1,123 @@
+"""Test the process item background task."""
+
+import logging
+from unittest import mock
+
+import pytest
+
+from core import factories, models
+from core.tasks.item import process_item_background_task
+
+pytestmark = pytest.mark.django_db
+
+
+def test_process_item_background_task_does_not_exist(caplog):
+    """The task should log an error if the background task does not exist."""
+    with caplog.at_level(logging.ERROR):
+        process_item_background_task("d4f1b3b8-4f1e-4c1a-9b52-0c3d3a0a6f0e")
+
+    assert "does not exist" in caplog.records[0].message
+
+
+def test_process_item_background_task_move_resume(settings):
+    """Running a move task again after an interruption should finish moving the tree."""
+    settings.ITEM_BACKGROUND_TASK_BATCH_SIZE = 2
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    children = factories.ItemFactory.create_batch(
+        5, parent=folder, type=models.ItemTypeChoices.FOLDER
+    )
+    target = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+
+    background_task = folder.move(target, in_background=True)
+
+    move_under = models.ItemQuerySet.move_under
+    calls = []
+
+    def move_first_batch_only(queryset, *args):
+        if calls:
+            raise RuntimeError("interrupted")
+        calls.append(queryset)
+        return move_under(queryset, *args)
+
+    # Interrupt the task after its first batch
+    with (
+        mock.patch.object(
+            models.ItemQuerySet,
+            "move_under",
+            autospec=True,
+            side_effect=move_first_batch_only,
+        ),
+        pytest.raises(RuntimeError),
+    ):
+        process_item_background_task(background_task.id)
+
+    background_task.refresh_from_db()
+    assert background_task.status == "failed"
+    assert background_task.error_details == "interrupted"
+    assert background_task.processed == 2
+    assert background_task.total == 5
+
+    process_item_background_task(background_task.id)
+
+    background_task.refresh_from_db()
+    assert background_task.status == "completed"
+    assert background_task.error_details is None
+    folder.refresh_from_db()
+    for child in children:
+        child.refresh_from_db()
+        assert child.path == [*folder.path, str(child.id)]
+
+
+def test_process_item_background_task_move_roles_by_batch(settings):
+    """The roles inherited from the new ancestors should be set on each batch once moved."""
+    settings.ITEM_BACKGROUND_TASK_BATCH_SIZE = 2
+    user = factories.UserFactory()
+    folder = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory.create_batch(5, parent=folder, type=models.ItemTypeChoices.FOLDER)
+    target = factories.ItemFactory(users=[(user, "editor")], type=models.ItemTypeChoices.FOLDER)
+
+    background_task = folder.move(target, in_background=True)
+
+    move_under = models.ItemQuerySet.move_under
+    calls = []
+
+    def move_first_batch_only(queryset, *args):
+        if calls:
+            raise RuntimeError("interrupted")
+        calls.append(queryset)
+        return move_under(queryset, *args)
+
+    # Interrupt the task after its first batch
+    with (
+        mock.patch.object(
+            models.ItemQuerySet,
+            "move_under",
+            autospec=True,
+            side_effect=move_first_batch_only,
+        ),
+        pytest.raises(RuntimeError),
+    ):
+        process_item_background_task(background_task.id)
+
+    folder.refresh_from_db()
+    moved = models.Item.objects.filter(path__descendants=folder.path).exclude(pk=folder.pk)
+    assert moved.count() == 2
+    for child in moved:
+        assert child.get_role(user) == "editor"
+    assert not models.ItemEffectiveAccess.objects.filter(
+        user=user, item__path__descendants=background_task.previous_path
+    ).exists()
+
+
+def test_process_item_background_task_completed(caplog, django_assert_num_queries):
+    """A completed task should not be run again."""
+    background_task = models.ItemBackgroundTask.objects.create(
+        item=factories.ItemFactory(type=models.ItemTypeChoices.FOLDER),
+        kind=models.ItemBackgroundTaskKindChoices.MOVE,
+        status=models.ItemBackgroundTaskStatusChoices.COMPLETED,
+    )
+
+    with caplog.at_level(logging.INFO), django_assert_num_queries(1):
+        process_item_background_task(background_task.id)
+
+    assert "is already completed" in caplog.records[0].message
@@ -1,9 +1,12 @@
 """Test the process item purge task."""
 
+# pylint: disable=protected-access
+
 import logging
 from datetime import timedelta
 from io import BytesIO
 from random import randint
+from unittest import mock
 
 from django.core.files.storage import default_storage
 from django.utils import timezone
@@ -11,6 +14,7 @@ from django.utils import timezone
 import pytest
 
 from core import factories, models
+from core.storage import get_storage_gateway
 from core.tasks.item import process_item_purge
 
 pytestmark = pytest.mark.django_db
@@ -246,14 +250,14 @@ def test_process_item_purge_stops_on_subfolder_delete_failure(monkeypatch):
     root.soft_delete()
     root.hard_delete()
 
-    original_delete = models.Item.delete
+    original_delete = models.ItemQuerySet.delete
 
     def failing_delete(self, *args, **kwargs):
-        if self.id == subfolder.id:
+        if self.filter(id=subfolder.id).exists():
             raise RuntimeError("Simulated failure on subfolder delete")
         return original_delete(self, *args, **kwargs)
 
-    monkeypatch.setattr(models.Item, "delete", failing_delete)
+    monkeypatch.setattr(models.ItemQuerySet, "delete", failing_delete, raising=False)
 
     # The process should raise and stop immediately
     with pytest.raises(RuntimeError) as exc_info:
@@ -267,3 +271,85 @@ def test_process_item_purge_stops_on_subfolder_delete_failure(monkeypatch):
     # The files should have processed first and should be deleted
     assert not default_storage.exists(file1.file_key)
     assert not default_storage.exists(file2.file_key)
+    assert not models.Item.objects.filter(id__in=[file1.id, file2.id]).exists()
+
+
+def test_process_item_purge_batches(monkeypatch):
+    """
+    Files should be deleted from storage with one request per batch and items from database
+    with their accesses and favorites.
+    """
+    monkeypatch.setattr("core.tasks.item.PURGE_BATCH_SIZE", 3)
+    root = factories.ItemFactory(
+        type=models.ItemTypeChoices.FOLDER, users=[factories.UserFactory()]
+    )
+    files = factories.ItemFactory.create_batch(
+        5,
+        type=models.ItemTypeChoices.FILE,
+        parent=root,
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        users=[factories.UserFactory()],
+        favorited_by=[factories.UserFactory()],
+    )
+    for file in files:
+        default_storage.save(file.file_key, BytesIO(b"my prose"))
+    root.soft_delete()
+    root.hard_delete()
+
+    s3_client = get_storage_gateway()._client
+    with mock.patch.object(
+        s3_client, "delete_objects", wraps=s3_client.delete_objects
+    ) as delete_objects_mock:
+        process_item_purge(root.id)
+
+    # One request for each batch of files, none for the folder
+    assert delete_objects_mock.call_count == 2
+    assert not models.Item.objects.exists()
+    assert not models.ItemAccess.objects.exists()
+    assert not models.ItemFavorite.objects.exists()
+    for file in files:
+        assert not default_storage.exists(file.file_key)
+
+
+def test_process_item_purge_storage_errors():
+    """Items should be kept in database if their files could not be deleted from storage."""
+    item = factories.ItemFactory(type=models.ItemTypeChoices.FILE, filename="foo.txt")
+    item.soft_delete()
+    item.hard_delete()
+
+    s3_client = get_storage_gateway()._client
+    with (
+        mock.patch.object(
+            s3_client,
+            "delete_objects",
+            return_value={
+                "Errors": [{"Key": item.file_key, "Code": "AccessDenied", "Message": "Denied"}]
+            },
+        ),
+        pytest.raises(RuntimeError, match="Failed to delete 1 files from storage"),
+    ):
+        process_item_purge(item.id)
+
+    assert models.Item.objects.filter(id=item.id).exists()
+
+
+def test_process_item_purge_blob_shared():
+    """A blob should only be deleted from storage once the last item referencing it is purged."""
+    blob = models.Blob.objects.create(sha256="a" * 64, size=8)
+    default_storage.save(blob.key, BytesIO(b"my prose"))
+    item, other_item = factories.ItemFactory.create_batch(
+        2, type=models.ItemTypeChoices.FILE, filename="foo.txt", size=8, blob=blob
+    )
+    for deleted_item in (item, other_item):
+        deleted_item.soft_delete()
+        deleted_item.hard_delete()
+
+    assert process_item_purge(item.id) == {"items": 1, "bytes": 0}
+
+    assert default_storage.exists(blob.key)
+    assert models.Blob.objects.filter(sha256=blob.sha256).exists()
+
+    assert process_item_purge(other_item.id) == {"items": 1, "bytes": 8}
+
+    assert not default_storage.exists(blob.key)
+    assert not models.Blob.objects.exists()
@@ -0,0 +1,37 @@
+"""Test the purge of the changes of the items older than their retention."""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+import pytest
+
+from core import factories, models
+from core.tasks.item import purge_item_changes
+
+pytestmark = pytest.mark.django_db
+
+
+def test_purge_item_changes(settings):
+    """Changes older than the retention should be deleted by batches, the others kept."""
+    settings.ITEM_CHANGES_RETENTION_DAYS = 30
+    settings.ITEM_BACKGROUND_TASK_BATCH_SIZE = 2
+    items = factories.ItemFactory.create_batch(5, type=models.ItemTypeChoices.FOLDER)
+    models.ItemChange.objects.filter(item_id__in=[item.id for item in items[:3]]).update(
+        created_at=timezone.now() - timedelta(days=31)
+    )
+
+    assert purge_item_changes() == 3
+
+    assert set(models.ItemChange.objects.values_list("item_id", flat=True)) == {
+        item.id for item in items[3:]
+    }
+
+
+def test_purge_item_changes_nothing_to_purge():
+    """Nothing should be deleted when all the changes are recent."""
+    factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    nb_changes = models.ItemChange.objects.count()
+
+    assert purge_item_changes() == 0
+    assert models.ItemChange.objects.count() == nb_changes
@@ -1,12 +1,16 @@
 """Test the rename file task."""
 
+# pylint: disable=protected-access
+
 from io import BytesIO
+from unittest import mock
 
 from django.core.files.storage import default_storage
 
 import pytest
 
 from core import factories, models
+from core.storage import get_storage_gateway
 from core.tasks.item import rename_file
 
 pytestmark = pytest.mark.django_db
@@ -33,6 +37,28 @@ def test_rename_file():
     assert not default_storage.exists(f"{item.key_base}/old_title.txt")
 
 
+def test_rename_file_versioned_key(settings):
+    """Renaming a file stored under a versioned key should not touch the storage."""
+    settings.ITEM_FILE_VERSIONED_KEYS = True
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        filename="old_title.txt",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+    )
+    file_key = item.file_key
+    default_storage.save(file_key, BytesIO(b"my prose"))
+
+    s3_client = get_storage_gateway()._client
+    with mock.patch.object(s3_client, "copy_object") as mock_copy_object:
+        rename_file(item.id, "new_title")
+
+    mock_copy_object.assert_not_called()
+    item.refresh_from_db()
+    assert item.filename == "new_title.txt"
+    assert item.file_key == file_key
+    assert default_storage.exists(file_key)
+
+
 def test_rename_file_origin_extension_is_kept():
     """The origin extension is kept no matter the new title."""
     user = factories.UserFactory()
@@ -34,6 +34,7 @@ pytestmark = pytest.mark.django_db
     FRONTEND_RELEASE_NOTE_ENABLED=True,
     FRONTEND_CSS_URL="http://testcss/",
     FRONTEND_JS_URL="http://testjs/",
+    ITEM_UPLOAD_BATCH_SIZE=100,
     MEDIA_BASE_URL="http://testserver/",
     POSTHOG_KEY="132456",
     POSTHOG_HOST="https://eu.i.posthog-test.com",
@@ -73,6 +74,7 @@ def test_api_config(is_authenticated):
         "FRONTEND_CSS_URL": "http://testcss/",
         "FRONTEND_JS_URL": "http://testjs/",
         "FRONTEND_ENTITLEMENTS_DISCLAIMERS": {},
+        "ITEM_UPLOAD_BATCH_SIZE": 100,
         "LANGUAGES": [
             ["en-us", "English"],
             ["fr-fr", "French"],
@@ -152,7 +152,7 @@ def test_models_invitationd_new_user_filter_expired_invitations():
     assert models.Invitation.objects.filter(item=expired_invitation.item, email=user_email).exists()
 
 
-@pytest.mark.parametrize("num_invitations, num_queries", [(0, 3), (1, 7), (20, 7)])
+@pytest.mark.parametrize("num_invitations, num_queries", [(0, 3), (1, 10), (20, 10)])
 def test_models_invitations_new_userd_user_creation_constant_num_queries(
     django_assert_num_queries, num_invitations, num_queries
 ):
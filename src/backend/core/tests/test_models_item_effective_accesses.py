@@ -0,0 +1,175 @@
+"""
+Unit tests for the ItemEffectiveAccess model
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+
+import pytest
+
+from core import factories, models
+
+pytestmark = pytest.mark.django_db
+
+
+def get_effective_roles(item):
+    """Return the effective roles materialized on an item as a dict."""
+    return {
+        (access.user_id or access.team): access.role
+        for access in models.ItemEffectiveAccess.objects.filter(item=item)
+    }
+
+
+def test_models_item_effective_accesses_inherited_by_descendants():
+    """Creating an access should materialize the role on the item and all its descendants."""
+    user = factories.UserFactory()
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    folder = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+    file = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FILE)
+
+    factories.UserItemAccessFactory(item=root, user=user, role="reader")
+
+    for item in [root, folder, file]:
+        assert get_effective_roles(item) == {user.id: "reader"}
+
+
+def test_models_item_effective_accesses_max_role_wins():
+    """The effective role should be the highest role among the item and its ancestors."""
+    user = factories.UserFactory()
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    folder = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+    child = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+
+    factories.UserItemAccessFactory(item=root, user=user, role="editor")
+    access = factories.UserItemAccessFactory(item=folder, user=user, role="owner")
+
+    assert get_effective_roles(root) == {user.id: "editor"}
+    assert get_effective_roles(folder) == {user.id: "owner"}
+    assert get_effective_roles(child) == {user.id: "owner"}
+
+    access.role = "reader"
+    access.save()
+
+    assert get_effective_roles(folder) == {user.id: "editor"}
+    assert get_effective_roles(child) == {user.id: "editor"}
+
+    access.delete()
+
+    assert get_effective_roles(child) == {user.id: "editor"}
+
+
+def test_models_item_effective_accesses_delete_access():
+    """Deleting the only access of a user should remove the user's effective roles."""
+    user = factories.UserFactory()
+    other_user = factories.UserFactory()
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    child = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FILE)
+
+    access = factories.UserItemAccessFactory(item=root, user=user, role="editor")
+    factories.UserItemAccessFactory(item=root, user=other_user, role="reader")
+
+    access.delete()
+
+    assert get_effective_roles(root) == {other_user.id: "reader"}
+    assert get_effective_roles(child) == {other_user.id: "reader"}
+
+
+def test_models_item_effective_accesses_teams():
+    """Team accesses should be materialized per team."""
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    child = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FILE)
+
+    factories.TeamItemAccessFactory(item=root, team="lasuite", role="administrator")
+
+    assert get_effective_roles(child) == {"lasuite": "administrator"}
+
+
+def test_models_item_effective_accesses_new_child_inherits():
+    """A child created after the accesses should inherit the roles of its parent."""
+    user = factories.UserFactory()
+    root = factories.ItemFactory(
+        type=models.ItemTypeChoices.FOLDER, users=[(user, "administrator")]
+    )
+
+    child = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FILE)
+
+    assert get_effective_roles(child) == {user.id: "administrator"}
+
+
+def test_models_item_effective_accesses_move():
+    """Moving an item should recompute the roles inherited from its new ancestors."""
+    user = factories.UserFactory()
+    source = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER, users=[(user, "owner")])
+    target = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER, users=[(user, "reader")])
+    folder = factories.ItemFactory(parent=source, type=models.ItemTypeChoices.FOLDER)
+    file = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FILE)
+
+    assert get_effective_roles(file) == {user.id: "owner"}
+
+    folder.move(target)
+
+    assert get_effective_roles(folder) == {user.id: "reader"}
+    assert get_effective_roles(file) == {user.id: "reader"}
+
+
+def test_models_item_effective_accesses_get_role_single_query(django_assert_num_queries):
+    """Item.get_role should resolve the role with one indexed lookup."""
+    user = factories.UserFactory()
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER, users=[(user, "editor")])
+    folder = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+    item = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FILE)
+
+    with django_assert_num_queries(1):
+        assert item.get_role(user) == "editor"
+
+    with django_assert_num_queries(0):
+        assert item.get_role(AnonymousUser()) is None
+
+
+def test_models_item_effective_accesses_rebuild_matches_accesses():
+    """A full rebuild should produce the same rows as the incremental maintenance."""
+    user = factories.UserFactory()
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER, users=[(user, "reader")])
+    folder = factories.ItemFactory(
+        parent=root, type=models.ItemTypeChoices.FOLDER, users=[(user, "editor")]
+    )
+    factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FILE)
+
+    expected = set(
+        models.ItemEffectiveAccess.objects.values_list("item_id", "user_id", "team", "role")
+    )
+
+    models.ItemEffectiveAccess.objects.all().delete()
+    models.ItemEffectiveAccess.objects.rebuild()
+
+    assert (
+        set(models.ItemEffectiveAccess.objects.values_list("item_id", "user_id", "team", "role"))
+        == expected
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_models_item_effective_accesses_rebuild_concurrent():
+    """Concurrent rebuilds of overlapping subtrees should not violate the unique constraints."""
+    user = factories.UserFactory()
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER, users=[(user, "reader")])
+    folder = factories.ItemFactory(
+        parent=root, type=models.ItemTypeChoices.FOLDER, teams=[("lasuite", "editor")]
+    )
+    file = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FILE)
+
+    def rebuild(path):
+        try:
+            for _ in range(10):
+                models.ItemEffectiveAccess.objects.rebuild(path)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(rebuild, path) for path in [root.path, folder.path, None]]
+        for future in futures:
+            future.result()
+
+    assert get_effective_roles(file) == {user.id: "reader", "lasuite": "editor"}
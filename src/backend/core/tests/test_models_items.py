@@ -12,6 +12,8 @@ from django.contrib.auth.models import AnonymousUser
 from django.core import mail
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 import pytest
@@ -75,6 +77,19 @@ def test_models_items_file_key():
     assert item.file_key == "item/9531a5f1-42b1-496c-b3f4-1c09ed139b3c/logo.png"
 
 
+def test_models_items_file_key_versioned(settings):
+    """With versioned keys, the file key should not depend on the name of the file."""
+    settings.ITEM_FILE_VERSIONED_KEYS = True
+    item = factories.ItemFactory(
+        id="9531a5f1-42b1-496c-b3f4-1c09ed139b3c",
+        type=models.ItemTypeChoices.FILE,
+        filename="logo.png",
+    )
+    assert item.file_version == 1
+    assert item.file_key == "item/9531a5f1-42b1-496c-b3f4-1c09ed139b3c/v1"
+    assert item.media_key == "item/9531a5f1-42b1-496c-b3f4-1c09ed139b3c/logo.png"
+
+
 @pytest.mark.parametrize("depth", range(5))
 def test_models_items_soft_delete(depth):
     """Trying to delete an item that is already deleted or is a descendant of
@@ -362,7 +377,7 @@ def test_models_items_get_abilities_reader(is_authenticated, reach, django_asser
 @pytest.mark.parametrize(
     "is_authenticated,reach,item_type,can_duplicate,upload_state",
     [
-        (True, "public", models.ItemTypeChoices.FOLDER, False, None),
+        (True, "public", models.ItemTypeChoices.FOLDER, True, None),
         (
             True,
             "public",
@@ -383,7 +398,7 @@ def test_models_items_get_abilities_reader(is_authenticated, reach, django_asser
         ),
         (False, "public", models.ItemTypeChoices.FOLDER, False, None),
         (False, "public", models.ItemTypeChoices.FILE, False, None),
-        (True, "authenticated", models.ItemTypeChoices.FOLDER, False, None),
+        (True, "authenticated", models.ItemTypeChoices.FOLDER, True, None),
         (
             True,
             "authenticated",
@@ -467,7 +482,7 @@ def test_models_items_get_abilities_editor(  # noqa: PLR0913
 @pytest.mark.parametrize(
     "item_type,can_duplicate,upload_state",
     [
-        (models.ItemTypeChoices.FOLDER, False, None),
+        (models.ItemTypeChoices.FOLDER, True, None),
         (models.ItemTypeChoices.FILE, True, models.ItemUploadStateChoices.READY),
         *(
             (
@@ -557,7 +572,7 @@ def test_models_items_not_root_get_abilities_owner(
 @pytest.mark.parametrize(
     "item_type,can_duplicate,upload_state",
     [
-        (models.ItemTypeChoices.FOLDER, False, None),
+        (models.ItemTypeChoices.FOLDER, True, None),
         (models.ItemTypeChoices.FILE, True, models.ItemUploadStateChoices.READY),
         *(
             (
@@ -626,7 +641,7 @@ def test_models_items_not_root_get_abilities_administrator(
 @pytest.mark.parametrize(
     "item_type,can_duplicate,upload_state",
     [
-        (models.ItemTypeChoices.FOLDER, False, None),
+        (models.ItemTypeChoices.FOLDER, True, None),
         (models.ItemTypeChoices.FILE, True, models.ItemUploadStateChoices.READY),
         *(
             (
@@ -712,7 +727,7 @@ def test_models_items_not_root_get_abilities_reader_user(django_assert_num_queri
         "breadcrumb": True,
         "children_list": True,
         "destroy": False,
-        "duplicate": access_from_link,
+        "duplicate": access_from_link or can_export,
         "export": can_export,
         "hard_delete": False,
         "favorite": True,
@@ -1024,12 +1039,12 @@ def test_models_items_nb_accesses_cache_is_set_and_retrieved(
 ):
     """Test that nb_accesses is cached after the first computation."""
     item = factories.ItemFactory()
-    key = f"item_{item.id!s}_nb_accesses"
     nb_accesses = random.randint(1, 4)
     factories.UserItemAccessFactory.create_batch(nb_accesses, item=item)
     factories.UserItemAccessFactory()  # An unrelated access should not be counted
 
     # Initially, the nb_accesses should not be cached
+    key = item.get_nb_accesses_cache_key()
     assert cache.get(key) is None
 
     # Compute the nb_accesses for the first time (this should set the cache)
@@ -1043,6 +1058,7 @@ def test_models_items_nb_accesses_cache_is_set_and_retrieved(
 
     # The cache value should be invalidated when a item access is created
     models.ItemAccess.objects.create(item=item, user=factories.UserFactory(), role="reader")
+    key = item.get_nb_accesses_cache_key()
     assert cache.get(key) is None  # Cache should be invalidated
     with django_assert_num_queries(1):
         new_nb_accesses = item.nb_accesses
@@ -1055,15 +1071,15 @@ def test_models_items_nb_accesses_cache_is_invalidated_on_access_removal(
 ):
     """Test that the cache is invalidated when an item access is deleted."""
     item = factories.ItemFactory()
-    key = f"item_{item.id!s}_nb_accesses"
     access = factories.UserItemAccessFactory(item=item)
 
     # Initially, the nb_accesses should be cached
     assert item.nb_accesses == 1
-    assert cache.get(key) == 1
+    assert cache.get(item.get_nb_accesses_cache_key()) == 1
 
     # Remove the access and check if cache is invalidated
     access.delete()
+    key = item.get_nb_accesses_cache_key()
     assert cache.get(key) is None  # Cache should be invalidated
 
     # Recompute the nb_accesses (this should trigger a cache set)
@@ -1207,67 +1223,202 @@ def test_models_items_unique_title_in_current_path_soft_deleted():
     factories.ItemFactory(parent=parent, title="child1", type=models.ItemTypeChoices.FOLDER)
 
 
-def test_models_items_numchild_annotation():
-    """The numchild property should return the number of children."""
+def test_models_items_numchild_counter():
+    """The numchild counter should return the number of children."""
     parent = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
 
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild == 0
 
     factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FOLDER)
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild == 1
 
     factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FILE)
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild == 2
 
     to_delete = factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FOLDER)
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild == 3
 
     to_delete.soft_delete()
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild == 2
 
     to_delete.restore()
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild == 3
 
 
-def test_models_items_numchild_folder_annotation():
-    """The numchild_folder property should return the number of folder children."""
+def test_models_items_numchild_folder_counter():
+    """The numchild_folder counter should return the number of folder children."""
     parent = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
 
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild_folder == 0
 
     factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FOLDER)
 
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild_folder == 1
 
     factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FILE)
 
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild_folder == 1
 
     to_delete = factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FOLDER)
 
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild_folder == 2
 
     to_delete.soft_delete()
 
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild_folder == 1
 
     to_delete.restore()
 
-    item = models.Item.objects.annotate_with_numchild().get(pk=parent.id)
+    item = models.Item.objects.get(pk=parent.id)
     assert item.numchild_folder == 2
 
 
+def test_models_items_numchild_move():
+    """Moving an item should update the counters of its former and new parents."""
+    source = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    target = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    item = factories.ItemFactory(parent=source, type=models.ItemTypeChoices.FOLDER)
+
+    item.move(target)
+
+    source.refresh_from_db()
+    target.refresh_from_db()
+    assert (source.numchild, source.numchild_folder) == (0, 0)
+    assert (target.numchild, target.numchild_folder) == (1, 1)
+
+
+def test_models_items_numchild_soft_delete_subtree():
+    """Deleting a folder should reset the counters of its whole subtree until restored."""
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    folder = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+    subfolder = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory(parent=subfolder, type=models.ItemTypeChoices.FILE)
+
+    folder.soft_delete()
+
+    for item in [root, folder, subfolder]:
+        item.refresh_from_db()
+    assert root.numchild == 0
+    assert folder.numchild == 0
+    assert subfolder.numchild == 0
+
+    folder.restore()
+
+    for item in [root, folder, subfolder]:
+        item.refresh_from_db()
+    assert (root.numchild, root.numchild_folder) == (1, 1)
+    assert (folder.numchild, folder.numchild_folder) == (1, 1)
+    assert (subfolder.numchild, subfolder.numchild_folder) == (1, 0)
+
+
+def test_models_items_numchild_not_overwritten_by_stale_instance():
+    """Saving an instance loaded before children were added should keep the counters."""
+    parent = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    stale_parent = models.Item.objects.get(pk=parent.pk)
+
+    factories.ItemFactory(parent=parent, type=models.ItemTypeChoices.FILE)
+
+    stale_parent.title = "new title"
+    stale_parent.save()
+
+    parent.refresh_from_db()
+    assert parent.title == "new title"
+    assert parent.numchild == 1
+
+
+def test_models_items_save_deferred_fields():
+    """Saving an instance with deferred fields should only save the fields loaded."""
+    item = factories.ItemFactory(type=models.ItemTypeChoices.FILE, mimetype="text/plain")
+    deferred_item = models.Item.objects.only("id", "path", "title").get(pk=item.pk)
+
+    deferred_item.title = "new title"
+    with CaptureQueriesContext(connection) as context:
+        deferred_item.save()
+
+    (update_sql,) = [
+        query["sql"]
+        for query in context.captured_queries
+        if query["sql"].startswith('UPDATE "drive_item" SET "title"')
+    ]
+    assert '"mimetype"' not in update_sql
+    assert '"numchild"' not in update_sql
+
+    item.refresh_from_db()
+    assert (item.title, item.mimetype) == ("new title", "text/plain")
+
+
+def test_models_items_parent_id():
+    """The parent pointer should follow the path on creation and on move."""
+    source = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    target = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    item = factories.ItemFactory(parent=source, type=models.ItemTypeChoices.FOLDER)
+    child = factories.ItemFactory(parent=item, type=models.ItemTypeChoices.FILE)
+
+    assert source.parent_id is None
+    assert item.parent_id == source.id
+    assert list(source.children()) == [item]
+
+    item.move(target)
+
+    item.refresh_from_db()
+    child.refresh_from_db()
+    assert item.parent_id == target.id
+    assert child.parent_id == item.id
+    assert not source.children().exists()
+    assert list(target.children()) == [item]
+
+
+def test_models_items_siblings_parent_id():
+    """Siblings should be the other children of the same parent."""
+    parent = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    item, sibling = factories.ItemFactory.create_batch(
+        2, parent=parent, type=models.ItemTypeChoices.FOLDER
+    )
+    factories.ItemFactory(parent=item, type=models.ItemTypeChoices.FILE)
+
+    assert list(item.siblings()) == [sibling]
+
+
+def test_models_items_nb_accesses_cache_invalidated_on_descendants():
+    """An access change on an item should invalidate the cache of its whole subtree."""
+    root = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    folder = factories.ItemFactory(parent=root, type=models.ItemTypeChoices.FOLDER)
+    item = factories.ItemFactory(parent=folder, type=models.ItemTypeChoices.FOLDER)
+
+    assert item.nb_accesses == 0
+    assert cache.get(item.get_nb_accesses_cache_key()) == 0
+
+    factories.UserItemAccessFactory(item=root)
+
+    assert cache.get(item.get_nb_accesses_cache_key()) is None
+    assert item.nb_accesses == 1
+
+
+def test_models_items_nb_accesses_cache_follows_move():
+    """Moving an item should not serve the number of accesses of its former ancestors."""
+    source = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    target = factories.ItemFactory(type=models.ItemTypeChoices.FOLDER)
+    factories.UserItemAccessFactory.create_batch(2, item=source)
+    item = factories.ItemFactory(parent=source, type=models.ItemTypeChoices.FOLDER)
+
+    assert item.nb_accesses == 2
+
+    item.move(target)
+
+    assert item.nb_accesses == 0
+
+
 def test_models_items_restore():
     """The restore method should restore a soft-deleted item."""
     item = factories.ItemFactory()
@@ -1381,3 +1532,16 @@ def test_models_items_restore_complex_bis():
     assert item.ancestors_deleted_at == item.deleted_at
     assert child1.ancestors_deleted_at == item.deleted_at
     assert child2.ancestors_deleted_at == item.deleted_at
+
+
+def test_models_items_path_descendants_any_lookup():
+    """The descendants_any lookup should match descendants of any of the given paths."""
+    root1, root2, root3 = factories.ItemFactory.create_batch(3, type=models.ItemTypeChoices.FOLDER)
+    child1 = factories.ItemFactory(parent=root1, type=models.ItemTypeChoices.FOLDER)
+    grand_child1 = factories.ItemFactory(parent=child1, type=models.ItemTypeChoices.FOLDER)
+    child2 = factories.ItemFactory(parent=root2, type=models.ItemTypeChoices.FOLDER)
+    factories.ItemFactory(parent=root3, type=models.ItemTypeChoices.FOLDER)
+
+    queryset = models.Item.objects.filter(path__descendants_any=[child1.path, root2.path])
+
+    assert set(queryset) == {child1, grand_child1, root2, child2}
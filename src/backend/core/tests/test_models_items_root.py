@@ -36,6 +36,7 @@ def test_models_sub_item_abilities_downgraded():
         data={
             "type": models.ItemTypeChoices.FILE,
             "filename": "file.txt",
+            "size": 8,
         },
     )
 
@@ -114,7 +115,7 @@ def test_models_sub_item_abilities_downgraded():
 @pytest.mark.parametrize(
     "item_type,can_duplicate,upload_state",
     [
-        (models.ItemTypeChoices.FOLDER, False, None),
+        (models.ItemTypeChoices.FOLDER, True, None),
         (models.ItemTypeChoices.FILE, True, models.ItemUploadStateChoices.READY),
         *(
             (
@@ -198,7 +199,7 @@ def test_models_items_root_get_abilities_owner(
 @pytest.mark.parametrize(
     "item_type,can_duplicate,upload_state",
     [
-        (models.ItemTypeChoices.FOLDER, False, None),
+        (models.ItemTypeChoices.FOLDER, True, None),
         (models.ItemTypeChoices.FILE, True, models.ItemUploadStateChoices.READY),
         *(
             (
@@ -264,7 +265,7 @@ def test_models_items_root_get_abilities_administrator(
 @pytest.mark.parametrize(
     "item_type,can_duplicate,upload_state",
     [
-        (models.ItemTypeChoices.FOLDER, False, None),
+        (models.ItemTypeChoices.FOLDER, True, None),
         (models.ItemTypeChoices.FILE, True, models.ItemUploadStateChoices.READY),
         *(
             (
@@ -330,7 +331,7 @@ def test_models_items_root_get_abilities_editor_user(
 @pytest.mark.parametrize(
     "item_type,can_duplicate",
     [
-        (models.ItemTypeChoices.FOLDER, False),
+        (models.ItemTypeChoices.FOLDER, True),
         (models.ItemTypeChoices.FILE, True),
     ],
 )
@@ -350,7 +351,7 @@ def test_models_items_root_get_abilities_reader_user(
         "children_create": access_from_link,
         "children_list": True,
         "destroy": False,
-        "duplicate": can_duplicate and access_from_link,
+        "duplicate": can_duplicate and (access_from_link or can_export),
         "export": can_export,
         "hard_delete": False,
         "favorite": True,
@@ -0,0 +1,98 @@
+"""Tests for the service storing files in content addressed blobs."""
+
+import hashlib
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+
+import pytest
+
+from core import factories, models
+from core.services.blobs import delete_unreferenced_blobs, store_file_as_blob
+
+pytestmark = pytest.mark.django_db
+
+CONTENT = b"my prose"
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+def create_uploaded_file(content=CONTENT):
+    """Create a file item and upload its content where the upload policy puts it."""
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        filename="my_file.txt",
+        size=len(content),
+        update_upload_state=models.ItemUploadStateChoices.ANALYZING,
+    )
+    default_storage.save(item.file_key, BytesIO(content))
+    return item
+
+
+def test_services_blobs_store_new_blob():
+    """The uploaded file should be moved to a new blob named after its digest."""
+    item = create_uploaded_file()
+    upload_key = item.file_key
+
+    blob = store_file_as_blob(item)
+
+    assert blob.sha256 == SHA256
+    assert blob.size == len(CONTENT)
+    assert blob.key == f"blob/{SHA256[:2]:s}/{SHA256:s}"
+
+    item.refresh_from_db()
+    assert item.blob == blob
+    assert item.file_key == blob.key
+    assert item.media_key == upload_key
+    assert not default_storage.exists(upload_key)
+    with default_storage.open(blob.key, "rb") as file:
+        assert file.read() == CONTENT
+
+
+def test_services_blobs_store_existing_blob(django_assert_num_queries):
+    """A file with the content of an existing blob should reference it and be dropped."""
+    first_item = create_uploaded_file()
+    blob = store_file_as_blob(first_item)
+    item = create_uploaded_file()
+    upload_key = item.file_key
+
+    assert store_file_as_blob(item) == blob
+
+    item.refresh_from_db()
+    assert item.blob == blob
+    assert not default_storage.exists(upload_key)
+    assert models.Blob.objects.count() == 1
+    assert list(blob.items.order_by("created_at")) == [first_item, item]
+
+    # Storing an item that already references a blob does nothing
+    with django_assert_num_queries(0):
+        assert store_file_as_blob(item) == blob
+
+
+def test_services_blobs_delete_unreferenced_blobs():
+    """Only the blobs not referenced by any item anymore should be deleted."""
+    item, other_item = create_uploaded_file(), create_uploaded_file()
+    blob = store_file_as_blob(item)
+    store_file_as_blob(other_item)
+    unique_item = create_uploaded_file(b"other content")
+    unique_blob = store_file_as_blob(unique_item)
+
+    item.delete()
+    unique_item.delete()
+
+    assert delete_unreferenced_blobs([blob.sha256, unique_blob.sha256]) == len(b"other content")
+
+    assert list(models.Blob.objects.all()) == [blob]
+    assert default_storage.exists(blob.key)
+    assert not default_storage.exists(unique_blob.key)
+
+    other_item.delete()
+
+    assert delete_unreferenced_blobs([blob.sha256]) == len(CONTENT)
+    assert not models.Blob.objects.exists()
+    assert not default_storage.exists(blob.key)
+
+
+def test_services_blobs_delete_unreferenced_blobs_empty(django_assert_num_queries):
+    """Nothing should be queried without blobs to check."""
+    with django_assert_num_queries(0):
+        assert delete_unreferenced_blobs([]) == 0
@@ -0,0 +1,95 @@
+"""Test the service signing the requests sent to the object storage."""
+
+# pylint: disable=protected-access
+
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+import botocore
+import pytest
+from freezegun import freeze_time
+
+from core.services.s3_signer import CREDENTIALS_REFRESH_INTERVAL, S3RequestSigner
+from core.storage import get_storage_gateway
+
+
+def _sign_with_botocore(key):
+    url = default_storage.unsigned_connection.meta.client.generate_presigned_url(
+        "get_object",
+        ExpiresIn=0,
+        Params={"Bucket": default_storage.bucket_name, "Key": key},
+    )
+    request = botocore.awsrequest.AWSRequest(method="get", url=url)
+    s3_client = get_storage_gateway()._client
+    credentials = s3_client._request_signer._credentials
+    botocore.auth.S3SigV4Auth(
+        credentials.get_frozen_credentials(), "s3", s3_client.meta.region_name
+    ).add_auth(request)
+    return dict(request.headers)
+
+
+@pytest.mark.parametrize("key", ["item/1/report.pdf", "item/2/ça va & co (1)~.txt"])
+def test_services_s3_signer_same_as_botocore(key):
+    """The headers built by the signer should be the ones botocore builds."""
+    signer = S3RequestSigner(get_storage_gateway())
+
+    with freeze_time(timezone.now()):
+        assert signer.sign(key) == _sign_with_botocore(key)
+
+
+def test_services_s3_signer_session_token():
+    """A session token should be sent and signed with temporary credentials."""
+    signer = S3RequestSigner(get_storage_gateway())
+    credentials = botocore.credentials.Credentials("access", "secret", "token")
+
+    with (
+        mock.patch.object(
+            get_storage_gateway()._client._request_signer,
+            "_credentials",
+            credentials,
+        ),
+        freeze_time(timezone.now()),
+    ):
+        headers = signer.sign("item/1/report.pdf")
+        assert headers == _sign_with_botocore("item/1/report.pdf")
+
+    assert headers["X-Amz-Security-Token"] == "token"
+    assert "x-amz-date;x-amz-security-token, Signature=" in headers["Authorization"]
+
+
+def test_services_s3_signer_credentials_refreshed():
+    """Credentials should be reused for a while, then refreshed."""
+    signer = S3RequestSigner(get_storage_gateway())
+    now = timezone.now()
+
+    with freeze_time(now) as frozen_time:
+        credentials = signer.get_credentials()
+        with mock.patch.object(
+            get_storage_gateway()._client._request_signer,
+            "_credentials",
+            botocore.credentials.Credentials("access", "rotated"),
+        ):
+            assert signer.get_credentials() is credentials
+
+            frozen_time.tick(timedelta(seconds=CREDENTIALS_REFRESH_INTERVAL))
+            assert signer.get_credentials().secret_key == "rotated"
+
+
+def test_services_s3_signer_signing_key_cached():
+    """The signing key should only be derived once a day."""
+    signer = S3RequestSigner(get_storage_gateway())
+
+    with freeze_time("2026-01-01 10:00:00") as frozen_time:
+        signer.sign("item/1/report.pdf")
+        signing_key = signer._signing_key
+
+        frozen_time.tick(timedelta(hours=1))
+        signer.sign("item/2/report.pdf")
+        assert signer._signing_key is signing_key
+
+        frozen_time.tick(timedelta(days=1))
+        signer.sign("item/3/report.pdf")
+        assert signer._signing_key[1] == "20260102"
@@ -0,0 +1,167 @@
+"""Test the service copying files inside the object storage."""
+
+# pylint: disable=protected-access
+
+import os
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+import pytest
+from botocore.exceptions import ClientError
+
+from core.services.storage_copy import _get_copy_state_key, abort_copy, copy_file
+from core.storage import get_storage_gateway
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(name="s3_client")
+def fixture_s3_client():
+    """Return the S3 client of the storage gateway."""
+    return get_storage_gateway()._client
+
+
+@pytest.fixture(name="multipart_settings")
+def fixture_multipart_settings(settings):
+    """Copy files by parts of the minimum size allowed by S3."""
+    settings.STORAGE_COPY_MULTIPART_THRESHOLD = 1
+    settings.STORAGE_COPY_PART_SIZE = 1
+    settings.STORAGE_COPY_MAX_CONCURRENCY = 2
+    return settings
+
+
+def _save_file(s3_client, key, content):
+    s3_client.put_object(
+        Bucket=default_storage.bucket_name,
+        Key=key,
+        Body=content,
+        ContentType="application/pdf",
+        Metadata={"owner": "me"},
+    )
+
+
+def _read_file(s3_client, key):
+    return s3_client.get_object(Bucket=default_storage.bucket_name, Key=key)
+
+
+def test_services_storage_copy_small_file(s3_client):
+    """Small files should be copied in one request with their content type and metadata."""
+    _save_file(s3_client, "copy/small-source", b"my prose")
+    on_progress = mock.Mock()
+
+    with mock.patch.object(
+        s3_client, "upload_part_copy", wraps=s3_client.upload_part_copy
+    ) as mock_upload_part_copy:
+        copy_file("copy/small-source", "copy/small-target", on_progress=on_progress)
+
+    mock_upload_part_copy.assert_not_called()
+    response = _read_file(s3_client, "copy/small-target")
+    assert response["Body"].read() == b"my prose"
+    assert response["ContentType"] == "application/pdf"
+    assert response["Metadata"] == {"owner": "me"}
+    on_progress.assert_called_once_with(8, 8)
+
+
+def test_services_storage_copy_large_file(s3_client, multipart_settings):
+    """Large files should be copied by parts with their content type and metadata."""
+    content = os.urandom(11 * MB)
+    _save_file(s3_client, "copy/large-source", content)
+    on_progress = mock.Mock()
+
+    with mock.patch.object(
+        s3_client, "upload_part_copy", wraps=s3_client.upload_part_copy
+    ) as mock_upload_part_copy:
+        copy_file("copy/large-source", "copy/large-target", on_progress=on_progress)
+
+    assert mock_upload_part_copy.call_count == 3
+    response = _read_file(s3_client, "copy/large-target")
+    assert response["Body"].read() == content
+    assert response["ContentType"] == "application/pdf"
+    assert response["Metadata"] == {"owner": "me"}
+    assert on_progress.call_count == 3
+    on_progress.assert_called_with(11 * MB, 11 * MB)
+    assert cache.get(_get_copy_state_key("copy/large-target")) is None
+
+
+def _fail_on_last_part(s3_client):
+    """Make the copy of the last part of a 11MB file fail."""
+    upload_part_copy = s3_client.upload_part_copy
+
+    def side_effect(**kwargs):
+        if kwargs["PartNumber"] == 3:
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "Slow down"}}, "copy")
+        return upload_part_copy(**kwargs)
+
+    return mock.patch.object(s3_client, "upload_part_copy", side_effect=side_effect)
+
+
+def test_services_storage_copy_large_file_resumed(s3_client, multipart_settings):
+    """Copying again a file after a failure should only copy the parts that are missing."""
+    content = os.urandom(11 * MB)
+    _save_file(s3_client, "copy/resumed-source", content)
+
+    with _fail_on_last_part(s3_client), pytest.raises(ClientError):
+        copy_file("copy/resumed-source", "copy/resumed-target")
+
+    assert not default_storage.exists("copy/resumed-target")
+    assert cache.get(_get_copy_state_key("copy/resumed-target")) is not None
+
+    on_progress = mock.Mock()
+    with mock.patch.object(
+        s3_client, "upload_part_copy", wraps=s3_client.upload_part_copy
+    ) as mock_upload_part_copy:
+        copy_file("copy/resumed-source", "copy/resumed-target", on_progress=on_progress)
+
+    assert mock_upload_part_copy.call_count == 1
+    assert mock_upload_part_copy.call_args.kwargs["PartNumber"] == 3
+    on_progress.assert_called_once_with(11 * MB, 11 * MB)
+    assert _read_file(s3_client, "copy/resumed-target")["Body"].read() == content
+
+
+def test_services_storage_copy_large_file_source_changed(s3_client, multipart_settings):
+    """Parts copied from a former version of the source should not be reused."""
+    _save_file(s3_client, "copy/changed-source", os.urandom(11 * MB))
+
+    with _fail_on_last_part(s3_client), pytest.raises(ClientError):
+        copy_file("copy/changed-source", "copy/changed-target")
+
+    content = os.urandom(11 * MB)
+    _save_file(s3_client, "copy/changed-source", content)
+
+    with mock.patch.object(
+        s3_client, "upload_part_copy", wraps=s3_client.upload_part_copy
+    ) as mock_upload_part_copy:
+        copy_file("copy/changed-source", "copy/changed-target")
+
+    assert mock_upload_part_copy.call_count == 3
+    assert _read_file(s3_client, "copy/changed-target")["Body"].read() == content
+
+
+def test_services_storage_copy_abort(s3_client, multipart_settings):
+    """Aborting a copy should free the parts copied so far."""
+    _save_file(s3_client, "copy/aborted-source", os.urandom(11 * MB))
+
+    with _fail_on_last_part(s3_client), pytest.raises(ClientError):
+        copy_file("copy/aborted-source", "copy/aborted-target")
+    upload_id = cache.get(_get_copy_state_key("copy/aborted-target"))["upload_id"]
+
+    abort_copy("copy/aborted-target")
+
+    assert cache.get(_get_copy_state_key("copy/aborted-target")) is None
+    uploads = s3_client.list_multipart_uploads(
+        Bucket=default_storage.bucket_name, Prefix="copy/aborted-target"
+    )
+    assert upload_id not in [upload["UploadId"] for upload in uploads.get("Uploads", [])]
+
+    # Nothing happens when no copy is in progress
+    abort_copy("copy/aborted-target")
+
+
+def test_services_storage_copy_missing_source():
+    """Copying a file that does not exist should fail."""
+    with pytest.raises(ClientError):
+        copy_file("copy/missing-source", "copy/missing-target")
+
+    assert not default_storage.exists("copy/missing-target")
@@ -0,0 +1,291 @@
+"""Test the gateways to the object storage."""
+
+# pylint: disable=protected-access
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+
+import pytest
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from freezegun import freeze_time
+
+from core.storage import get_storage_gateway
+from core.storage.gateway import (
+    InMemoryStorageGateway,
+    S3StorageGateway,
+    StorageGatewayMetrics,
+)
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(name="gateway", params=["s3", "in_memory"])
+def fixture_gateway(request):
+    """The gateway to the object storage and its in-memory fake, which should behave alike."""
+    return S3StorageGateway() if request.param == "s3" else InMemoryStorageGateway()
+
+
+def test_storage_gateway_default():
+    """The gateway configured should be shared by the whole process."""
+    assert isinstance(get_storage_gateway(), S3StorageGateway)
+    assert get_storage_gateway() is get_storage_gateway()
+
+
+def test_storage_gateway_put_head_get(gateway):
+    """Files stored should be read whole or by range."""
+    result = gateway.put_stream(
+        "gateway/file.txt", BytesIO(b"my prose"), content_type="text/plain", metadata={"a": "b"}
+    )
+
+    head = gateway.head("gateway/file.txt")
+    assert result == {"ETag": head["ETag"], "ContentLength": 8}
+    assert head["ContentLength"] == 8
+    assert head["ContentType"] == "text/plain"
+    assert head["Metadata"] == {"a": "b"}
+
+    response = gateway.get_range("gateway/file.txt")
+    assert response["Body"].read() == b"my prose"
+    assert response["ETag"] == head["ETag"]
+
+    response = gateway.get_range("gateway/file.txt", start=3, end=5)
+    assert response["Body"].read() == b"pro"
+    assert response["ContentRange"] == "bytes 3-5/8"
+    assert gateway.get_range("gateway/file.txt", start=3)["Body"].read() == b"prose"
+
+
+def test_storage_gateway_empty_file(gateway):
+    """Empty files should be read without range."""
+    gateway.put_stream("gateway/empty.txt", BytesIO(b""))
+
+    assert gateway.head("gateway/empty.txt")["ContentLength"] == 0
+    assert gateway.get_range("gateway/empty.txt")["Body"].read() == b""
+
+
+def test_storage_gateway_missing_file(gateway):
+    """Reading a missing file should raise the errors of S3."""
+    with pytest.raises(ClientError) as head_error:
+        gateway.head("gateway/missing.txt")
+    assert head_error.value.response["Error"]["Code"] == "404"
+
+    with pytest.raises(ClientError) as get_error:
+        gateway.get_range("gateway/missing.txt")
+    assert get_error.value.response["Error"]["Code"] == "NoSuchKey"
+
+    assert gateway.metrics.snapshot()["head"]["errors"] == 1
+
+
+def test_storage_gateway_copy(gateway):
+    """Files should be copied with their content type and metadata, or new ones."""
+    gateway.put_stream(
+        "gateway/source.txt", BytesIO(b"my prose"), content_type="text/plain", metadata={"a": "b"}
+    )
+
+    gateway.copy("gateway/source.txt", "gateway/target.txt")
+    head = gateway.head("gateway/target.txt")
+    assert (head["ContentType"], head["Metadata"]) == ("text/plain", {"a": "b"})
+
+    gateway.copy("gateway/source.txt", "gateway/source.txt", content_type="text/markdown")
+    head = gateway.head("gateway/source.txt")
+    assert (head["ContentType"], head["Metadata"]) == ("text/markdown", {"a": "b"})
+    assert gateway.get_range("gateway/source.txt")["Body"].read() == b"my prose"
+
+
+def test_storage_gateway_list_and_delete(gateway):
+    """Files should be listed by prefix and deleted at once."""
+    for name in ["a", "b", "c"]:
+        gateway.put_stream(f"gateway/list/{name:s}.txt", BytesIO(name.encode()))
+    gateway.put_stream("gateway/other.txt", BytesIO(b"other"))
+
+    keys = [file["Key"] for file in gateway.list("gateway/list/")]
+    assert keys == ["gateway/list/a.txt", "gateway/list/b.txt", "gateway/list/c.txt"]
+
+    assert gateway.delete_many([*keys[:2], "gateway/list/missing.txt"]) == []
+    gateway.delete(keys[2])
+
+    assert not list(gateway.list("gateway/list/"))
+    assert gateway.head("gateway/other.txt")["ContentLength"] == 5
+
+
+def test_storage_gateway_open_and_sha256(gateway):
+    """Files should be streamed and hashed without being loaded at once."""
+    gateway.put_stream("gateway/hashed.txt", BytesIO(b"my prose"))
+
+    with closing(gateway.open("gateway/hashed.txt")) as body:
+        assert list(body.iter_chunks(3)) == [b"my ", b"pro", b"se"]
+    assert gateway.get_sha256("gateway/hashed.txt") == hashlib.sha256(b"my prose").hexdigest()
+
+
+def test_storage_gateway_multipart_copy(gateway):
+    """Files should be copied by parts, only while their ETag is the one expected."""
+    gateway.put_stream("gateway/source.txt", BytesIO(b"my prose"))
+    etag = gateway.head("gateway/source.txt")["ETag"]
+
+    upload_id = gateway.create_multipart_upload("gateway/target.txt", content_type="text/plain")
+    with pytest.raises(ClientError) as error:
+        gateway.upload_part_copy(
+            "gateway/source.txt", "gateway/target.txt", upload_id, 1, 0, 7, '"other"'
+        )
+    assert error.value.response["Error"]["Code"] == "PreconditionFailed"
+
+    part_etag = gateway.upload_part_copy(
+        "gateway/source.txt", "gateway/target.txt", upload_id, 1, 0, 7, etag
+    )
+    parts = list(gateway.list_parts("gateway/target.txt", upload_id))
+    assert [(part["PartNumber"], part["ETag"], part["Size"]) for part in parts] == [
+        (1, part_etag, 8)
+    ]
+
+    gateway.complete_multipart_upload(
+        "gateway/target.txt", upload_id, [{"PartNumber": 1, "ETag": part_etag}]
+    )
+    assert gateway.head("gateway/target.txt")["ContentType"] == "text/plain"
+    assert gateway.get_range("gateway/target.txt")["Body"].read() == b"my prose"
+
+
+def test_storage_gateway_multipart_abort(gateway):
+    """Aborted uploads should be forgotten."""
+    upload_id = gateway.create_multipart_upload("gateway/aborted.txt")
+    gateway.abort_multipart_upload("gateway/aborted.txt", upload_id)
+
+    with pytest.raises(ClientError) as error:
+        list(gateway.list_parts("gateway/aborted.txt", upload_id))
+    assert error.value.response["Error"]["Code"] == "NoSuchUpload"
+
+
+def test_storage_gateway_presign(gateway):
+    """Urls authorizing an operation should be signed for the key and parameters given."""
+    url = gateway.presign("put_object", "gateway/signed file.txt", 60, ContentLength=8)
+
+    assert "signed%20file.txt?" in url
+    assert "60" in url
+
+
+def test_storage_gateway_metrics(gateway):
+    """The number and the latency of the operations should be recorded."""
+    gateway.put_stream("gateway/metrics.txt", BytesIO(b"my prose"))
+    gateway.head("gateway/metrics.txt")
+    gateway.head("gateway/metrics.txt")
+
+    metrics = gateway.metrics.snapshot()
+    assert metrics["put_stream"]["count"] == 1
+    assert metrics["head"]["count"] == 2
+    assert metrics["head"]["errors"] == 0
+    assert 0 <= metrics["head"]["max_seconds"] <= metrics["head"]["total_seconds"]
+
+    gateway.metrics.reset()
+    assert gateway.metrics.snapshot() == {}
+
+
+def test_storage_gateway_metrics_logged(caplog):
+    """The metrics should be logged and reset once their interval elapsed."""
+    gateway = InMemoryStorageGateway()
+
+    with freeze_time() as frozen_time, caplog.at_level(logging.INFO):
+        gateway.metrics = StorageGatewayMetrics(log_interval=60)
+        gateway.put_stream("gateway/metrics.txt", BytesIO(b"my prose"))
+        assert not caplog.records
+
+        frozen_time.tick(60)
+        gateway.head("gateway/metrics.txt")
+
+    assert [record.getMessage().split(" avg=")[0] for record in caplog.records] == [
+        "storage_gateway metrics over 60s: head count=1 errors=0",
+        "storage_gateway metrics over 60s: put_stream count=1 errors=0",
+    ]
+    assert gateway.metrics.snapshot() == {}
+
+
+def test_storage_gateway_s3_delete_many_batches():
+    """Files should be deleted by batches of 1000 keys, the limit of S3."""
+    gateway = S3StorageGateway()
+    keys = [f"gateway/batch/{i:d}" for i in range(1001)]
+
+    with mock.patch.object(
+        gateway._client,
+        "delete_objects",
+        side_effect=[{}, {"Errors": [{"Key": keys[-1], "Message": "Denied"}]}],
+    ) as mock_delete_objects:
+        errors = gateway.delete_many(keys)
+
+    assert [
+        len(call.kwargs["Delete"]["Objects"]) for call in mock_delete_objects.call_args_list
+    ] == [1000, 1]
+    assert errors == [{"Key": keys[-1], "Message": "Denied"}]
+
+
+def test_storage_gateway_s3_clients_shared(settings):
+    """
+    One client should be shared by all threads, a second one only being created to sign
+    the upload urls for another domain.
+    """
+    gateway = S3StorageGateway()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        clients = set(executor.map(lambda _: id(gateway._client), range(8)))
+    assert clients == {id(gateway._client)}
+    assert gateway._upload_client is gateway._client
+
+    settings.AWS_S3_DOMAIN_REPLACE = "https://other-s3-endpoint.com"
+    upload_client = gateway._upload_client
+    assert upload_client is not gateway._client
+    assert upload_client is gateway._upload_client
+    assert upload_client.meta.endpoint_url == "https://other-s3-endpoint.com"
+
+
+@pytest.fixture(name="multipart_transfer_config")
+def fixture_multipart_transfer_config():
+    """Upload files by parts of the minimum size allowed by S3."""
+    with mock.patch.object(
+        default_storage,
+        "transfer_config",
+        TransferConfig(multipart_threshold=1, multipart_chunksize=1, max_concurrency=2),
+    ):
+        yield
+
+
+def test_storage_gateway_s3_put_stream_multipart(multipart_transfer_config):
+    """Large streams should be uploaded by parts, the result being the one of the upload."""
+    gateway = S3StorageGateway()
+    content = os.urandom(11 * MB)
+
+    with mock.patch.object(
+        gateway._client, "upload_part", wraps=gateway._client.upload_part
+    ) as mock_upload_part:
+        result = gateway.put_stream(
+            "gateway/large.bin", BytesIO(content), content_type="application/pdf"
+        )
+
+    assert [call.kwargs["PartNumber"] for call in mock_upload_part.call_args_list] == [1, 2, 3]
+    assert [len(call.kwargs["Body"]) for call in mock_upload_part.call_args_list] == [
+        5 * MB,
+        5 * MB,
+        1 * MB,
+    ]
+    head = gateway.head("gateway/large.bin")
+    assert result == {"ETag": head["ETag"], "ContentLength": 11 * MB}
+    assert head["ContentType"] == "application/pdf"
+    assert gateway.get_range("gateway/large.bin")["Body"].read() == content
+
+
+def test_storage_gateway_s3_put_stream_aborted(multipart_transfer_config):
+    """The parts uploaded should be freed if the stream can not be read until its end."""
+    gateway = S3StorageGateway()
+    stream = mock.Mock()
+    stream.read.side_effect = [os.urandom(5 * MB), OSError("Client disconnected")]
+
+    with pytest.raises(OSError):
+        gateway.put_stream("gateway/aborted.bin", stream)
+
+    uploads = gateway._client.list_multipart_uploads(
+        Bucket=gateway.bucket_name, Prefix="gateway/aborted.bin"
+    )
+    assert not uploads.get("Uploads")
+    assert not default_storage.exists("gateway/aborted.bin")
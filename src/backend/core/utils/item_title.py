@@ -46,3 +46,25 @@ def manage_unique_title(queryset, title):
     base_title, ext = splitext(title)
     next_number = _get_next_available_number(queryset, base_title, ext)
     return f"{base_title}_{next_number}{ext}"
+
+
+def get_unique_title(titles, title):
+    """
+    Return a title not among the given titles, numbered like manage_unique_title does.
+    Used when many items are created at once in folders whose titles are already known.
+    """
+    if title not in titles:
+        return title
+
+    base_title, ext = splitext(title)
+    escaped_ext = re.escape(ext) if ext else ""
+    title_regex = re.compile(rf"^{re.escape(base_title)}_\d+{escaped_ext}$")
+    numbers = [
+        _extract_number_from_title(existing_title)
+        for existing_title in titles
+        if title_regex.match(existing_title)
+    ]
+    if not numbers:
+        return f"{base_title}_01{ext}"
+
+    return f"{base_title}_{str(max(numbers) + 1).zfill(2)}{ext}"
@@ -142,6 +142,10 @@ class Base(Configuration):
     MEDIA_URL_PREVIEW = "/media/preview/"
     MEDIA_ROOT = os.path.join(DATA_DIR, "media")
     MEDIA_BASE_URL = values.Value(None, environ_name="MEDIA_BASE_URL", environ_prefix=None)
+    # Seconds during which the decision to let a user fetch a media is reused, 0 to disable
+    MEDIA_AUTH_CACHE_TIMEOUT = values.PositiveIntegerValue(
+        60, environ_name="MEDIA_AUTH_CACHE_TIMEOUT", environ_prefix=None
+    )
 
     SITE_ID = 1
 
@@ -217,11 +221,61 @@ class Base(Configuration):
         environ_name="AWS_S3_UPLOAD_POLICY_EXPIRATION",
         environ_prefix=None,
     )
+    AWS_S3_UPLOAD_PART_EXPIRATION = values.Value(
+        900,  # 15 minutes
+        environ_name="AWS_S3_UPLOAD_PART_EXPIRATION",
+        environ_prefix=None,
+    )
     AWS_S3_DOMAIN_REPLACE = values.Value(
         environ_name="AWS_S3_DOMAIN_REPLACE",
         environ_prefix=None,
     )
 
+    # Copies inside the object storage
+    STORAGE_COPY_MULTIPART_THRESHOLD = values.PositiveIntegerValue(
+        512 * 1024 * 1024,  # 512MB
+        environ_name="STORAGE_COPY_MULTIPART_THRESHOLD",
+        environ_prefix=None,
+    )
+    STORAGE_COPY_PART_SIZE = values.PositiveIntegerValue(
+        128 * 1024 * 1024,  # 128MB
+        environ_name="STORAGE_COPY_PART_SIZE",
+        environ_prefix=None,
+    )
+    STORAGE_COPY_MAX_CONCURRENCY = values.PositiveIntegerValue(
+        8, environ_name="STORAGE_COPY_MAX_CONCURRENCY", environ_prefix=None
+    )
+    STORAGE_COPY_RESUME_TIMEOUT = values.PositiveIntegerValue(
+        60 * 60 * 24,  # 1 day
+        environ_name="STORAGE_COPY_RESUME_TIMEOUT",
+        environ_prefix=None,
+    )
+
+    # Gateway to the object storage
+    STORAGE_GATEWAY_BACKEND = values.Value(
+        "core.storage.gateway.S3StorageGateway",
+        environ_name="STORAGE_GATEWAY_BACKEND",
+        environ_prefix=None,
+    )
+    STORAGE_GATEWAY_MAX_POOL_CONNECTIONS = values.PositiveIntegerValue(
+        50, environ_name="STORAGE_GATEWAY_MAX_POOL_CONNECTIONS", environ_prefix=None
+    )
+    STORAGE_GATEWAY_CONNECT_TIMEOUT = values.PositiveIntegerValue(
+        5, environ_name="STORAGE_GATEWAY_CONNECT_TIMEOUT", environ_prefix=None
+    )
+    STORAGE_GATEWAY_READ_TIMEOUT = values.PositiveIntegerValue(
+        60, environ_name="STORAGE_GATEWAY_READ_TIMEOUT", environ_prefix=None
+    )
+    STORAGE_GATEWAY_RETRY_MODE = values.Value(
+        "adaptive", environ_name="STORAGE_GATEWAY_RETRY_MODE", environ_prefix=None
+    )
+    STORAGE_GATEWAY_MAX_ATTEMPTS = values.PositiveIntegerValue(
+        5, environ_name="STORAGE_GATEWAY_MAX_ATTEMPTS", environ_prefix=None
+    )
+    STORAGE_GATEWAY_METRICS_LOG_INTERVAL = values.PositiveIntegerValue(
+        300, environ_name="STORAGE_GATEWAY_METRICS_LOG_INTERVAL", environ_prefix=None
+    )
+
     # Maximum size of the request body in memory.
     # This is used to limit the size of the request body in memory.
     # This also limits the size of the file that can be uploaded to the server.
@@ -952,10 +1006,75 @@ class Base(Configuration):
         "REDOC_DIST": "SIDECAR",
     }
 
+    ACCESSIBLE_ITEMS_CACHE_TIMEOUT = values.PositiveIntegerValue(
+        60 * 60, environ_name="ACCESSIBLE_ITEMS_CACHE_TIMEOUT", environ_prefix=None
+    )
+
+    ITEM_BACKGROUND_TASK_THRESHOLD = values.PositiveIntegerValue(
+        10000, environ_name="ITEM_BACKGROUND_TASK_THRESHOLD", environ_prefix=None
+    )
+    ITEM_BACKGROUND_TASK_BATCH_SIZE = values.PositiveIntegerValue(
+        1000, environ_name="ITEM_BACKGROUND_TASK_BATCH_SIZE", environ_prefix=None
+    )
+    ITEM_DUPLICATE_COPY_CONCURRENCY = values.PositiveIntegerValue(
+        8, environ_name="ITEM_DUPLICATE_COPY_CONCURRENCY", environ_prefix=None
+    )
+
+    ITEM_CONTENT_ADDRESSED_STORAGE = values.BooleanValue(
+        False, environ_name="ITEM_CONTENT_ADDRESSED_STORAGE", environ_prefix=None
+    )
+
+    ITEM_FILE_VERSIONED_KEYS = values.BooleanValue(
+        False, environ_name="ITEM_FILE_VERSIONED_KEYS", environ_prefix=None
+    )
+
+    ITEM_UPLOAD_PARTS_BATCH_SIZE = values.PositiveIntegerValue(
+        100, environ_name="ITEM_UPLOAD_PARTS_BATCH_SIZE", environ_prefix=None
+    )
+
+    ITEM_UPLOAD_BATCH_SIZE = values.PositiveIntegerValue(
+        1000, environ_name="ITEM_UPLOAD_BATCH_SIZE", environ_prefix=None
+    )
+
+    ITEM_CHANGES_PAGE_SIZE = values.PositiveIntegerValue(
+        500, environ_name="ITEM_CHANGES_PAGE_SIZE", environ_prefix=None
+    )
+    ITEM_CHANGES_RETENTION_DAYS = values.PositiveIntegerValue(
+        30, environ_name="ITEM_CHANGES_RETENTION_DAYS", environ_prefix=None
+    )
+    ITEM_CHANGES_PURGE_CRONTAB_MINUTE = values.Value(
+        15, environ_name="ITEM_CHANGES_PURGE_CRONTAB_MINUTE", environ_prefix=None
+    )
+    ITEM_CHANGES_PURGE_CRONTAB_HOUR = values.Value(
+        2, environ_name="ITEM_CHANGES_PURGE_CRONTAB_HOUR", environ_prefix=None
+    )
+    ITEM_CHANGES_PURGE_CRONTAB_DAY_OF_MONTH = values.Value(
+        "*", environ_name="ITEM_CHANGES_PURGE_CRONTAB_DAY_OF_MONTH", environ_prefix=None
+    )
+    ITEM_CHANGES_PURGE_CRONTAB_MONTH_OF_YEAR = values.Value(
+        "*", environ_name="ITEM_CHANGES_PURGE_CRONTAB_MONTH_OF_YEAR", environ_prefix=None
+    )
+
     TRASHBIN_CUTOFF_DAYS = values.Value(
         30, environ_name="TRASHBIN_CUTOFF_DAYS", environ_prefix=None
     )
     PURGE_GRACE_DAYS = values.Value(7, environ_name="PURGE_GRACE_DAYS", environ_prefix=None)
+    PURGE_SHARDS_COUNT = values.PositiveIntegerValue(
+        4, environ_name="PURGE_SHARDS_COUNT", environ_prefix=None
+    )
+    PURGE_CLAIM_TIMEOUT = values.PositiveIntegerValue(
+        60 * 60 * 6, environ_name="PURGE_CLAIM_TIMEOUT", environ_prefix=None
+    )
+    PURGE_CRONTAB_MINUTE = values.Value(
+        45, environ_name="PURGE_CRONTAB_MINUTE", environ_prefix=None
+    )
+    PURGE_CRONTAB_HOUR = values.Value(0, environ_name="PURGE_CRONTAB_HOUR", environ_prefix=None)
+    PURGE_CRONTAB_DAY_OF_MONTH = values.Value(
+        "*", environ_name="PURGE_CRONTAB_DAY_OF_MONTH", environ_prefix=None
+    )
+    PURGE_CRONTAB_MONTH_OF_YEAR = values.Value(
+        "*", environ_name="PURGE_CRONTAB_MONTH_OF_YEAR", environ_prefix=None
+    )
 
     # Mail
     EMAIL_BACKEND = values.Value("django.core.mail.backends.smtp.EmailBackend")
@@ -1412,6 +1531,10 @@ class Base(Configuration):
     WOPI_LOCK_TIMEOUT = values.IntegerValue(
         30 * 60, environ_name="WOPI_LOCK_TIMEOUT", environ_prefix=None
     )
+    # Size of the chunks in which the files are streamed to the WOPI clients
+    WOPI_GET_FILE_CHUNK_SIZE = values.PositiveIntegerValue(
+        256 * 1024, environ_name="WOPI_GET_FILE_CHUNK_SIZE", environ_prefix=None
+    )
     WOPI_LEGACY_CONVERSION_TARGETS = {
         "doc": "docx",
         "xls": "xlsx",
@@ -3,13 +3,13 @@
 from os.path import splitext
 
 from django.conf import settings
-from django.core.files.storage import default_storage
 from django.db import DatabaseError, transaction
 from django.utils.translation import gettext as _
 
 from core import models
 from core.api.utils import detect_mimetype
 from core.models import Item
+from core.storage import get_storage_gateway
 from core.utils.item_title import manage_unique_title
 from wopi.conversion.backends.onlyoffice import OnlyOfficeConversionBackend
 from wopi.conversion.exceptions import (
@@ -138,14 +138,15 @@ def perform_conversion(source_item, placeholder, user):
     )
     converted_file.seek(0)
 
-    default_storage.save(placeholder.file_key, converted_file)
+    storage_gateway = get_storage_gateway()
+    storage_gateway.put_stream(placeholder.file_key, converted_file, content_type=mimetype)
     try:
         placeholder.mimetype = mimetype
         placeholder.size = converted_file.size
         placeholder.upload_state = models.ItemUploadStateChoices.READY
         placeholder.save(update_fields=["mimetype", "size", "upload_state", "updated_at"])
     except DatabaseError:
-        default_storage.delete(placeholder.file_key)
+        storage_gateway.delete(placeholder.file_key)
         raise
 
     return placeholder
@@ -51,7 +51,8 @@ class AccessUserItem:
         """Convert a dictionary to an access user item"""
         try:
             return cls(
-                item=Item.objects.get(id=UUID(data["item"])),
+                # Items whose tree is being rewritten by a background task are hidden
+                item=Item.objects.exclude_background_tasks_subtrees().get(id=UUID(data["item"])),
                 user=User.objects.get(id=UUID(data["user"])) if data["user"] else AnonymousUser(),
             )
         except (Item.DoesNotExist, User.DoesNotExist) as error:
@@ -260,13 +260,13 @@ def test_perform_conversion_removes_saved_file_when_database_save_fails(settings
     saved_keys = []
     deleted_keys = []
 
-    class FakeStorage:
-        """Storage fake tracking saved and deleted keys."""
+    class FakeStorageGateway:
+        """Storage gateway fake tracking saved and deleted keys."""
 
-        def save(self, key, _content):
+        def put_stream(self, key, _stream, **_kwargs):
             """Track saved keys."""
             saved_keys.append(key)
-            return key
+            return {}
 
         def delete(self, key):
             """Track deleted keys."""
@@ -281,7 +281,7 @@ def test_perform_conversion_removes_saved_file_when_database_save_fails(settings
         return original_save(instance, *args, **kwargs)
 
     with (
-        mock.patch.object(services, "default_storage", FakeStorage()),
+        mock.patch.object(services, "get_storage_gateway", FakeStorageGateway),
         mock.patch.object(models.Item, "save", fail_ready_save),
     ):
         with pytest.raises(DatabaseError, match="database write failed"):
@@ -1,6 +1,9 @@
 """Test the Wopi GetFileContent viewset."""
 
+# pylint: disable=protected-access
+
 from io import BytesIO
+from unittest import mock
 
 from django.core.files.storage import default_storage
 
@@ -8,6 +11,7 @@ import pytest
 from rest_framework.test import APIClient
 
 from core import factories, models
+from core.storage import get_storage_gateway
 from wopi.services.access import AccessUserItemService
 
 pytestmark = pytest.mark.django_db
@@ -48,6 +52,40 @@ def test_get_file_content_connected_user_with_access():
     assert response.headers["Content-Length"] == "8"
 
 
+def test_get_file_content_background_task_in_progress():
+    """The content of a file in a folder being moved in background should not be served."""
+    folder = factories.ItemFactory(
+        type=models.ItemTypeChoices.FOLDER,
+    )
+    item = factories.ItemFactory(
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        filename="wopi_test.txt",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        link_reach=models.LinkReachChoices.RESTRICTED,
+        link_role=models.LinkRoleChoices.EDITOR,
+    )
+    user = factories.UserFactory()
+    factories.UserItemAccessFactory(item=item, user=user, role=models.RoleChoices.EDITOR)
+    default_storage.save(item.file_key, BytesIO(b"my prose"))
+
+    service = AccessUserItemService()
+    access_token, _ = service.insert_new_access(item, user)
+
+    models.ItemBackgroundTask.objects.create(
+        item=folder,
+        kind=models.ItemBackgroundTaskKindChoices.MOVE,
+        previous_path=folder.path,
+    )
+
+    client = APIClient()
+    response = client.get(
+        f"/api/v1.0/wopi/files/{item.id}/contents/",
+        HTTP_AUTHORIZATION=f"Bearer {access_token}",
+    )
+    assert response.status_code == 401
+
+
 def test_get_file_content_connected_user_not_linked_to_item():
     """
     User trying to get the file content of an item not linked to the access token should get a 403.
@@ -145,3 +183,116 @@ def test_get_file_content_max_expected_size():
         HTTP_X_WOPI_MAXEXPECTEDSIZE="2",
     )
     assert response.status_code == 412
+
+
+def _get_file_and_token():
+    """Create a file readable by a user and return it with the access token of the user."""
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        filename="wopi_test.txt",
+        mimetype="text/plain",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        link_reach=models.LinkReachChoices.RESTRICTED,
+    )
+    user = factories.UserFactory()
+    factories.UserItemAccessFactory(item=item, user=user, role=models.RoleChoices.READER)
+    default_storage.save(item.file_key, BytesIO(b"my prose"))
+    access_token, _ = AccessUserItemService().insert_new_access(item, user)
+    return item, access_token
+
+
+def _get_file_content(item, access_token, **headers):
+    return APIClient().get(
+        f"/api/v1.0/wopi/files/{item.id}/contents/",
+        HTTP_AUTHORIZATION=f"Bearer {access_token}",
+        headers=headers,
+    )
+
+
+def test_get_file_content_single_request(settings):
+    """The file should be fetched with one request and streamed by chunks."""
+    settings.WOPI_GET_FILE_CHUNK_SIZE = 3
+    item, access_token = _get_file_and_token()
+    s3_client = get_storage_gateway()._client
+
+    with (
+        mock.patch.object(s3_client, "head_object", wraps=s3_client.head_object) as mock_head,
+        mock.patch.object(s3_client, "get_object", wraps=s3_client.get_object) as mock_get,
+    ):
+        response = _get_file_content(item, access_token)
+        content = list(response.streaming_content)
+
+    mock_head.assert_not_called()
+    assert mock_get.call_count == 1
+    assert response.status_code == 200
+    assert content == [b"my ", b"pro", b"se"]
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["X-WOPI-ItemVersion"] == response.headers["ETag"].strip('"')
+
+
+@pytest.mark.parametrize(
+    "range_header, content, content_range",
+    [
+        ("bytes=3-5", b"pro", "bytes 3-5/8"),
+        ("bytes=3-", b"prose", "bytes 3-7/8"),
+        ("bytes=-2", b"se", "bytes 6-7/8"),
+        ("bytes=6-100", b"se", "bytes 6-7/8"),
+    ],
+)
+def test_get_file_content_range(range_header, content, content_range):
+    """One range of bytes of the file should be served as partial content."""
+    item, access_token = _get_file_and_token()
+
+    response = _get_file_content(item, access_token, Range=range_header)
+
+    assert response.status_code == 206
+    assert b"".join(response.streaming_content) == content
+    assert response.headers["Content-Range"] == content_range
+    assert response.headers["Content-Length"] == str(len(content))
+
+
+@pytest.mark.parametrize("range_header", ["bytes=5-3", "bytes=0-1,4-5", "lines=1-2", "bytes=-"])
+def test_get_file_content_range_ignored(range_header):
+    """Invalid ranges and several ranges should be ignored, the whole file being served."""
+    item, access_token = _get_file_and_token()
+
+    response = _get_file_content(item, access_token, Range=range_header)
+
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == b"my prose"
+
+
+def test_get_file_content_range_not_satisfiable():
+    """A range starting after the end of the file should not be satisfiable."""
+    item, access_token = _get_file_and_token()
+
+    response = _get_file_content(item, access_token, Range="bytes=8-")
+
+    assert response.status_code == 416
+
+
+def test_get_file_content_if_range():
+    """A range should only be served if the file did not change since the client got it."""
+    item, access_token = _get_file_and_token()
+    response = _get_file_content(item, access_token)
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    for if_range in [etag, last_modified]:
+        response = _get_file_content(item, access_token, Range="bytes=3-5", If_Range=if_range)
+        assert response.status_code == 206
+        assert b"".join(response.streaming_content) == b"pro"
+
+    for if_range in ['"outdated"', f"W/{etag:s}", "Mon, 01 Jan 2024 00:00:00 GMT"]:
+        response = _get_file_content(item, access_token, Range="bytes=3-5", If_Range=if_range)
+        assert response.status_code == 200
+        assert b"".join(response.streaming_content) == b"my prose"
+        assert "Content-Range" not in response.headers
+
+
+def test_get_file_content_range_max_expected_size():
+    """The size of the whole file should be compared to the max expected size."""
+    item, access_token = _get_file_and_token()
+
+    response = _get_file_content(item, access_token, Range="bytes=0-1", X_WOPI_MaxExpectedSize="4")
+
+    assert response.status_code == 412
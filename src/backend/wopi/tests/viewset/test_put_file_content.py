@@ -1,11 +1,19 @@
 """Test the PUT file content viewset."""
 
+# pylint: disable=protected-access
+
+import os
+from unittest import mock
+
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 
 import pytest
+from boto3.s3.transfer import TransferConfig
 from rest_framework.test import APIClient
 
 from core import factories, models
+from core.storage import get_storage_gateway
 from wopi.services.access import AccessUserItemService
 from wopi.services.lock import LockService
 
@@ -64,6 +72,52 @@ def test_put_file_content_connected_user_with_access():
     assert item.updated_at > updated_at
 
 
+def test_put_file_content_blob_shared():
+    """
+    Putting the content of a file stored in a blob should store the new content for the
+    item only and keep the blob for the other items referencing it.
+    """
+    blob = models.Blob.objects.create(sha256="a" * 64, size=11)
+    default_storage.save(blob.key, ContentFile(b"old content"))
+    item, other_item = factories.ItemFactory.create_batch(
+        2,
+        type=models.ItemTypeChoices.FILE,
+        filename="wopi_test.txt",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        link_reach=models.LinkReachChoices.RESTRICTED,
+        size=11,
+        blob=blob,
+    )
+    user = factories.UserFactory()
+    factories.UserItemAccessFactory(item=item, user=user, role=models.RoleChoices.EDITOR)
+
+    access_token, _ = AccessUserItemService().insert_new_access(item, user)
+    LockService(item).lock("1234567890")
+
+    response = APIClient().post(
+        f"/api/v1.0/wopi/files/{item.id}/contents/",
+        data=b"new content",
+        content_type="text/plain",
+        HTTP_AUTHORIZATION=f"Bearer {access_token}",
+        headers={
+            "X-WOPI-Override": "PUT",
+            "X-WOPI-Lock": "1234567890",
+        },
+    )
+    assert response.status_code == 200
+
+    item.refresh_from_db()
+    assert item.blob is None
+    assert item.file_key == item.media_key
+    with default_storage.open(item.file_key, "rb") as file:
+        assert file.read() == b"new content"
+
+    other_item.refresh_from_db()
+    assert other_item.blob == blob
+    with default_storage.open(blob.key, "rb") as file:
+        assert file.read() == b"old content"
+
+
 def test_put_file_content_connected_user_with_access_delete_item_during_edition():
     """User should not be able to put file content if the item is deleted during the edition."""
     folder = factories.ItemFactory(
@@ -207,6 +261,52 @@ def test_put_file_content_connected_user_with_access_access_removed_during_editi
     assert file["Body"].read() == b"new content"  # the content should not have been updated
 
 
+def test_put_file_content_background_task_in_progress():
+    """The content of a file in a folder being duplicated in background can't be put."""
+    folder = factories.ItemFactory(
+        type=models.ItemTypeChoices.FOLDER,
+    )
+    item = factories.ItemFactory(
+        parent=folder,
+        type=models.ItemTypeChoices.FILE,
+        filename="wopi_test.txt",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        link_reach=models.LinkReachChoices.RESTRICTED,
+        link_role=models.LinkRoleChoices.EDITOR,
+        size=0,
+    )
+    user = factories.UserFactory()
+    factories.UserItemAccessFactory(item=item, user=user, role=models.RoleChoices.EDITOR)
+
+    service = AccessUserItemService()
+    access_token, _ = service.insert_new_access(item, user)
+
+    LockService(item).lock("1234567890")
+    models.ItemBackgroundTask.objects.create(
+        item=factories.ItemFactory(type=models.ItemTypeChoices.FOLDER),
+        kind=models.ItemBackgroundTaskKindChoices.DUPLICATE,
+        previous_path=folder.path,
+    )
+
+    client = APIClient()
+    response = client.post(
+        f"/api/v1.0/wopi/files/{item.id}/contents/",
+        data=b"new content",
+        content_type="text/plain",
+        HTTP_AUTHORIZATION=f"Bearer {access_token}",
+        headers={
+            "X-WOPI-Override": "PUT",
+            "X-WOPI-Lock": "1234567890",
+        },
+    )
+    assert response.status_code == 409
+    assert response.headers["X-WOPI-Lock"] == ""
+    assert "X-WOPI-LockFailureReason" in response.headers
+
+    item.refresh_from_db()
+    assert item.size == 0
+
+
 def test_put_file_content_connected_user_not_linked_to_item():
     """
     User trying to put file content of an item not linked to the access token should get a 403.
@@ -396,3 +496,77 @@ def test_put_file_content_with_no_lock_header_and_body_size_0(data):
     )
     assert file["Body"].read() == data
     assert response.headers.get("X-WOPI-ItemVersion") == file["ETag"].strip('"')
+
+
+def _get_locked_item_and_token():
+    """Create a file locked by the WOPI client of an editor and return its access token."""
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        filename="wopi_test.txt",
+        mimetype="text/plain",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        link_reach=models.LinkReachChoices.RESTRICTED,
+        size=0,
+    )
+    user = factories.UserFactory()
+    factories.UserItemAccessFactory(item=item, user=user, role=models.RoleChoices.EDITOR)
+    access_token, _ = AccessUserItemService().insert_new_access(item, user)
+    LockService(item).lock("1234567890")
+    return item, access_token
+
+
+def test_put_file_content_large_file_streamed():
+    """
+    Large files should be streamed to the object storage by parts, without reading the
+    whole body of the request, the version being the one of the upload.
+    """
+    item, access_token = _get_locked_item_and_token()
+    content = os.urandom(11 * 1024 * 1024)
+    s3_client = get_storage_gateway()._client
+
+    with (
+        mock.patch.object(
+            default_storage,
+            "transfer_config",
+            TransferConfig(multipart_threshold=1, multipart_chunksize=1, max_concurrency=2),
+        ),
+        mock.patch.object(s3_client, "upload_part", wraps=s3_client.upload_part) as mock_upload,
+        mock.patch.object(s3_client, "head_object", wraps=s3_client.head_object) as mock_head,
+    ):
+        response = APIClient().post(
+            f"/api/v1.0/wopi/files/{item.id}/contents/",
+            data=content,
+            content_type="application/octet-stream",
+            HTTP_AUTHORIZATION=f"Bearer {access_token}",
+            headers={"X-WOPI-Override": "PUT", "X-WOPI-Lock": "1234567890"},
+        )
+
+    assert response.status_code == 200
+    assert mock_upload.call_count == 3
+    mock_head.assert_not_called()
+
+    file = s3_client.get_object(Bucket=default_storage.bucket_name, Key=item.file_key)
+    assert file["Body"].read() == content
+    assert file["ContentType"] == item.mimetype
+    assert response.headers["X-WOPI-ItemVersion"] == file["ETag"].strip('"')
+    item.refresh_from_db()
+    assert item.size == 11 * 1024 * 1024
+
+
+def test_put_file_content_too_large(settings):
+    """Files larger than the maximum size allowed should be refused before being stored."""
+    settings.DATA_UPLOAD_MAX_MEMORY_SIZE = 10
+    item, access_token = _get_locked_item_and_token()
+
+    response = APIClient().post(
+        f"/api/v1.0/wopi/files/{item.id}/contents/",
+        data=b"new content",
+        content_type="text/plain",
+        HTTP_AUTHORIZATION=f"Bearer {access_token}",
+        headers={"X-WOPI-Override": "PUT", "X-WOPI-Lock": "1234567890"},
+    )
+
+    assert response.status_code == 413
+    assert not default_storage.exists(item.file_key)
+    item.refresh_from_db()
+    assert item.size == 0
@@ -1,5 +1,7 @@
 """Test the rename file operation from the WOPI viewset."""
 
+# pylint: disable=protected-access
+
 from io import BytesIO
 from unittest.mock import patch
 
@@ -10,6 +12,7 @@ import pytest
 from rest_framework.test import APIClient
 
 from core import factories, models
+from core.storage import get_storage_gateway
 from wopi.services.access import AccessUserItemService
 from wopi.services.lock import LockService
 from wopi.viewsets import X_WOPI_INVALIDFILENAMERROR, X_WOPI_LOCK
@@ -55,6 +58,40 @@ def test_rename_file_success():
     assert len(response.content) == 0
 
 
+def test_rename_file_versioned_key(settings):
+    """Renaming a file stored under a versioned key should not copy it in the storage."""
+    settings.ITEM_FILE_VERSIONED_KEYS = True
+    item = factories.ItemFactory(
+        type=models.ItemTypeChoices.FILE,
+        filename="wopi_test.txt",
+        update_upload_state=models.ItemUploadStateChoices.READY,
+        link_reach=models.LinkReachChoices.RESTRICTED,
+    )
+    user = factories.UserFactory()
+    factories.UserItemAccessFactory(item=item, user=user, role=models.RoleChoices.EDITOR)
+    access_token, _ = AccessUserItemService().insert_new_access(item, user)
+    file_key = item.file_key
+    default_storage.save(file_key, BytesIO(b"my prose"))
+
+    s3_client = get_storage_gateway()._client
+    with patch.object(s3_client, "copy_object") as mock_copy_object:
+        response = APIClient().post(
+            f"/api/v1.0/wopi/files/{item.id}/",
+            HTTP_AUTHORIZATION=f"Bearer {access_token}",
+            headers={
+                "X-WOPI-Override": "RENAME_FILE",
+                "X-WOPI-RequestedName": "new name".encode("utf-7").decode("ascii"),
+            },
+        )
+
+    assert response.status_code == 200
+    mock_copy_object.assert_not_called()
+    item.refresh_from_db()
+    assert item.filename == "new name.txt"
+    assert item.file_key == file_key
+    assert default_storage.exists(file_key)
+
+
 def test_rename_file_success_accept_json():
     """User having access to the item can rename the file."""
     folder = factories.ItemFactory(
@@ -265,7 +302,7 @@ def test_rename_file_storage_error():
     client = APIClient()
     with (
         patch.object(
-            default_storage.connection.meta.client,
+            get_storage_gateway()._client,
             "copy_object",
             side_effect=botocore.exceptions.ClientError(
                 {"Error": {"Code": "StorageError", "Message": "Storage error"}},
@@ -5,6 +5,7 @@ from urllib.parse import urlencode, urlparse
 
 from django.conf import settings
 from django.core.cache import cache
+from django.utils.http import parse_http_date_safe
 
 from core import models
 from wopi.tasks.configure_wopi import (
@@ -104,3 +105,42 @@ def get_wopi_item_version(head_object):
         return str(last_modified)
 
     return str(head_object.get("ContentLength", "0"))
+
+
+def parse_range_header(range_header):
+    """
+    Parse the Range header of a request asking for one range of bytes and return its first
+    and last positions, the first one being negative for the last bytes of a file.
+    None is returned if the header is absent or invalid or asks for several ranges, the whole
+    file being served then.
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", (range_header or "").strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        return (-int(end), None) if int(end) > 0 else None
+
+    start, end = int(start), int(end) if end else None
+    if end is not None and end < start:
+        return None
+    return start, end
+
+
+def is_if_range_matching(if_range_header, get_object):
+    """
+    Check if the If-Range header of a request matches the file fetched: a range can only be
+    served if the file did not change since the client got its ETag or modification date.
+    """
+    if if_range_header.startswith(('"', "W/")):
+        # Weak validators never match
+        return if_range_header == get_object.get("ETag")
+
+    if_range_date = parse_http_date_safe(if_range_header)
+    last_modified = get_object.get("LastModified")
+    return (
+        if_range_date is not None
+        and last_modified is not None
+        and if_range_date == int(last_modified.timestamp())
+    )
@@ -2,15 +2,16 @@
 
 import logging
 import uuid
+from io import BytesIO
 from os.path import splitext
 
 from django.conf import settings
-from django.core.exceptions import RequestDataTooBig
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.http import StreamingHttpResponse
+from django.utils.http import http_date
 
+from botocore.exceptions import ClientError
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -18,10 +19,18 @@ from sentry_sdk import capture_exception
 
 from core.api.utils import get_item_file_head_object
 from core.models import Item
+from core.services.blobs import delete_unreferenced_blobs
+from core.services.storage_copy import copy_file
+from core.storage import get_storage_gateway
 from wopi.authentication import WopiAccessTokenAuthentication
 from wopi.permissions import AccessTokenPermission
 from wopi.services.lock import LockService
-from wopi.utils import get_wopi_client_config, get_wopi_item_version
+from wopi.utils import (
+    get_wopi_client_config,
+    get_wopi_item_version,
+    is_if_range_matching,
+    parse_range_header,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +42,7 @@ HTTP_X_WOPI_OVERRIDE = "HTTP_X_WOPI_OVERRIDE"
 X_WOPI_INVALIDFILENAMERROR = "X-WOPI-InvalidFileNameError"
 X_WOPI_ITEMVERSION = "X-WOPI-ItemVersion"
 X_WOPI_LOCK = "X-WOPI-Lock"
+X_WOPI_LOCKFAILUREREASON = "X-WOPI-LockFailureReason"
 S3_VERSION_ID = "VersionId"
 
 
@@ -57,6 +67,24 @@ class WopiViewSet(viewsets.ViewSet):
         """Get the file id from the URL path."""
         return uuid.UUID(self.kwargs.get("pk"))
 
+    @staticmethod
+    def _background_task_conflict(item):
+        """
+        Return a conflict response if a background task is rewriting the tree of the item,
+        which can't be written until the task completes.
+        """
+        try:
+            item.check_no_background_task()
+        except ValidationError:
+            return Response(
+                status=409,
+                headers={
+                    X_WOPI_LOCK: "",
+                    X_WOPI_LOCKFAILUREREASON: "An operation is in progress on the file tree",
+                },
+            )
+        return None
+
     # pylint: disable=unused-argument
     def retrieve(self, request, pk=None):
         """
@@ -98,7 +126,7 @@ class WopiViewSet(viewsets.ViewSet):
             "SupportsGetLock": True,
             "SupportsLocks": True,
             "SupportsUserInfo": False,
-            "DownloadUrl": f"/media/{item.file_key}",
+            "DownloadUrl": f"/media/{item.media_key}",
         }
 
         return Response(properties, status=200)
@@ -111,6 +139,8 @@ class WopiViewSet(viewsets.ViewSet):
         if request.method == "GET":
             return self._get_file_content(request, pk)
         if request.method == "POST":
+            if conflict_response := self._background_task_conflict(request.auth.item):
+                return conflict_response
             return self._put_file_content(request, pk)
 
         return Response(status=405)
@@ -121,34 +151,56 @@ class WopiViewSet(viewsets.ViewSet):
         https://learn.microsoft.com/en-us/microsoft-365/cloud-storage-partner-program/rest/files/getfile
         """
         item = request.auth.item
+        storage_gateway = get_storage_gateway()
 
+        # The file is fetched with one request, whose response gives its size and version.
+        # Clients can ask for one range of bytes, e.g. to resume an interrupted download.
+        byte_range = parse_range_header(request.META.get("HTTP_RANGE"))
+        try:
+            file = storage_gateway.get_range(item.file_key, *(byte_range or ()))
+        except ClientError as error:
+            if error.response["Error"]["Code"] != "InvalidRange":
+                raise
+            headers = {}
+            if size := error.response["Error"].get("ActualObjectSize"):
+                headers["Content-Range"] = f"bytes */{size!s}"
+            return Response(status=416, headers=headers)
+
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if byte_range and if_range and not is_if_range_matching(if_range, file):
+            # The file changed since the client got the version it asks a range of
+            file["Body"].close()
+            file = storage_gateway.get_range(item.file_key)
+            byte_range = None
+
+        size = int(file["ContentRange"].rsplit("/", 1)[1]) if byte_range else file["ContentLength"]
         max_expected_size = request.META.get("HTTP_X_WOPI_MAXEXPECTEDSIZE")
-
-        head_object = get_item_file_head_object(item)
-        if max_expected_size:
-            if int(head_object["ContentLength"]) > int(max_expected_size):
-                logger.info(
-                    "get_file_content: file size %s exceeds X-WOPI-MaxExpectedSize header value %s",
-                    int(head_object["ContentLength"]),
-                    int(max_expected_size),
-                )
-                return Response(status=412)
-
-        s3_client = default_storage.connection.meta.client
-
-        file = s3_client.get_object(
-            Bucket=default_storage.bucket_name,
-            Key=item.file_key,
-        )
+        if max_expected_size and size > int(max_expected_size):
+            file["Body"].close()
+            logger.info(
+                "get_file_content: file size %s exceeds X-WOPI-MaxExpectedSize header value %s",
+                size,
+                int(max_expected_size),
+            )
+            return Response(status=412)
+
+        headers = {
+            "X-WOPI-ItemVersion": get_wopi_item_version(file),
+            "Content-Length": file["ContentLength"],
+            "Accept-Ranges": "bytes",
+            "ETag": file["ETag"],
+            "Last-Modified": http_date(file["LastModified"].timestamp()),
+        }
+        if byte_range:
+            headers["Content-Range"] = file["ContentRange"]
 
         return StreamingHttpResponse(
-            streaming_content=file["Body"].iter_chunks(),
+            streaming_content=file["Body"].iter_chunks(
+                chunk_size=settings.WOPI_GET_FILE_CHUNK_SIZE
+            ),
             content_type=item.mimetype,
-            headers={
-                "X-WOPI-ItemVersion": get_wopi_item_version(head_object),
-                "Content-Length": head_object["ContentLength"],
-            },
-            status=200,
+            headers=headers,
+            status=206 if byte_range else 200,
         )
 
     def _put_file_content(self, request, pk=None):
@@ -177,20 +229,23 @@ class WopiViewSet(viewsets.ViewSet):
             if body_size > 0:
                 return Response(status=409, headers={X_WOPI_LOCK: ""})
 
-        try:
-            file = ContentFile(request.body)
-        except RequestDataTooBig:
+        # The body is streamed to the object storage instead of being loaded in memory
+        if int(request.META.get("CONTENT_LENGTH") or 0) > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
             return Response(status=413)
 
-        s3_client = default_storage.connection.meta.client
-        default_storage.save(item.file_key, file)
-        item.size = file.size
-        item.save(update_fields=["size", "updated_at"])
+        # A blob may be shared with other items, the new content is stored for the item only
+        blob_id, item.blob = item.blob_id, None
+        put_response = get_storage_gateway().put_stream(
+            item.file_key, request.stream or BytesIO(), content_type=item.mimetype
+        )
+        item.size = put_response["ContentLength"]
+        item.save(update_fields=["size", "blob", "updated_at"])
+        if blob_id:
+            delete_unreferenced_blobs([blob_id])
 
-        head_response = s3_client.head_object(Bucket=default_storage.bucket_name, Key=item.file_key)
         return Response(
             status=200,
-            headers={X_WOPI_ITEMVERSION: get_wopi_item_version(head_response)},
+            headers={X_WOPI_ITEMVERSION: get_wopi_item_version(put_response)},
         )
 
     def detail_post(self, request, pk=None):
@@ -214,6 +269,10 @@ class WopiViewSet(viewsets.ViewSet):
             return Response(status=401)
 
         post_action = self.detail_post_actions[request.META.get(HTTP_X_WOPI_OVERRIDE)]
+        if post_action == "_rename_file" and (
+            conflict_response := self._background_task_conflict(item)
+        ):
+            return conflict_response
         return getattr(self, post_action)(request, pk)
 
     def _lock(self, request, pk=None):
@@ -351,11 +410,9 @@ class WopiViewSet(viewsets.ViewSet):
         _, current_extension = splitext(item.filename)
         new_filename_with_extension = f"{new_filename}{current_extension}"
 
-        parent_path = item.path[:-1]
         # Filter on siblings with the desired filename
         queryset = (
-            Item.objects.filter(path__descendants=".".join(parent_path))
-            .filter(path__depth=item.depth)
+            Item.objects.filter(parent_id=item.parent_id)
             .filter(filename=new_filename_with_extension)
             .exclude(id=item.id)
         )
@@ -365,45 +422,39 @@ class WopiViewSet(viewsets.ViewSet):
                 status=400,
                 headers={X_WOPI_INVALIDFILENAMERROR: "Filename already exists"},
             )
-        head_object = get_item_file_head_object(item)
-
         file_key = item.file_key
         item.filename = new_filename_with_extension
         item.title = new_filename
 
+        if item.file_key == file_key:
+            # Only files stored under their name before versioned keys have to be moved
+            item.save(update_fields=["filename", "title", "updated_at"])
+            return self._rename_file_response(request, new_filename)
+
+        storage_gateway = get_storage_gateway()
+        head_object = storage_gateway.head(file_key)
+
         # ensure renaming the file in the database and on the storage are done atomically
         with transaction.atomic():
             item.save(update_fields=["filename", "title", "updated_at"])
 
             # Rename the file in the storage
-            s3_client = default_storage.connection.meta.client
             # Don't catch any s3 error, if failing let the exception raises to sentry
             # the transaction will be rolled back
-            s3_client.copy_object(
-                Bucket=default_storage.bucket_name,
-                CopySource={
-                    "Bucket": default_storage.bucket_name,
-                    "Key": file_key,
-                },
-                Key=item.file_key,
-                MetadataDirective="COPY",
-            )
+            copy_file(file_key, item.file_key)
 
         try:
-            delete_object_args = {
-                "Bucket": default_storage.bucket_name,
-                "Key": file_key,
-            }
-            version_id = head_object.get(S3_VERSION_ID)
-            if version_id:
-                delete_object_args[S3_VERSION_ID] = version_id
-
-            s3_client.delete_object(**delete_object_args)
+            storage_gateway.delete(file_key, version_id=head_object.get(S3_VERSION_ID))
         # pylint: disable=broad-exception-caught
         except Exception as e:  # noqa
             capture_exception(e)
             logger.warning("Error deleting old file for item %s in the storage: %s", item.id, e)
 
+        return self._rename_file_response(request, new_filename)
+
+    @staticmethod
+    def _rename_file_response(request, new_filename):
+        """Return the response of the RenameFile operation in the format asked by the client."""
         if "application/json" in request.META.get("HTTP_ACCEPT", ""):
             return Response(
                 data={"Name": new_filename}, status=200, content_type="application/json"
@@ -0,0 +1,30 @@
+export type DTOCreateUploadBatch = {
+  // Folder under which the files are created
+  parentId: string;
+  // Paths of the files relative to the folder, their folders being created with them
+  files: { path: string; size: number }[];
+};
+
+export type UploadBatchFile = {
+  id: string;
+  parent_id: string;
+  path: string;
+  title: string;
+  policy: string;
+};
+
+export type UploadBatch = {
+  folders: { id: string; parent_id: string; title: string }[];
+  // In the order of the files of the batch
+  files: UploadBatchFile[];
+};
+
+export type DTOEndUploadBatch = {
+  parentId: string;
+  ids: string[];
+};
+
+export type UploadEndedBatch = {
+  finalizing: string[];
+  failed: string[];
+};
@@ -9,6 +9,12 @@ import {
   DTODeleteInvitation,
   DTOUpdateInvitation,
 } from "./DTOs/InvitationDTO";
+import {
+  DTOCreateUploadBatch,
+  DTOEndUploadBatch,
+  UploadBatch,
+  UploadEndedBatch,
+} from "./DTOs/UploadDTO";
 import {
   Access,
   ApiConfig,
@@ -150,6 +156,14 @@ export abstract class Driver {
     file: File;
     progressHandler?: (progress: number) => void;
   }): { promise: Promise<Item>; abort: () => Promise<void> };
+  // Folder uploads create and end their files by batches
+  abstract createUploadBatch(data: DTOCreateUploadBatch): Promise<UploadBatch>;
+  abstract uploadBatchFile(data: {
+    policy: string;
+    file: File;
+    progressHandler?: (progress: number) => void;
+  }): { promise: Promise<void>; abort: () => Promise<void> };
+  abstract endUploadBatch(data: DTOEndUploadBatch): Promise<UploadEndedBatch>;
   abstract createFileFromTemplate(data: {
     parentId: string;
     extension: string;
@@ -15,6 +15,12 @@ import {
   DTOCreateAccess,
   DTOUpdateLinkConfiguration,
 } from "../DTOs/AccessesDTO";
+import {
+  DTOCreateUploadBatch,
+  DTOEndUploadBatch,
+  UploadBatch,
+  UploadEndedBatch,
+} from "../DTOs/UploadDTO";
 import { DTOUpdateAccess } from "../DTOs/AccessesDTO";
 import {
   Access,
@@ -366,6 +372,8 @@ export class StandardDriver extends Driver {
           method: "POST",
           body: JSON.stringify({
             type: ItemType.FILE,
+            // The size is signed in the upload policy
+            size: file.size,
             ...rest,
           }),
         },
@@ -420,6 +428,50 @@ export class StandardDriver extends Driver {
     return { promise, abort };
   }
 
+  async createUploadBatch(data: DTOCreateUploadBatch): Promise<UploadBatch> {
+    const response = await fetchAPI(
+      `items/${data.parentId}/upload-batch/`,
+      {
+        method: "POST",
+        body: JSON.stringify({ files: data.files }),
+      },
+      {
+        redirectOn40x: false,
+      },
+    );
+    return response.json();
+  }
+
+  uploadBatchFile(data: {
+    policy: string;
+    file: File;
+    progressHandler?: (progress: number) => void;
+  }): { promise: Promise<void>; abort: () => Promise<void> } {
+    const { policy, file, progressHandler } = data;
+    // Like createFile, the progress stops at 90% until the upload is ended.
+    const upload = uploadFile(policy, file, (progress) => {
+      progressHandler?.((progress * 90) / 100);
+    });
+    return {
+      promise: upload.promise.then(() => undefined),
+      abort: async () => upload.abort(),
+    };
+  }
+
+  async endUploadBatch(data: DTOEndUploadBatch): Promise<UploadEndedBatch> {
+    const response = await fetchAPI(
+      `items/${data.parentId}/upload-ended-batch/`,
+      {
+        method: "POST",
+        body: JSON.stringify({ ids: data.ids }),
+      },
+      {
+        redirectOn40x: false,
+      },
+    );
+    return response.json();
+  }
+
   async createFileFromTemplate(data: {
     parentId?: string;
     extension: string;
@@ -19,6 +19,7 @@ export enum LinkRole {
 
 export enum ItemUploadState {
   PENDING = "pending",
+  FINALIZING = "finalizing",
   DUPLICATING = "duplicating",
   CONVERTING = "converting",
   ANALYZING = "analyzing",
@@ -28,6 +29,7 @@ export enum ItemUploadState {
 }
 
 export const TRANSIENT_UPLOAD_STATES: string[] = [
+  ItemUploadState.FINALIZING,
   ItemUploadState.ANALYZING,
   ItemUploadState.DUPLICATING,
   ItemUploadState.CONVERTING,
@@ -193,6 +195,7 @@ export interface ThemeCustomization {
 export type ApiConfig = {
   APP_URLS?: Record<string, string>;
   DATA_UPLOAD_MAX_MEMORY_SIZE?: number;
+  ITEM_UPLOAD_BATCH_SIZE?: number;
   POSTHOG_KEY?: string;
   POSTHOG_HOST?: string;
   FRONTEND_MORE_LINK?: string;
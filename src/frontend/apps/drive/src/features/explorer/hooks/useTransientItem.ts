@@ -14,6 +14,8 @@ export const useTransientItem = (item: Item): TransientItem => {
   const { t } = useTranslation();
   const isTransient = TRANSIENT_UPLOAD_STATES.includes(item.upload_state);
   const transientLabels: Record<string, string> = {
+    // Finalizing is the first step of the analysis of a file for users
+    [ItemUploadState.FINALIZING]: t("explorer.item.analyzing"),
     [ItemUploadState.ANALYZING]: t("explorer.item.analyzing"),
     [ItemUploadState.CONVERTING]: t("explorer.item.converting"),
     [ItemUploadState.DUPLICATING]: t("explorer.item.duplicating"),
@@ -19,6 +19,23 @@ import { getDriver } from "@/features/config/Config";
 import { APIError } from "@/features/api/APIError";
 import { useRefreshQueryCacheAfterMutation } from "./useRefreshItems";
 import { isIdInItemTree } from "../utils/utils";
+import { UploadBatch } from "@/features/drivers/DTOs/UploadDTO";
+
+// Files created by the same call to the upload-batch endpoint, ended at once
+// by the upload-ended-batch endpoint when all of them are settled.
+type UploadBatchChunk = {
+  parentId: string;
+  // Number of files neither uploaded, failed nor cancelled yet.
+  remaining: number;
+  uploaded: { id: string; parentId: string; filePath: string; file: File }[];
+};
+
+type ActiveUploadBatch = {
+  chunk: UploadBatchChunk;
+  id: string;
+  parentId: string;
+  policy: string;
+};
 
 type ActiveUpload = {
   file: FileUpload;
@@ -27,6 +44,8 @@ type ActiveUpload = {
   parentPath: string;
   // Populated once the upload actually starts. Undefined while still queued.
   abort?: () => Promise<void>;
+  // Set when the file was created by a batch of its folder upload.
+  batch?: ActiveUploadBatch;
 };
 import { formatSize } from "@/features/explorer/utils/utils";
 import {
@@ -233,6 +252,16 @@ const pathNicefy = (path: string) => {
   return path.replace(/^[./]+/, "");
 };
 
+// Same default as the backend ITEM_UPLOAD_BATCH_SIZE setting.
+const DEFAULT_UPLOAD_BATCH_SIZE = 1000;
+
+const getErrorCode = (err: unknown) => {
+  if (err instanceof APIError && err.data?.errors?.[0]?.code) {
+    return err.data.errors[0].code;
+  }
+  return "unknown";
+};
+
 export const useUploadZone = ({ item }: { item: Item }) => {
   const { t } = useTranslation();
   const { config } = useConfig();
@@ -259,6 +288,62 @@ export const useUploadZone = ({ item }: { item: Item }) => {
 
   const { filesToUpload, handleHierarchy } = useUpload({ item: item! });
 
+  /**
+   * Settle a file of a batch once it is uploaded, failed or cancelled. The
+   * uploaded files of the batch are ended at once when the last one settles.
+   */
+  const settleBatchFile = useCallback(
+    async (
+      batch: ActiveUploadBatch,
+      uploaded?: { filePath: string; file: File },
+    ) => {
+      const { chunk } = batch;
+      if (uploaded) {
+        chunk.uploaded.push({
+          id: batch.id,
+          parentId: batch.parentId,
+          ...uploaded,
+        });
+      }
+      chunk.remaining -= 1;
+      if (chunk.remaining > 0 || chunk.uploaded.length === 0) {
+        return;
+      }
+
+      let failed: Set<string>;
+      let errorCode = "unknown";
+      try {
+        const ended = await driver.endUploadBatch({
+          parentId: chunk.parentId,
+          ids: chunk.uploaded.map((file) => file.id),
+        });
+        failed = new Set(ended.failed);
+      } catch (err) {
+        failed = new Set(chunk.uploaded.map((file) => file.id));
+        errorCode = getErrorCode(err);
+      }
+
+      setUploadingState((prev) => {
+        const filesMeta = { ...prev.filesMeta };
+        for (const { id, filePath, file } of chunk.uploaded) {
+          filesMeta[filePath] = failed.has(id)
+            ? {
+                file,
+                progress: prev.filesMeta[filePath]?.progress ?? 0,
+                status: FileUploadStatus.ERROR,
+                error: errorCode,
+              }
+            : { file, progress: 100, status: FileUploadStatus.DONE };
+        }
+        return { ...prev, filesMeta };
+      });
+      new Set(chunk.uploaded.map((file) => file.parentId)).forEach(
+        (parentId) => refresh(parentId),
+      );
+    },
+    [],
+  );
+
   const onCancelFile = useCallback(async (fileName: string) => {
     const upload = activeUploadsRef.current.get(fileName);
     // Remove from the map first: this is the signal the processing loop
@@ -266,6 +351,9 @@ export const useUploadZone = ({ item }: { item: Item }) => {
     activeUploadsRef.current.delete(fileName);
     if (upload?.abort) {
       await upload.abort();
+    } else if (upload?.batch) {
+      // Queued files are never seen by the processing loop again.
+      void settleBatchFile(upload.batch);
     }
     setUploadingState((prev) => {
       const meta = prev.filesMeta[fileName];
@@ -291,6 +379,8 @@ export const useUploadZone = ({ item }: { item: Item }) => {
     for (const [, upload] of entries) {
       if (upload.abort) {
         await upload.abort();
+      } else if (upload.batch) {
+        void settleBatchFile(upload.batch);
       }
     }
     setUploadingState((prev) => {
@@ -305,6 +395,81 @@ export const useUploadZone = ({ item }: { item: Item }) => {
     });
   }, []);
 
+  /**
+   * Create the files to upload by batches and enqueue them. Files are created
+   * under the drop target with their relative path, or directly in their
+   * folder when the folders were already created by handleHierarchy.
+   */
+  const enqueueBatches = async (
+    files: FileUpload[],
+    foldersCreated: boolean,
+    parentPath: string,
+  ) => {
+    const batchSize =
+      config.ITEM_UPLOAD_BATCH_SIZE ?? DEFAULT_UPLOAD_BATCH_SIZE;
+    const filesByParent = new Map<string, FileUpload[]>();
+    for (const file of files) {
+      const parentId = foldersCreated ? file.parentId! : item.id;
+      filesByParent.set(parentId, [
+        ...(filesByParent.get(parentId) ?? []),
+        file,
+      ]);
+    }
+
+    for (const [parentId, parentFiles] of filesByParent) {
+      for (let start = 0; start < parentFiles.length; start += batchSize) {
+        const chunkFiles = parentFiles.slice(start, start + batchSize);
+        let created: UploadBatch;
+        try {
+          created = await driver.createUploadBatch({
+            parentId,
+            files: chunkFiles.map((file) => ({
+              path: foldersCreated ? file.name : pathNicefy(file.path!),
+              size: file.size,
+            })),
+          });
+        } catch (err) {
+          const errorCode = getErrorCode(err);
+          setUploadingState((prev) => {
+            const filesMeta = { ...prev.filesMeta };
+            for (const file of chunkFiles) {
+              filesMeta[pathNicefy(file.path!)] = {
+                file,
+                progress: 0,
+                status: FileUploadStatus.ERROR,
+                error: errorCode,
+              };
+            }
+            return { ...prev, filesMeta };
+          });
+          continue;
+        }
+
+        // Show the folders created with the files.
+        refresh(parentId);
+        const chunk: UploadBatchChunk = {
+          parentId,
+          remaining: chunkFiles.length,
+          uploaded: [],
+        };
+        // Created files are returned in the order of the batch.
+        chunkFiles.forEach((file, index) => {
+          const createdFile = created.files[index];
+          activeUploadsRef.current.set(pathNicefy(file.path!), {
+            file,
+            parentPath,
+            batch: {
+              chunk,
+              id: createdFile.id,
+              parentId: createdFile.parent_id,
+              policy: createdFile.policy,
+            },
+          });
+        });
+      }
+    }
+  };
+
   const validateDrop = () => {
     const canUpload = canCreateChildren;
     if (!canUpload) {
@@ -441,7 +606,16 @@ export const useUploadZone = ({ item }: { item: Item }) => {
       dismissDragToast();
 
       const upload = filesToUpload(acceptedFiles);
-      await handleHierarchy(upload);
+      // Uploads to a folder create their files, and the folders of their
+      // paths, by batches. Empty folders have no file to be created with, so
+      // the folders of such drops are still created one by one beforehand.
+      const uploadByBatches = Boolean(item?.id);
+      const hasEmptyFolders = acceptedFiles.some((file) =>
+        isEmptyFolderMarker(file),
+      );
+      if (!uploadByBatches || hasEmptyFolders) {
+        await handleHierarchy(upload);
+      }
 
       if (hasOnlyEmptyFolders) {
         setUploadingState((prev) => ({
@@ -525,11 +699,15 @@ export const useUploadZone = ({ item }: { item: Item }) => {
       // path of the drop target is stored once per file so we can later
       // resolve "was an ancestor of this upload deleted?" via isIdInItemTree.
       const parentPath = item?.path ?? "";
-      for (const file of validFiles) {
-        activeUploadsRef.current.set(pathNicefy(file.path!), {
-          file,
-          parentPath,
-        });
+      if (uploadByBatches) {
+        await enqueueBatches(validFiles, hasEmptyFolders, parentPath);
+      } else {
+        for (const file of validFiles) {
+          activeUploadsRef.current.set(pathNicefy(file.path!), {
+            file,
+            parentPath,
+          });
+        }
       }
 
       // If the processing loop is already running, it will pick up the new files
@@ -556,28 +734,36 @@ export const useUploadZone = ({ item }: { item: Item }) => {
 
         const [filePath, upload] = nextEntry;
         const file = upload.file;
+        const { batch } = upload;
 
-        const { promise, abort } = driver.createFile({
-          filename: file.name,
-          file,
-          parentId: file.parentId,
-          progressHandler: (progress) => {
-            setUploadingState((prev) => ({
-              ...prev,
-              filesMeta: {
-                ...prev.filesMeta,
-                [filePath]: {
-                  file,
-                  progress,
-                  status:
-                    progress >= 100
-                      ? FileUploadStatus.DONE
-                      : FileUploadStatus.UPLOADING,
-                },
+        const progressHandler = (progress: number) => {
+          setUploadingState((prev) => ({
+            ...prev,
+            filesMeta: {
+              ...prev.filesMeta,
+              [filePath]: {
+                file,
+                progress,
+                status:
+                  progress >= 100
+                    ? FileUploadStatus.DONE
+                    : FileUploadStatus.UPLOADING,
               },
-            }));
-          },
-        });
+            },
+          }));
+        };
+        const { promise, abort } = batch
+          ? driver.uploadBatchFile({
+              policy: batch.policy,
+              file,
+              progressHandler,
+            })
+          : driver.createFile({
+              filename: file.name,
+              file,
+              parentId: file.parentId,
+              progressHandler,
+            });
 
         // Mark this entry as "in flight" so the loop won't pick it again.
         upload.abort = abort;
@@ -587,9 +773,17 @@ export const useUploadZone = ({ item }: { item: Item }) => {
           // If the upload was cancelled mid-flight, the entry was removed
           // from the map: skip the success state update.
           if (!activeUploadsRef.current.has(filePath)) {
+            if (batch) {
+              void settleBatchFile(batch);
+            }
             continue;
           }
           activeUploadsRef.current.delete(filePath);
+          if (batch) {
+            // The file is done once its batch is ended.
+            void settleBatchFile(batch, { filePath, file });
+            continue;
+          }
           refresh(file.parentId);
           setUploadingState((prev) => ({
             ...prev,
@@ -607,6 +801,9 @@ export const useUploadZone = ({ item }: { item: Item }) => {
           // onCancelAll) ran while the upload was in flight → user cancel.
           const wasCancelled = !activeUploadsRef.current.has(filePath);
           activeUploadsRef.current.delete(filePath);
+          if (batch) {
+            void settleBatchFile(batch);
+          }
           if (
             wasCancelled ||
             (err instanceof DOMException && err.name === "AbortError")
@@ -614,10 +811,7 @@ export const useUploadZone = ({ item }: { item: Item }) => {
             // Already handled by onCancelFile/onCancelAll
             continue;
           }
-          let errorCode = "unknown";
-          if (err instanceof APIError && err.data?.errors?.[0]?.code) {
-            errorCode = err.data.errors[0].code;
-          }
+          const errorCode = getErrorCode(err);
 
           // Keep file in state with error status
           setUploadingState((prev) => ({
@@ -32,6 +32,7 @@ export const useDownloadItem = () => {
     const isSuspicious = itemState === ItemUploadState.SUSPICIOUS;
     const isPending =
       itemState === ItemUploadState.PENDING ||
+      itemState === ItemUploadState.FINALIZING ||
       itemState === ItemUploadState.ANALYZING;
 
     let title: string | undefined;